@@ -9,6 +9,7 @@ from typing import Optional, List
 from datetime import datetime, date
 
 from app.database.connection import get_db
+from app.services.document_download import DocumentDownloadService
 from app.models.processo import Processo, Documento, DocumentoTag, DocumentoEntidade
 from app.models.api_schemas import (
     DocumentoResponse, DocumentoUpdate, DocumentoStatistics,
@@ -444,13 +445,12 @@ async def upload_documento(
             data_documento=datetime.now().date(),
             data_inclusao=datetime.now().date(),
             unidade="Upload Manual",
-            arquivo_path=str(file_path),
-            downloaded=True,  # Já foi "baixado" (upload)
             detalhamento_status='pendente'
         )
         
-        db.add(documento)
-        db.commit()
+        # Já foi "baixado" (upload): entra nos totais de download
+        download_service = DocumentDownloadService(db, {"download_base_path": "uploads"})
+        download_service.register_uploaded_file(documento, str(file_path), len(content), file_hash)
         db.refresh(documento)
         
         # Converter para response incluindo informações do arquivo
@@ -1,9 +1,11 @@
 """
 Router para endpoints de LLM/Análises - Fase 6
 """
+import json
+import logging
 from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, and_, or_
 from typing import Optional, List
 from datetime import datetime, date, timedelta
 from decimal import Decimal
@@ -11,14 +13,17 @@ from decimal import Decimal
 from app.database.connection import get_db
 from app.models.processo import Documento
 from app.services.llm_service import LLMService
+from app.services.batch_progress import BatchProgress, batch_progress_store
 from app.models.api_schemas import (
-    DocumentAnalysisResponse, BatchAnalysisRequest, BatchAnalysisResponse,
-    LLMStatisticsResponse, CostEstimationResponse, LLMConfigResponse,
+    DocumentAnalysisResponse, BatchAnalysisRequest, BatchAnalysisResponse, BatchJobStatusResponse,
+    LLMStatisticsResponse, LLMCallStatisticsResponse, LLMCallBucketResponse, CostEstimationResponse, LLMConfigResponse,
     LLMConfigUpdate, CleanupResponse, PaginatedDocumentos, ResponseMessage
 )
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
 def get_llm_service(db: Session = Depends(get_db)) -> LLMService:
     """Dependency para obter instância do LLMService"""
     config = {
@@ -70,80 +75,147 @@ async def analyze_documento(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro na análise: {str(e)}")
 
+# ===== ENDPOINTS DE ANÁLISE EM LOTE =====
+
+def _ndjson_line(event: str, **payload) -> str:
+    """Serializa um evento do stream como uma linha NDJSON"""
+    return json.dumps({"event": event, **payload}, default=str, ensure_ascii=False) + "\n"
+
+async def _run_batch_job(llm_service: LLMService, request: BatchAnalysisRequest, progress: BatchProgress):
+    """Executa um lote em background atualizando o progresso"""
+    try:
+        async for _ in llm_service.iter_batch_analysis(
+            request.documento_ids, request.max_concurrent, progress
+        ):
+            pass
+        progress.finish()
+    except Exception as e:
+        logger.error(f"Erro no lote {progress.job_id}: {str(e)}")
+        progress.finish(error_message=str(e))
+
+@router.post("/batch-analyze/stream")
+async def batch_analyze_stream(
+    request: BatchAnalysisRequest,
+    llm_service: LLMService = Depends(get_llm_service)
+):
+    """
+    Análise em lote com resultados incrementais (NDJSON).
+    
+    Emite uma linha `result` por documento assim que sua análise termina,
+    com totais acumulados de tokens/custo e ETA, e uma linha final
+    `completed`. O lote também pode ser acompanhado em `/batch-jobs/{job_id}`
+    (job_id no header `X-Batch-Job-Id`).
+    """
+    progress = batch_progress_store.create(len(request.documento_ids))
+    
+    async def event_stream():
+        yield _ndjson_line("started", progress=progress.snapshot().model_dump(mode="json"))
+        try:
+            async for result in llm_service.iter_batch_analysis(
+                request.documento_ids, request.max_concurrent, progress
+            ):
+                yield _ndjson_line(
+                    "result",
+                    result=result.model_dump(mode="json"),
+                    progress=progress.snapshot().model_dump(mode="json")
+                )
+            progress.finish()
+            yield _ndjson_line("completed", progress=progress.snapshot().model_dump(mode="json"))
+        except Exception as e:
+            logger.error(f"Erro no lote {progress.job_id}: {str(e)}")
+            progress.finish(error_message=str(e))
+            yield _ndjson_line("error", progress=progress.snapshot().model_dump(mode="json"))
+        finally:
+            if not progress.is_finished:
+                # Cliente desconectou antes do fim
+                progress.finish(error_message="Stream interrompido pelo cliente")
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="application/x-ndjson",
+        headers={"X-Batch-Job-Id": progress.job_id, "Cache-Control": "no-cache"}
+    )
+
+@router.post("/batch-jobs", response_model=BatchJobStatusResponse, status_code=202)
+async def create_batch_job(
+    request: BatchAnalysisRequest,
+    background_tasks: BackgroundTasks,
+    llm_service: LLMService = Depends(get_llm_service)
+):
+    """Inicia análise em lote em background; acompanhe via GET /batch-jobs/{job_id}"""
+    
+    progress = batch_progress_store.create(len(request.documento_ids))
+    background_tasks.add_task(_run_batch_job, llm_service, request, progress)
+    
+    return BatchJobStatusResponse(**progress.snapshot().model_dump())
+
+@router.get("/batch-jobs/{job_id}", response_model=BatchJobStatusResponse)
+async def get_batch_job_status(job_id: str):
+    """Status e progresso de um lote de análises"""
+    
+    progress = batch_progress_store.get(job_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail="Lote não encontrado")
+    
+    return BatchJobStatusResponse(**progress.snapshot().model_dump())
+
 # ===== ENDPOINTS DE ESTATÍSTICAS =====
 
 @router.get("/statistics", response_model=LLMStatisticsResponse)
 async def get_llm_statistics(
-    db: Session = Depends(get_db)
+    llm_service: LLMService = Depends(get_llm_service)
 ):
-    """Estatísticas do LLM"""
+    """Estatísticas do LLM (tokens e custo reais da telemetria de chamadas)"""
     
     try:
-        # Buscar estatísticas básicas dos documentos analisados
-        total_docs = db.query(Documento).count()
-        
-        # Documentos com análise concluída
-        docs_analisados = db.query(Documento).filter(
-            Documento.detalhamento_status == 'concluido'
-        ).count()
-        
-        # Documentos com falha na análise
-        docs_com_falha = db.query(Documento).filter(
-            Documento.detalhamento_status == 'erro'
-        ).count()
-        
-        # Total de tokens (se disponível)
-        tokens_result = db.query(func.sum(Documento.detalhamento_tokens)).filter(
-            Documento.detalhamento_tokens.isnot(None)
-        ).scalar()
-        total_tokens = int(tokens_result) if tokens_result else 0
-        
-        # Custo total (estimado baseado em tokens)
-        cost_per_1k_tokens = 0.0015  # Custo estimado
-        total_cost = Decimal(str((total_tokens / 1000) * cost_per_1k_tokens))
-        
-        # Médias
-        avg_tokens = float(total_tokens / docs_analisados) if docs_analisados > 0 else 0.0
-        avg_cost = total_cost / docs_analisados if docs_analisados > 0 else Decimal('0.0')
-        
-        # Modelo mais usado
-        modelo_result = db.query(
-            Documento.detalhamento_modelo,
-            func.count(Documento.id)
-        ).filter(
-            Documento.detalhamento_modelo.isnot(None)
-        ).group_by(Documento.detalhamento_modelo).order_by(
-            desc(func.count(Documento.id))
-        ).first()
-        
-        most_used_model = modelo_result[0] if modelo_result else "gpt-4o-mini"
-        
-        # Última análise
-        last_doc = db.query(Documento).filter(
-            Documento.detalhamento_data.isnot(None)
-        ).order_by(desc(Documento.detalhamento_data)).first()
-        
-        last_analysis = last_doc.detalhamento_data if last_doc else None
-        
-        # Percentual de processamento
-        processing_percentage = float((docs_analisados / total_docs) * 100) if total_docs > 0 else 0.0
+        stats = llm_service.get_llm_statistics()
         
+        # No serviço, total_documents_processed é o total de documentos; a API
+        # sempre expôs aqui os documentos com análise concluída
         return LLMStatisticsResponse(
-            total_documents_processed=docs_analisados,
-            successful_analyses=docs_analisados,
-            failed_analyses=docs_com_falha,
-            total_tokens_used=total_tokens,
-            total_cost_usd=total_cost,
-            average_tokens_per_document=avg_tokens,
-            average_cost_per_document=avg_cost,
-            most_used_model=most_used_model,
-            last_analysis_at=last_analysis,
-            processing_percentage=processing_percentage
+            total_documents_processed=stats.successful_analyses,
+            successful_analyses=stats.successful_analyses,
+            failed_analyses=stats.failed_analyses,
+            total_tokens_used=stats.total_tokens_used,
+            total_cost_usd=stats.total_cost_usd,
+            average_tokens_per_document=stats.average_tokens_per_document or 0.0,
+            average_cost_per_document=stats.average_cost_per_document or Decimal('0.0'),
+            most_used_model=stats.most_used_model or "gpt-4o-mini",
+            last_analysis_at=stats.last_analysis_at,
+            processing_percentage=stats.processing_percentage
         )
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao buscar estatísticas: {str(e)}")
 
+@router.get("/statistics/calls", response_model=LLMCallStatisticsResponse)
+async def get_llm_call_statistics(
+    granularity: str = Query("hour", pattern="^(hour|day)$", description="Intervalo de agregação"),
+    since_hours: int = Query(24, ge=1, le=24 * 90, description="Período consultado, em horas"),
+    model: Optional[str] = Query(None, description="Filtra por modelo"),
+    llm_service: LLMService = Depends(get_llm_service)
+):
+    """Série temporal de uso, custo e latência (p50/p95) das chamadas ao LLM"""
+    
+    try:
+        buckets = llm_service.get_call_statistics(
+            granularity=granularity,
+            since=datetime.now() - timedelta(hours=since_hours),
+            model=model
+        )
+        
+        return LLMCallStatisticsResponse(
+            granularity=granularity,
+            model=model,
+            buckets=[
+                LLMCallBucketResponse(**bucket.model_dump(exclude={"model"}))
+                for bucket in buckets
+            ]
+        )
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar estatísticas de chamadas: {str(e)}")
+
 @router.get("/cost-estimation", response_model=CostEstimationResponse)
 async def get_cost_estimation(
     llm_service: LLMService = Depends(get_llm_service)
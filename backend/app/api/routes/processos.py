@@ -3,6 +3,7 @@ Router para endpoints de Processos - Fase 6
 """
 import logging
 from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc, and_, case
 from typing import Optional, List, Dict, Any
@@ -554,8 +555,8 @@ async def preview_scraping(request: ScrapingPreviewRequest):
     try:
         logger.info(f"Preview de scraping solicitado para: {request.url}")
         
-        # Executar preview real
-        resultado = scraping_preview_service.preview_scraping(request.url)
+        # Executar preview real (assíncrono, com cache de curta duração)
+        resultado = await scraping_preview_service.preview_scraping(request.url)
         
         logger.info(f"Preview concluído: {resultado.total_protocolos} protocolos, {resultado.total_andamentos} andamentos")
         return resultado
@@ -572,18 +573,26 @@ async def salvar_processo_completo(request: SalvarProcessoCompletoRequest):
     """
     Salva processo completo com todos os dados relacionados.
     
-    - **url**: URL original do processo
-    - **autuacao**: Dados da autuação
-    - **protocolos**: Lista de protocolos/documentos
-    - **andamentos**: Lista de andamentos
+    - **preview_token**: Token devolvido pelo preview (dispensa reenviar os dados)
+    - **url**: URL original do processo (alternativa ao token)
+    - **autuacao**: Dados da autuação (opcional se houver preview válido)
+    - **protocolos**: Lista de protocolos/documentos (opcional)
+    - **andamentos**: Lista de andamentos (opcional)
+    - **alteracoes**: Edições do cliente sobre o preview, como diff (opcional)
     
+    Campos omitidos são reaproveitados do preview em cache.
     Salva processo, documentos e andamentos em uma única transação.
     """
     try:
-        logger.info(f"Salvamento completo solicitado para processo: {request.autuacao.numero}")
+        dados = scraping_preview_service.resolver_dados_salvamento(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        logger.info(f"Salvamento completo solicitado para processo: {dados.autuacao.numero}")
         
-        # Executar salvamento
-        resultado = scraping_preview_service.salvar_processo_completo(request)
+        # Executar salvamento (acesso síncrono ao banco fora do event loop)
+        resultado = await run_in_threadpool(scraping_preview_service.salvar_processo_completo, dados)
         
         if resultado.sucesso:
             logger.info(f"Processo salvo com sucesso: ID {resultado.processo_id}")
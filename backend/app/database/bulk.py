@@ -0,0 +1,56 @@
+"""
+Utilitários para inserção em lote
+"""
+from typing import Any, Dict, List
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+
+def build_insert_ignore(db: Session, model):
+    """
+    Monta INSERT que ignora linhas em conflito com constraints de unicidade
+
+    Usa ON CONFLICT DO NOTHING no PostgreSQL e no SQLite. Em outros bancos
+    retorna um INSERT simples (conflitos geram IntegrityError).
+
+    Args:
+        db: Sessão do banco de dados
+        model: Modelo SQLAlchemy de destino
+
+    Returns:
+        Statement de inserção
+    """
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return insert(model)
+
+    return dialect_insert(model).on_conflict_do_nothing()
+
+
+def bulk_insert_ignore(db: Session, model, rows: List[Dict[str, Any]]) -> int:
+    """
+    Insere linhas em lote (um único executemany) ignorando duplicatas
+
+    Não faz commit: a inserção participa da transação corrente da sessão.
+
+    Args:
+        db: Sessão do banco de dados
+        model: Modelo SQLAlchemy de destino
+        rows: Lista de dicionários coluna -> valor
+
+    Returns:
+        Número de linhas efetivamente inseridas
+    """
+    if not rows:
+        return 0
+
+    stmt = build_insert_ignore(db, model).returning(model.id)
+    result = db.execute(stmt, rows)
+
+    return len(result.all())
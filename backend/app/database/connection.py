@@ -1,16 +1,42 @@
 """
 Configuração de conexão com banco de dados
 """
+import logging
 import os
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import QueuePool, StaticPool
 from typing import Generator
 
+from app.metrics import DB_POOL_CHECKOUT_SECONDS
+
+logger = logging.getLogger(__name__)
+
 # Base para modelos SQLAlchemy
 Base = declarative_base()
 
+
+class _TimedCheckout:
+    """Mede em sei_db_pool_checkout_seconds o tempo para obter uma conexão do pool"""
+    
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    """QueuePool com métrica de checkout"""
+
+
+class TimedStaticPool(_TimedCheckout, StaticPool):
+    """StaticPool com métrica de checkout"""
+
+
 class DatabaseConfig:
     """Configuração do banco de dados"""
     
@@ -46,6 +72,7 @@ class DatabaseConfig:
                 engine = create_engine(
                     url,
                     echo=self.echo,
+                    poolclass=TimedQueuePool,
                     pool_size=10,
                     max_overflow=20,
                     pool_pre_ping=True,
@@ -56,11 +83,11 @@ class DatabaseConfig:
                 with engine.connect() as conn:
                     pass
                 
-                print(f"✅ Conectado ao PostgreSQL: {url[:30]}...")
+                logger.info("Conectado ao PostgreSQL: %s", engine.url.render_as_string(hide_password=True))
                 return engine
                 
             except (ImportError, Exception) as e:
-                print(f"⚠️ PostgreSQL não disponível ({e}), usando SQLite como fallback")
+                logger.warning("PostgreSQL não disponível (%s), usando SQLite como fallback", e)
                 url = "sqlite:///./sei_scraper.db"
         
         # Configuração para SQLite (desenvolvimento/fallback)
@@ -68,18 +95,18 @@ class DatabaseConfig:
             engine = create_engine(
                 url,
                 echo=self.echo,
-                poolclass=StaticPool,
+                poolclass=TimedStaticPool,
                 connect_args={"check_same_thread": False}
             )
-            print(f"✅ Conectado ao SQLite: {url}")
+            logger.info("Conectado ao SQLite: %s", url)
             return engine
         
         # Fallback final para SQLite
-        print("⚠️ Configuração de banco inválida, usando SQLite como fallback final")
+        logger.warning("Configuração de banco inválida, usando SQLite como fallback final")
         return create_engine(
             "sqlite:///./sei_scraper.db",
             echo=self.echo,
-            poolclass=StaticPool,
+            poolclass=TimedStaticPool,
             connect_args={"check_same_thread": False}
         )
 
@@ -118,14 +145,69 @@ def get_test_db() -> Generator:
     finally:
         db.close()
 
+def upgrade_schema(engine) -> list:
+    """
+    Acrescenta às tabelas existentes as colunas e índices novos dos modelos
+    
+    create_all() só cria tabelas que ainda não existem; bases criadas por
+    versões anteriores (PostgreSQL em produção ou sei_scraper.db) precisam de
+    ALTER TABLE para as colunas acrescentadas depois. Idempotente: só emite o
+    que falta. Colunas com default escalar são preenchidas nas linhas antigas.
+    
+    Args:
+        engine: Engine do banco a atualizar
+        
+    Returns:
+        Colunas e índices criados ("tabela.coluna" / nome do índice)
+    """
+    created = []
+    
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            
+            columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                preparer = engine.dialect.identifier_preparer
+                ddl_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"ADD COLUMN {preparer.format_column(column)} {ddl_type}"
+                ))
+                if column.default is not None and column.default.is_scalar:
+                    conn.execute(
+                        text(
+                            f"UPDATE {preparer.format_table(table)} SET {preparer.format_column(column)} = :valor "
+                            f"WHERE {preparer.format_column(column)} IS NULL"
+                        ),
+                        {"valor": column.default.arg}
+                    )
+                created.append(f"{table.name}.{column.name}")
+            
+            indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(bind=conn)
+                    created.append(index.name)
+    
+    if created:
+        logger.info("Esquema atualizado: %s", ", ".join(created))
+    return created
+
 def create_tables(test: bool = False):
-    """Cria todas as tabelas"""
+    """Cria todas as tabelas e acrescenta as colunas novas às já existentes"""
     try:
         engine = db_config.get_engine(test=test)
         Base.metadata.create_all(bind=engine)
-        print("✅ Tabelas criadas com sucesso")
+        upgrade_schema(engine)
+        logger.info("Tabelas criadas com sucesso")
     except Exception as e:
-        print(f"⚠️ Erro ao criar tabelas: {e}")
+        logger.warning("Erro ao criar tabelas: %s", e)
         # Em produção, continua mesmo com erro de banco
         if os.getenv("ENVIRONMENT") != "production":
             raise e
@@ -1,13 +1,15 @@
 """
 Aplicação principal FastAPI
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 import os
+import time
 
 # Importar modelos para criar tabelas (será usado quando implementarmos as rotas)
 from app.models import processo  # noqa: F401
 from app.database.connection import create_tables
+from app.metrics import CONTENT_TYPE, HTTP_REQUEST_SECONDS, render as render_metrics
 
 app = FastAPI(
     title="SEI Scraper API",
@@ -26,6 +28,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def measure_request_latency(request: Request, call_next):
+    """Mede a latência de cada requisição pelo template da rota (ex.: /api/v1/processos/{processo_id})"""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.labels(
+            method=request.method,
+            route=getattr(route, "path", "não mapeada"),
+            status=status
+        ).observe(time.perf_counter() - started)
+
 # Criar tabelas no startup (para desenvolvimento)
 @app.on_event("startup")
 async def startup_event():
@@ -50,6 +69,11 @@ async def health_check():
         "database": "connected"  # TODO: Implementar verificação real do banco
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Métricas no formato de texto do Prometheus"""
+    return Response(content=render_metrics(), headers={"Content-Type": CONTENT_TYPE})
+
 # Incluir routers da API
 from app.api.routes import processos, documentos, llm
 
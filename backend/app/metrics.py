@@ -0,0 +1,305 @@
+"""
+Métricas do processo no formato de texto do Prometheus
+
+Contadores e histogramas em memória, sem dependências nem serviço externo:
+o endpoint /metrics devolve render() e qualquer coletor compatível com o
+formato de exposição 0.0.4 (Prometheus, VictoriaMetrics, Grafana Agent) pode
+fazer o scrape. Os valores são por processo; o pool de parse só é medido
+no processo principal (tempo de ida e volta do worker).
+
+As métricas ficam declaradas no fim deste módulo e cada estágio (scraper,
+persistência, download, LLM, pool do banco e API) só chama inc/observe.
+"""
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Limites padrão (segundos) para latências
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str, quotes: bool = True) -> str:
+    value = value.replace("\\", "\\\\").replace("\n", "\\n")
+    return value.replace('"', '\\"') if quotes else value
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(pairs: Iterable[Tuple[str, str]]) -> str:
+    body = ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+    return f"{{{body}}}" if body else ""
+
+
+class _CounterChild:
+    """Série de um contador (uma combinação de labels)"""
+
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        if amount < 0:
+            raise ValueError("Contadores só aumentam")
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class _HistogramChild:
+    """Série de um histograma (uma combinação de labels)"""
+
+    __slots__ = ("_bounds", "_counts", "_sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def time(self) -> "_Timer":
+        """Context manager que observa o tempo decorrido em segundos"""
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """Contagens cumulativas por limite (+Inf por último) e soma"""
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative, running = [], 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total
+
+
+class _Timer:
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: _HistogramChild):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class _Metric:
+    """Métrica com labels; cada combinação de valores é uma série"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, **labels: object):
+        """
+        Série para os valores de labels informados
+
+        Args:
+            **labels: Um valor para cada label da métrica
+
+        Returns:
+            Série (criada na primeira chamada)
+        """
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} espera os labels {self.labelnames}, recebeu {tuple(labels)}")
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _series(self) -> List[Tuple[Tuple[Tuple[str, str], ...], object]]:
+        with self._lock:
+            items = sorted(self._children.items())
+        return [(tuple(zip(self.labelnames, key)), child) for key, child in items]
+
+    def reset(self):
+        """Descarta as séries (testes)"""
+        with self._lock:
+            self._children.clear()
+            if not self.labelnames:
+                self._children[()] = self._new_child()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape(self.documentation, quotes=False)}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Contador monotônico"""
+
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        """Incrementa a série sem labels"""
+        self.labels().inc(amount)
+
+    def _render_samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(labels)} {_format_value(child.value)}"
+            for labels, child in self._series()
+        ]
+
+
+class Histogram(_Metric):
+    """Histograma com limites fixos (buckets cumulativos, _sum e _count)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != math.inf))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        """Observa um valor na série sem labels"""
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        """Mede o tempo do bloco na série sem labels"""
+        return self.labels().time()
+
+    def _render_samples(self) -> List[str]:
+        lines = []
+        for labels, child in self._series():
+            cumulative, total = child.snapshot()
+            for bound, count in zip(self.buckets + (math.inf,), cumulative):
+                le = labels + (("le", _format_value(bound)),)
+                lines.append(f"{self.name}_bucket{_format_labels(le)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative[-1]}")
+        return lines
+
+
+class Registry:
+    """Conjunto de métricas expostas em /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica já registrada: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """Zera todas as métricas (testes)"""
+        for metric in self._metrics.values():
+            metric.reset()
+
+
+REGISTRY = Registry()
+
+
+def render() -> str:
+    """
+    Todas as métricas no formato de texto do Prometheus
+
+    Returns:
+        Corpo da resposta de /metrics
+    """
+    return REGISTRY.render()
+
+
+# Scraper
+SCRAPER_FETCH_SECONDS = REGISTRY.register(Histogram(
+    "sei_scraper_fetch_seconds", "Duração de cada requisição HTTP ao SEI (por tentativa)",
+    ("mode", "status")
+))
+SCRAPER_PARSE_SECONDS = REGISTRY.register(Histogram(
+    "sei_scraper_parse_seconds", "Tempo de parse por página", ("mode",)
+))
+
+# Persistência
+PERSISTENCE_ROWS_INSERTED = REGISTRY.register(Counter(
+    "sei_persistence_rows_inserted_total", "Linhas novas gravadas pelos merges", ("secao",)
+))
+
+# Downloads
+DOWNLOAD_BYTES = REGISTRY.register(Counter(
+    "sei_download_bytes_total", "Bytes recebidos nos downloads de documentos"
+))
+DOWNLOAD_SECONDS = REGISTRY.register(Histogram(
+    "sei_download_seconds", "Duração de cada tentativa de download", ("outcome",)
+))
+DOWNLOAD_THROUGHPUT = REGISTRY.register(Histogram(
+    "sei_download_throughput_bytes_per_second", "Vazão de cada transferência de documento",
+    buckets=(16e3, 64e3, 256e3, 1e6, 4e6, 16e6, 64e6)
+))
+
+# LLM
+LLM_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "sei_llm_request_seconds", "Latência das chamadas ao LLM", ("model", "outcome")
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "sei_llm_tokens_total", "Tokens consumidos nas chamadas ao LLM", ("model", "kind")
+))
+LLM_COST_USD = REGISTRY.register(Counter(
+    "sei_llm_cost_usd_total", "Custo estimado das chamadas ao LLM em USD", ("model",)
+))
+
+# Banco de dados
+DB_POOL_CHECKOUT_SECONDS = REGISTRY.register(Histogram(
+    "sei_db_pool_checkout_seconds", "Espera para obter uma conexão do pool",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+))
+
+# API
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "sei_http_request_seconds", "Latência das requisições à API por rota", ("method", "route", "status")
+))
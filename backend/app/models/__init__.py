@@ -5,16 +5,28 @@ from .processo import (
     Processo,
     Autuacao, 
     Documento,
+    DocumentoPagina,
     DocumentoTag,
     DocumentoEntidade,
-    Andamento
+    Andamento,
+    ProcessoFingerprint,
+    LLMChamada,
+    LLMChamadaAgregada,
+    DownloadTentativa,
+    DownloadAgregado
 )
 
 __all__ = [
     "Processo",
     "Autuacao",
     "Documento", 
+    "DocumentoPagina",
     "DocumentoTag",
     "DocumentoEntidade",
-    "Andamento"
+    "Andamento",
+    "ProcessoFingerprint",
+    "LLMChamada",
+    "LLMChamadaAgregada",
+    "DownloadTentativa",
+    "DownloadAgregado"
 ] 
\ No newline at end of file
@@ -185,6 +185,22 @@ class BatchAnalysisResponse(BaseModel):
     started_at: datetime
     completed_at: Optional[datetime] = None
 
+class BatchJobStatusResponse(BaseModel):
+    """Status de um lote de análises (streaming ou em background)"""
+    job_id: str
+    status: str
+    total_documents: int
+    completed: int
+    successful: int
+    failed: int
+    total_tokens_used: int
+    total_cost_usd: Decimal
+    elapsed_seconds: float
+    eta_seconds: Optional[float] = None
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    error_message: Optional[str] = None
+
 class LLMStatisticsResponse(BaseModel):
     """Estatísticas do LLM"""
     total_documents_processed: int
@@ -198,6 +214,26 @@ class LLMStatisticsResponse(BaseModel):
     last_analysis_at: Optional[datetime] = None
     processing_percentage: float
 
+class LLMCallBucketResponse(BaseModel):
+    """Uso e latência das chamadas ao LLM em um intervalo"""
+    bucket_start: datetime
+    calls: int
+    failed_calls: int
+    retries: int
+    cache_hits: int
+    prompt_tokens: int
+    completion_tokens: int
+    total_cost_usd: Decimal
+    average_latency_ms: Optional[float] = None
+    p50_latency_ms: Optional[float] = None
+    p95_latency_ms: Optional[float] = None
+
+class LLMCallStatisticsResponse(BaseModel):
+    """Série temporal da telemetria de chamadas ao LLM"""
+    granularity: str
+    model: Optional[str] = None
+    buckets: List[LLMCallBucketResponse]
+
 class CostEstimationResponse(BaseModel):
     """Estimativa de custos"""
     document_count: int
@@ -326,19 +362,37 @@ class ScrapingPreviewResponse(BaseModel):
     url_original: str
     total_protocolos: int = Field(description="Total de protocolos encontrados")
     total_andamentos: int = Field(description="Total de andamentos encontrados")
+    preview_token: Optional[str] = Field(None, description="Token para salvar este preview sem reenviar os dados")
 
 class ScrapingPreviewRequest(BaseModel):
     url: str = Field(description="URL do processo no SEI-RJ")
 
+class AlteracoesLista(BaseModel):
+    """Edições sobre uma lista do preview (índices referem-se à lista do preview)"""
+    alterados: Dict[int, Dict[str, Any]] = Field(default_factory=dict, description="Campos alterados por índice")
+    removidos: List[int] = Field(default_factory=list, description="Índices removidos")
+    adicionados: List[Dict[str, Any]] = Field(default_factory=list, description="Itens novos")
+
+class AlteracoesPreview(BaseModel):
+    """Edições do cliente sobre o preview, enviadas como diff"""
+    autuacao: Dict[str, Any] = Field(default_factory=dict, description="Campos alterados da autuação")
+    protocolos: AlteracoesLista = Field(default_factory=AlteracoesLista)
+    andamentos: AlteracoesLista = Field(default_factory=AlteracoesLista)
+
 class SalvarProcessoCompletoRequest(BaseModel):
-    url: str
-    autuacao: ProcessoInfoPreview
-    protocolos: List[ProtocoloInfoPreview]
-    andamentos: List[AndamentoInfoPreview]
+    url: Optional[str] = None
+    preview_token: Optional[str] = Field(None, description="Token devolvido pelo preview")
+    # Se omitidos, são reutilizados os dados do preview (pelo token ou pela URL)
+    autuacao: Optional[ProcessoInfoPreview] = None
+    protocolos: Optional[List[ProtocoloInfoPreview]] = None
+    andamentos: Optional[List[AndamentoInfoPreview]] = None
+    alteracoes: Optional[AlteracoesPreview] = None
 
 class SalvarProcessoCompletoResponse(BaseModel):
     processo_id: int
     protocolos_salvos: int
     andamentos_salvos: int
+    protocolos_ignorados: int = Field(0, description="Protocolos já existentes, não inseridos")
+    andamentos_ignorados: int = Field(0, description="Andamentos já existentes, não inseridos")
     sucesso: bool
     mensagem: str 
\ No newline at end of file
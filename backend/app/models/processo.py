@@ -1,7 +1,7 @@
 """
 Modelos de dados para processos SEI
 """
-from sqlalchemy import Column, Integer, String, Text, Date, DateTime, Boolean, ForeignKey, Numeric, UniqueConstraint
+from sqlalchemy import Column, Integer, BigInteger, Float, String, Text, Date, DateTime, Boolean, ForeignKey, Numeric, UniqueConstraint, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database.connection import Base
@@ -25,6 +25,14 @@ class Processo(Base):
     
     # Campos técnicos
     hash_conteudo = Column(String(100))  # Novo campo
+    digest_secoes = Column(Text)  # ProcessoDigest (JSON) do último snapshot persistido
+    
+    # Agendamento da reverificação (RefreshScheduler)
+    taxa_mudancas = Column(Float)  # mudanças por dia estimadas
+    mudancas_observadas = Column(Float)  # mudanças vistas, com decaimento exponencial
+    dias_observados = Column(Float)  # tempo coberto pelas verificações, com o mesmo decaimento
+    ultima_verificacao = Column(DateTime)
+    proxima_verificacao = Column(DateTime, index=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
@@ -33,6 +41,11 @@ class Processo(Base):
     documentos = relationship("Documento", back_populates="processo")
     andamentos = relationship("Andamento", back_populates="processo")
     
+    @property
+    def numero_sei(self) -> str:
+        """Nome antigo de `numero`, ainda usado na organização dos downloads"""
+        return self.numero
+    
     def __repr__(self):
         return f"<Processo(numero='{self.numero}', situacao='{self.situacao}')>"
 
@@ -70,8 +83,15 @@ class Documento(Base):
     data_documento = Column(Date)
     data_inclusao = Column(Date)
     unidade = Column(String(100))
+    url_download = Column(Text)  # link do documento na página do processo
     arquivo_path = Column(String(500))
+    arquivo_hash = Column(String(64))  # SHA-256 do arquivo baixado
+    arquivo_tamanho = Column(BigInteger)  # bytes
     downloaded = Column(Boolean, default=False)
+    downloaded_at = Column(DateTime)
+    download_duracao_ms = Column(Integer)  # duração do último download concluído
+    download_falhas = Column(Integer, default=0)  # downloads que falharam (após as repetições)
+    download_erro = Column(Text)  # erro do último download, limpo após um sucesso
     
     # Campos para detalhamento LLM
     detalhamento_texto = Column(Text)
@@ -95,6 +115,23 @@ class Documento(Base):
         return f"<Documento(numero_documento='{self.numero_documento}', tipo='{self.tipo}')>"
 
 
+class DocumentoPagina(Base):
+    """Texto extraído de cada página do documento, identificado pelo digest do conteúdo da página"""
+    __tablename__ = "documento_paginas"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    documento_id = Column(Integer, ForeignKey("documentos.id"), nullable=False)
+    numero_pagina = Column(Integer, nullable=False)  # 1-based
+    digest = Column(String(32), nullable=False, index=True)
+    texto = Column(Text)
+    created_at = Column(DateTime, default=func.now())
+    
+    __table_args__ = (UniqueConstraint('documento_id', 'numero_pagina', name='uq_documento_pagina'),)
+    
+    def __repr__(self):
+        return f"<DocumentoPagina(documento_id={self.documento_id}, numero_pagina={self.numero_pagina})>"
+
+
 class DocumentoTag(Base):
     """Modelo para tags de classificação de documentos"""
     __tablename__ = "documento_tags"
@@ -154,7 +191,113 @@ class Andamento(Base):
     # Constraint de unicidade para evitar duplicatas
     __table_args__ = (
         UniqueConstraint('processo_id', 'data_hora', 'unidade', 'descricao', name='uq_andamento_completo'),
+        Index('ix_andamentos_processo_data_hora', 'processo_id', 'data_hora'),
+    )
+    
+    def __repr__(self):
+        return f"<Andamento(data_hora='{self.data_hora}', unidade='{self.unidade}')>"
+
+
+class ProcessoFingerprint(Base):
+    """Fingerprints (64 bits) das linhas já persistidas de uma seção do processo"""
+    __tablename__ = "processo_fingerprints"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    processo_id = Column(Integer, ForeignKey("processos.id"), nullable=False)
+    secao = Column(String(20), nullable=False)  # andamentos, documentos
+    fingerprints = Column(LargeBinary, nullable=False)  # array ordenado de int64
+    total_linhas = Column(Integer, nullable=False)  # linhas cobertas (validação)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        UniqueConstraint('processo_id', 'secao', name='uq_processo_fingerprint_secao'),
+    )
+    
+    def __repr__(self):
+        return f"<ProcessoFingerprint(processo_id={self.processo_id}, secao='{self.secao}')>"
+
+
+class LLMChamada(Base):
+    """Telemetria de cada chamada feita ao provedor de LLM"""
+    __tablename__ = "llm_chamadas"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    documento_id = Column(Integer, ForeignKey("documentos.id"), nullable=True)  # NULL em chamadas agrupadas
+    provider = Column(String(50), nullable=False)
+    modelo = Column(String(100), nullable=False)
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    latencia_ms = Column(Integer, nullable=False)
+    tentativas = Column(Integer, default=0)  # repetições por throttling
+    cache_hit = Column(Boolean, default=False)
+    chunk_index = Column(Integer)
+    documentos_agrupados = Column(Integer, default=1)
+    custo_usd = Column(Numeric(16, 10), default=0)
+    sucesso = Column(Boolean, default=True)
+    erro = Column(Text)
+    created_at = Column(DateTime, default=func.now(), index=True)
+    
+    def __repr__(self):
+        return f"<LLMChamada(modelo='{self.modelo}', latencia_ms={self.latencia_ms})>"
+
+
+class LLMChamadaAgregada(Base):
+    """Agregado horário da telemetria de LLM, mantido incrementalmente"""
+    __tablename__ = "llm_chamadas_agregadas"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    bucket_inicio = Column(DateTime, nullable=False)
+    modelo = Column(String(100), nullable=False)
+    chamadas = Column(Integer, default=0)
+    falhas = Column(Integer, default=0)
+    tentativas = Column(Integer, default=0)
+    cache_hits = Column(Integer, default=0)
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    custo_usd = Column(Numeric(18, 10), default=0)
+    latencia_total_ms = Column(Integer, default=0)
+    latencia_histograma = Column(Text)  # JSON: contagem por faixa de latência
+    
+    __table_args__ = (
+        UniqueConstraint('bucket_inicio', 'modelo', name='uq_llm_agregado_bucket_modelo'),
     )
     
     def __repr__(self):
-        return f"<Andamento(data_hora='{self.data_hora}', unidade='{self.unidade}')>" 
\ No newline at end of file
+        return f"<LLMChamadaAgregada(bucket_inicio='{self.bucket_inicio}', modelo='{self.modelo}')>"
+
+
+class DownloadTentativa(Base):
+    """Registro de cada download de documento (com as repetições internas)"""
+    __tablename__ = "download_tentativas"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    documento_id = Column(Integer, ForeignKey("documentos.id"), nullable=False, index=True)
+    url = Column(Text)
+    sucesso = Column(Boolean, nullable=False)
+    repeticoes = Column(Integer, default=0)
+    tamanho_bytes = Column(BigInteger)
+    duracao_ms = Column(Integer, nullable=False)
+    erro = Column(Text)
+    created_at = Column(DateTime, default=func.now(), index=True)
+    
+    def __repr__(self):
+        return f"<DownloadTentativa(documento_id={self.documento_id}, sucesso={self.sucesso})>"
+
+
+class DownloadAgregado(Base):
+    """Totais de downloads mantidos incrementalmente (linha única, id=1)"""
+    __tablename__ = "downloads_agregados"
+    
+    id = Column(Integer, primary_key=True)
+    documentos_total = Column(Integer)  # todos os documentos; NULL = recontar na próxima leitura
+    documentos_baixados = Column(Integer, default=0)
+    documentos_com_falha = Column(Integer, default=0)  # sem arquivo e com último download falho
+    arquivos_bytes = Column(BigInteger, default=0)  # tamanho somado dos arquivos atuais
+    tentativas = Column(Integer, default=0)
+    tentativas_falhas = Column(Integer, default=0)
+    bytes_transferidos = Column(BigInteger, default=0)
+    duracao_sucesso_ms = Column(BigInteger, default=0)  # tempo somado dos downloads bem-sucedidos
+    ultimo_download_em = Column(DateTime)
+    
+    def __repr__(self):
+        return f"<DownloadAgregado(documentos_baixados={self.documentos_baixados})>"
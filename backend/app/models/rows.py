@@ -0,0 +1,81 @@
+"""
+Linhas internas do caminho scraping → persistência
+
+Dataclasses com __slots__ e os mesmos nomes de campo dos schemas Pydantic
+(AutuacaoData, DocumentoData, AndamentoData): os serviços leem ambos por
+atributo. O parser já entrega valores tipados, então não há validação por
+linha; ProcessoRows.to_model valida tudo de uma vez quando os dados saem
+pela API.
+"""
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:
+    from .schemas import ProcessoData
+
+
+@dataclass(slots=True)
+class AutuacaoRow:
+    """Autuação extraída do scraping"""
+    numero_sei: str
+    tipo: Optional[str] = None
+    data_geracao: Optional[date] = None
+    interessados: Optional[str] = None
+
+
+@dataclass(slots=True)
+class DocumentoRow:
+    """Documento extraído do scraping"""
+    numero_documento: str
+    tipo: Optional[str] = None
+    data_documento: Optional[date] = None
+    data_inclusao: Optional[date] = None
+    unidade: Optional[str] = None
+    url_download: Optional[str] = None
+
+
+@dataclass(slots=True)
+class AndamentoRow:
+    """Andamento extraído do scraping"""
+    data_hora: datetime
+    unidade: Optional[str] = None
+    descricao: Optional[str] = None
+
+
+@dataclass(slots=True)
+class ProcessoRows:
+    """Processo extraído do scraping (equivalente interno de ProcessoData)"""
+    autuacao: AutuacaoRow
+    documentos: List[DocumentoRow] = field(default_factory=list)
+    andamentos: List[AndamentoRow] = field(default_factory=list)
+
+    def to_model(self) -> "ProcessoData":
+        """
+        Converte para o schema Pydantic, validando os dados
+
+        Returns:
+            ProcessoData equivalente
+        """
+        # schemas referencia ProcessoRows em ScrapingResult
+        from .schemas import AndamentoData, AutuacaoData, DocumentoData, ProcessoData
+
+        return ProcessoData(
+            autuacao=AutuacaoData(
+                numero_sei=self.autuacao.numero_sei,
+                tipo=self.autuacao.tipo,
+                data_geracao=self.autuacao.data_geracao,
+                interessados=self.autuacao.interessados
+            ),
+            documentos=[
+                DocumentoData(
+                    numero_documento=d.numero_documento, tipo=d.tipo, data_documento=d.data_documento,
+                    data_inclusao=d.data_inclusao, unidade=d.unidade, url_download=d.url_download
+                )
+                for d in self.documentos
+            ],
+            andamentos=[
+                AndamentoData(data_hora=a.data_hora, unidade=a.unidade, descricao=a.descricao)
+                for a in self.andamentos
+            ]
+        )
@@ -1,11 +1,13 @@
 """
 Schemas Pydantic para validação de dados
 """
-from pydantic import BaseModel, HttpUrl, validator, Field
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, HttpUrl, InstanceOf, validator, Field
+from typing import Optional, List, Dict, Any, Union
 from datetime import datetime, date
 from decimal import Decimal
 
+from .rows import ProcessoRows
+
 
 # Schemas base
 class ProcessoBase(BaseModel):
@@ -191,6 +193,7 @@ class DocumentoData(BaseModel):
     data_documento: Optional[date] = None
     data_inclusao: Optional[date] = None
     unidade: Optional[str] = None
+    url_download: Optional[str] = None
 
 class AndamentoData(BaseModel):
     """Dados de andamento extraídos do scraping"""
@@ -208,21 +211,13 @@ class ProcessoData(BaseModel):
 class ScrapingResult(BaseModel):
     """Resultado do scraping"""
     success: bool
-    processo_data: Optional[ProcessoData] = None
+    # O scraper entrega linhas internas (sem validação por linha); ProcessoData segue aceito
+    processo_data: Optional[Union[InstanceOf[ProcessoRows], ProcessoData]] = None
     error_message: Optional[str] = None
     scraped_at: datetime
 
 
 # Schemas específicos da Fase 3 - Persistência
-class ProcessoResult(BaseModel):
-    """Resultado de operação de persistência de processo"""
-    success: bool
-    processo_id: Optional[int] = None
-    was_updated: bool = False
-    changes_detected: int = 0
-    error_message: Optional[str] = None
-    processed_at: datetime = Field(default_factory=datetime.now)
-
 class ChangesSummary(BaseModel):
     """Resumo das mudanças detectadas"""
     new_andamentos: int = 0
@@ -235,6 +230,16 @@ class ChangesSummary(BaseModel):
         """Calcula total de mudanças"""
         return values.get('new_andamentos', 0) + values.get('new_documentos', 0) + (1 if values.get('updated_autuacao', False) else 0)
 
+class ProcessoResult(BaseModel):
+    """Resultado de operação de persistência de processo"""
+    success: bool
+    processo_id: Optional[int] = None
+    was_updated: bool = False
+    changes_detected: int = 0
+    changes: Optional[ChangesSummary] = None
+    error_message: Optional[str] = None
+    processed_at: datetime = Field(default_factory=datetime.now)
+
 class BatchProcessResult(BaseModel):
     """Resultado de processamento em lote"""
     total_processed: int
@@ -256,6 +261,26 @@ class ContentHash(BaseModel):
     hash_value: str
     created_at: datetime = Field(default_factory=datetime.now)
 
+class SectionDigest(BaseModel):
+    """Digest hierárquico de uma lista ordenada (documentos ou andamentos)"""
+    root: str
+    count: int = 0
+    chunks: List[str] = Field(default_factory=list)  # digest de cada bloco, em ordem
+
+class ProcessoDigest(BaseModel):
+    """Digest hierárquico do processo: autuação, documentos e andamentos"""
+    chunk_size: int
+    root: str
+    autuacao: str
+    documentos: SectionDigest
+    andamentos: SectionDigest
+
+class SnapshotDiff(BaseModel):
+    """Seções alteradas entre dois digests (None = seção inalterada)"""
+    autuacao_changed: bool = True
+    documentos_start: Optional[int] = 0  # primeira posição (ordem canônica) a reenviar
+    andamentos_start: Optional[int] = 0
+
 class MergeOperation(BaseModel):
     """Operação de merge de dados"""
     operation_type: str  # 'insert', 'update', 'skip'
@@ -291,6 +316,16 @@ class BatchDownloadResult(BaseModel):
         """Calcula quantidade de downloads que falharam"""
         return values.get('total_documents', 0) - values.get('successful_downloads', 0)
 
+class DownloadProgress(BaseModel):
+    """Progresso incremental de um download em lote"""
+    total_documents: int
+    completed: int = 0
+    successful: int = 0
+    failed: int = 0
+    bytes_downloaded: int = 0
+    in_progress: int = 0
+    elapsed_seconds: float = 0.0
+
 class DownloadConfig(BaseModel):
     """Configuração para download de documentos"""
     download_base_path: str = "./downloads"
@@ -299,6 +334,7 @@ class DownloadConfig(BaseModel):
     max_retries: int = 3
     delay_between_downloads: float = 1.0
     concurrent_downloads: int = 5
+    max_downloads_per_host: Optional[int] = None  # padrão: concurrent_downloads
     allowed_extensions: List[str] = ['.pdf', '.doc', '.docx', '.txt', '.jpg', '.png']
     max_file_size_mb: int = 100
 
@@ -311,6 +347,89 @@ class DownloadStatistics(BaseModel):
     download_percentage: float
     total_file_size_mb: float
     last_download_at: Optional[datetime] = None
+    total_attempts: int = 0
+    failed_attempts: int = 0
+    failure_rate: float = 0.0  # fração dos downloads que falharam
+    average_duration_seconds: Optional[float] = None  # downloads bem-sucedidos
+    average_throughput_kbps: Optional[float] = None  # KiB/s nos downloads bem-sucedidos
+
+class TextExtractionConfig(BaseModel):
+    """Configuração da extração de texto de PDFs"""
+    max_workers: Optional[int] = None  # padrão: número de CPUs
+    pages_per_task: int = 25  # páginas por tarefa enviada ao pool
+    task_timeout_seconds: float = 60.0  # por tarefa (faixa de páginas)
+    file_timeout_seconds: float = 600.0  # total por arquivo
+    memory_limit_mb: Optional[int] = 1024  # por processo worker (POSIX)
+    max_pages: Optional[int] = None  # páginas extraídas por arquivo (None = todas)
+
+class TextExtractionResult(BaseModel):
+    """Resultado da extração de texto de um documento"""
+    success: bool
+    documento_id: int
+    total_pages: int = 0
+    extracted_pages: int = 0
+    reused_pages: int = 0  # páginas inalteradas cujo texto veio do cache
+    failed_pages: int = 0
+    characters: int = 0
+    duration_seconds: float = 0.0
+    error_message: Optional[str] = None
+
+class TextExtractionBatchResult(BaseModel):
+    """Resultado da extração de texto em lote"""
+    total_documents: int
+    successful: int = 0
+    failed: int = 0
+    total_pages: int = 0
+    results: List[TextExtractionResult] = []
+    started_at: datetime
+    completed_at: Optional[datetime] = None
+
+class PipelineConfig(BaseModel):
+    """Configuração do pipeline scrape → persistência → download → extração → análise"""
+    scrape_concurrency: int = 2
+    persist_concurrency: int = 1
+    download_concurrency: int = 5
+    extract_concurrency: int = 2  # documentos simultâneos (as páginas usam o pool de processos)
+    analyze_concurrency: int = 3
+    queue_size: int = 100  # capacidade de cada fila entre estágios
+    analyze_documents: bool = True  # desligado: o pipeline termina na extração
+    report_interval_seconds: float = 10.0
+
+class PipelineStageStats(BaseModel):
+    """Retrato de um estágio do pipeline"""
+    name: str
+    concurrency: int
+    queue_depth: int = 0
+    queue_capacity: int = 0
+    in_progress: int = 0
+    processed: int = 0
+    failed: int = 0
+    throughput_per_second: float = 0.0
+
+class PipelineReport(BaseModel):
+    """Retrato do pipeline: estágios na ordem do fluxo"""
+    stages: List[PipelineStageStats] = []
+    elapsed_seconds: float = 0.0
+    finished: bool = False
+
+class RefreshSchedulerConfig(BaseModel):
+    """Configuração da reverificação periódica dos processos"""
+    requests_per_hour: int = 60  # orçamento global de scraping
+    min_interval_minutes: float = 30.0  # processos mais ativos
+    max_interval_hours: float = 336.0  # processos dormentes (14 dias)
+    rate_half_life_days: float = 14.0  # memória da taxa de mudanças observada
+    prior_changes_per_day: float = 1.0  # taxa assumida para processos sem histórico
+    prior_weight_days: float = 2.0  # peso da taxa assumida, em dias de observação
+    tick_seconds: float = 60.0
+    max_burst: int = 10  # verificações acumuláveis no balde de tokens
+
+class RefreshTickResult(BaseModel):
+    """Resultado de uma rodada do agendador de reverificação"""
+    due: int = 0
+    checked: int = 0
+    changed: int = 0
+    failed: int = 0
+    deferred: int = 0  # vencidos que ficaram para a próxima rodada por falta de orçamento
 
 class FileInfo(BaseModel):
     """Informações de um arquivo baixado"""
@@ -374,6 +493,15 @@ class LLMConfig(BaseModel):
     cost_per_1k_input_tokens: Decimal = Decimal("0.00015")
     cost_per_1k_output_tokens: Decimal = Decimal("0.0006")
     timeout_seconds: int = 120
+    # Cotas do provedor por modelo (compartilhadas por todas as instâncias do processo)
+    requests_per_minute: int = 500
+    tokens_per_minute: int = 200000
+    max_concurrent_requests: int = 8
+    rate_limit_max_retries: int = 5
+    # Empacotamento de documentos curtos em uma única requisição (análise em lote)
+    pack_short_documents: bool = True
+    packing_max_document_chars: int = 2000
+    packing_max_documents: int = 8
 
 class BatchLLMResult(BaseModel):
     """Resultado de processamento em lote com LLM"""
@@ -386,6 +514,22 @@ class BatchLLMResult(BaseModel):
     started_at: datetime
     completed_at: datetime
 
+class BatchProgressSnapshot(BaseModel):
+    """Progresso de um lote de análises em andamento"""
+    job_id: str
+    status: str  # executando, concluido, erro
+    total_documents: int
+    completed: int
+    successful: int
+    failed: int
+    total_tokens_used: int
+    total_cost_usd: Decimal
+    elapsed_seconds: float
+    eta_seconds: Optional[float] = None
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    error_message: Optional[str] = None
+
 class LLMStatistics(BaseModel):
     """Estatísticas de uso do LLM"""
     total_documents_processed: int
@@ -399,6 +543,21 @@ class LLMStatistics(BaseModel):
     last_analysis_at: Optional[datetime] = None
     processing_percentage: float
 
+class LLMCallBucketStats(BaseModel):
+    """Uso e latência das chamadas ao LLM em um intervalo de tempo"""
+    bucket_start: datetime
+    model: Optional[str] = None  # None = todos os modelos
+    calls: int
+    failed_calls: int
+    retries: int
+    cache_hits: int
+    prompt_tokens: int
+    completion_tokens: int
+    total_cost_usd: Decimal
+    average_latency_ms: Optional[float] = None
+    p50_latency_ms: Optional[float] = None
+    p95_latency_ms: Optional[float] = None
+
 class CostEstimation(BaseModel):
     """Estimativa de custo para processamento"""
     document_count: int
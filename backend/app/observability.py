@@ -0,0 +1,266 @@
+"""
+Logging estruturado e spans de tempo por estágio (fetch, parse, persist)
+
+Logging: configure_logging() define o nível (LOG_LEVEL) e o formato
+(LOG_FORMAT=json para uma linha JSON por registro, com os campos passados
+em `extra`).
+
+Tracing: span() mede um trecho do caminho scraping → persistência. Fica
+desligado por padrão: sem amostragem devolve um contexto nulo compartilhado
+e o custo é uma leitura de ContextVar. Com TRACE_SAMPLE_RATE > 0, cada span
+raiz (sem span pai ativo) é amostrado com essa probabilidade e os spans
+filhos seguem a decisão do pai. Os spans amostrados vão para um buffer
+circular em memória e podem ser exportados em JSON Lines ou no formato
+Chrome Trace Event (chrome://tracing, Perfetto); com TRACE_EXPORT_PATH o
+buffer é gravado na saída do processo.
+"""
+import atexit
+import contextvars
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Atributos padrão do LogRecord (o resto veio de `extra`)
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("sei_span", default=None)
+_span_ids = itertools.count(1)
+_buffer_lock = threading.Lock()
+
+
+class JSONFormatter(logging.Formatter):
+    """Formata cada registro como uma linha JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None):
+    """
+    Configura o logging raiz da aplicação
+
+    Args:
+        level: Nível (padrão: LOG_LEVEL ou INFO)
+        fmt: "json" ou "text" (padrão: LOG_FORMAT ou text)
+    """
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    fmt = (fmt or os.getenv("LOG_FORMAT", "text")).lower()
+
+    handler = logging.StreamHandler()
+    if fmt == "json":
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+
+
+class TracingConfig:
+    """Estado global do tracing (amostragem e buffer de spans)"""
+
+    def __init__(self, sample_rate: float = 0.0, buffer_size: int = 10000,
+                 export_path: Optional[str] = None, seed: Optional[int] = None):
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.spans: Deque[Dict[str, Any]] = deque(maxlen=buffer_size)
+        self.export_path = export_path
+        self.random = random.Random(seed)
+
+
+_config = TracingConfig()
+
+
+def configure_tracing(sample_rate: float = 0.0, buffer_size: int = 10000,
+                      export_path: Optional[str] = None, seed: Optional[int] = None) -> TracingConfig:
+    """
+    Liga, desliga ou reconfigura o tracing (descarta os spans em memória)
+
+    Args:
+        sample_rate: Fração dos spans raiz amostrados (0 = desligado)
+        buffer_size: Spans mantidos em memória (os mais antigos são descartados)
+        export_path: Arquivo JSON Lines gravado na saída do processo
+        seed: Semente da amostragem (testes e benchmarks reprodutíveis)
+
+    Returns:
+        Configuração ativa
+    """
+    global _config
+    _config = TracingConfig(sample_rate, buffer_size, export_path, seed)
+    return _config
+
+
+class Span:
+    """Trecho cronometrado de um trace amostrado"""
+
+    __slots__ = ("name", "attrs", "trace_id", "span_id", "parent_id", "_start_ns", "_wall_us", "_token")
+
+    def __init__(self, name: str, attrs: Dict[str, Any], parent: Optional["Span"]):
+        self.name = name
+        self.attrs = attrs
+        self.span_id = next(_span_ids)
+        self.trace_id = parent.trace_id if parent is not None else self.span_id
+        self.parent_id = parent.span_id if parent is not None else None
+
+    def set(self, **attrs):
+        """Acrescenta atributos ao span (ex.: contagens conhecidas só no fim)"""
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        self._wall_us = time.time_ns() // 1000
+        self._start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_ns = time.perf_counter_ns() - self._start_ns
+        _current_span.reset(self._token)
+
+        record = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_us": self._wall_us,
+            "duration_ms": duration_ns / 1e6,
+            "attrs": self.attrs,
+            "pid": os.getpid(),
+        }
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        with _buffer_lock:
+            _config.spans.append(record)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("span %s %.2f ms", self.name, record["duration_ms"], extra={"span": record})
+        return False
+
+
+class _NoopSpan:
+    """Span não amostrado: não mede nem registra nada"""
+
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+# Marca os trechos de um trace não amostrado, para os filhos não sortearem de novo
+_unsampled: contextvars.ContextVar[bool] = contextvars.ContextVar("sei_unsampled", default=False)
+
+
+class _UnsampledRoot(_NoopSpan):
+    """Raiz não amostrada: desliga a amostragem dos spans filhos"""
+
+    __slots__ = ("_token",)
+
+    def __enter__(self):
+        self._token = _unsampled.set(True)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _unsampled.reset(self._token)
+        return False
+
+
+def span(name: str, **attrs):
+    """
+    Context manager que mede um trecho do processamento
+
+    Args:
+        name: Nome do estágio (ex.: "fetch", "parse", "persist")
+        **attrs: Atributos registrados com o span
+
+    Returns:
+        Span (amostrado) ou um contexto nulo
+    """
+    parent = _current_span.get()
+    if parent is not None:
+        return Span(name, attrs, parent)
+    if _config.sample_rate <= 0.0 or _unsampled.get():
+        return _NOOP
+    if _config.sample_rate < 1.0 and _config.random.random() >= _config.sample_rate:
+        return _UnsampledRoot()
+    return Span(name, attrs, None)
+
+
+def get_spans() -> List[Dict[str, Any]]:
+    """
+    Spans amostrados em memória, na ordem de término
+
+    Returns:
+        Cópia dos registros de span
+    """
+    with _buffer_lock:
+        return list(_config.spans)
+
+
+def export_spans(path: str, fmt: str = "jsonl") -> int:
+    """
+    Grava os spans em memória
+
+    Args:
+        path: Arquivo de saída
+        fmt: "jsonl" (um span por linha) ou "chrome" (Trace Event Format)
+
+    Returns:
+        Número de spans gravados
+    """
+    spans = get_spans()
+    with open(path, "w", encoding="utf-8") as f:
+        if fmt == "chrome":
+            events = [
+                {
+                    "name": s["name"], "cat": "sei", "ph": "X", "ts": s["start_us"],
+                    "dur": round(s["duration_ms"] * 1000), "pid": s["pid"], "tid": s["trace_id"],
+                    "args": {**s["attrs"], "span_id": s["span_id"], "parent_id": s["parent_id"]},
+                }
+                for s in spans
+            ]
+            json.dump({"traceEvents": events}, f, default=str)
+        else:
+            for s in spans:
+                f.write(json.dumps(s, ensure_ascii=False, default=str) + "\n")
+    return len(spans)
+
+
+@atexit.register
+def _export_on_exit():
+    """Grava o buffer em TRACE_EXPORT_PATH na saída do processo"""
+    if _config.export_path and _config.spans:
+        try:
+            export_spans(_config.export_path)
+        except OSError as e:
+            logger.warning(f"Falha ao exportar spans para {_config.export_path}: {e}")
+
+
+configure_tracing(
+    sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "0") or 0),
+    export_path=os.getenv("TRACE_EXPORT_PATH") or None
+)
@@ -2,20 +2,130 @@
 Scraper base para processos SEI
 """
 import asyncio
+import atexit
+import codecs
 import re
+import threading
+import time
 import aiohttp
 import requests
-from typing import Optional, Dict, List
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Optional, Dict, List, Union
 from datetime import datetime
+from urllib.parse import urljoin
 from bs4 import BeautifulSoup
 import logging
 
 from .config import ScraperConfig
-from .parsers import SEIParser
-from ..models.schemas import ProcessoData, ScrapingResult, AutuacaoData, DocumentoData, AndamentoData
+from .parsers import SEIParser, SEIStreamParser
+from ..models.rows import AndamentoRow, AutuacaoRow, DocumentoRow, ProcessoRows
+from ..models.schemas import ScrapingResult
+from ..metrics import SCRAPER_FETCH_SECONDS, SCRAPER_PARSE_SECONDS
+from ..observability import span
 
 logger = logging.getLogger(__name__)
 
+# Pools de parsing compartilhados pelo processo, por número de workers
+_parse_pools: Dict[int, ProcessPoolExecutor] = {}
+_parse_pools_lock = threading.Lock()
+
+# charset declarado no <meta> da página, quando o Content-Type não informa
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.I)
+
+
+class _FetchTimer:
+    """Mede uma tentativa de requisição ao SEI em sei_scraper_fetch_seconds"""
+    
+    __slots__ = ("mode", "_start")
+    
+    def __init__(self, mode: str):
+        self.mode = mode
+        self._start: Optional[float] = time.perf_counter()
+    
+    def stop(self, status: Union[int, str] = "error"):
+        """Registra a duração uma única vez (status "error" se não houve resposta)"""
+        if self._start is not None:
+            SCRAPER_FETCH_SECONDS.labels(mode=self.mode, status=status).observe(time.perf_counter() - self._start)
+            self._start = None
+
+
+def parse_processo_html(html_content: str) -> Dict:
+    """
+    Faz o parse do HTML de um processo (executado no processo worker)
+    
+    Args:
+        html_content: HTML da página do processo
+        
+    Returns:
+        Dict picklable com autuacao, protocolos e andamentos
+    """
+    soup = BeautifulSoup(html_content, 'html.parser')
+    
+    return {
+        "autuacao": SEIScraper.extract_autuacao(soup),
+        "protocolos": SEIScraper.extract_documentos(soup),
+        "andamentos": SEIScraper.extract_andamentos(soup)
+    }
+
+
+def documento_row(doc: Dict, base_url: str) -> DocumentoRow:
+    """
+    Linha de documento a partir do dict do SEIParser
+    
+    Args:
+        doc: Documento extraído pelo parser
+        base_url: URL da página do processo (resolve o link relativo)
+        
+    Returns:
+        DocumentoRow com o link absoluto em url_download
+    """
+    return DocumentoRow(
+        numero_documento=doc['numero_documento'],
+        tipo=doc.get('tipo'),
+        data_documento=doc.get('data_documento'),
+        data_inclusao=doc.get('data_inclusao'),
+        unidade=doc.get('unidade'),
+        url_download=urljoin(base_url, doc['url']) if doc.get('url') else None
+    )
+
+
+def _warm_up_worker() -> bool:
+    """Força o início do worker com BeautifulSoup e os parsers já importados"""
+    BeautifulSoup("<html></html>", 'html.parser')
+    return True
+
+
+def get_parse_pool(workers: int) -> Optional[ProcessPoolExecutor]:
+    """
+    Pool de processos para parsing de HTML, criado e aquecido no primeiro uso
+    
+    Args:
+        workers: Número de processos (0 = sem pool, parse em thread)
+        
+    Returns:
+        Pool compartilhado ou None
+    """
+    if workers <= 0:
+        return None
+    
+    with _parse_pools_lock:
+        pool = _parse_pools.get(workers)
+        if pool is None:
+            pool = _parse_pools[workers] = ProcessPoolExecutor(max_workers=workers)
+            # Uma tarefa por worker: os processos sobem em segundo plano
+            for _ in range(workers):
+                pool.submit(_warm_up_worker)
+        return pool
+
+
+@atexit.register
+def shutdown_parse_pools():
+    """Encerra os pools de parsing"""
+    with _parse_pools_lock:
+        for pool in _parse_pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pools.clear()
+
 
 class SEIScraper:
     """Classe base para scraping de processos SEI"""
@@ -24,6 +134,7 @@ class SEIScraper:
         self.config = config
         self.session: Optional[aiohttp.ClientSession] = None
         self.driver = None  # Para futuro uso com Selenium se necessário
+        self.parse_pool = get_parse_pool(config.parse_workers)
     
     async def scrape_processo(self, url: str) -> ScrapingResult:
         """Extrai dados completos de um processo"""
@@ -36,29 +147,36 @@ class SEIScraper:
             )
         
         try:
-            html_content = await self._fetch_html(url)
-            if not html_content:
-                return ScrapingResult(
-                    success=False,
-                    processo_data=None,
-                    error_message="Não foi possível obter conteúdo HTML",
-                    scraped_at=datetime.now()
-                )
-            
-            # Parse do HTML
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Extrai dados usando os parsers
-            autuacao_data = self.extract_autuacao(soup)
-            documentos_data = self.extract_documentos(soup)
-            andamentos_data = self.extract_andamentos(soup)
-            
-            # Cria ProcessoData
-            processo_data = ProcessoData(
-                autuacao=AutuacaoData(**autuacao_data),
-                documentos=[DocumentoData(**doc) for doc in documentos_data],
-                andamentos=[AndamentoData(**and_item) for and_item in andamentos_data]
-            )
+            with span("scrape_processo", url=url) as trace:
+                if self.config.stream_parse:
+                    with span("stream"):
+                        processo_data = await self._collect_stream(url)
+                else:
+                    with span("fetch") as fetch_span:
+                        html_content = await self._fetch_html(url)
+                        fetch_span.set(bytes=len(html_content or ""))
+                    if not html_content:
+                        return ScrapingResult(
+                            success=False,
+                            processo_data=None,
+                            error_message="Não foi possível obter conteúdo HTML",
+                            scraped_at=datetime.now()
+                        )
+                    
+                    # Parse do HTML fora do event loop
+                    with span("parse"):
+                        dados = await self.parse_html(html_content)
+                    autuacao_data = dados["autuacao"]
+                    documentos_data = dados["protocolos"]
+                    andamentos_data = dados["andamentos"]
+                    
+                    # Linhas internas; a validação Pydantic fica para a saída pela API
+                    processo_data = ProcessoRows(
+                        autuacao=AutuacaoRow(**autuacao_data),
+                        documentos=[documento_row(doc, url) for doc in documentos_data],
+                        andamentos=[AndamentoRow(**and_item) for and_item in andamentos_data]
+                    )
+                trace.set(documentos=len(processo_data.documentos), andamentos=len(processo_data.andamentos))
             
             return ScrapingResult(
                 success=True,
@@ -76,9 +194,126 @@ class SEIScraper:
                 scraped_at=datetime.now()
             )
     
+    async def extract_dados_completos(self, url: str) -> Dict:
+        """
+        Extrai todos os dados de um processo sem salvar, sem bloquear o event loop.
+        
+        O download usa aiohttp e o parse (CPU) roda no pool de processos.
+        
+        Args:
+            url: URL do processo no SEI-RJ
+            
+        Returns:
+            Dict com autuacao, protocolos e andamentos
+        """
+        logger.info(f"Extraindo dados completos de: {url}")
+        
+        html_content = await self._fetch_html(url)
+        if not html_content:
+            raise Exception("Não foi possível obter conteúdo HTML")
+        
+        return await self.parse_html(html_content)
+    
+    async def stream_processo(self, url: str,
+                              chunk_size: int = 64 * 1024) -> AsyncIterator[Union[AutuacaoRow, DocumentoRow, AndamentoRow]]:
+        """
+        Extrai um processo em modo streaming, sem carregar a página inteira
+        
+        O corpo da resposta é consumido em pedaços pelo SEIStreamParser e
+        cada linha é entregue assim que reconhecida, então a página nunca é
+        carregada inteira (só as chaves de deduplicação dos andamentos
+        crescem com ela) e o consumidor (ex.:
+        ProcessoPersistenceService.save_processo_stream) pode persistir
+        antes do fim do download.
+        
+        Args:
+            url: URL do processo no SEI-RJ
+            chunk_size: Bytes lidos do corpo por vez
+            
+        Yields:
+            AutuacaoRow (uma vez, ao fim da tabela de autuação), depois
+            DocumentoRow e AndamentoRow na ordem da página
+        """
+        if not self.validate_url(url):
+            raise ValueError(f"URL inválida: {url}")
+        
+        rows: List[Union[AutuacaoRow, DocumentoRow, AndamentoRow]] = []
+        parser = SEIStreamParser(
+            on_autuacao=lambda data: rows.append(AutuacaoRow(**data)),
+            on_documento=lambda doc: rows.append(documento_row(doc, url)),
+            on_andamento=lambda data: rows.append(AndamentoRow(**data))
+        )
+        
+        parse_seconds = 0.0
+        async for text in self._fetch_html_chunks(url, chunk_size):
+            started = time.perf_counter()
+            parser.feed(text)
+            parse_seconds += time.perf_counter() - started
+            for row in rows:
+                yield row
+            rows.clear()
+        
+        started = time.perf_counter()
+        parser.close()
+        SCRAPER_PARSE_SECONDS.labels(mode="stream").observe(parse_seconds + time.perf_counter() - started)
+        for row in rows:
+            yield row
+        
+        if not parser.autuacao_complete:
+            raise ValueError(f"Autuação não encontrada na página: {url}")
+        logger.info(f"Streaming de {url}: {parser.documentos} documentos, {parser.andamentos} andamentos")
+    
+    async def _collect_stream(self, url: str) -> ProcessoRows:
+        """Monta o processo a partir do streaming (andamentos em ordem cronológica)"""
+        autuacao = None
+        documentos: List[DocumentoRow] = []
+        andamentos: List[AndamentoRow] = []
+        
+        async for row in self.stream_processo(url):
+            if isinstance(row, AutuacaoRow):
+                autuacao = row
+            elif isinstance(row, DocumentoRow):
+                documentos.append(row)
+            else:
+                andamentos.append(row)
+        
+        andamentos.sort(key=lambda a: a.data_hora)
+        return ProcessoRows(autuacao=autuacao, documentos=documentos, andamentos=andamentos)
+    
+    async def parse_html(self, html_content: str) -> Dict:
+        """
+        Faz o parse do HTML no pool de processos (ou em thread, sem pool)
+        
+        Args:
+            html_content: HTML da página do processo
+            
+        Returns:
+            Dict com autuacao, protocolos e andamentos
+        """
+        if self.parse_pool is None:
+            with SCRAPER_PARSE_SECONDS.labels(mode="thread").time():
+                return await asyncio.to_thread(parse_processo_html, html_content)
+        
+        loop = asyncio.get_running_loop()
+        with SCRAPER_PARSE_SECONDS.labels(mode="pool").time():
+            return await loop.run_in_executor(self.parse_pool, parse_processo_html, html_content)
+    
+    def parse_dados_completos(self, html_content: str) -> Dict:
+        """
+        Faz o parse do HTML de um processo no processo atual
+        
+        Args:
+            html_content: HTML da página do processo
+            
+        Returns:
+            Dict com autuacao, protocolos e andamentos
+        """
+        return parse_processo_html(html_content)
+    
     async def _fetch_html(self, url: str) -> Optional[str]:
         """Busca HTML da URL com retry e rate limiting"""
         for attempt in range(self.config.max_retries):
+            fetch = None
             try:
                 # Rate limiting
                 if attempt > 0:
@@ -88,10 +323,14 @@ class SEIScraper:
                     timeout=aiohttp.ClientTimeout(total=self.config.timeout),
                     headers=self.get_headers()
                 ) as session:
+                    fetch = _FetchTimer("full")
                     async with session.get(url) as response:
                         if response.status == 200:
-                            return await response.text()
-                        elif response.status in [500, 502, 503, 504] and attempt < self.config.max_retries - 1:
+                            html_content = await response.text()
+                            fetch.stop(response.status)
+                            return html_content
+                        fetch.stop(response.status)
+                        if response.status in [500, 502, 503, 504] and attempt < self.config.max_retries - 1:
                             # Retry em caso de erro de servidor
                             logger.warning(f"Erro HTTP {response.status}, tentativa {attempt + 1}")
                             await asyncio.sleep(2 ** attempt)  # Backoff exponencial
@@ -100,6 +339,8 @@ class SEIScraper:
                             raise Exception(f"HTTP {response.status}")
                             
             except Exception as e:
+                if fetch is not None:
+                    fetch.stop()
                 if attempt == self.config.max_retries - 1:
                     raise e
                 logger.warning(f"Erro na tentativa {attempt + 1}: {str(e)}")
@@ -107,7 +348,69 @@ class SEIScraper:
         
         return None
     
-    def extract_autuacao(self, soup: BeautifulSoup) -> dict:
+    async def _fetch_html_chunks(self, url: str, chunk_size: int) -> AsyncIterator[str]:
+        """
+        Busca o HTML da URL em pedaços já decodificados
+        
+        Repete com backoff como _fetch_html, mas só enquanto nada foi
+        entregue: depois do primeiro pedaço, uma falha é propagada.
+        """
+        for attempt in range(self.config.max_retries):
+            delivered = False
+            fetch = None
+            try:
+                if attempt > 0:
+                    await self.wait_delay()
+                
+                async with aiohttp.ClientSession(
+                    timeout=aiohttp.ClientTimeout(total=self.config.timeout),
+                    headers=self.get_headers()
+                ) as session:
+                    # O corpo é lido no ritmo do consumidor: a latência vai até os cabeçalhos
+                    fetch = _FetchTimer("stream")
+                    async with session.get(url) as response:
+                        fetch.stop(response.status)
+                        if response.status in [500, 502, 503, 504] and attempt < self.config.max_retries - 1:
+                            logger.warning(f"Erro HTTP {response.status}, tentativa {attempt + 1}")
+                            await asyncio.sleep(2 ** attempt)
+                            continue
+                        if response.status != 200:
+                            raise Exception(f"HTTP {response.status}")
+                        
+                        decoder = None
+                        async for chunk in response.content.iter_chunked(chunk_size):
+                            if decoder is None:
+                                decoder = codecs.getincrementaldecoder(
+                                    self._response_charset(response.charset, chunk)
+                                )(errors='replace')
+                            delivered = True
+                            yield decoder.decode(chunk)
+                        if decoder is not None:
+                            yield decoder.decode(b'', final=True)
+                        return
+                        
+            except Exception as e:
+                if fetch is not None:
+                    fetch.stop()
+                if delivered or attempt == self.config.max_retries - 1:
+                    raise e
+                logger.warning(f"Erro na tentativa {attempt + 1}: {str(e)}")
+                await asyncio.sleep(2 ** attempt)
+    
+    @staticmethod
+    def _response_charset(header_charset: Optional[str], head: bytes) -> str:
+        """Charset do Content-Type, senão do <meta> no início da página (padrão UTF-8)"""
+        charset = header_charset
+        if not charset:
+            match = _META_CHARSET_RE.search(head[:4096])
+            charset = match.group(1).decode('ascii') if match else 'utf-8'
+        try:
+            return codecs.lookup(charset).name
+        except LookupError:
+            return 'utf-8'
+    
+    @staticmethod
+    def extract_autuacao(soup: BeautifulSoup) -> dict:
         """Extrai dados da autuação"""
         # Procura primeiro por div específica, senão usa a primeira tabela
         autuacao_div = soup.find('div', id='divAutuacao')
@@ -115,10 +418,11 @@ class SEIScraper:
             return SEIParser.parse_autuacao_table(autuacao_div)
         return SEIParser.parse_autuacao_table(soup)
     
-    def extract_documentos(self, soup: BeautifulSoup) -> list:
+    @staticmethod
+    def extract_documentos(soup: BeautifulSoup) -> list:
         """Extrai lista de documentos"""
-        # Busca pela tabela específica de cabeçalho (lista de protocolos)
-        documentos_table = soup.find('table', id='tblCabecalho')
+        # Tabela de protocolos (tblDocumentos; tblCabecalho em versões antigas do SEI)
+        documentos_table = soup.find('table', id='tblDocumentos') or soup.find('table', id='tblCabecalho')
         if documentos_table:
             return SEIParser.parse_documentos_table(documentos_table)
         
@@ -133,7 +437,8 @@ class SEIScraper:
         
         return []
     
-    def extract_andamentos(self, soup: BeautifulSoup) -> list:
+    @staticmethod
+    def extract_andamentos(soup: BeautifulSoup) -> list:
         """Extrai histórico de andamentos"""
         # Busca pela tabela específica de histórico
         andamentos_table = soup.find('table', id='tblHistorico')
@@ -266,8 +571,8 @@ class ScraperSEI:
     
     def extract_documentos(self, soup: BeautifulSoup) -> list:
         """Extrai lista de documentos/protocolos"""
-        # Busca pela tabela específica de cabeçalho (lista de protocolos)
-        documentos_table = soup.find('table', id='tblCabecalho')
+        # Tabela de protocolos (tblDocumentos; tblCabecalho em versões antigas do SEI)
+        documentos_table = soup.find('table', id='tblDocumentos') or soup.find('table', id='tblCabecalho')
         if documentos_table:
             return SEIParser.parse_documentos_table(documentos_table)
         
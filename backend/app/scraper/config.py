@@ -3,7 +3,7 @@ Configuração para o web scraper SEI
 """
 import os
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class ScraperConfig(BaseModel):
@@ -12,6 +12,8 @@ class ScraperConfig(BaseModel):
     delay: int = 2  # Delay entre requisições em segundos
     timeout: int = 30  # Timeout das requisições em segundos
     max_retries: int = 3  # Máximo de tentativas por requisição
+    parse_workers: int = Field(default_factory=lambda: min(4, os.cpu_count() or 1))  # 0 = parse em thread
+    stream_parse: bool = False  # Parse incremental do corpo da resposta (processos muito grandes)
     user_agent: str = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
     
     # Headers padrão
@@ -42,6 +44,8 @@ class ScraperConfig(BaseModel):
             delay=int(os.getenv("SCRAPER_DELAY", "2")),
             timeout=int(os.getenv("SCRAPER_TIMEOUT", "30")),
             max_retries=int(os.getenv("SCRAPER_MAX_RETRIES", "3")),
+            parse_workers=int(os.getenv("SCRAPER_PARSE_WORKERS", str(min(4, os.cpu_count() or 1)))),
+            stream_parse=os.getenv("SCRAPER_STREAM_PARSE", "false").lower() == "true",
             user_agent=os.getenv("SCRAPER_USER_AGENT", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"),
             selenium_headless=os.getenv("SELENIUM_HEADLESS", "true").lower() == "true"
         ) 
\ No newline at end of file
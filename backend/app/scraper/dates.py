@@ -0,0 +1,106 @@
+"""
+Conversão das datas do SEI (DD/MM/AAAA e DD/MM/AAAA HH:MM)
+
+As páginas do SEI repetem a mesma data centenas de vezes: cada valor
+distinto é convertido uma única vez por processo (cache LRU), fatiando as
+posições fixas em inteiros, sem strptime. Valores fora da largura fixa
+(dia ou mês com um dígito) passam por uma expressão pré-compilada.
+"""
+import re
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+# Valores distintos memorizados por formato
+CACHE_SIZE = 16384
+
+_DATE_RE = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})')
+_DATETIME_RE = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})\s+(\d{1,2}):(\d{2})')
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_date(value: Optional[str]) -> Optional[date]:
+    """
+    Converte uma data DD/MM/AAAA
+
+    Args:
+        value: Texto da célula (espaços nas pontas são ignorados)
+
+    Returns:
+        Data ou None se vazia/inválida
+    """
+    if not isinstance(value, str):
+        return None
+
+    value = value.strip()
+    if len(value) == 10 and value[2] == '/' and value[5] == '/':
+        fields = (value[6:10], value[3:5], value[0:2])
+    else:
+        match = _DATE_RE.fullmatch(value)
+        if match is None:
+            return None
+        fields = match.group(3, 2, 1)
+
+    if not ''.join(fields).isdecimal():
+        return None
+    try:
+        return date(*map(int, fields))
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    """
+    Converte uma data/hora DD/MM/AAAA HH:MM
+
+    Args:
+        value: Texto da célula (espaços nas pontas são ignorados)
+
+    Returns:
+        Data/hora ou None se vazia/inválida
+    """
+    if not isinstance(value, str):
+        return None
+
+    value = value.strip()
+    if len(value) == 16 and value[2] == '/' and value[5] == '/' and value[10] == ' ' and value[13] == ':':
+        fields = (value[6:10], value[3:5], value[0:2], value[11:13], value[14:16])
+    else:
+        match = _DATETIME_RE.fullmatch(value)
+        if match is None:
+            return None
+        fields = match.group(3, 2, 1, 4, 5)
+
+    if not ''.join(fields).isdecimal():
+        return None
+    try:
+        return datetime(*map(int, fields))
+    except ValueError:
+        return None
+
+
+def parse_dates(values: Iterable[Optional[str]]) -> List[Optional[date]]:
+    """
+    Converte uma coluna inteira de datas DD/MM/AAAA
+
+    Args:
+        values: Textos das células
+
+    Returns:
+        Datas na mesma ordem (None para vazias/inválidas)
+    """
+    return list(map(parse_date, values))
+
+
+def parse_datetimes(values: Iterable[Optional[str]]) -> List[Optional[datetime]]:
+    """
+    Converte uma coluna inteira de datas/horas DD/MM/AAAA HH:MM
+
+    Args:
+        values: Textos das células
+
+    Returns:
+        Datas/horas na mesma ordem (None para vazias/inválidas)
+    """
+    return list(map(parse_datetime, values))
@@ -1,11 +1,23 @@
 """
 Parsers para extrair dados das páginas SEI
 """
+import logging
 import re
 from datetime import datetime, date
-from typing import Dict, List, Optional
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 from bs4 import BeautifulSoup
 
+from .dates import parse_date, parse_datetime
+
+logger = logging.getLogger(__name__)
+
+# Número de documento (8 dígitos) e início de linha do histórico (DD/MM/AAAA HH:MM)
+_NUMERO_DOCUMENTO_RE = re.compile(r'^\d{8}$')
+_DATA_HORA_RE = re.compile(r'\d{2}/\d{2}/\d{4} \d{2}:\d{2}')
+# Destino do link de documento na pesquisa pública (onclick="window.open('...')")
+_WINDOW_OPEN_RE = re.compile(r"window\.open\(\s*['\"]([^'\"]+)['\"]")
+
 
 class SEIParser:
     """Parser para páginas SEI do RJ"""
@@ -22,41 +34,25 @@ class SEIParser:
             for table in tables:
                 rows = table.find_all('tr')
                 for row in rows:
-                    cells = row.find_all('td')
-                    
-                    # Verifica se tem exatamente 2 colunas (label:value)
-                    if len(cells) == 2:
-                        label = cells[0].get_text(strip=True)
-                        value = cells[1].get_text(strip=True)
-                        
-                        # Mapeia labels exatos da página SEI-RJ
-                        if label == 'Processo:':
-                            result['numero_sei'] = value
-                        elif label == 'Tipo:':
-                            result['tipo'] = value
-                        elif label == 'Data de Geração:':
-                            result['data_geracao'] = SEIParser._parse_date(value)
-                        elif label == 'Interessados:':
-                            result['interessados'] = value if value else None
+                    SEIParser.parse_autuacao_row(row.find_all('td'), result)
                             
                 # Se encontrou dados, para de procurar
                 if result.get('numero_sei'):
                     break
                         
-        except Exception as e:
-            # Log do erro para debugging
-            print(f"Erro no parse de autuação: {e}")
+        except Exception:
+            logger.exception("Erro no parse de autuação")
             
         return result
     
     @staticmethod
     def parse_documentos_table(table: BeautifulSoup) -> List[Dict]:
-        """Parse da tabela de protocolos/documentos (tblCabecalho)"""
+        """Parse da tabela de protocolos/documentos (tblDocumentos)"""
         result = []
         
         try:
             rows = table.find_all('tr')
-            print(f"Debug: Analisando tabela de documentos com {len(rows)} linhas")
+            logger.debug("Analisando tabela de documentos com %d linhas", len(rows))
             
             for i, row in enumerate(rows):
                 cells = row.find_all('td')
@@ -65,66 +61,12 @@ class SEIParser:
                 if i == 0 or len(cells) < 4:
                     continue
                 
-                # Estrutura da tabela: checkbox | link+tipo | tipo | data | data_inclusao | unidade
-                # Procurar por links numéricos na segunda célula
-                if len(cells) >= 4:
-                    doc_cell = cells[1]  # Segunda célula
-                    links = doc_cell.find_all('a')
-                    
-                    for link in links:
-                        link_text = link.get_text(strip=True)
-                        
-                        # Verifica se é número de documento (8 dígitos)
-                        if re.match(r'^\d{8}$', link_text):
-                            numero_documento = link_text
-                            
-                            # Extrai tipo do título do link ou texto adjacente
-                            tipo = link.get('title', '').strip(' "')
-                            if not tipo:
-                                # Procura texto após o link na mesma célula
-                                remaining_text = doc_cell.get_text(strip=True)
-                                remaining_text = remaining_text.replace(link_text, '').strip(' "')
-                                tipo = remaining_text or 'Documento'
-                            
-                            # Extrai datas das próximas células
-                            data_documento = None
-                            data_inclusao = None
-                            unidade = None
-                            
-                            # Terceira célula: tipo (alternativo)
-                            if len(cells) > 2 and not tipo:
-                                tipo = cells[2].get_text(strip=True)
-                            
-                            # Quarta célula: data
-                            if len(cells) > 3:
-                                data_text = cells[3].get_text(strip=True)
-                                data_documento = SEIParser._parse_date(data_text)
-                            
-                            # Quinta célula: data de inclusão
-                            if len(cells) > 4:
-                                data_inc_text = cells[4].get_text(strip=True)
-                                data_inclusao = SEIParser._parse_date(data_inc_text)
-                            
-                            # Sexta célula: unidade
-                            if len(cells) > 5:
-                                unidade = cells[5].get_text(strip=True)
-                            
-                            documento = {
-                                'numero_documento': numero_documento,
-                                'tipo': tipo or 'Documento',
-                                'data_documento': data_documento,
-                                'data_inclusao': data_inclusao,
-                                'unidade': unidade
-                            }
-                            
-                            result.append(documento)
+                result.extend(SEIParser.parse_documento_row(cells))
             
-            print(f"Debug: Extraídos {len(result)} documentos")
+            logger.debug("Extraídos %d documentos", len(result))
                         
-        except Exception as e:
-            print(f"Erro no parse de documentos: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Erro no parse de documentos")
             
         return result
     
@@ -135,7 +77,7 @@ class SEIParser:
         
         try:
             rows = table.find_all('tr')
-            print(f"Debug: Analisando tabela de andamentos com {len(rows)} linhas")
+            logger.debug("Analisando tabela de andamentos com %d linhas", len(rows))
             
             for i, row in enumerate(rows):
                 cells = row.find_all('td')
@@ -144,38 +86,9 @@ class SEIParser:
                 if i == 0 or len(cells) < 2:
                     continue
                 
-                # Estrutura: Data/Hora | Unidade | Descrição
-                if len(cells) >= 2:
-                    first_cell_text = cells[0].get_text(strip=True)
-                    
-                    # Verifica padrão de data/hora: DD/MM/AAAA HH:MM
-                    if re.match(r'\d{2}/\d{2}/\d{4} \d{2}:\d{2}', first_cell_text):
-                        # Extrai data/hora
-                        data_hora = SEIParser._parse_datetime(first_cell_text)
-                        if not data_hora:
-                            continue
-                        
-                        # Segunda célula: unidade
-                        unidade = None
-                        if len(cells) >= 2:
-                            unidade = cells[1].get_text(strip=True) or None
-                        
-                        # Terceira célula: descrição
-                        descricao = ""
-                        if len(cells) >= 3:
-                            descricao = cells[2].get_text(strip=True)
-                        elif len(cells) >= 2:
-                            # Se só tem 2 células, segunda é descrição
-                            descricao = cells[1].get_text(strip=True)
-                            unidade = None
-                        
-                        if descricao:  # Só adiciona se tem descrição
-                            andamento = {
-                                'data_hora': data_hora,
-                                'descricao': descricao,
-                                'unidade': unidade
-                            }
-                            result.append(andamento)
+                andamento = SEIParser.parse_andamento_row(cells)
+                if andamento:
+                    result.append(andamento)
             
             # Remove duplicatas
             seen = set()
@@ -189,44 +102,338 @@ class SEIParser:
             # Ordena por data_hora (cronológico crescente)
             unique_result.sort(key=lambda x: x['data_hora'])
             
-            print(f"Debug: Extraídos {len(unique_result)} andamentos únicos")
+            logger.debug("Extraídos %d andamentos únicos", len(unique_result))
             return unique_result
                         
-        except Exception as e:
-            print(f"Erro no parse de andamentos: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Erro no parse de andamentos")
             
         return result
     
     @staticmethod
-    def _parse_date(date_str: str) -> Optional[date]:
-        """Parse de string de data para objeto date"""
-        if not date_str or date_str.strip() == '':
-            return None
+    def parse_autuacao_row(cells: List, result: Dict):
+        """
+        Aplica uma linha label:valor da tabela de autuação em `result`
+        
+        Args:
+            cells: Células <td> da linha (Tag ou células do SEIStreamParser)
+            result: Dados da autuação extraídos até aqui
+        """
+        # Verifica se tem exatamente 2 colunas (label:value)
+        if len(cells) != 2:
+            return
+        
+        label = cells[0].get_text(strip=True)
+        value = cells[1].get_text(strip=True)
+        
+        # Mapeia labels exatos da página SEI-RJ
+        if label == 'Processo:':
+            result['numero_sei'] = value
+        elif label == 'Tipo:':
+            result['tipo'] = value
+        elif label == 'Data de Geração:':
+            result['data_geracao'] = SEIParser._parse_date(value)
+        elif label == 'Interessados:':
+            result['interessados'] = value if value else None
+    
+    @staticmethod
+    def parse_documento_row(cells: List) -> List[Dict]:
+        """
+        Documentos de uma linha da tabela de protocolos
+        
+        Estrutura da tabela: checkbox | link+tipo | tipo | data | data_inclusao | unidade
+        
+        Args:
+            cells: Células <td> da linha (Tag ou células do SEIStreamParser)
+        
+        Returns:
+            Documentos com link numérico na segunda célula
+        """
+        result = []
+        if len(cells) < 4:
+            return result
+        
+        # Procurar por links numéricos na segunda célula
+        doc_cell = cells[1]
+        for link in doc_cell.find_all('a'):
+            link_text = link.get_text(strip=True)
             
-        try:
-            # Tenta formato brasileiro dd/mm/yyyy
-            date_str = date_str.strip()
-            if re.match(r'\d{2}/\d{2}/\d{4}', date_str):
-                return datetime.strptime(date_str, '%d/%m/%Y').date()
-        except Exception:
-            pass
+            # Verifica se é número de documento (8 dígitos)
+            if not _NUMERO_DOCUMENTO_RE.match(link_text):
+                continue
+            
+            # Extrai tipo do título do link ou texto adjacente
+            tipo = link.get('title', '').strip(' "')
+            if not tipo:
+                # Procura texto após o link na mesma célula
+                remaining_text = doc_cell.get_text(strip=True)
+                remaining_text = remaining_text.replace(link_text, '').strip(' "')
+                tipo = remaining_text or 'Documento'
+            
+            # Terceira célula: tipo (alternativo)
+            if not tipo:
+                tipo = cells[2].get_text(strip=True)
+            
+            # Quarta e quinta células: data e data de inclusão; sexta: unidade
+            data_documento = SEIParser._parse_date(cells[3].get_text(strip=True))
+            data_inclusao = SEIParser._parse_date(cells[4].get_text(strip=True)) if len(cells) > 4 else None
+            unidade = cells[5].get_text(strip=True) if len(cells) > 5 else None
             
-        return None
+            # Link do documento (relativo à página do processo)
+            href = link.get('href', '').strip()
+            if not href or href.startswith(('#', 'javascript:')):
+                # A pesquisa pública abre o documento por onclick="window.open('...')"
+                match = _WINDOW_OPEN_RE.search(link.get('onclick', ''))
+                href = match.group(1).strip() if match else None
+            
+            result.append({
+                'numero_documento': link_text,
+                'tipo': tipo or 'Documento',
+                'data_documento': data_documento,
+                'data_inclusao': data_inclusao,
+                'unidade': unidade,
+                'url': href
+            })
+        
+        return result
     
     @staticmethod
-    def _parse_datetime(datetime_str: str) -> Optional[datetime]:
-        """Parse de string de data/hora para objeto datetime"""
-        if not datetime_str or datetime_str.strip() == '':
+    def parse_andamento_row(cells: List) -> Optional[Dict]:
+        """
+        Andamento de uma linha da tabela de histórico
+        
+        Estrutura: Data/Hora | Unidade | Descrição
+        
+        Args:
+            cells: Células <td> da linha (Tag ou células do SEIStreamParser)
+        
+        Returns:
+            Andamento ou None se a linha não for um andamento com descrição
+        """
+        if len(cells) < 2:
             return None
+        
+        # Verifica padrão de data/hora: DD/MM/AAAA HH:MM
+        first_cell_text = cells[0].get_text(strip=True)
+        if not _DATA_HORA_RE.match(first_cell_text):
+            return None
+        
+        data_hora = SEIParser._parse_datetime(first_cell_text)
+        if not data_hora:
+            return None
+        
+        if len(cells) >= 3:
+            unidade = cells[1].get_text(strip=True) or None
+            descricao = cells[2].get_text(strip=True)
+        else:
+            # Se só tem 2 células, segunda é descrição
+            unidade = None
+            descricao = cells[1].get_text(strip=True)
+        
+        # Só retorna se tem descrição
+        if not descricao:
+            return None
+        
+        return {
+            'data_hora': data_hora,
+            'descricao': descricao,
+            'unidade': unidade
+        }
+
+    @staticmethod
+    def _parse_date(date_str: str) -> Optional[date]:
+        """Parse de string de data DD/MM/AAAA para objeto date"""
+        return parse_date(date_str)
+    
+    @staticmethod
+    def _parse_datetime(datetime_str: str) -> Optional[datetime]:
+        """Parse de string de data/hora DD/MM/AAAA HH:MM para objeto datetime"""
+        return parse_datetime(datetime_str)
+
+
+class _StreamLink:
+    """Link <a> visto pelo SEIStreamParser (interface mínima de Tag)"""
+    
+    __slots__ = ('attrs', 'texts')
+    
+    def __init__(self, attrs: Dict[str, Optional[str]]):
+        self.attrs = attrs
+        self.texts: List[str] = []
+    
+    def get(self, name: str, default: str = '') -> str:
+        value = self.attrs.get(name)
+        return default if value is None else value
+    
+    def get_text(self, strip: bool = True) -> str:
+        return ''.join(self.texts)
+
+
+class _StreamCell:
+    """Célula <td> vista pelo SEIStreamParser (interface mínima de Tag)"""
+    
+    __slots__ = ('texts', 'links')
+    
+    def __init__(self):
+        self.texts: List[str] = []
+        self.links: List[_StreamLink] = []
+    
+    def get_text(self, strip: bool = True) -> str:
+        return ''.join(self.texts)
+    
+    def find_all(self, name: str) -> List[_StreamLink]:
+        return self.links
+
+
+class _StreamTable:
+    """Estado de uma <table> aberta no SEIStreamParser"""
+    
+    __slots__ = ('id', 'rows', 'row', 'cell', 'link')
+    
+    def __init__(self, table_id: Optional[str]):
+        self.id = table_id
+        self.rows = 0
+        self.row: Optional[List[_StreamCell]] = None
+        self.cell: Optional[_StreamCell] = None
+        self.link: Optional[_StreamLink] = None
+
+
+class SEIStreamParser(HTMLParser):
+    """
+    Parser incremental da página de processo, orientado a eventos
+    
+    Recebe o HTML em pedaços (feed) e entrega cada protocolo de
+    tblDocumentos e cada andamento de tblHistorico assim que a linha
+    termina, sem montar a árvore do documento. As linhas usam as mesmas
+    regras do SEIParser e saem na ordem da página (o histórico do SEI vem do
+    mais recente para o mais antigo); andamentos repetidos são descartados.
+    
+    Memória: a linha corrente mais uma chave (data/hora, descrição) por
+    andamento já emitido, usada na deduplicação, ou seja, O(andamentos),
+    bem abaixo da árvore do BeautifulSoup, mas não constante.
+    """
+    
+    def __init__(self, on_autuacao: Optional[Callable[[Dict], Any]] = None,
+                 on_documento: Optional[Callable[[Dict], Any]] = None,
+                 on_andamento: Optional[Callable[[Dict], Any]] = None):
+        """
+        Inicializa o parser
+        
+        Args:
+            on_autuacao: Chamado uma vez com a autuação, ao fim da sua tabela
+            on_documento: Chamado com cada documento (dict do SEIParser)
+            on_andamento: Chamado com cada andamento (dict do SEIParser)
+        """
+        super().__init__(convert_charrefs=True)
+        self.on_autuacao = on_autuacao
+        self.on_documento = on_documento
+        self.on_andamento = on_andamento
+        self.autuacao: Dict = {}
+        self.autuacao_complete = False
+        self.documentos = 0
+        self.andamentos = 0
+        self._tables: List[_StreamTable] = []
+        self._text: List[str] = []
+        self._seen_andamentos: Set[Tuple[datetime, str]] = set()
+    
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        self._flush_text()
+        if tag == 'table':
+            self._tables.append(_StreamTable(dict(attrs).get('id')))
+            return
+        if not self._tables:
+            return
+        
+        table = self._tables[-1]
+        if tag == 'tr':
+            self._end_row(table)
+            table.row = []
+            table.rows += 1
+        elif tag in ('td', 'th'):
+            table.cell = table.link = None
+            # <th> não conta como célula (find_all('td')) e seu texto é ignorado
+            if tag == 'td' and table.row is not None:
+                table.cell = _StreamCell()
+                table.row.append(table.cell)
+        elif tag == 'a' and table.cell is not None:
+            table.link = _StreamLink(dict(attrs))
+            table.cell.links.append(table.link)
+    
+    def handle_endtag(self, tag: str):
+        self._flush_text()
+        if not self._tables:
+            return
+        
+        table = self._tables[-1]
+        if tag == 'table':
+            self._end_row(table)
+            self._tables.pop()
+            # Como no SEIParser: a autuação é a primeira tabela com o número do processo
+            if self.autuacao.get('numero_sei') and not self.autuacao_complete:
+                self.autuacao_complete = True
+                if self.on_autuacao is not None:
+                    self.on_autuacao(dict(self.autuacao))
+        elif tag == 'tr':
+            self._end_row(table)
+        elif tag in ('td', 'th'):
+            table.cell = table.link = None
+        elif tag == 'a':
+            table.link = None
+    
+    def handle_data(self, data: str):
+        if self._tables and self._tables[-1].cell is not None:
+            self._text.append(data)
+    
+    def handle_comment(self, data: str):
+        self._flush_text()
+    
+    def close(self):
+        """Processa o restante do buffer e fecha as tabelas abertas"""
+        super().close()
+        self._flush_text()
+        while self._tables:
+            self.handle_endtag('table')
+    
+    def _flush_text(self):
+        """Fecha o nó de texto corrente (equivalente a get_text(strip=True))"""
+        if not self._text:
+            return
+        
+        text = ''.join(self._text).strip()
+        self._text = []
+        table = self._tables[-1] if self._tables else None
+        if text and table is not None and table.cell is not None:
+            table.cell.texts.append(text)
+            if table.link is not None:
+                table.link.texts.append(text)
+    
+    def _end_row(self, table: _StreamTable):
+        """Reconhece a linha encerrada e emite os dados encontrados"""
+        cells = table.row
+        table.row = table.cell = table.link = None
+        if cells is None:
+            return
+        
+        if not self.autuacao_complete:
+            SEIParser.parse_autuacao_row(cells, self.autuacao)
+        
+        # Pular cabeçalho (primeira linha)
+        if table.rows == 1:
+            return
+        
+        if table.id == 'tblDocumentos':
+            for documento in SEIParser.parse_documento_row(cells):
+                self.documentos += 1
+                if self.on_documento is not None:
+                    self.on_documento(documento)
+        elif table.id == 'tblHistorico':
+            andamento = SEIParser.parse_andamento_row(cells)
+            if andamento is None:
+                return
             
-        try:
-            # Tenta formato brasileiro dd/mm/yyyy hh:mm
-            datetime_str = datetime_str.strip()
-            if re.match(r'\d{2}/\d{2}/\d{4} \d{2}:\d{2}', datetime_str):
-                return datetime.strptime(datetime_str, '%d/%m/%Y %H:%M')
-        except Exception:
-            pass
-            
-        return None 
\ No newline at end of file
+            key = (andamento['data_hora'], andamento['descricao'])
+            if key in self._seen_andamentos:
+                return
+            self._seen_andamentos.add(key)
+            self.andamentos += 1
+            if self.on_andamento is not None:
+                self.on_andamento(andamento)
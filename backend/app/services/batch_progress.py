@@ -0,0 +1,170 @@
+"""
+Acompanhamento de progresso de análises em lote
+"""
+import threading
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from app.models.schemas import BatchProgressSnapshot, DocumentAnalysis
+
+
+class BatchProgress:
+    """Progresso incremental de um lote de análises"""
+
+    def __init__(self, total_documents: int, job_id: Optional[str] = None):
+        """
+        Inicializa o progresso
+
+        Args:
+            total_documents: Número de documentos do lote
+            job_id: Identificador do job (gerado se omitido)
+        """
+        self.job_id = job_id or uuid.uuid4().hex
+        self.total_documents = total_documents
+        self.completed = 0
+        self.successful = 0
+        self.failed = 0
+        self.total_tokens = 0
+        self.total_cost = Decimal("0")
+        self.status = "executando"
+        self.error_message: Optional[str] = None
+        self.started_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self._started_monotonic = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, result: DocumentAnalysis):
+        """
+        Contabiliza o resultado de um documento
+
+        Args:
+            result: Resultado da análise
+        """
+        with self._lock:
+            self.completed += 1
+            if result.success:
+                self.successful += 1
+                self.total_tokens += result.tokens_used
+                self.total_cost += result.cost_usd
+            else:
+                self.failed += 1
+
+    def finish(self, error_message: Optional[str] = None):
+        """
+        Marca o lote como encerrado
+
+        Args:
+            error_message: Mensagem de erro se o lote foi interrompido
+        """
+        with self._lock:
+            self.status = "erro" if error_message else "concluido"
+            self.error_message = error_message
+            self.finished_at = datetime.now()
+
+    @property
+    def is_finished(self) -> bool:
+        """Se o lote já foi encerrado"""
+        return self.finished_at is not None
+
+    def snapshot(self) -> BatchProgressSnapshot:
+        """
+        Retrato atual do progresso, com estimativa de tempo restante
+
+        Returns:
+            Snapshot do progresso
+        """
+        with self._lock:
+            elapsed = time.monotonic() - self._started_monotonic
+            remaining = self.total_documents - self.completed
+
+            eta = None
+            if self.completed > 0 and not self.is_finished:
+                eta = elapsed / self.completed * remaining
+
+            return BatchProgressSnapshot(
+                job_id=self.job_id,
+                status=self.status,
+                total_documents=self.total_documents,
+                completed=self.completed,
+                successful=self.successful,
+                failed=self.failed,
+                total_tokens_used=self.total_tokens,
+                total_cost_usd=self.total_cost,
+                elapsed_seconds=elapsed,
+                eta_seconds=eta,
+                started_at=self.started_at,
+                finished_at=self.finished_at,
+                error_message=self.error_message
+            )
+
+
+class BatchProgressStore:
+    """Registro em memória dos lotes em andamento e recentes"""
+
+    def __init__(self, ttl_seconds: float = 3600):
+        """
+        Inicializa o registro
+
+        Args:
+            ttl_seconds: Tempo que lotes encerrados permanecem consultáveis
+        """
+        self.ttl_seconds = ttl_seconds
+        self._jobs: Dict[str, BatchProgress] = {}
+        self._lock = threading.Lock()
+
+    def create(self, total_documents: int) -> BatchProgress:
+        """
+        Cria e registra o progresso de um novo lote
+
+        Args:
+            total_documents: Número de documentos do lote
+
+        Returns:
+            Progresso registrado
+        """
+        progress = BatchProgress(total_documents)
+        with self._lock:
+            self._evict_expired()
+            self._jobs[progress.job_id] = progress
+        return progress
+
+    def get(self, job_id: str) -> Optional[BatchProgress]:
+        """
+        Busca o progresso de um lote
+
+        Args:
+            job_id: Identificador do job
+
+        Returns:
+            Progresso ou None se não encontrado/expirado
+        """
+        with self._lock:
+            self._evict_expired()
+            return self._jobs.get(job_id)
+
+    def list_active(self) -> List[BatchProgress]:
+        """
+        Lista lotes ainda em execução
+
+        Returns:
+            Lista de progressos
+        """
+        with self._lock:
+            return [p for p in self._jobs.values() if not p.is_finished]
+
+    def _evict_expired(self):
+        """Remove lotes encerrados há mais que o TTL"""
+        now = datetime.now()
+        expired = [
+            job_id for job_id, progress in self._jobs.items()
+            if progress.finished_at and (now - progress.finished_at).total_seconds() > self.ttl_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+# Registro compartilhado pelo processo
+batch_progress_store = BatchProgressStore()
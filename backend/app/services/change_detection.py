@@ -4,8 +4,163 @@ Serviço para detecção de mudanças em processos
 import hashlib
 import json
 from datetime import datetime
-from typing import Dict, List, Any, Optional
-from app.models.schemas import ChangesSummary, ContentHash
+from typing import Dict, Iterable, List, Any, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from app.models.schemas import (
+    AndamentoData, AutuacaoData, ChangesSummary, ContentHash, DocumentoData,
+    ProcessoDigest, SectionDigest, SnapshotDiff
+)
+
+# Separador entre campos na chave de fingerprint (não ocorre em texto do SEI)
+_FIELD_SEPARATOR = "\x1f"
+
+# Linhas por bloco no digest hierárquico das seções
+DIGEST_CHUNK_SIZE = 64
+
+
+def fingerprint(key: str) -> int:
+    """
+    Calcula fingerprint de 64 bits (com sinal, cabe em BIGINT) de uma chave
+    
+    Args:
+        key: Chave textual da linha
+        
+    Returns:
+        Inteiro de 64 bits
+    """
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def andamento_fingerprint(data_hora: Any, descricao: Optional[str]) -> int:
+    """
+    Fingerprint de um andamento (data/hora + descrição)
+    
+    Args:
+        data_hora: Data/hora do andamento (datetime ou texto)
+        descricao: Descrição do andamento
+        
+    Returns:
+        Inteiro de 64 bits
+    """
+    if isinstance(data_hora, datetime):
+        data_hora = data_hora.isoformat()
+    return fingerprint(f"{data_hora or ''}{_FIELD_SEPARATOR}{descricao or ''}")
+
+
+def documento_fingerprint(numero_documento: Optional[str]) -> int:
+    """
+    Fingerprint de um documento (número do documento)
+    
+    Args:
+        numero_documento: Número do documento no SEI
+        
+    Returns:
+        Inteiro de 64 bits
+    """
+    return fingerprint(numero_documento or "")
+
+
+def fingerprint_array(values: Union[np.ndarray, Iterable[int]]) -> np.ndarray:
+    """
+    Conjunto de fingerprints como array ordenado de int64, sem repetições
+    
+    Args:
+        values: Fingerprints
+        
+    Returns:
+        Array ordenado de int64
+    """
+    if not isinstance(values, np.ndarray):
+        values = np.fromiter(values, dtype=np.int64)
+    return np.unique(values.astype(np.int64, copy=False))
+
+
+def pack_fingerprints(values: Union[np.ndarray, Iterable[int]]) -> bytes:
+    """
+    Serializa fingerprints como array ordenado de int64 little-endian
+    
+    Args:
+        values: Fingerprints
+        
+    Returns:
+        Bytes para persistência
+    """
+    return fingerprint_array(values).astype("<i8", copy=False).tobytes()
+
+
+def unpack_fingerprints(data: Optional[bytes]) -> np.ndarray:
+    """
+    Desserializa fingerprints gravados por pack_fingerprints
+    
+    Args:
+        data: Bytes persistidos
+        
+    Returns:
+        Array ordenado de int64
+    """
+    if not data:
+        return np.empty(0, dtype=np.int64)
+    return np.frombuffer(data, dtype="<i8").astype(np.int64)
+
+
+def _int64_bytes(values: Sequence[int]) -> bytes:
+    """Serializa inteiros de 64 bits em little-endian, preservando a ordem"""
+    return np.asarray(values, dtype="<i8").tobytes()
+
+
+def section_digest(fingerprints: Sequence[int], chunk_size: int = DIGEST_CHUNK_SIZE) -> SectionDigest:
+    """
+    Calcula o digest hierárquico de uma lista ordenada de fingerprints
+    
+    Cada bloco de `chunk_size` linhas tem seu próprio digest e a raiz resume
+    os blocos e o total de linhas. Linhas acrescentadas ao final só alteram o
+    último bloco e os seguintes.
+    
+    Args:
+        fingerprints: Fingerprints das linhas na ordem canônica
+        chunk_size: Linhas por bloco
+        
+    Returns:
+        Digest da seção
+    """
+    chunks = [
+        hashlib.blake2b(_int64_bytes(fingerprints[start:start + chunk_size]), digest_size=16).hexdigest()
+        for start in range(0, len(fingerprints), chunk_size)
+    ]
+    root = hashlib.blake2b(digest_size=16)
+    root.update(len(fingerprints).to_bytes(8, "little"))
+    for chunk in chunks:
+        root.update(bytes.fromhex(chunk))
+    return SectionDigest(root=root.hexdigest(), count=len(fingerprints), chunks=chunks)
+
+
+def changed_suffix_start(current: SectionDigest, stored: Optional[SectionDigest],
+                         chunk_size: int = DIGEST_CHUNK_SIZE) -> Optional[int]:
+    """
+    Primeira posição a partir da qual a seção pode ter mudado
+    
+    Args:
+        current: Digest atual da seção
+        stored: Digest armazenado (None = desconhecido)
+        chunk_size: Linhas por bloco usadas nos dois digests
+        
+    Returns:
+        Índice na ordem canônica (0 = seção inteira) ou None se inalterada
+    """
+    if stored is None:
+        return 0
+    if current.root == stored.root:
+        return None
+    
+    for index, (chunk, stored_chunk) in enumerate(zip(current.chunks, stored.chunks)):
+        if chunk != stored_chunk:
+            return index * chunk_size
+    
+    # Blocos comuns iguais: só há blocos acrescentados (ou removidos) ao final
+    common = min(len(current.chunks), len(stored.chunks))
+    return min(common * chunk_size, current.count)
 
 
 class ChangeDetectionService:
@@ -40,15 +195,11 @@ class ChangeDetectionService:
         Returns:
             Lista de documentos novos
         """
-        stored_numbers = {doc.get('numero_documento') for doc in stored_docs}
-        
-        new_docs = []
-        for doc in current_docs:
-            doc_number = doc.get('numero_documento')
-            if doc_number and doc_number not in stored_numbers:
-                new_docs.append(doc)
+        current_docs = [doc for doc in current_docs if doc.get('numero_documento')]
+        current_fps = [documento_fingerprint(doc['numero_documento']) for doc in current_docs]
+        stored_fps = fingerprint_array(documento_fingerprint(doc.get('numero_documento')) for doc in stored_docs)
         
-        return new_docs
+        return [current_docs[i] for i in self.select_new_indices(current_fps, stored_fps)]
     
     def detect_new_andamentos(self, current_andamentos: List[Dict], stored_andamentos: List[Dict]) -> List[Dict]:
         """
@@ -61,19 +212,143 @@ class ChangeDetectionService:
         Returns:
             Lista de andamentos novos
         """
-        # Cria conjunto de identificadores únicos dos andamentos armazenados
-        stored_identifiers = set()
-        for andamento in stored_andamentos:
-            identifier = self._create_andamento_identifier(andamento)
-            stored_identifiers.add(identifier)
+        current_fps = [
+            andamento_fingerprint(a.get('data_hora'), a.get('descricao')) for a in current_andamentos
+        ]
+        stored_fps = fingerprint_array(
+            andamento_fingerprint(a.get('data_hora'), a.get('descricao')) for a in stored_andamentos
+        )
         
-        new_andamentos = []
-        for andamento in current_andamentos:
-            identifier = self._create_andamento_identifier(andamento)
-            if identifier not in stored_identifiers:
-                new_andamentos.append(andamento)
+        return [current_andamentos[i] for i in self.select_new_indices(current_fps, stored_fps)]
+    
+    def select_new_indices(self, current_fps: Sequence[int],
+                           stored_fps: Union[np.ndarray, Iterable[int]]) -> List[int]:
+        """
+        Seleciona as linhas atuais cujo fingerprint não está armazenado
+        
+        A diferença é vetorizada: busca binária (np.searchsorted) das linhas
+        atuais no array ordenado armazenado. Linhas repetidas na lista atual
+        aparecem uma única vez (primeira ocorrência).
         
-        return new_andamentos
+        Args:
+            current_fps: Fingerprints das linhas atuais, na ordem das linhas
+            stored_fps: Fingerprints já armazenados (de preferência o array
+                ordenado de fingerprint_array/unpack_fingerprints)
+            
+        Returns:
+            Índices (em ordem) das linhas novas
+        """
+        current = np.asarray(current_fps, dtype=np.int64)
+        if current.size == 0:
+            return []
+        if not isinstance(stored_fps, np.ndarray):
+            stored_fps = fingerprint_array(stored_fps)
+        
+        # Primeira ocorrência de cada fingerprint, na ordem das linhas
+        _, first = np.unique(current, return_index=True)
+        first.sort()
+        
+        if stored_fps.size:
+            candidates = current[first]
+            positions = np.searchsorted(stored_fps, candidates)
+            stored = stored_fps[np.minimum(positions, stored_fps.size - 1)] == candidates
+            first = first[~stored]
+        return first.tolist()
+    
+    def order_documentos(self, documentos: List[DocumentoData]) -> Tuple[List[DocumentoData], List[int]]:
+        """
+        Ordena documentos na ordem canônica do digest (número do documento)
+        
+        Os números do SEI são crescentes, então documentos novos ficam no final.
+        
+        Args:
+            documentos: Documentos extraídos
+            
+        Returns:
+            Tupla (documentos ordenados, fingerprints na mesma ordem)
+        """
+        keyed = sorted(
+            ((len(d.numero_documento or ""), d.numero_documento or "", documento_fingerprint(d.numero_documento), d)
+             for d in documentos),
+            key=lambda item: item[:3]
+        )
+        return [item[3] for item in keyed], [item[2] for item in keyed]
+    
+    def order_andamentos(self, andamentos: List[AndamentoData]) -> Tuple[List[AndamentoData], List[int]]:
+        """
+        Ordena andamentos na ordem canônica do digest (cronológica)
+        
+        Andamentos novos são os mais recentes, então ficam no final.
+        
+        Args:
+            andamentos: Andamentos extraídos
+            
+        Returns:
+            Tupla (andamentos ordenados, fingerprints na mesma ordem)
+        """
+        keyed = sorted(
+            ((a.data_hora, andamento_fingerprint(a.data_hora, a.descricao), a) for a in andamentos),
+            key=lambda item: item[:2]
+        )
+        return [item[2] for item in keyed], [item[1] for item in keyed]
+    
+    def build_processo_digest(self, autuacao: AutuacaoData, documento_fps: Sequence[int],
+                              andamento_fps: Sequence[int],
+                              chunk_size: int = DIGEST_CHUNK_SIZE) -> ProcessoDigest:
+        """
+        Monta o digest hierárquico do processo
+        
+        Args:
+            autuacao: Dados da autuação
+            documento_fps: Fingerprints dos documentos (ordem de order_documentos)
+            andamento_fps: Fingerprints dos andamentos (ordem de order_andamentos)
+            chunk_size: Linhas por bloco
+            
+        Returns:
+            Digest do processo
+        """
+        # Mesmo dict de AutuacaoData.model_dump(), também para AutuacaoRow
+        autuacao_hash = self.calculate_content_hash({
+            "numero_sei": autuacao.numero_sei,
+            "tipo": autuacao.tipo,
+            "data_geracao": autuacao.data_geracao,
+            "interessados": autuacao.interessados
+        })
+        documentos = section_digest(documento_fps, chunk_size)
+        andamentos = section_digest(andamento_fps, chunk_size)
+        
+        root = hashlib.blake2b(
+            f"{autuacao_hash}{documentos.root}{andamentos.root}".encode("ascii"), digest_size=16
+        ).hexdigest()
+        return ProcessoDigest(
+            chunk_size=chunk_size,
+            root=root,
+            autuacao=autuacao_hash,
+            documentos=documentos,
+            andamentos=andamentos
+        )
+    
+    def compare_digests(self, current: ProcessoDigest, stored: Optional[ProcessoDigest]) -> SnapshotDiff:
+        """
+        Compara digests e indica quais seções (e a partir de onde) mudaram
+        
+        Args:
+            current: Digest dos dados atuais
+            stored: Digest do último snapshot persistido (None = desconhecido)
+            
+        Returns:
+            Seções alteradas; sem digest comparável tudo é considerado alterado
+        """
+        if stored is None or stored.chunk_size != current.chunk_size:
+            return SnapshotDiff()
+        if stored.root == current.root:
+            return SnapshotDiff(autuacao_changed=False, documentos_start=None, andamentos_start=None)
+        
+        return SnapshotDiff(
+            autuacao_changed=stored.autuacao != current.autuacao,
+            documentos_start=changed_suffix_start(current.documentos, stored.documentos, current.chunk_size),
+            andamentos_start=changed_suffix_start(current.andamentos, stored.andamentos, current.chunk_size)
+        )
     
     def detect_autuacao_changes(self, current_autuacao: Dict, stored_autuacao: Dict) -> bool:
         """
@@ -171,23 +446,3 @@ class ChangeDetectionService:
                 normalized[key] = value
         
         return normalized
-    
-    def _create_andamento_identifier(self, andamento: Dict) -> str:
-        """
-        Cria identificador único para andamento
-        
-        Args:
-            andamento: Dados do andamento
-            
-        Returns:
-            Identificador único como string
-        """
-        # Usa data_hora + descrição como identificador único
-        data_hora = andamento.get('data_hora', '')
-        descricao = andamento.get('descricao', '')
-        
-        # Se data_hora é datetime, converte para string
-        if isinstance(data_hora, datetime):
-            data_hora = data_hora.isoformat()
-        
-        return f"{data_hora}|{descricao}" 
\ No newline at end of file
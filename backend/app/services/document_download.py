@@ -5,20 +5,74 @@ import asyncio
 import aiohttp
 import aiofiles
 import hashlib
+import inspect
+import json
 import logging
+import os
+import re
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import Callable, List, Optional, Dict, Any
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-from app.models.processo import Processo, Documento
+from app.database.bulk import bulk_insert_ignore
+from app.metrics import DOWNLOAD_BYTES, DOWNLOAD_SECONDS, DOWNLOAD_THROUGHPUT
+from app.models.processo import Processo, Documento, DownloadTentativa, DownloadAgregado
 from app.models.schemas import (
-    DownloadResult, BatchDownloadResult, DownloadConfig, 
+    DownloadResult, BatchDownloadResult, DownloadConfig, DownloadProgress,
     DownloadStatistics, FileInfo
 )
+from app.services.download_scheduler import DownloadJob, DownloadScheduler
 
 logger = logging.getLogger(__name__)
 
+# Arquivos de download em andamento/interrompido e seus metadados de retomada
+PARTIAL_SUFFIX = ".part"
+PARTIAL_META_SUFFIX = ".part.json"
+
+CONTENT_RANGE_PATTERN = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+
+class PartialDownload:
+    """Estado de um download parcial retomável"""
+    
+    def __init__(self, etag: Optional[str] = None, total_size: Optional[int] = None,
+                 offset: int = 0, hasher=None):
+        """
+        Inicializa o estado
+        
+        Args:
+            etag: ETag da versão sendo baixada
+            total_size: Tamanho total esperado em bytes
+            offset: Bytes já gravados e incluídos no hash
+            hasher: Estado SHA-256 dos bytes já gravados
+        """
+        self.etag = etag
+        self.total_size = total_size
+        self.offset = offset
+        self.hasher = hasher if hasher is not None else hashlib.sha256()
+
+
+def count_new_documentos(db: Session, count: int):
+    """
+    Soma documentos recém-inseridos ao total mantido em DownloadAgregado
+    
+    Deve ser chamado por todo caminho que insere documentos, na mesma
+    transação (não faz commit). Sem a linha agregada nada é feito: ela é
+    criada depois a partir da contagem real.
+    
+    Args:
+        db: Sessão do banco
+        count: Documentos inseridos
+    """
+    if count:
+        db.query(DownloadAgregado).filter(DownloadAgregado.id == 1).update(
+            {DownloadAgregado.documentos_total: DownloadAgregado.documentos_total + count},
+            synchronize_session=False
+        )
+
 
 class DocumentDownloadService:
     """Serviço para download e gerenciamento de documentos"""
@@ -35,6 +89,9 @@ class DocumentDownloadService:
         self.config = DownloadConfig(**config)
         self.session: Optional[aiohttp.ClientSession] = None
         
+        # Checkpoints em memória dos parciais (estado do hash entre tentativas)
+        self._partials: Dict[str, PartialDownload] = {}
+        
         # Cria diretório base se não existir
         Path(self.config.download_base_path).mkdir(parents=True, exist_ok=True)
     
@@ -73,11 +130,18 @@ class DocumentDownloadService:
         
         # Gera caminho do arquivo
         file_path = self.generate_file_path(documento, processo.numero_sei)
+        started_monotonic = time.monotonic()
         
         # Realiza download com retry
         for attempt in range(self.config.max_retries):
             try:
-                result = await self._perform_download(download_url, file_path)
+                attempt_started = time.perf_counter()
+                outcome = "error"
+                try:
+                    result = await self._perform_download(download_url, file_path)
+                    outcome = "success" if result['success'] else "failure"
+                finally:
+                    DOWNLOAD_SECONDS.labels(outcome=outcome).observe(time.perf_counter() - attempt_started)
                 
                 if result['success']:
                     # Atualiza status do documento no banco
@@ -85,7 +149,10 @@ class DocumentDownloadService:
                         documento, 
                         file_path, 
                         result['file_size'], 
-                        result['file_hash']
+                        result['file_hash'],
+                        duration_ms=int((time.monotonic() - started_monotonic) * 1000),
+                        download_url=download_url,
+                        retry_count=retry_count
                     )
                     
                     return DownloadResult(
@@ -110,6 +177,10 @@ class DocumentDownloadService:
                 if attempt < self.config.max_retries - 1:
                     await asyncio.sleep(2 ** attempt)
                 else:
+                    self.record_download_failure(
+                        documento, str(e), int((time.monotonic() - started_monotonic) * 1000),
+                        download_url=download_url, retry_count=retry_count
+                    )
                     return DownloadResult(
                         success=False,
                         documento_id=documento.id,
@@ -117,57 +188,80 @@ class DocumentDownloadService:
                         retry_count=retry_count
                     )
         
+        error_message = f"Falha após {self.config.max_retries} tentativas"
+        self.record_download_failure(
+            documento, error_message, int((time.monotonic() - started_monotonic) * 1000),
+            download_url=download_url, retry_count=retry_count
+        )
         return DownloadResult(
             success=False,
             documento_id=documento.id,
-            error_message=f"Falha após {self.config.max_retries} tentativas",
+            error_message=error_message,
             retry_count=retry_count
         )
     
-    async def batch_download(self, documentos_data: List[Dict]) -> BatchDownloadResult:
+    async def batch_download(self, documentos_data: List[Dict],
+                             progress_callback: Optional[Callable[[DownloadResult, DownloadProgress], Any]] = None
+                             ) -> BatchDownloadResult:
         """
         Download em lote de documentos
         
+        Usa uma fila contínua (DownloadScheduler): cada uma das
+        `concurrent_downloads` vagas inicia o próximo arquivo assim que a
+        anterior termina, com rodízio entre hosts e arquivos menores primeiro.
+        `delay_between_downloads` vira o espaçamento médio entre inícios no
+        mesmo host, mantendo a taxa máxima de requisições dos lotes antigos.
+        
         Args:
-            documentos_data: Lista com dicionários contendo 'documento' e 'url'
+            documentos_data: Lista com dicionários contendo 'documento', 'url'
+                e opcionalmente 'size' (tamanho conhecido em bytes)
+            progress_callback: Chamado (sync ou async) a cada documento concluído
             
         Returns:
-            Resultado do download em lote
+            Resultado do download em lote (resultados na ordem de entrada)
         """
         start_time = datetime.now()
-        results = []
-        
-        # Processa downloads em lotes menores para controlar concorrência
-        batch_size = self.config.concurrent_downloads
-        
-        for i in range(0, len(documentos_data), batch_size):
-            batch = documentos_data[i:i + batch_size]
-            
-            # Executa downloads concorrentes no lote
-            tasks = []
-            for item in batch:
-                task = self.download_document(item['documento'], item['url'])
-                tasks.append(task)
-            
-            # Aguarda conclusão do lote
-            batch_results = await asyncio.gather(*tasks, return_exceptions=True)
+        started_monotonic = time.monotonic()
+        results: List[Optional[DownloadResult]] = [None] * len(documentos_data)
+        progress = DownloadProgress(total_documents=len(documentos_data))
+        
+        scheduler = DownloadScheduler(
+            concurrency=self.config.concurrent_downloads,
+            per_host_limit=self.config.max_downloads_per_host,
+            min_host_interval=self.config.delay_between_downloads / max(1, self.config.concurrent_downloads)
+        )
+        for index, item in enumerate(documentos_data):
+            scheduler.add(DownloadJob(index, item['url'], size=item.get('size'), payload=item['documento']))
+        
+        async def run_job(job: DownloadJob) -> DownloadResult:
+            return await self.download_document(job.payload, job.url)
+        
+        async def on_complete(job: DownloadJob, result):
+            if isinstance(result, Exception):
+                # Trata exceções não capturadas
+                logger.error(f"Erro não tratado no download: {result}")
+                result = DownloadResult(
+                    success=False,
+                    documento_id=getattr(job.payload, 'id', None) or 0,
+                    error_message=str(result)
+                )
+            results[job.index] = result
             
-            # Processa resultados do lote
-            for result in batch_results:
-                if isinstance(result, Exception):
-                    # Trata exceções não capturadas
-                    logger.error(f"Erro não tratado no download: {result}")
-                    results.append(DownloadResult(
-                        success=False,
-                        documento_id=0,
-                        error_message=str(result)
-                    ))
-                else:
-                    results.append(result)
+            progress.completed += 1
+            if result.success:
+                progress.successful += 1
+                progress.bytes_downloaded += result.file_size or 0
+            else:
+                progress.failed += 1
+            progress.in_progress = len(documentos_data) - progress.completed - scheduler.pending
+            progress.elapsed_seconds = time.monotonic() - started_monotonic
             
-            # Delay entre lotes
-            if i + batch_size < len(documentos_data):
-                await asyncio.sleep(self.config.delay_between_downloads)
+            if progress_callback is not None:
+                outcome = progress_callback(result, progress.model_copy())
+                if inspect.isawaitable(outcome):
+                    await outcome
+        
+        await scheduler.run(run_job, on_complete)
         
         # Calcula estatísticas
         successful = sum(1 for r in results if r.success)
@@ -264,19 +358,201 @@ class DocumentDownloadService:
         return sha256_hash.hexdigest()
     
     async def update_documento_status(self, documento: Documento, file_path: str, 
-                                    file_size: int, file_hash: str):
+                                    file_size: int, file_hash: str, duration_ms: Optional[int] = None,
+                                    download_url: Optional[str] = None, retry_count: int = 0):
         """
         Atualiza status do documento após download
         
+        Registra a tentativa e atualiza os totais agregados na mesma transação.
+        
         Args:
             documento: Instância do documento
             file_path: Caminho do arquivo baixado
             file_size: Tamanho do arquivo
             file_hash: Hash do arquivo
+            duration_ms: Duração do download (incluindo repetições)
+            download_url: URL de origem
+            retry_count: Repetições necessárias
+        """
+        now = datetime.now()
+        was_downloaded = bool(documento.downloaded)
+        was_failed = not was_downloaded and documento.download_erro is not None
+        
+        if documento.arquivo_hash and documento.arquivo_hash != file_hash:
+            # Conteúdo mudou: o texto será reextraído, reaproveitando as páginas inalteradas
+            documento.detalhamento_texto = None
+            documento.detalhamento_status = 'pendente'
+        
+        self._bump_statistics(
+            documentos_baixados=0 if was_downloaded else 1,
+            documentos_com_falha=-1 if was_failed else 0,
+            arquivos_bytes=(file_size or 0) - ((documento.arquivo_tamanho or 0) if was_downloaded else 0),
+            tentativas=1,
+            bytes_transferidos=file_size or 0,
+            duracao_sucesso_ms=duration_ms or 0,
+            ultimo_download_em=now
+        )
+        if documento.id is not None:
+            self.db.add(DownloadTentativa(
+                documento_id=documento.id, url=download_url, sucesso=True, repeticoes=retry_count,
+                tamanho_bytes=file_size, duracao_ms=duration_ms or 0, created_at=now
+            ))
+        
+        documento.downloaded = True
+        documento.arquivo_path = file_path
+        documento.arquivo_hash = file_hash
+        documento.arquivo_tamanho = file_size
+        documento.downloaded_at = now
+        documento.download_duracao_ms = duration_ms
+        documento.download_erro = None
+        documento.updated_at = now
+        
+        self.db.commit()
+    
+    def register_uploaded_file(self, documento: Documento, file_path: str, file_size: int, file_hash: str):
+        """
+        Marca como disponível um arquivo enviado manualmente (sem download)
+        
+        Conta o documento nos totais agregados como baixado, sem registrar
+        tentativa de download, e grava o documento.
+        
+        Args:
+            documento: Documento (novo ou existente) ainda não baixado
+            file_path: Caminho do arquivo salvo
+            file_size: Tamanho do arquivo
+            file_hash: Hash SHA-256 do arquivo
         """
+        now = datetime.now()
+        
+        # Antes de gravar o documento, para a criação da linha agregada não contá-lo
+        self._bump_statistics(
+            documentos_total=1 if documento.id is None else 0,
+            documentos_baixados=1, arquivos_bytes=file_size or 0, ultimo_download_em=now
+        )
+        
         documento.downloaded = True
         documento.arquivo_path = file_path
-        documento.updated_at = datetime.now()
+        documento.arquivo_hash = file_hash
+        documento.arquivo_tamanho = file_size
+        documento.downloaded_at = now
+        self.db.add(documento)
+        
+        self.db.commit()
+    
+    def record_download_failure(self, documento: Documento, error_message: str, duration_ms: int,
+                                download_url: Optional[str] = None, retry_count: int = 0):
+        """
+        Registra um download que falhou após todas as repetições
+        
+        Args:
+            documento: Instância do documento
+            error_message: Erro da última tentativa
+            duration_ms: Duração somada das tentativas
+            download_url: URL de origem
+            retry_count: Repetições realizadas
+        """
+        newly_failed = not documento.downloaded and documento.download_erro is None
+        
+        self._bump_statistics(
+            documentos_com_falha=1 if newly_failed else 0,
+            tentativas=1,
+            tentativas_falhas=1
+        )
+        if documento.id is not None:
+            self.db.add(DownloadTentativa(
+                documento_id=documento.id, url=download_url, sucesso=False, repeticoes=retry_count,
+                duracao_ms=duration_ms, erro=error_message, created_at=datetime.now()
+            ))
+        
+        documento.download_falhas = (documento.download_falhas or 0) + 1
+        documento.download_erro = error_message
+        
+        self.db.commit()
+    
+    def _bump_statistics(self, ultimo_download_em: Optional[datetime] = None, **deltas: int):
+        """
+        Incrementa os totais agregados com um UPDATE atômico (sem ler a linha)
+        
+        Não faz commit: participa da transação do download.
+        
+        Args:
+            ultimo_download_em: Instante do download concluído, se houver
+            **deltas: Coluna de DownloadAgregado -> incremento
+        """
+        values = {
+            getattr(DownloadAgregado, column): getattr(DownloadAgregado, column) + delta
+            for column, delta in deltas.items() if delta
+        }
+        if ultimo_download_em is not None:
+            values[DownloadAgregado.ultimo_download_em] = ultimo_download_em
+        if not values:
+            return
+        
+        aggregate = self.db.query(DownloadAgregado).filter(DownloadAgregado.id == 1)
+        if aggregate.update(values, synchronize_session=False) == 0:
+            # Primeira atualização: cria a linha a partir das tabelas e repete
+            self._seed_statistics()
+            aggregate.update(values, synchronize_session=False)
+    
+    def _seed_statistics(self):
+        """
+        Cria a linha agregada com os totais já existentes nas tabelas
+        
+        Bases anteriores aos totais incrementais (ou a primeira operação numa
+        base nova) partem da contagem real, não de zero. Ignora a linha criada
+        por uma transação concorrente. Não faz commit.
+        """
+        bulk_insert_ignore(self.db, DownloadAgregado, [{"id": 1, **self._statistics_from_tables()}])
+    
+    def _statistics_from_tables(self) -> Dict[str, Any]:
+        """
+        Totais agregados recalculados a partir de documentos e tentativas
+        
+        Returns:
+            Coluna de DownloadAgregado -> valor
+        """
+        documentos = self.db.query(
+            func.count(Documento.id),
+            func.count(Documento.id).filter(Documento.downloaded == True),
+            func.count(Documento.id).filter(Documento.downloaded != True, Documento.download_erro.isnot(None)),
+            func.sum(Documento.arquivo_tamanho).filter(Documento.downloaded == True),
+            func.max(Documento.downloaded_at)
+        ).one()
+        tentativas = self.db.query(
+            func.count(DownloadTentativa.id),
+            func.count(DownloadTentativa.id).filter(DownloadTentativa.sucesso == False),
+            func.sum(DownloadTentativa.tamanho_bytes).filter(DownloadTentativa.sucesso == True),
+            func.sum(DownloadTentativa.duracao_ms).filter(DownloadTentativa.sucesso == True)
+        ).one()
+        
+        return {
+            "documentos_total": documentos[0] or 0,
+            "documentos_baixados": documentos[1] or 0,
+            "documentos_com_falha": documentos[2] or 0,
+            "arquivos_bytes": int(documentos[3] or 0),
+            "ultimo_download_em": documentos[4],
+            "tentativas": tentativas[0] or 0,
+            "tentativas_falhas": tentativas[1] or 0,
+            "bytes_transferidos": int(tentativas[2] or 0),
+            "duracao_sucesso_ms": int(tentativas[3] or 0),
+        }
+    
+    def rebuild_download_statistics(self):
+        """
+        Recalcula os totais agregados a partir de documentos e tentativas
+        
+        Custo proporcional ao tamanho das tabelas; serve para reconciliar os
+        totais após remoções em massa ou migração de bases antigas.
+        """
+        values = self._statistics_from_tables()
+        
+        aggregate = self.db.query(DownloadAgregado).filter(DownloadAgregado.id == 1).first()
+        if aggregate is None:
+            aggregate = DownloadAgregado(id=1)
+            self.db.add(aggregate)
+        
+        for column, value in values.items():
+            setattr(aggregate, column, value)
         
         self.db.commit()
     
@@ -284,31 +560,62 @@ class DocumentDownloadService:
         """
         Obtém estatísticas de downloads
         
+        Lê os totais mantidos incrementalmente em DownloadAgregado, inclusive
+        o total de documentos (count_new_documentos). Sem a linha agregada
+        (base anterior aos totais incrementais), ela é criada a partir das
+        tabelas; sem o total de documentos (coluna recém-criada), ele é
+        contado uma única vez.
+        
         Returns:
             Estatísticas de download
         """
-        total_docs = self.db.query(Documento).count()
-        downloaded_docs = self.db.query(Documento).filter(Documento.downloaded == True).count()
-        pending_docs = total_docs - downloaded_docs
+        aggregate = self.db.query(DownloadAgregado).filter(DownloadAgregado.id == 1).first()
+        if aggregate is None:
+            self._seed_statistics()
+            self.db.commit()
+            aggregate = self.db.query(DownloadAgregado).filter(DownloadAgregado.id == 1).first()
+        elif aggregate.documentos_total is None:
+            aggregate.documentos_total = self.db.query(func.count(Documento.id)).scalar() or 0
+            self.db.commit()
+        
+        total_docs = (aggregate.documentos_total or 0) if aggregate else 0
+        downloaded_docs = (aggregate.documentos_baixados or 0) if aggregate else 0
+        attempts = (aggregate.tentativas or 0) if aggregate else 0
+        failed_attempts = (aggregate.tentativas_falhas or 0) if aggregate else 0
+        successful_attempts = attempts - failed_attempts
+        success_ms = (aggregate.duracao_sucesso_ms or 0) if aggregate else 0
+        transferred = (aggregate.bytes_transferidos or 0) if aggregate else 0
         
         download_percentage = (downloaded_docs / total_docs * 100) if total_docs > 0 else 0
         
         return DownloadStatistics(
             total_documents=total_docs,
             downloaded_documents=downloaded_docs,
-            pending_downloads=pending_docs,
-            failed_downloads=0,  # TODO: Implementar tracking de falhas
+            pending_downloads=max(0, total_docs - downloaded_docs),
+            failed_downloads=(aggregate.documentos_com_falha or 0) if aggregate else 0,
             download_percentage=download_percentage,
-            total_file_size_mb=0.0,  # TODO: Calcular tamanho total
-            last_download_at=None  # TODO: Implementar timestamp
+            total_file_size_mb=((aggregate.arquivos_bytes or 0) if aggregate else 0) / (1024 * 1024),
+            last_download_at=aggregate.ultimo_download_em if aggregate else None,
+            total_attempts=attempts,
+            failed_attempts=failed_attempts,
+            failure_rate=failed_attempts / attempts if attempts else 0.0,
+            average_duration_seconds=success_ms / successful_attempts / 1000 if successful_attempts else None,
+            average_throughput_kbps=transferred / 1024 / (success_ms / 1000) if success_ms else None
         )
     
-    async def cleanup_failed_downloads(self, directory: str) -> int:
+    async def cleanup_failed_downloads(self, directory: str,
+                                       max_partial_age_hours: Optional[float] = None) -> int:
         """
         Remove downloads incompletos ou corrompidos
         
+        Arquivos finais só são gravados por renomeação ao fim do download, então
+        apenas os vazios são removidos. Parciais (.part) retomáveis, com
+        metadados válidos, são mantidos; os demais são removidos.
+        
         Args:
             directory: Diretório para limpeza
+            max_partial_age_hours: Remove também parciais retomáveis sem
+                progresso há mais que este tempo (None = mantém)
             
         Returns:
             Número de arquivos removidos
@@ -322,21 +629,43 @@ class DocumentDownloadService:
         # Processa todos os arquivos PDF
         for file_path in dir_path.rglob("*.pdf"):
             try:
-                # Verifica se arquivo é muito pequeno (provavelmente incompleto)
-                if file_path.stat().st_size < 100:  # Menos de 100 bytes
+                if file_path.stat().st_size == 0:
                     file_path.unlink()
                     cleaned_count += 1
-                    logger.info(f"Arquivo removido (muito pequeno): {file_path}")
+                    logger.info(f"Arquivo removido (vazio): {file_path}")
                     
             except Exception as e:
                 logger.warning(f"Erro ao verificar arquivo {file_path}: {e}")
         
+        # Parciais: mantém apenas os retomáveis
+        for part_path in dir_path.rglob(f"*{PARTIAL_SUFFIX}"):
+            final_path = str(part_path)[:-len(PARTIAL_SUFFIX)]
+            try:
+                reason = self._partial_problem(final_path, max_partial_age_hours)
+                if reason:
+                    cleaned_count += self._discard_partial(final_path)
+                    logger.info(f"Parcial removido ({reason}): {part_path}")
+            except Exception as e:
+                logger.warning(f"Erro ao verificar parcial {part_path}: {e}")
+        
+        # Metadados sem o parcial correspondente
+        for meta_path in dir_path.rglob(f"*{PARTIAL_META_SUFFIX}"):
+            if not Path(str(meta_path)[:-len(PARTIAL_META_SUFFIX)] + PARTIAL_SUFFIX).exists():
+                meta_path.unlink()
+                cleaned_count += 1
+        
         return cleaned_count
     
     async def _perform_download(self, url: str, file_path: str) -> Dict[str, Any]:
         """
         Executa o download efetivo do arquivo
         
+        Grava em `<arquivo>.part` e, se houver parcial de uma tentativa
+        anterior, retoma com Range/If-Range a partir do último byte gravado,
+        validando ETag e tamanho total. O hash SHA-256 é calculado durante a
+        transferência e seu estado é mantido entre tentativas. Ao concluir, o
+        parcial é renomeado para o caminho final.
+        
         Args:
             url: URL para download
             file_path: Caminho onde salvar o arquivo
@@ -348,33 +677,262 @@ class DocumentDownloadService:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
         
+        part_path = Path(file_path + PARTIAL_SUFFIX)
+        part_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        partial = self._load_partial(file_path)
+        if partial.offset:
+            headers['Range'] = f"bytes={partial.offset}-"
+            if partial.etag and not partial.etag.startswith('W/'):
+                headers['If-Range'] = partial.etag
+        
         timeout = aiohttp.ClientTimeout(total=self.config.timeout)
         
         async with aiohttp.ClientSession(timeout=timeout) as session:
             async with session.get(url, headers=headers) as response:
                 
-                if response.status != 200:
+                if response.status == 206 and partial.offset:
+                    problem = self._validate_resume(partial, response.headers)
+                    if problem:
+                        self._discard_partial(file_path)
+                        return {'success': False, 'error': f"Retomada inválida: {problem}"}
+                elif response.status == 200:
+                    # Download novo, ou servidor ignorou o Range (arquivo mudou)
+                    if partial.offset:
+                        logger.info(f"Servidor reenviou o arquivo completo; reiniciando {file_path}")
+                    content_length = response.headers.get('Content-Length')
+                    partial = PartialDownload(
+                        etag=response.headers.get('ETag'),
+                        total_size=int(content_length) if content_length and content_length.isdigit() else None
+                    )
+                elif response.status == 416:
+                    self._discard_partial(file_path)
+                    return {'success': False, 'error': "HTTP 416: parcial maior que o arquivo remoto"}
+                else:
                     return {
                         'success': False,
                         'error': f"HTTP {response.status}: {await response.text()}"
                     }
                 
-                # Cria diretório do arquivo se necessário
-                Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+                # Baixa arquivo (anexando ao parcial quando retomado)
+                transfer_started = time.perf_counter()
+                received = 0
+                try:
+                    async with aiofiles.open(part_path, 'ab' if partial.offset else 'wb') as f:
+                        async for chunk in response.content.iter_chunked(self.config.chunk_size):
+                            await f.write(chunk)
+                            partial.hasher.update(chunk)
+                            partial.offset += len(chunk)
+                            received += len(chunk)
+                finally:
+                    self._checkpoint_partial(file_path, partial)
+                    self._record_transfer(received, time.perf_counter() - transfer_started)
                 
-                # Baixa arquivo
-                file_size = 0
-                async with aiofiles.open(file_path, 'wb') as f:
-                    async for chunk in response.content.iter_chunked(self.config.chunk_size):
-                        await f.write(chunk)
-                        file_size += len(chunk)
+                if partial.total_size is not None and partial.offset != partial.total_size:
+                    return {
+                        'success': False,
+                        'error': f"Download incompleto: {partial.offset} de {partial.total_size} bytes"
+                    }
                 
-                # Calcula hash do arquivo
-                file_hash = self.calculate_file_hash(file_path)
+                os.replace(part_path, file_path)
+                self._discard_partial(file_path)
                 
                 return {
                     'success': True,
-                    'file_size': file_size,
+                    'file_size': partial.offset,
                     'content_type': response.headers.get('content-type', 'application/octet-stream'),
-                    'file_hash': file_hash
-                } 
\ No newline at end of file
+                    'file_hash': partial.hasher.hexdigest()
+                }
+    
+    @staticmethod
+    def _record_transfer(received: int, elapsed_seconds: float):
+        """
+        Registra bytes recebidos e vazão de uma transferência nas métricas
+        
+        Args:
+            received: Bytes recebidos nesta tentativa
+            elapsed_seconds: Duração da transferência do corpo
+        """
+        DOWNLOAD_BYTES.inc(received)
+        if received and elapsed_seconds > 0:
+            DOWNLOAD_THROUGHPUT.observe(received / elapsed_seconds)
+    
+    def _load_partial(self, file_path: str) -> PartialDownload:
+        """
+        Recupera o estado do parcial de uma tentativa anterior
+        
+        Reaproveita o hash em memória da última tentativa; após reinício do
+        processo, recalcula-o lendo o parcial do disco. Bytes gravados além do
+        último checkpoint são descartados.
+        
+        Args:
+            file_path: Caminho final do arquivo
+            
+        Returns:
+            Estado do parcial (offset 0 se não houver parcial utilizável)
+        """
+        part_path = Path(file_path + PARTIAL_SUFFIX)
+        meta = self._read_partial_meta(file_path)
+        if meta is None or not part_path.exists():
+            self._discard_partial(file_path)
+            return PartialDownload()
+        
+        size = part_path.stat().st_size
+        offset = min(size, meta['offset'])
+        
+        cached = self._partials.get(file_path)
+        if cached is not None and cached.offset == offset:
+            hasher = cached.hasher
+        else:
+            hasher = self._rehash_partial(part_path, offset)
+        
+        if size > offset:
+            with open(part_path, 'r+b') as f:
+                f.truncate(offset)
+        
+        return PartialDownload(
+            etag=meta.get('etag'),
+            total_size=meta.get('total_size'),
+            offset=offset,
+            hasher=hasher
+        )
+    
+    def _validate_resume(self, partial: PartialDownload, headers) -> Optional[str]:
+        """
+        Confere se a resposta 206 continua exatamente o parcial gravado
+        
+        Args:
+            partial: Estado do parcial
+            headers: Headers da resposta
+            
+        Returns:
+            Descrição do problema ou None se a retomada for válida
+        """
+        if not partial.etag and partial.total_size is None:
+            return "parcial sem ETag nem tamanho para validar"
+        
+        etag = headers.get('ETag')
+        if partial.etag and etag and etag != partial.etag:
+            return f"ETag mudou ({partial.etag} -> {etag})"
+        
+        match = CONTENT_RANGE_PATTERN.match(headers.get('Content-Range', ''))
+        if not match:
+            return "Content-Range ausente ou inválido"
+        
+        start, total = int(match.group(1)), match.group(3)
+        if start != partial.offset:
+            return f"Content-Range começa em {start}, esperado {partial.offset}"
+        if total != '*' and partial.total_size is not None and int(total) != partial.total_size:
+            return f"tamanho mudou ({partial.total_size} -> {total})"
+        if total != '*' and partial.total_size is None:
+            partial.total_size = int(total)
+        
+        return None
+    
+    def _checkpoint_partial(self, file_path: str, partial: PartialDownload):
+        """
+        Registra o progresso do parcial (em memória e no arquivo de metadados)
+        
+        Args:
+            file_path: Caminho final do arquivo
+            partial: Estado do parcial
+        """
+        self._partials[file_path] = partial
+        Path(file_path + PARTIAL_META_SUFFIX).write_text(json.dumps({
+            'etag': partial.etag,
+            'total_size': partial.total_size,
+            'offset': partial.offset,
+            'updated_at': datetime.now().isoformat()
+        }))
+    
+    def _read_partial_meta(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Lê os metadados do parcial
+        
+        Args:
+            file_path: Caminho final do arquivo
+            
+        Returns:
+            Metadados ou None se ausentes/ilegíveis
+        """
+        meta_path = Path(file_path + PARTIAL_META_SUFFIX)
+        try:
+            meta = json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            return None
+        
+        if not isinstance(meta, dict) or not isinstance(meta.get('offset'), int) or meta['offset'] < 0:
+            return None
+        return meta
+    
+    def _partial_problem(self, file_path: str, max_age_hours: Optional[float]) -> Optional[str]:
+        """
+        Verifica se o parcial de um arquivo pode ser retomado
+        
+        Args:
+            file_path: Caminho final do arquivo
+            max_age_hours: Idade máxima do último checkpoint (None = sem limite)
+            
+        Returns:
+            Motivo para descartar o parcial ou None se for retomável
+        """
+        meta = self._read_partial_meta(file_path)
+        if meta is None:
+            return "sem metadados"
+        if not meta.get('etag') and meta.get('total_size') is None:
+            return "sem ETag nem tamanho"
+        if Path(file_path + PARTIAL_SUFFIX).stat().st_size < meta['offset']:
+            return "menor que o checkpoint"
+        if meta.get('total_size') is not None and meta['offset'] > meta['total_size']:
+            return "maior que o arquivo remoto"
+        
+        if max_age_hours is not None:
+            try:
+                updated_at = datetime.fromisoformat(meta.get('updated_at', ''))
+            except (TypeError, ValueError):
+                return "sem data de checkpoint"
+            if (datetime.now() - updated_at).total_seconds() > max_age_hours * 3600:
+                return "sem progresso recente"
+        
+        return None
+    
+    def _discard_partial(self, file_path: str) -> int:
+        """
+        Remove parcial e metadados de um arquivo
+        
+        Args:
+            file_path: Caminho final do arquivo
+            
+        Returns:
+            Número de arquivos removidos
+        """
+        self._partials.pop(file_path, None)
+        removed = 0
+        for suffix in (PARTIAL_SUFFIX, PARTIAL_META_SUFFIX):
+            path = Path(file_path + suffix)
+            if path.exists():
+                path.unlink()
+                removed += 1
+        return removed
+    
+    def _rehash_partial(self, part_path: Path, length: int):
+        """
+        Recalcula o estado do hash a partir dos bytes já gravados
+        
+        Args:
+            part_path: Caminho do parcial
+            length: Bytes a considerar
+            
+        Returns:
+            Objeto hashlib SHA-256 com os `length` primeiros bytes
+        """
+        sha256_hash = hashlib.sha256()
+        remaining = length
+        with open(part_path, "rb") as f:
+            while remaining > 0:
+                chunk = f.read(min(1024 * 1024, remaining))
+                if not chunk:
+                    break
+                sha256_hash.update(chunk)
+                remaining -= len(chunk)
+        return sha256_hash
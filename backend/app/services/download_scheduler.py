@@ -0,0 +1,175 @@
+"""
+Escalonamento contínuo de downloads com justiça entre hosts
+"""
+import asyncio
+import heapq
+import inspect
+import itertools
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+class DownloadJob:
+    """Item da fila de downloads"""
+
+    def __init__(self, index: int, url: str, size: Optional[int] = None, payload: Any = None):
+        """
+        Inicializa o item
+
+        Args:
+            index: Posição do item no lote original
+            url: URL do arquivo
+            size: Tamanho conhecido em bytes (None = desconhecido)
+            payload: Dados do chamador associados ao item
+        """
+        self.index = index
+        self.url = url
+        self.size = size
+        self.payload = payload
+        self.host = (urlsplit(url).hostname or "").lower()
+
+
+class DownloadScheduler:
+    """
+    Fila de trabalho com N workers sempre ocupados
+
+    Cada worker pega o próximo item assim que termina o anterior, sem esperar
+    o resto do lote. Os hosts são atendidos em rodízio, com limite de
+    downloads simultâneos e intervalo mínimo entre inícios por host; dentro
+    de cada host, arquivos de tamanho conhecido vão primeiro, do menor para
+    o maior.
+    """
+
+    def __init__(self, concurrency: int, per_host_limit: Optional[int] = None,
+                 min_host_interval: float = 0.0, clock: Callable[[], float] = time.monotonic):
+        """
+        Inicializa o escalonador
+
+        Args:
+            concurrency: Número de workers
+            per_host_limit: Downloads simultâneos por host (padrão: concurrency)
+            min_host_interval: Segundos mínimos entre inícios no mesmo host
+            clock: Relógio monotônico (injetável para testes)
+        """
+        self.concurrency = max(1, concurrency)
+        self.per_host_limit = max(1, per_host_limit or self.concurrency)
+        self.min_host_interval = min_host_interval
+        self._clock = clock
+
+        self._queues: Dict[str, List[Tuple[float, int, DownloadJob]]] = {}
+        self._host_order: Deque[str] = deque()
+        self._in_flight: Dict[str, int] = {}
+        self._next_start: Dict[str, float] = {}
+        self._sequence = itertools.count()
+        self._changed: Optional[asyncio.Condition] = None
+
+    def add(self, job: DownloadJob):
+        """
+        Enfileira um item
+
+        Args:
+            job: Item de download
+        """
+        queue = self._queues.get(job.host)
+        if queue is None:
+            queue = self._queues[job.host] = []
+            self._host_order.append(job.host)
+
+        size_key = float(job.size) if job.size is not None else float("inf")
+        heapq.heappush(queue, (size_key, next(self._sequence), job))
+
+    @property
+    def pending(self) -> int:
+        """Itens ainda não iniciados"""
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def run(self, worker: Callable[[DownloadJob], Awaitable[Any]],
+                  on_complete: Optional[Callable[[DownloadJob, Any], Any]] = None):
+        """
+        Processa a fila até esvaziá-la
+
+        Args:
+            worker: Corrotina que executa o download de um item
+            on_complete: Chamado (sync ou async) a cada item concluído com o
+                resultado do worker ou a exceção levantada por ele
+        """
+        self._changed = asyncio.Condition()
+        workers = [asyncio.create_task(self._worker_loop(worker, on_complete))
+                   for _ in range(min(self.concurrency, max(1, self.pending)))]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+
+    async def _worker_loop(self, worker: Callable[[DownloadJob], Awaitable[Any]],
+                           on_complete: Optional[Callable[[DownloadJob, Any], Any]]):
+        """Laço de um worker: pega, executa e reporta itens até a fila acabar"""
+        while True:
+            job, wait = self._next_job()
+            if job is None:
+                if wait is None:
+                    return
+                await self._wait_for_change(wait)
+                continue
+
+            try:
+                result = await worker(job)
+            except Exception as e:
+                result = e
+            finally:
+                self._in_flight[job.host] -= 1
+                async with self._changed:
+                    self._changed.notify_all()
+
+            if on_complete is not None:
+                outcome = on_complete(job, result)
+                if inspect.isawaitable(outcome):
+                    await outcome
+
+    def _next_job(self) -> Tuple[Optional[DownloadJob], Optional[float]]:
+        """
+        Escolhe o próximo item respeitando rodízio e limites por host
+
+        Returns:
+            (item, None) se houver item liberado; (None, espera) se todos os
+            hosts com fila estiverem ocupados (espera = inf até uma conclusão);
+            (None, None) se a fila estiver vazia
+        """
+        now = self._clock()
+        wait: Optional[float] = None
+
+        for _ in range(len(self._host_order)):
+            host = self._host_order[0]
+            self._host_order.rotate(-1)
+            queue = self._queues[host]
+            if not queue:
+                continue
+
+            if self._in_flight.get(host, 0) >= self.per_host_limit:
+                wait = float("inf") if wait is None else wait
+                continue
+
+            delay = self._next_start.get(host, 0.0) - now
+            if delay > 0:
+                wait = delay if wait is None else min(wait, delay)
+                continue
+
+            _, _, job = heapq.heappop(queue)
+            self._in_flight[host] = self._in_flight.get(host, 0) + 1
+            self._next_start[host] = now + self.min_host_interval
+            return job, None
+
+        return None, wait
+
+    async def _wait_for_change(self, timeout: float):
+        """Aguarda a conclusão de algum item (ou o timeout, se finito)"""
+        async with self._changed:
+            try:
+                await asyncio.wait_for(
+                    self._changed.wait(), None if timeout == float("inf") else timeout
+                )
+            except asyncio.TimeoutError:
+                pass
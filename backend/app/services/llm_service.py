@@ -8,16 +8,21 @@ import re
 import time
 from datetime import datetime, timedelta
 from decimal import Decimal
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Optional, Dict, Any, Union, AsyncIterator
 
 import openai
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
 
-from app.models.processo import Documento, DocumentoTag, DocumentoEntidade
+from app.database.bulk import bulk_insert_ignore
+from app.metrics import LLM_COST_USD, LLM_REQUEST_SECONDS, LLM_TOKENS
+from app.models.processo import Documento, DocumentoTag, DocumentoEntidade, LLMChamadaAgregada
+from app.services.batch_progress import BatchProgress
+from app.services.llm_telemetry import LLMTelemetryService
+from app.services.rate_limiter import get_rate_limiter, is_throttling_error
 from app.models.schemas import (
     DocumentAnalysis, EntityExtractionResult, TagGenerationResult,
-    LLMConfig, BatchLLMResult, LLMStatistics, CostEstimation
+    LLMConfig, BatchLLMResult, LLMStatistics, CostEstimation, LLMCallBucketStats
 )
 
 logger = logging.getLogger(__name__)
@@ -42,6 +47,19 @@ class LLMService:
             openai.api_key = self.config.api_key
             if self.config.organization_id:
                 openai.organization = self.config.organization_id
+        
+        # Controle de cotas compartilhado por modelo
+        self.rate_limiter = get_rate_limiter(
+            self.config.provider,
+            self.config.model,
+            requests_per_minute=self.config.requests_per_minute,
+            tokens_per_minute=self.config.tokens_per_minute,
+            max_concurrency=self.config.max_concurrent_requests
+        )
+        
+        # Telemetria por chamada, gravada junto com a próxima atualização de status
+        self.telemetry = LLMTelemetryService(db_session)
+        self._pending_telemetry: List[Dict[str, Any]] = []
     
     async def analyze_document(self, documento_id: int) -> DocumentAnalysis:
         """
@@ -89,9 +107,9 @@ class LLMService:
             # Processa documento (pode ser dividido em chunks)
             text = documento.detalhamento_texto
             if len(text) > self.config.chunk_size:
-                analysis_result = await self._process_document_chunks(text)
+                analysis_result = await self._process_document_chunks(text, documento_id=documento_id)
             else:
-                analysis_result = await self._process_single_chunk(text)
+                analysis_result = await self._process_single_chunk(text, documento_id=documento_id)
             
             if not analysis_result["success"]:
                 await self._update_document_status(documento_id, "erro", self.config.model)
@@ -106,43 +124,14 @@ class LLMService:
                     error_message=analysis_result.get("error", "Erro no processamento")
                 )
             
-            # Calcula custo
-            cost = self.calculate_cost(
-                input_tokens=analysis_result["prompt_tokens"],
-                output_tokens=analysis_result["completion_tokens"]
-            )
-            
-            # Salva entidades e tags no banco
-            await self._save_analysis_results(documento_id, analysis_result)
-            
-            # Atualiza status para concluído
-            await self._update_document_status(
-                documento_id, 
-                "concluido", 
-                self.config.model, 
-                tokens=analysis_result["total_tokens"]
-            )
-            
-            processing_time = time.time() - start_time
-            
-            return DocumentAnalysis(
-                documento_id=documento_id,
-                success=True,
-                analysis_text=analysis_result.get("full_text"),
-                summary=analysis_result.get("summary"),
-                extracted_entities=analysis_result.get("entities", []),
-                generated_tags=analysis_result.get("tags", []),
-                confidence_score=Decimal(str(analysis_result.get("confidence", 0))),
-                model_used=self.config.model,
-                tokens_used=analysis_result["total_tokens"],
-                processing_time_seconds=processing_time,
-                cost_usd=cost,
-                processed_at=datetime.now()
-            )
+            return await self._finalize_analysis(documento_id, analysis_result, start_time)
             
         except Exception as e:
             logger.error(f"Erro na análise do documento {documento_id}: {str(e)}")
             
+            # Descarta resultados parciais não confirmados
+            self.db.rollback()
+            
             # Atualiza status para erro
             await self._update_document_status(documento_id, "erro", self.config.model)
             
@@ -310,8 +299,9 @@ class LLMService:
             avg_tokens_per_doc = 1000  # Valor padrão conservador
         
         total_tokens = pending_count * avg_tokens_per_doc
-        estimated_cost = self.calculate_cost(input_tokens=int(total_tokens * 0.8), 
-                                           output_tokens=int(total_tokens * 0.2))
+        input_share = self._get_input_token_share()
+        estimated_cost = self.calculate_cost(input_tokens=int(total_tokens * input_share), 
+                                           output_tokens=int(total_tokens * (1 - input_share)))
         
         # Estima tempo de processamento (baseado em 1 doc/segundo)
         estimated_time_minutes = pending_count / 60
@@ -324,74 +314,159 @@ class LLMService:
             estimated_processing_time_minutes=estimated_time_minutes
         )
     
+    async def iter_batch_analysis(self, documento_ids: List[int], max_concurrent: int = 3,
+                                  progress: Optional[BatchProgress] = None) -> AsyncIterator[DocumentAnalysis]:
+        """
+        Processa múltiplos documentos emitindo cada resultado assim que concluído
+        
+        Args:
+            documento_ids: Lista de IDs dos documentos
+            max_concurrent: Máximo de análises concorrentes
+            progress: Progresso a ser atualizado a cada resultado (opcional)
+            
+        Yields:
+            Resultado de cada documento, em ordem de conclusão
+        """
+        semaphore = asyncio.Semaphore(max_concurrent)
+        
+        # Documentos curtos são agrupados em uma requisição; os demais seguem individualmente
+        groups, singles = self._plan_packed_groups(documento_ids)
+        
+        async def analyze_with_semaphore(unit):
+            async with semaphore:
+                doc_ids = unit if isinstance(unit, list) else [unit]
+                try:
+                    if isinstance(unit, list):
+                        return await self.analyze_documents_packed(unit)
+                    return [await self.analyze_document(unit)]
+                except Exception as e:
+                    logger.error(f"Erro não tratado na análise: {e}")
+                    return [
+                        DocumentAnalysis(
+                            documento_id=doc_id,
+                            success=False,
+                            model_used=self.config.model,
+                            tokens_used=0,
+                            processing_time_seconds=0,
+                            cost_usd=Decimal("0"),
+                            processed_at=datetime.now(),
+                            error_message=str(e)
+                        )
+                        for doc_id in doc_ids
+                    ]
+        
+        tasks = [asyncio.ensure_future(analyze_with_semaphore(unit)) for unit in groups + singles]
+        
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                for result in await next_done:
+                    if progress:
+                        progress.record(result)
+                    yield result
+        finally:
+            # Consumidor interrompido (ex.: cliente desconectou): cancela o restante
+            for task in tasks:
+                task.cancel()
+    
     async def batch_analyze_documents(self, documento_ids: List[int], 
-                                    max_concurrent: int = 3) -> BatchLLMResult:
+                                    max_concurrent: int = 3,
+                                    progress: Optional[BatchProgress] = None) -> BatchLLMResult:
         """
         Processa múltiplos documentos em lote
         
         Args:
             documento_ids: Lista de IDs dos documentos
             max_concurrent: Máximo de análises concorrentes
+            progress: Progresso a ser atualizado a cada resultado (opcional)
             
         Returns:
             Resultado do lote
         """
         start_time = datetime.now()
-        results = []
         
-        # Processa em lotes menores para controlar concorrência
-        semaphore = asyncio.Semaphore(max_concurrent)
+        results = [
+            result async for result in self.iter_batch_analysis(documento_ids, max_concurrent, progress)
+        ]
         
-        async def analyze_with_semaphore(doc_id):
-            async with semaphore:
-                return await self.analyze_document(doc_id)
+        # Mantém a ordem dos IDs solicitados
+        order = {doc_id: i for i, doc_id in enumerate(documento_ids)}
+        results.sort(key=lambda r: order.get(r.documento_id, len(order)))
         
-        # Executa análises concorrentes
-        tasks = [analyze_with_semaphore(doc_id) for doc_id in documento_ids]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        successful = [r for r in results if r.success]
         
-        # Processa resultados
-        successful = 0
-        failed = 0
-        total_tokens = 0
-        total_cost = Decimal("0")
-        final_results = []
+        return BatchLLMResult(
+            total_documents=len(documento_ids),
+            successful_analyses=len(successful),
+            failed_analyses=len(results) - len(successful),
+            results=results,
+            total_tokens_used=sum(r.tokens_used for r in successful),
+            total_cost_usd=sum((r.cost_usd for r in successful), Decimal("0")),
+            started_at=start_time,
+            completed_at=datetime.now()
+        )
+    
+    async def analyze_documents_packed(self, documento_ids: List[int]) -> List[DocumentAnalysis]:
+        """
+        Analisa vários documentos curtos com uma única chamada ao LLM
         
-        for result in results:
-            if isinstance(result, Exception):
-                logger.error(f"Erro não tratado na análise: {result}")
-                failed += 1
-                # Cria resultado de erro
-                error_result = DocumentAnalysis(
-                    documento_id=0,
+        O bloco de instruções é enviado uma vez para todos os documentos, e a
+        resposta (array JSON) é separada e validada por documento. Documentos
+        ausentes ou inválidos na resposta são reprocessados individualmente.
+        
+        Args:
+            documento_ids: IDs dos documentos (curtos) a analisar juntos
+            
+        Returns:
+            Resultados na ordem dos IDs informados
+        """
+        start_time = time.time()
+        
+        rows = self.db.query(Documento.id, Documento.detalhamento_texto).filter(
+            Documento.id.in_(documento_ids),
+            Documento.detalhamento_texto.isnot(None)
+        ).all()
+        texts = {row.id: row.detalhamento_texto for row in rows if row.detalhamento_texto}
+        
+        packed_results = {}
+        if len(texts) > 1:
+            # Atualiza status para processando (um único comando)
+            self.db.query(Documento).filter(Documento.id.in_(list(texts))).update({
+                Documento.detalhamento_status: "processando",
+                Documento.detalhamento_data: datetime.now(),
+                Documento.detalhamento_modelo: self.config.model
+            }, synchronize_session=False)
+            self.db.commit()
+            
+            try:
+                packed_results = await self._process_packed_documents(texts)
+            except Exception as e:
+                logger.warning(f"Erro na análise agrupada, reprocessando individualmente: {str(e)}")
+        
+        results = []
+        for documento_id in documento_ids:
+            analysis_result = packed_results.get(documento_id)
+            if analysis_result is None:
+                results.append(await self.analyze_document(documento_id))
+                continue
+            
+            try:
+                results.append(await self._finalize_analysis(documento_id, analysis_result, start_time))
+            except Exception as e:
+                logger.error(f"Erro na análise do documento {documento_id}: {str(e)}")
+                self.db.rollback()
+                await self._update_document_status(documento_id, "erro", self.config.model)
+                results.append(DocumentAnalysis(
+                    documento_id=documento_id,
                     success=False,
                     model_used=self.config.model,
                     tokens_used=0,
-                    processing_time_seconds=0,
+                    processing_time_seconds=time.time() - start_time,
                     cost_usd=Decimal("0"),
                     processed_at=datetime.now(),
-                    error_message=str(result)
-                )
-                final_results.append(error_result)
-            else:
-                if result.success:
-                    successful += 1
-                    total_tokens += result.tokens_used
-                    total_cost += result.cost_usd
-                else:
-                    failed += 1
-                final_results.append(result)
+                    error_message=str(e)
+                ))
         
-        return BatchLLMResult(
-            total_documents=len(documento_ids),
-            successful_analyses=successful,
-            failed_analyses=failed,
-            results=final_results,
-            total_tokens_used=total_tokens,
-            total_cost_usd=total_cost,
-            started_at=start_time,
-            completed_at=datetime.now()
-        )
+        return results
     
     def get_llm_statistics(self) -> LLMStatistics:
         """
@@ -413,10 +488,18 @@ class LLMService:
             Documento.detalhamento_status == 'erro'
         ).count()
         
-        # Total de tokens usados
-        total_tokens = self.db.query(func.sum(Documento.detalhamento_tokens)).filter(
-            Documento.detalhamento_tokens.isnot(None)
-        ).scalar() or 0
+        # Tokens e custo reais, a partir dos agregados de telemetria
+        totals = self.telemetry.get_totals()
+        if totals["calls"]:
+            total_tokens = totals["prompt_tokens"] + totals["completion_tokens"]
+            total_cost = totals["cost_usd"]
+        else:
+            # Sem telemetria (análises anteriores a ela): estimativa pelos documentos
+            total_tokens = self.db.query(func.sum(Documento.detalhamento_tokens)).filter(
+                Documento.detalhamento_tokens.isnot(None)
+            ).scalar() or 0
+            total_cost = self.calculate_cost(input_tokens=int(total_tokens * 0.8), 
+                                           output_tokens=int(total_tokens * 0.2))
         
         # Modelo mais usado
         most_used_model = self.db.query(Documento.detalhamento_modelo).filter(
@@ -430,10 +513,6 @@ class LLMService:
             Documento.detalhamento_data.isnot(None)
         ).order_by(desc(Documento.detalhamento_data)).first()
         
-        # Calcula custo total estimado
-        total_cost = self.calculate_cost(input_tokens=int(total_tokens * 0.8), 
-                                       output_tokens=int(total_tokens * 0.2))
-        
         # Médias
         avg_tokens = float(total_tokens / processed_docs) if processed_docs > 0 else None
         avg_cost = total_cost / processed_docs if processed_docs > 0 else None
@@ -451,6 +530,21 @@ class LLMService:
             processing_percentage=float(processed_docs / total_docs * 100) if total_docs > 0 else 0
         )
     
+    def get_call_statistics(self, granularity: str = "hour", since: Optional[datetime] = None,
+                            model: Optional[str] = None) -> List[LLMCallBucketStats]:
+        """
+        Obtém a série temporal de uso e latência das chamadas ao LLM
+        
+        Args:
+            granularity: "hour" ou "day"
+            since: Início do período
+            model: Filtra por modelo
+            
+        Returns:
+            Estatísticas por intervalo, com latências p50/p95
+        """
+        return self.telemetry.get_bucket_statistics(granularity=granularity, since=since, model=model)
+    
     async def cleanup_failed_analyses(self) -> int:
         """
         Limpa análises falhadas ou travadas
@@ -535,17 +629,148 @@ class LLMService:
             result["prompt_tokens"] = response.usage.prompt_tokens
             result["completion_tokens"] = response.usage.completion_tokens
             
+            # Tokens de prompt servidos pelo cache do provedor, quando informado
+            details = getattr(response.usage, "prompt_tokens_details", None)
+            cached_tokens = getattr(details, "cached_tokens", 0) if details else 0
+            result["cached_tokens"] = cached_tokens if isinstance(cached_tokens, int) else 0
+            
             return result
         
         else:
             raise ValueError(f"Provider '{self.config.provider}' não suportado")
     
-    async def _process_single_chunk(self, text: str) -> Dict[str, Any]:
+    async def _call_llm_api_with_rate_limit(self, prompt: str, max_tokens: int = None,
+                                            documento_id: Optional[int] = None,
+                                            chunk_index: Optional[int] = None,
+                                            documentos_agrupados: int = 1) -> Dict[str, Any]:
+        """
+        Chama a API do LLM respeitando as cotas do modelo
+        
+        Reserva concorrência e tokens no rate limiter compartilhado, executa a
+        chamada fora do event loop e, em caso de throttling (HTTP 429), aguarda
+        com backoff exponencial e tenta novamente. Cada chamada gera um registro
+        de telemetria (tokens, latência, repetições e custo).
+        
+        Args:
+            prompt: Prompt para enviar
+            max_tokens: Máximo de tokens na resposta
+            documento_id: Documento analisado (None em chamadas agrupadas)
+            chunk_index: Índice do chunk, quando o documento foi dividido
+            documentos_agrupados: Número de documentos no prompt
+            
+        Returns:
+            Resultado da API
+        """
+        if max_tokens is None:
+            max_tokens = self.config.max_tokens
+        
+        # O provedor contabiliza max_tokens na cota de TPM; ~4 caracteres por token
+        estimated_tokens = len(prompt) // 4 + max_tokens
+        
+        telemetry = {
+            "documento_id": documento_id,
+            "chunk_index": chunk_index,
+            "documentos_agrupados": documentos_agrupados
+        }
+        
+        for attempt in range(self.config.rate_limit_max_retries + 1):
+            await self.rate_limiter.acquire(estimated_tokens)
+            
+            call_started = time.perf_counter()
+            try:
+                result = await asyncio.to_thread(self._call_llm_api, prompt, max_tokens)
+            except Exception as e:
+                latency = time.perf_counter() - call_started
+                if not is_throttling_error(e):
+                    self.rate_limiter.release(estimated_tokens)
+                    self._record_llm_call(latency, attempt, error=str(e), **telemetry)
+                    raise
+                
+                retry_after = self.rate_limiter.release(
+                    estimated_tokens, throttled=True, headers=getattr(e, "headers", None)
+                )
+                if attempt == self.config.rate_limit_max_retries:
+                    self._record_llm_call(latency, attempt, error=str(e), **telemetry)
+                    raise
+                
+                delay = self.rate_limiter.backoff_delay(attempt, retry_after)
+                logger.warning(f"Throttling do provedor (tentativa {attempt + 1}), aguardando {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            
+            self.rate_limiter.release(estimated_tokens, actual_tokens=result.get("tokens_used"))
+            self._record_llm_call(time.perf_counter() - call_started, attempt, result=result, **telemetry)
+            return result
+    
+    def _record_llm_call(self, latency_seconds: float, retries: int,
+                         result: Optional[Dict[str, Any]] = None, error: Optional[str] = None,
+                         documento_id: Optional[int] = None, chunk_index: Optional[int] = None,
+                         documentos_agrupados: int = 1):
+        """
+        Enfileira o registro de telemetria de uma chamada ao LLM
+        
+        Args:
+            latency_seconds: Latência da última tentativa
+            retries: Repetições por throttling antes do resultado
+            result: Resultado da API (None em caso de falha)
+            error: Mensagem de erro da chamada
+            documento_id: Documento analisado
+            chunk_index: Índice do chunk
+            documentos_agrupados: Número de documentos no prompt
+        """
+        result = result or {}
+        prompt_tokens = result.get("prompt_tokens") or 0
+        completion_tokens = result.get("completion_tokens") or 0
+        cost = self.calculate_cost(prompt_tokens, completion_tokens)
+        
+        model = self.config.model
+        LLM_REQUEST_SECONDS.labels(model=model, outcome="success" if error is None else "error").observe(latency_seconds)
+        LLM_TOKENS.labels(model=model, kind="prompt").inc(prompt_tokens)
+        LLM_TOKENS.labels(model=model, kind="completion").inc(completion_tokens)
+        LLM_COST_USD.labels(model=model).inc(float(cost))
+        
+        self._pending_telemetry.append({
+            "documento_id": documento_id,
+            "provider": self.config.provider,
+            "modelo": self.config.model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "latencia_ms": int(round(latency_seconds * 1000)),
+            "tentativas": retries,
+            "cache_hit": bool(result.get("cached_tokens")),
+            "chunk_index": chunk_index,
+            "documentos_agrupados": documentos_agrupados,
+            "custo_usd": cost,
+            "sucesso": error is None,
+            "erro": error,
+            "created_at": datetime.now()
+        })
+    
+    def _flush_telemetry(self):
+        """
+        Grava a telemetria pendente na transação corrente (sem commit)
+        
+        Falhas na gravação são registradas em log e não interrompem a análise.
+        """
+        if not self._pending_telemetry:
+            return
+        
+        calls, self._pending_telemetry = self._pending_telemetry, []
+        try:
+            with self.db.begin_nested():
+                self.telemetry.record_calls(calls)
+        except Exception as e:
+            logger.warning(f"Erro ao gravar telemetria de {len(calls)} chamadas ao LLM: {str(e)}")
+    
+    async def _process_single_chunk(self, text: str, documento_id: Optional[int] = None,
+                                    chunk_index: Optional[int] = None) -> Dict[str, Any]:
         """
         Processa um único chunk de texto
         
         Args:
             text: Texto para processar
+            documento_id: Documento de origem (telemetria)
+            chunk_index: Índice do chunk no documento (telemetria)
             
         Returns:
             Resultado do processamento
@@ -575,7 +800,9 @@ class LLMService:
         """
         
         try:
-            result = self._call_llm_api(prompt)
+            result = await self._call_llm_api_with_rate_limit(
+                prompt, documento_id=documento_id, chunk_index=chunk_index
+            )
             
             if self._validate_llm_response(result):
                 result["success"] = True
@@ -589,12 +816,146 @@ class LLMService:
             logger.error(f"Erro no processamento: {str(e)}")
             return {"success": False, "error": str(e)}
     
-    async def _process_document_chunks(self, text: str) -> Dict[str, Any]:
+    def _plan_packed_groups(self, documento_ids: List[int]):
+        """
+        Agrupa documentos curtos para análise em uma única requisição
+        
+        Args:
+            documento_ids: IDs dos documentos do lote
+            
+        Returns:
+            Tupla (grupos de IDs a empacotar, IDs a processar individualmente)
+        """
+        if not self.config.pack_short_documents or len(documento_ids) < 2:
+            return [], list(documento_ids)
+        
+        # Apenas os tamanhos: os textos são carregados na análise
+        lengths = dict(self.db.query(Documento.id, func.length(Documento.detalhamento_texto)).filter(
+            Documento.id.in_(documento_ids),
+            Documento.detalhamento_texto.isnot(None)
+        ).all())
+        
+        groups = []
+        singles = []
+        current = []
+        current_chars = 0
+        
+        for doc_id in documento_ids:
+            length = lengths.get(doc_id)
+            if not length or length > self.config.packing_max_document_chars:
+                singles.append(doc_id)
+                continue
+            
+            if current and (len(current) >= self.config.packing_max_documents or
+                            current_chars + length > self.config.chunk_size):
+                groups.append(current)
+                current = []
+                current_chars = 0
+            
+            current.append(doc_id)
+            current_chars += length
+        
+        if current:
+            groups.append(current)
+        
+        # Grupos de um só documento seguem o caminho normal
+        singles.extend(group[0] for group in groups if len(group) == 1)
+        return [group for group in groups if len(group) > 1], singles
+    
+    async def _process_packed_documents(self, texts: Dict[int, str]) -> Dict[int, Dict[str, Any]]:
+        """
+        Processa vários documentos curtos em um único prompt
+        
+        Args:
+            texts: Texto de cada documento, por ID
+            
+        Returns:
+            Resultado validado por ID (documentos ausentes ou inválidos são omitidos)
+        """
+        documents_block = "\n\n".join(
+            f"=== DOCUMENTO {doc_id} ===\n{text}\n=== FIM DOCUMENTO {doc_id} ==="
+            for doc_id, text in texts.items()
+        )
+        
+        prompt = f"""
+        Analise cada um dos documentos administrativos abaixo, delimitados por
+        "=== DOCUMENTO <id> ===" e "=== FIM DOCUMENTO <id> ===". Analise cada
+        documento de forma independente.
+
+        {documents_block}
+
+        Para cada documento, retorne:
+        1. O id do documento (id)
+        2. Um resumo executivo do documento (summary)
+        3. Entidades relevantes extraídas (entities)
+        4. Tags de classificação apropriadas (tags)
+        5. Nível de confiança da análise (confidence)
+
+        Retorne APENAS um JSON válido com um item por documento, no formato:
+        {{
+            "documents": [
+                {{
+                    "id": 123,
+                    "summary": "Resumo executivo do documento...",
+                    "entities": [
+                        {{"type": "PESSOA", "value": "Nome da Pessoa", "confidence": 0.95}}
+                    ],
+                    "tags": ["despacho", "administrativo"],
+                    "confidence": 0.92
+                }}
+            ]
+        }}
+        """
+        
+        result = await self._call_llm_api_with_rate_limit(prompt, documentos_agrupados=len(texts))
+        
+        items = result.get("documents")
+        if not isinstance(items, list):
+            logger.warning("Resposta agrupada do LLM sem array 'documents'")
+            return {}
+        
+        # Tokens da chamada são rateados proporcionalmente ao tamanho de cada documento
+        total_chars = sum(len(text) for text in texts.values()) or 1
+        prompt_tokens = result.get("prompt_tokens", 0)
+        completion_tokens = result.get("completion_tokens", 0)
+        
+        parsed = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            try:
+                doc_id = int(item.get("id"))
+            except (TypeError, ValueError):
+                continue
+            
+            if doc_id not in texts or doc_id in parsed or not self._validate_llm_response(item):
+                continue
+            
+            share = len(texts[doc_id]) / total_chars
+            doc_prompt_tokens = int(round(prompt_tokens * share))
+            doc_completion_tokens = int(round(completion_tokens * share))
+            
+            parsed[doc_id] = {
+                "summary": item["summary"],
+                "entities": item["entities"],
+                "tags": item["tags"],
+                "confidence": item["confidence"],
+                "success": True,
+                "full_text": texts[doc_id],
+                "prompt_tokens": doc_prompt_tokens,
+                "completion_tokens": doc_completion_tokens,
+                "total_tokens": doc_prompt_tokens + doc_completion_tokens
+            }
+        
+        return parsed
+    
+    async def _process_document_chunks(self, text: str, documento_id: Optional[int] = None) -> Dict[str, Any]:
         """
         Processa documento dividido em chunks
         
         Args:
             text: Texto completo do documento
+            documento_id: Documento de origem (telemetria)
             
         Returns:
             Resultado consolidado
@@ -605,24 +966,27 @@ class LLMService:
         if len(chunks) > self.config.max_chunks_per_document:
             chunks = chunks[:self.config.max_chunks_per_document]
         
-        # Processa cada chunk
+        # Processa chunks concorrentemente; o ritmo é controlado pelo rate limiter
+        results = await asyncio.gather(
+            *(self._process_single_chunk(chunk, documento_id=documento_id, chunk_index=i)
+              for i, chunk in enumerate(chunks)),
+            return_exceptions=True
+        )
+        
         chunk_results = []
         total_tokens = 0
+        prompt_tokens = 0
+        completion_tokens = 0
         
-        for i, chunk in enumerate(chunks):
-            try:
-                result = await self._process_single_chunk(chunk)
-                if result["success"]:
-                    chunk_results.append(result)
-                    total_tokens += result.get("total_tokens", 0)
-                
-                # Pequeno delay para evitar rate limiting
-                if i < len(chunks) - 1:
-                    await asyncio.sleep(0.5)
-                    
-            except Exception as e:
-                logger.warning(f"Erro no chunk {i}: {str(e)}")
+        for i, result in enumerate(results):
+            if isinstance(result, Exception):
+                logger.warning(f"Erro no chunk {i}: {str(result)}")
                 continue
+            if result["success"]:
+                chunk_results.append(result)
+                total_tokens += result.get("total_tokens", 0)
+                prompt_tokens += result.get("prompt_tokens", 0)
+                completion_tokens += result.get("completion_tokens", 0)
         
         if not chunk_results:
             return {"success": False, "error": "Nenhum chunk processado com sucesso"}
@@ -632,8 +996,8 @@ class LLMService:
         consolidated["success"] = True
         consolidated["full_text"] = text
         consolidated["total_tokens"] = total_tokens
-        consolidated["prompt_tokens"] = int(total_tokens * 0.8)  # Estimativa
-        consolidated["completion_tokens"] = int(total_tokens * 0.2)  # Estimativa
+        consolidated["prompt_tokens"] = prompt_tokens
+        consolidated["completion_tokens"] = completion_tokens
         
         return consolidated
     
@@ -748,43 +1112,53 @@ class LLMService:
         """
         Salva resultados da análise no banco
         
+        Busca as tags e entidades já existentes do documento em uma consulta
+        cada e insere apenas a diferença em lote. Não faz commit: o commit é
+        feito junto com a atualização de status do documento.
+        
         Args:
             documento_id: ID do documento
             analysis_result: Resultado da análise
         """
-        # Salva tags
+        # Tags já existentes (uma única consulta)
+        existing_tags = {
+            row.tag for row in self.db.query(DocumentoTag.tag).filter(
+                DocumentoTag.documento_id == documento_id
+            )
+        }
+        
+        new_tags = []
         for tag_name in analysis_result.get("tags", []):
-            existing_tag = self.db.query(DocumentoTag).filter(
-                DocumentoTag.documento_id == documento_id,
-                DocumentoTag.tag == tag_name
-            ).first()
-            
-            if not existing_tag:
-                tag = DocumentoTag(
-                    documento_id=documento_id,
-                    tag=tag_name,
-                    origem="llm"
-                )
-                self.db.add(tag)
+            if tag_name not in existing_tags:
+                existing_tags.add(tag_name)
+                new_tags.append({
+                    "documento_id": documento_id,
+                    "tag": tag_name,
+                    "origem": "llm"
+                })
+        
+        # Entidades já existentes (uma única consulta)
+        existing_entities = {
+            (row.tipo_entidade, row.valor) for row in self.db.query(
+                DocumentoEntidade.tipo_entidade, DocumentoEntidade.valor
+            ).filter(DocumentoEntidade.documento_id == documento_id)
+        }
         
-        # Salva entidades
+        new_entities = []
         for entity in analysis_result.get("entities", []):
-            existing_entity = self.db.query(DocumentoEntidade).filter(
-                DocumentoEntidade.documento_id == documento_id,
-                DocumentoEntidade.tipo_entidade == entity["type"],
-                DocumentoEntidade.valor == entity["value"]
-            ).first()
-            
-            if not existing_entity:
-                entidade = DocumentoEntidade(
-                    documento_id=documento_id,
-                    tipo_entidade=entity["type"],
-                    valor=entity["value"],
-                    confianca=Decimal(str(entity.get("confidence", 0)))
-                )
-                self.db.add(entidade)
-        
-        self.db.commit()
+            entity_key = (entity["type"], entity["value"])
+            if entity_key not in existing_entities:
+                existing_entities.add(entity_key)
+                new_entities.append({
+                    "documento_id": documento_id,
+                    "tipo_entidade": entity["type"],
+                    "valor": entity["value"],
+                    "confianca": Decimal(str(entity.get("confidence", 0)))
+                })
+        
+        # Inserção em lote; conflitos em uq_documento_tag (análises concorrentes) são ignorados
+        bulk_insert_ignore(self.db, DocumentoTag, new_tags)
+        bulk_insert_ignore(self.db, DocumentoEntidade, new_entities)
     
     async def _update_document_status(self, documento_id: int, status: str, 
                                     model: str, tokens: int = None):
@@ -797,6 +1171,9 @@ class LLMService:
             model: Modelo usado
             tokens: Tokens usados (opcional)
         """
+        has_telemetry = bool(self._pending_telemetry)
+        self._flush_telemetry()
+        
         documento = self.db.query(Documento).filter(Documento.id == documento_id).first()
         if documento:
             documento.detalhamento_status = status
@@ -804,9 +1181,55 @@ class LLMService:
             documento.detalhamento_modelo = model
             if tokens:
                 documento.detalhamento_tokens = tokens
-            
+        
+        if documento or has_telemetry:
             self.db.commit()
     
+    async def _finalize_analysis(self, documento_id: int, analysis_result: Dict[str, Any],
+                                 start_time: float) -> DocumentAnalysis:
+        """
+        Persiste uma análise bem-sucedida e monta o resultado
+        
+        Args:
+            documento_id: ID do documento
+            analysis_result: Resultado validado do LLM para o documento
+            start_time: Início do processamento (time.time())
+            
+        Returns:
+            Resultado da análise
+        """
+        # Calcula custo
+        cost = self.calculate_cost(
+            input_tokens=analysis_result["prompt_tokens"],
+            output_tokens=analysis_result["completion_tokens"]
+        )
+        
+        # Salva entidades e tags e atualiza status para concluído (mesma transação)
+        await self._save_analysis_results(documento_id, analysis_result)
+        await self._update_document_status(
+            documento_id, 
+            "concluido", 
+            self.config.model, 
+            tokens=analysis_result["total_tokens"]
+        )
+        
+        processing_time = time.time() - start_time
+        
+        return DocumentAnalysis(
+            documento_id=documento_id,
+            success=True,
+            analysis_text=analysis_result.get("full_text"),
+            summary=analysis_result.get("summary"),
+            extracted_entities=analysis_result.get("entities", []),
+            generated_tags=analysis_result.get("tags", []),
+            confidence_score=Decimal(str(analysis_result.get("confidence", 0))),
+            model_used=self.config.model,
+            tokens_used=analysis_result["total_tokens"],
+            processing_time_seconds=processing_time,
+            cost_usd=cost,
+            processed_at=datetime.now()
+        )
+    
     def _get_average_tokens_per_document(self) -> int:
         """
         Obtém média de tokens por documento processado
@@ -818,4 +1241,20 @@ class LLMService:
             Documento.detalhamento_tokens.isnot(None)
         ).scalar()
         
-        return int(avg_tokens) if avg_tokens else 0 
\ No newline at end of file
+        return int(avg_tokens) if avg_tokens else 0 
+    
+    def _get_input_token_share(self) -> float:
+        """
+        Obtém a fração de tokens de entrada observada na telemetria
+        
+        Returns:
+            Fração de tokens de prompt (0.8 se ainda não houver telemetria)
+        """
+        row = self.db.query(
+            func.sum(LLMChamadaAgregada.prompt_tokens),
+            func.sum(LLMChamadaAgregada.completion_tokens)
+        ).one()
+        prompt_tokens = int(row[0] or 0)
+        total_tokens = prompt_tokens + int(row[1] or 0)
+        
+        return prompt_tokens / total_tokens if total_tokens else 0.8
@@ -0,0 +1,255 @@
+"""
+Telemetria de custo e latência das chamadas ao LLM
+"""
+import json
+import logging
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import insert, func
+from sqlalchemy.orm import Session
+
+from app.database.bulk import bulk_insert_ignore
+from app.models.processo import LLMChamada, LLMChamadaAgregada
+from app.models.schemas import LLMCallBucketStats
+
+logger = logging.getLogger(__name__)
+
+# Limites superiores (ms) das faixas do histograma de latência; a última faixa
+# acumula tudo acima do maior limite
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+GRANULARITIES = ("hour", "day")
+
+
+def latency_bucket_index(latency_ms: float) -> int:
+    """
+    Índice da faixa do histograma para uma latência
+
+    Args:
+        latency_ms: Latência em milissegundos
+
+    Returns:
+        Índice em LATENCY_BUCKETS_MS (len(LATENCY_BUCKETS_MS) = acima do maior limite)
+    """
+    return bisect_left(LATENCY_BUCKETS_MS, latency_ms)
+
+
+def histogram_percentile(histogram: Sequence[int], quantile: float) -> Optional[float]:
+    """
+    Estima um percentil a partir do histograma de latência
+
+    Interpola linearmente dentro da faixa que contém o percentil.
+
+    Args:
+        histogram: Contagens por faixa (len(LATENCY_BUCKETS_MS) + 1 posições)
+        quantile: Quantil desejado (0.5 = p50, 0.95 = p95)
+
+    Returns:
+        Latência estimada em ms ou None se o histograma estiver vazio
+    """
+    total = sum(histogram)
+    if total == 0:
+        return None
+
+    target = quantile * total
+    cumulative = 0
+    for index, count in enumerate(histogram):
+        if count and cumulative + count >= target:
+            lower = LATENCY_BUCKETS_MS[index - 1] if index > 0 else 0
+            upper = LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else lower * 2
+            return lower + (upper - lower) * (target - cumulative) / count
+        cumulative += count
+
+    return float(LATENCY_BUCKETS_MS[-1] * 2)
+
+
+def truncate_to_bucket(moment: datetime, granularity: str = "hour") -> datetime:
+    """
+    Trunca um instante para o início do seu bucket de tempo
+
+    Args:
+        moment: Instante
+        granularity: "hour" ou "day"
+
+    Returns:
+        Início do bucket
+    """
+    if granularity == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _empty_histogram() -> List[int]:
+    return [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+
+def _load_histogram(raw: Optional[str]) -> List[int]:
+    histogram = _empty_histogram()
+    if raw:
+        for index, count in enumerate(json.loads(raw)[:len(histogram)]):
+            histogram[index] = int(count)
+    return histogram
+
+
+class LLMTelemetryService:
+    """Registro por chamada e agregados horários da telemetria de LLM"""
+
+    def __init__(self, db_session: Session):
+        """
+        Inicializa o serviço de telemetria
+
+        Args:
+            db_session: Sessão do banco de dados
+        """
+        self.db = db_session
+
+    def record_calls(self, calls: List[Dict[str, Any]]):
+        """
+        Persiste chamadas e incrementa os agregados horários
+
+        Não faz commit: os registros participam da transação corrente.
+
+        Args:
+            calls: Dicionários com as colunas de LLMChamada (created_at obrigatório)
+        """
+        if not calls:
+            return
+
+        self.db.execute(insert(LLMChamada), calls)
+
+        # Consolida as chamadas por (hora, modelo) antes de tocar os agregados
+        rollups: Dict[tuple, Dict[str, Any]] = {}
+        for call in calls:
+            key = (truncate_to_bucket(call["created_at"]), call["modelo"])
+            rollup = rollups.get(key)
+            if rollup is None:
+                rollup = rollups[key] = {
+                    "chamadas": 0, "falhas": 0, "tentativas": 0, "cache_hits": 0,
+                    "prompt_tokens": 0, "completion_tokens": 0, "custo_usd": Decimal("0"),
+                    "latencia_total_ms": 0, "histograma": _empty_histogram()
+                }
+            rollup["chamadas"] += 1
+            rollup["falhas"] += 0 if call.get("sucesso", True) else 1
+            rollup["tentativas"] += call.get("tentativas") or 0
+            rollup["cache_hits"] += 1 if call.get("cache_hit") else 0
+            rollup["prompt_tokens"] += call.get("prompt_tokens") or 0
+            rollup["completion_tokens"] += call.get("completion_tokens") or 0
+            rollup["custo_usd"] += Decimal(str(call.get("custo_usd") or 0))
+            rollup["latencia_total_ms"] += call["latencia_ms"]
+            rollup["histograma"][latency_bucket_index(call["latencia_ms"])] += 1
+
+        # Garante a existência das linhas (ignora as já criadas) e as bloqueia
+        # para o incremento, evitando corrida entre processos
+        bulk_insert_ignore(self.db, LLMChamadaAgregada, [
+            {"bucket_inicio": bucket, "modelo": modelo, "latencia_histograma": json.dumps(_empty_histogram())}
+            for bucket, modelo in rollups
+        ])
+        existing = self.db.query(LLMChamadaAgregada).filter(
+            LLMChamadaAgregada.bucket_inicio.in_({bucket for bucket, _ in rollups}),
+            LLMChamadaAgregada.modelo.in_({modelo for _, modelo in rollups})
+        ).with_for_update().populate_existing().all()
+
+        for row in existing:
+            rollup = rollups.get((row.bucket_inicio, row.modelo))
+            if rollup is None:
+                continue
+            row.chamadas = (row.chamadas or 0) + rollup["chamadas"]
+            row.falhas = (row.falhas or 0) + rollup["falhas"]
+            row.tentativas = (row.tentativas or 0) + rollup["tentativas"]
+            row.cache_hits = (row.cache_hits or 0) + rollup["cache_hits"]
+            row.prompt_tokens = (row.prompt_tokens or 0) + rollup["prompt_tokens"]
+            row.completion_tokens = (row.completion_tokens or 0) + rollup["completion_tokens"]
+            row.custo_usd = Decimal(str(row.custo_usd or 0)) + rollup["custo_usd"]
+            row.latencia_total_ms = (row.latencia_total_ms or 0) + rollup["latencia_total_ms"]
+            histogram = _load_histogram(row.latencia_histograma)
+            row.latencia_histograma = json.dumps(
+                [a + b for a, b in zip(histogram, rollup["histograma"])]
+            )
+
+        self.db.flush()
+
+    def get_totals(self) -> Dict[str, Any]:
+        """
+        Totais de uso a partir dos agregados
+
+        Returns:
+            Dicionário com chamadas, tokens e custo acumulados
+        """
+        row = self.db.query(
+            func.sum(LLMChamadaAgregada.chamadas),
+            func.sum(LLMChamadaAgregada.falhas),
+            func.sum(LLMChamadaAgregada.prompt_tokens),
+            func.sum(LLMChamadaAgregada.completion_tokens),
+            func.sum(LLMChamadaAgregada.custo_usd)
+        ).one()
+
+        return {
+            "calls": int(row[0] or 0),
+            "failed_calls": int(row[1] or 0),
+            "prompt_tokens": int(row[2] or 0),
+            "completion_tokens": int(row[3] or 0),
+            "cost_usd": Decimal(str(row[4] or 0))
+        }
+
+    def get_bucket_statistics(self, granularity: str = "hour", since: Optional[datetime] = None,
+                              model: Optional[str] = None) -> List[LLMCallBucketStats]:
+        """
+        Série temporal de uso e latência (p50/p95) das chamadas
+
+        Args:
+            granularity: "hour" ou "day"
+            since: Início do período (inclusive)
+            model: Filtra por modelo (padrão: todos os modelos somados)
+
+        Returns:
+            Estatísticas por bucket, em ordem cronológica
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Granularidade inválida: {granularity}")
+
+        query = self.db.query(LLMChamadaAgregada)
+        if since is not None:
+            query = query.filter(LLMChamadaAgregada.bucket_inicio >= truncate_to_bucket(since))
+        if model:
+            query = query.filter(LLMChamadaAgregada.modelo == model)
+
+        merged: Dict[datetime, Dict[str, Any]] = defaultdict(lambda: {
+            "calls": 0, "failed_calls": 0, "retries": 0, "cache_hits": 0,
+            "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": Decimal("0"),
+            "latency_total_ms": 0, "histogram": _empty_histogram()
+        })
+        for row in query.all():
+            bucket = merged[truncate_to_bucket(row.bucket_inicio, granularity)]
+            bucket["calls"] += row.chamadas or 0
+            bucket["failed_calls"] += row.falhas or 0
+            bucket["retries"] += row.tentativas or 0
+            bucket["cache_hits"] += row.cache_hits or 0
+            bucket["prompt_tokens"] += row.prompt_tokens or 0
+            bucket["completion_tokens"] += row.completion_tokens or 0
+            bucket["cost_usd"] += Decimal(str(row.custo_usd or 0))
+            bucket["latency_total_ms"] += row.latencia_total_ms or 0
+            bucket["histogram"] = [
+                a + b for a, b in zip(bucket["histogram"], _load_histogram(row.latencia_histograma))
+            ]
+
+        return [
+            LLMCallBucketStats(
+                bucket_start=bucket_start,
+                model=model,
+                calls=data["calls"],
+                failed_calls=data["failed_calls"],
+                retries=data["retries"],
+                cache_hits=data["cache_hits"],
+                prompt_tokens=data["prompt_tokens"],
+                completion_tokens=data["completion_tokens"],
+                total_cost_usd=data["cost_usd"],
+                average_latency_ms=data["latency_total_ms"] / data["calls"] if data["calls"] else None,
+                p50_latency_ms=histogram_percentile(data["histogram"], 0.5),
+                p95_latency_ms=histogram_percentile(data["histogram"], 0.95)
+            )
+            for bucket_start, data in sorted(merged.items())
+        ]
@@ -3,53 +3,73 @@ Serviço para persistência incremental de processos
 """
 import logging
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterable, Callable, List, Optional, Any, Set, Tuple, Union
+import numpy as np
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
-from app.models.processo import Processo, Autuacao, Documento, Andamento
+from app.metrics import PERSISTENCE_ROWS_INSERTED
+from app.models.processo import Processo, Autuacao, Documento, Andamento, ProcessoFingerprint
+from app.models.rows import AndamentoRow, AutuacaoRow, DocumentoRow, ProcessoRows
 from app.models.schemas import (
     ProcessoData, ProcessoResult, AutuacaoData, DocumentoData, AndamentoData,
-    ChangesSummary
+    ChangesSummary, ProcessoDigest
 )
-from app.services.change_detection import ChangeDetectionService
+from app.services.change_detection import (
+    ChangeDetectionService, andamento_fingerprint, documento_fingerprint,
+    fingerprint_array, pack_fingerprints, unpack_fingerprints
+)
+from app.services.document_download import count_new_documentos
+from app.observability import span
 
 logger = logging.getLogger(__name__)
 
+# Andamentos mais recentes consultados no caminho rápido (histórico append-only)
+ANDAMENTOS_TAIL_WINDOW = 32
+
+# Linhas por merge na persistência em streaming
+STREAM_BATCH_SIZE = 500
+
 
 class ProcessoPersistenceService:
     """Serviço para persistência incremental de processos"""
     
-    def __init__(self, db_session: Session):
+    def __init__(self, db_session: Session,
+                 on_new_documentos: Optional[Callable[[List[int]], Any]] = None):
         """
         Inicializa o serviço
         
         Args:
             db_session: Sessão do banco de dados
+            on_new_documentos: Chamado com os IDs dos documentos inseridos,
+                logo após o commit de cada merge
         """
         self.db = db_session
         self.change_service = ChangeDetectionService()
+        self.on_new_documentos = on_new_documentos
     
-    async def save_processo_data(self, processo_data: ProcessoData, url: str = "") -> ProcessoResult:
+    async def save_processo_data(self, processo_data: Union[ProcessoRows, ProcessoData], url: str = "") -> ProcessoResult:
         """
         Salva dados do processo de forma incremental
         
         Args:
-            processo_data: Dados do processo extraídos
+            processo_data: Dados do processo extraídos (linhas do scraper ou schema da API)
             
         Returns:
             Resultado da operação de persistência
         """
         try:
-            # Busca processo existente
-            existing_processo = self._find_existing_processo(processo_data.autuacao.numero_sei)
-            
-            if existing_processo:
-                # Atualiza processo existente
-                return await self._update_existing_processo(existing_processo, processo_data, url)
-            else:
-                # Cria novo processo
-                return await self._create_new_processo(processo_data, url)
+            with span("persist", numero_sei=processo_data.autuacao.numero_sei):
+                # Busca processo existente
+                existing_processo = self._find_existing_processo(processo_data.autuacao.numero_sei)
+                
+                if existing_processo:
+                    # Atualiza processo existente
+                    return await self._update_existing_processo(existing_processo, processo_data, url)
+                else:
+                    # Cria novo processo
+                    return await self._create_new_processo(processo_data, url)
                 
         except IntegrityError as e:
             logger.error(f"Erro de integridade ao salvar processo: {e}")
@@ -73,6 +93,118 @@ class ProcessoPersistenceService:
                 error_message=f"Database error: {str(e)}"
             )
     
+    async def save_processo_stream(self, rows: AsyncIterable[Union[AutuacaoRow, DocumentoRow, AndamentoRow]],
+                                   url: str = "", batch_size: int = STREAM_BATCH_SIZE) -> ProcessoResult:
+        """
+        Salva um processo recebido em streaming (SEIScraper.stream_processo)
+        
+        O processo é criado ou atualizado assim que a autuação chega e os
+        documentos e andamentos são mesclados em lotes, então a persistência
+        (e on_new_documentos) começa antes do fim do download. Só os
+        fingerprints ficam em memória para gravar o digest no final; se o
+        stream falhar no meio, o digest fica vazio e a próxima atualização
+        faz o diff completo.
+        
+        Args:
+            rows: Autuação, documentos e andamentos na ordem da página
+            url: URL do processo
+            batch_size: Linhas por merge
+            
+        Returns:
+            Resultado da operação de persistência
+        """
+        processo: Optional[Processo] = None
+        processo_id: Optional[int] = None
+        autuacao: Optional[AutuacaoData] = None
+        created = updated = False
+        documentos: List[DocumentoRow] = []
+        andamentos: List[AndamentoRow] = []
+        documento_keys: List[Tuple[int, str, int]] = []
+        andamento_keys: List[Tuple[datetime, int]] = []
+        doc_count = and_count = 0
+        
+        async def flush_documentos():
+            nonlocal doc_count
+            if processo is not None and documentos:
+                with span("persist", secao="documentos", linhas=len(documentos)):
+                    doc_count += await self.merge_documentos(processo.id, documentos)
+                documentos.clear()
+        
+        async def flush_andamentos():
+            nonlocal and_count
+            if processo is not None and andamentos:
+                with span("persist", secao="andamentos", linhas=len(andamentos)):
+                    and_count += await self.merge_andamentos(processo.id, andamentos)
+                andamentos.clear()
+        
+        try:
+            async for row in rows:
+                if isinstance(row, (AutuacaoRow, AutuacaoData)):
+                    autuacao = row
+                    processo = self._find_existing_processo(row.numero_sei)
+                    if processo is None:
+                        created = True
+                        result = await self._create_new_processo(
+                            ProcessoRows(autuacao=row), url
+                        )
+                        processo = self.db.get(Processo, result.processo_id)
+                    else:
+                        updated = self._apply_autuacao(processo, row)
+                    processo_id = processo.id
+                    # Digest inválido até o fim do stream
+                    processo.hash_conteudo = None
+                    processo.digest_secoes = None
+                    self.db.commit()
+                elif isinstance(row, (DocumentoRow, DocumentoData)):
+                    if row.numero_documento:
+                        documento_keys.append(
+                            (len(row.numero_documento), row.numero_documento,
+                             documento_fingerprint(row.numero_documento))
+                        )
+                    documentos.append(row)
+                    if len(documentos) >= batch_size:
+                        await flush_documentos()
+                else:
+                    # Fim da tabela de documentos: libera os downloads antes dos andamentos
+                    await flush_documentos()
+                    andamento_keys.append((row.data_hora, andamento_fingerprint(row.data_hora, row.descricao)))
+                    andamentos.append(row)
+                    if len(andamentos) >= batch_size:
+                        await flush_andamentos()
+            
+            if processo is None:
+                raise ValueError("Stream sem autuação")
+            await flush_documentos()
+            await flush_andamentos()
+            
+            with span("persist", secao="digest"):
+                documento_keys.sort()
+                andamento_keys.sort()
+                digest = self.change_service.build_processo_digest(
+                    autuacao, [key[2] for key in documento_keys], [key[1] for key in andamento_keys]
+                )
+                processo.hash_conteudo = digest.root
+                processo.digest_secoes = digest.model_dump_json()
+                self.db.commit()
+            
+        except (IntegrityError, SQLAlchemyError) as e:
+            logger.error(f"Erro de banco de dados ao salvar processo em streaming: {e}")
+            self.db.rollback()
+            return ProcessoResult(success=False, error_message=f"Database error: {str(e)}")
+        except Exception as e:
+            logger.error(f"Erro ao salvar processo em streaming: {e}")
+            self.db.rollback()
+            return ProcessoResult(success=False, processo_id=processo_id, error_message=str(e))
+        
+        return ProcessoResult(
+            success=True,
+            processo_id=processo_id,
+            was_updated=not created,
+            changes_detected=(1 if created or updated else 0) + doc_count + and_count,
+            changes=ChangesSummary(new_documentos=doc_count, new_andamentos=and_count,
+                                   updated_autuacao=created or updated)
+        )
+    
     async def get_last_update(self, processo_id: int) -> Optional[datetime]:
         """
         Retorna última atualização do processo
@@ -86,10 +218,15 @@ class ProcessoPersistenceService:
         processo = self.db.query(Processo).filter(Processo.id == processo_id).first()
         return processo.updated_at if processo else None
     
-    async def merge_andamentos(self, processo_id: int, andamentos: List[AndamentoData]) -> int:
+    async def merge_andamentos(self, processo_id: int, andamentos: List[Union[AndamentoRow, AndamentoData]]) -> int:
         """
         Mescla andamentos evitando duplicatas
         
+        Como o histórico do SEI é append-only, tenta primeiro o caminho rápido
+        (_detect_new_andamentos_by_tail), que consulta apenas os andamentos
+        mais recentes. Se houver lacuna, compara com os fingerprints
+        persistidos do processo (diferença de conjuntos de inteiros).
+        
         Args:
             processo_id: ID do processo
             andamentos: Lista de novos andamentos
@@ -100,49 +237,112 @@ class ProcessoPersistenceService:
         if not andamentos:
             return 0
         
-        # Busca andamentos existentes
-        existing_andamentos = self.db.query(Andamento).filter(
-            Andamento.processo_id == processo_id
-        ).all()
-        
-        # Converte para formato dict para comparação
-        existing_dicts = [
-            {
-                'data_hora': a.data_hora,
-                'descricao': a.descricao,
-                'unidade': a.unidade
-            }
-            for a in existing_andamentos
-        ]
-        
-        # Detecta novos andamentos
-        current_dicts = [a.model_dump() for a in andamentos]
-        new_andamentos = self.change_service.detect_new_andamentos(current_dicts, existing_dicts)
-        
-        if not new_andamentos:
-            return 0
+        current_fps = [andamento_fingerprint(a.data_hora, a.descricao) for a in andamentos]
+        new_indices = self._detect_new_andamentos_by_tail(processo_id, andamentos, current_fps)
+        
+        if new_indices is not None:
+            if not new_indices:
+                return 0
+            self._append_fingerprints(processo_id, "andamentos", Andamento, [current_fps[i] for i in new_indices])
+        else:
+            snapshot, stored_fps, total = self._load_fingerprints(
+                processo_id, "andamentos", Andamento,
+                lambda row: andamento_fingerprint(row.data_hora, row.descricao),
+                Andamento.data_hora, Andamento.descricao
+            )
+            
+            new_indices = self.change_service.select_new_indices(current_fps, stored_fps)
+            if not new_indices:
+                return 0
+            
+            self._save_fingerprints(
+                snapshot, processo_id, "andamentos",
+                np.union1d(stored_fps, [current_fps[i] for i in new_indices]), total + len(new_indices)
+            )
         
         # Cria objetos Andamento
         andamento_objects = []
-        for and_data in new_andamentos:
+        for index in new_indices:
+            and_data = andamentos[index]
             andamento = Andamento(
                 processo_id=processo_id,
-                data_hora=and_data['data_hora'],
-                descricao=and_data.get('descricao'),
-                unidade=and_data.get('unidade')
+                data_hora=and_data.data_hora,
+                descricao=and_data.descricao,
+                unidade=and_data.unidade
             )
             andamento_objects.append(andamento)
         
-        # Insere no banco
+        # Insere no banco junto com os fingerprints atualizados
         self.db.add_all(andamento_objects)
         self.db.commit()
         
+        PERSISTENCE_ROWS_INSERTED.labels(secao="andamentos").inc(len(andamento_objects))
         return len(andamento_objects)
     
-    async def merge_documentos(self, processo_id: int, documentos: List[DocumentoData]) -> int:
+    def _detect_new_andamentos_by_tail(self, processo_id: int, andamentos: List[AndamentoData],
+                                       current_fps: List[int]) -> Optional[List[int]]:
+        """
+        Caminho rápido: detecta andamentos novos a partir do fim do histórico
+        
+        Busca só os ANDAMENTOS_TAIL_WINDOW andamentos armazenados mais recentes
+        (índice em processo_id, data_hora) e percorre os extraídos do mais
+        novo para o mais antigo, parando no primeiro andamento já conhecido.
+        
+        Args:
+            processo_id: ID do processo
+            andamentos: Andamentos extraídos
+            current_fps: Fingerprints dos andamentos extraídos (mesma ordem)
+            
+        Returns:
+            Índices dos andamentos novos, ou None se for preciso o diff completo
+            (processo sem andamentos, lacuna ou janela insuficiente)
+        """
+        tail = self.db.query(Andamento.data_hora, Andamento.unidade, Andamento.descricao).filter(
+            Andamento.processo_id == processo_id
+        ).order_by(Andamento.data_hora.desc()).limit(ANDAMENTOS_TAIL_WINDOW).all()
+        
+        if not tail:
+            return None
+        
+        newest = tail[0].data_hora
+        if len(tail) == ANDAMENTOS_TAIL_WINDOW and tail[-1].data_hora == newest:
+            # Mais andamentos no mesmo instante do que a janela cobre
+            return None
+        
+        tail_fps = {andamento_fingerprint(row.data_hora, row.descricao) for row in tail}
+        
+        new_indices = []
+        seen: Set[int] = set()
+        reached_known = False
+        for index in sorted(range(len(andamentos)), key=lambda i: andamentos[i].data_hora, reverse=True):
+            fp = current_fps[index]
+            if andamentos[index].data_hora < newest:
+                # Todo andamento anterior ao mais recente armazenado deve ser
+                # conhecido; o primeiro encontrado encerra a varredura
+                if fp not in tail_fps:
+                    return None
+                reached_known = True
+                break
+            if fp in tail_fps:
+                reached_known = True
+            elif fp not in seen:
+                seen.add(fp)
+                new_indices.append(index)
+        
+        # Sem sobreposição com o histórico armazenado não há como descartar lacunas
+        if not reached_known:
+            return None
+        
+        # Insere na ordem cronológica, como no diff completo
+        return sorted(new_indices, key=lambda i: andamentos[i].data_hora)
+    
+    async def merge_documentos(self, processo_id: int, documentos: List[Union[DocumentoRow, DocumentoData]]) -> int:
         """
         Mescla documentos evitando duplicatas
         
+        A comparação usa os fingerprints persistidos do processo (diferença de
+        conjuntos de inteiros), sem carregar os documentos armazenados.
+        
         Args:
             processo_id: ID do processo
             documentos: Lista de novos documentos
@@ -153,48 +353,126 @@ class ProcessoPersistenceService:
         if not documentos:
             return 0
         
-        # Busca documentos existentes
-        existing_documentos = self.db.query(Documento).filter(
-            Documento.processo_id == processo_id
-        ).all()
-        
-        # Converte para formato dict para comparação
-        existing_dicts = [
-            {
-                'numero_documento': d.numero_documento,
-                'tipo': d.tipo,
-                'data_documento': d.data_documento,
-                'unidade': d.unidade
-            }
-            for d in existing_documentos
-        ]
-        
-        # Detecta novos documentos
-        current_dicts = [d.model_dump() for d in documentos]
-        new_documentos = self.change_service.detect_new_documents(current_dicts, existing_dicts)
-        
-        if not new_documentos:
+        documentos = [d for d in documentos if d.numero_documento]
+        current_fps = [documento_fingerprint(d.numero_documento) for d in documentos]
+        snapshot, stored_fps, total = self._load_fingerprints(
+            processo_id, "documentos", Documento,
+            lambda row: documento_fingerprint(row.numero_documento),
+            Documento.numero_documento
+        )
+        
+        new_indices = self.change_service.select_new_indices(current_fps, stored_fps)
+        if not new_indices:
             return 0
         
         # Cria objetos Documento
         documento_objects = []
-        for doc_data in new_documentos:
+        for index in new_indices:
+            doc_data = documentos[index]
             documento = Documento(
                 processo_id=processo_id,
-                numero_documento=doc_data['numero_documento'],
-                tipo=doc_data.get('tipo'),
-                data_documento=doc_data.get('data_documento'),
-                data_inclusao=doc_data.get('data_inclusao'),
-                unidade=doc_data.get('unidade')
+                numero_documento=doc_data.numero_documento,
+                tipo=doc_data.tipo,
+                data_documento=doc_data.data_documento,
+                data_inclusao=doc_data.data_inclusao,
+                unidade=doc_data.unidade,
+                url_download=doc_data.url_download
             )
             documento_objects.append(documento)
         
-        # Insere no banco
+        # Insere no banco junto com os fingerprints e o total de documentos
         self.db.add_all(documento_objects)
+        count_new_documentos(self.db, len(documento_objects))
+        self._save_fingerprints(
+            snapshot, processo_id, "documentos",
+            np.union1d(stored_fps, [current_fps[i] for i in new_indices]), total + len(documento_objects)
+        )
         self.db.commit()
         
+        if self.on_new_documentos is not None:
+            self.on_new_documentos([documento.id for documento in documento_objects])
+        
+        PERSISTENCE_ROWS_INSERTED.labels(secao="documentos").inc(len(documento_objects))
         return len(documento_objects)
     
+    def _load_fingerprints(self, processo_id: int, secao: str, model,
+                           row_fingerprint: Callable, *columns) -> Tuple[Optional[ProcessoFingerprint], np.ndarray, int]:
+        """
+        Carrega os fingerprints persistidos de uma seção do processo
+        
+        O snapshot só é usado se cobrir exatamente as linhas existentes; caso
+        contrário (linhas gravadas por outro caminho), é reconstruído a partir
+        apenas das colunas da chave.
+        
+        Args:
+            processo_id: ID do processo
+            secao: Nome da seção (andamentos, documentos)
+            model: Modelo da seção
+            row_fingerprint: Função que calcula o fingerprint de uma linha
+            *columns: Colunas da chave da linha
+            
+        Returns:
+            Tupla (snapshot ou None, array ordenado dos fingerprints armazenados, total de linhas)
+        """
+        total = self.db.query(func.count(model.id)).filter(model.processo_id == processo_id).scalar()
+        snapshot = self.db.query(ProcessoFingerprint).filter(
+            ProcessoFingerprint.processo_id == processo_id,
+            ProcessoFingerprint.secao == secao
+        ).first()
+        
+        if snapshot is not None and snapshot.total_linhas == total:
+            return snapshot, unpack_fingerprints(snapshot.fingerprints), total
+        
+        rows = self.db.query(*columns).filter(model.processo_id == processo_id).all()
+        return snapshot, fingerprint_array(row_fingerprint(row) for row in rows), len(rows)
+    
+    def _append_fingerprints(self, processo_id: int, secao: str, model, new_fps: List[int]):
+        """
+        Acrescenta (sem commit) fingerprints de linhas novas ao snapshot da seção
+        
+        Só atualiza snapshots coerentes com as linhas existentes; snapshots
+        ausentes ou defasados são reconstruídos no próximo diff completo.
+        Deve ser chamado antes de adicionar as novas linhas à sessão.
+        
+        Args:
+            processo_id: ID do processo
+            secao: Nome da seção
+            model: Modelo da seção
+            new_fps: Fingerprints das linhas que serão inseridas
+        """
+        snapshot = self.db.query(ProcessoFingerprint).filter(
+            ProcessoFingerprint.processo_id == processo_id,
+            ProcessoFingerprint.secao == secao
+        ).first()
+        if snapshot is None:
+            return
+        
+        total = self.db.query(func.count(model.id)).filter(model.processo_id == processo_id).scalar()
+        if snapshot.total_linhas != total:
+            return
+        
+        stored_fps = unpack_fingerprints(snapshot.fingerprints)
+        self._save_fingerprints(snapshot, processo_id, secao, np.union1d(stored_fps, new_fps), total + len(new_fps))
+    
+    def _save_fingerprints(self, snapshot: Optional[ProcessoFingerprint], processo_id: int,
+                           secao: str, fingerprints: np.ndarray, total: int):
+        """
+        Grava (sem commit) os fingerprints de uma seção do processo
+        
+        Args:
+            snapshot: Registro existente ou None
+            processo_id: ID do processo
+            secao: Nome da seção
+            fingerprints: Fingerprints das linhas persistidas
+            total: Total de linhas persistidas
+        """
+        if snapshot is None:
+            snapshot = ProcessoFingerprint(processo_id=processo_id, secao=secao)
+            self.db.add(snapshot)
+        
+        snapshot.fingerprints = pack_fingerprints(fingerprints)
+        snapshot.total_linhas = total
+    
     def _find_existing_processo(self, numero_sei: str) -> Optional[Processo]:
         """
         Busca processo existente pelo número SEI
@@ -209,7 +487,7 @@ class ProcessoPersistenceService:
             Processo.numero == numero_sei  # Corrigido: numero_sei -> numero
         ).first()
     
-    async def _create_new_processo(self, processo_data: ProcessoData, url: str = "") -> ProcessoResult:
+    async def _create_new_processo(self, processo_data: Union[ProcessoRows, ProcessoData], url: str = "") -> ProcessoResult:
         """
         Cria novo processo
         
@@ -219,6 +497,10 @@ class ProcessoPersistenceService:
         Returns:
             Resultado da operação
         """
+        documentos, documento_fps = self.change_service.order_documentos(processo_data.documentos)
+        andamentos, andamento_fps = self.change_service.order_andamentos(processo_data.andamentos)
+        digest = self.change_service.build_processo_digest(processo_data.autuacao, documento_fps, andamento_fps)
+        
         # Cria processo com campos corretos do novo modelo
         processo = Processo(
             numero=processo_data.autuacao.numero_sei,  # numero_sei -> numero
@@ -229,7 +511,8 @@ class ProcessoPersistenceService:
             data_autuacao=processo_data.autuacao.data_geracao,  # data_geracao -> data_autuacao
             orgao_autuador='Não informado',  # Órgão padrão
             url_processo=url,  # URL do processo SEI
-            hash_conteudo=f"hash_{processo_data.autuacao.numero_sei}_{datetime.now().timestamp()}"
+            hash_conteudo=digest.root,
+            digest_secoes=digest.model_dump_json()
         )
         
         self.db.add(processo)
@@ -248,8 +531,8 @@ class ProcessoPersistenceService:
             self.db.add(autuacao)
         
         # Insere documentos e andamentos
-        doc_count = await self.merge_documentos(processo.id, processo_data.documentos)
-        and_count = await self.merge_andamentos(processo.id, processo_data.andamentos)
+        doc_count = await self.merge_documentos(processo.id, documentos)
+        and_count = await self.merge_andamentos(processo.id, andamentos)
         
         total_changes = 1 + doc_count + and_count  # 1 para o processo novo
         
@@ -257,13 +540,19 @@ class ProcessoPersistenceService:
             success=True,
             processo_id=processo.id,
             was_updated=False,
-            changes_detected=total_changes
+            changes_detected=total_changes,
+            changes=ChangesSummary(new_documentos=doc_count, new_andamentos=and_count, updated_autuacao=True)
         )
     
-    async def _update_existing_processo(self, processo: Processo, processo_data: ProcessoData, url: str = "") -> ProcessoResult:
+    async def _update_existing_processo(self, processo: Processo, processo_data: Union[ProcessoRows, ProcessoData],
+                                        url: str = "") -> ProcessoResult:
         """
         Atualiza processo existente
         
+        Compara o digest hierárquico dos dados atuais com o do último snapshot:
+        só as seções alteradas são verificadas e, nelas, apenas as linhas a
+        partir do primeiro bloco divergente seguem para o merge.
+        
         Args:
             processo: Processo existente
             processo_data: Novos dados
@@ -273,49 +562,83 @@ class ProcessoPersistenceService:
         """
         changes_count = 0
         
-        # Atualiza dados básicos do processo se necessário
-        updated = False
-        if processo.tipo != processo_data.autuacao.tipo:
-            processo.tipo = processo_data.autuacao.tipo
-            updated = True
-        if processo.interessado != processo_data.autuacao.interessados:  # interessados -> interessado
-            processo.interessado = processo_data.autuacao.interessados
-            updated = True
+        documentos, documento_fps = self.change_service.order_documentos(processo_data.documentos)
+        andamentos, andamento_fps = self.change_service.order_andamentos(processo_data.andamentos)
+        digest = self.change_service.build_processo_digest(processo_data.autuacao, documento_fps, andamento_fps)
+        diff = self.change_service.compare_digests(digest, self._load_digest(processo))
         
+        # Atualiza dados básicos do processo se a autuação mudou
+        updated = diff.autuacao_changed and self._apply_autuacao(processo, processo_data.autuacao)
         if updated:
-            processo.updated_at = datetime.now()
             changes_count += 1
         
-        # Merge de documentos e andamentos
-        doc_count = await self.merge_documentos(processo.id, processo_data.documentos)
-        and_count = await self.merge_andamentos(processo.id, processo_data.andamentos)
+        # Merge apenas do sufixo alterado de documentos e andamentos
+        doc_count = 0
+        if diff.documentos_start is not None:
+            doc_count = await self.merge_documentos(processo.id, documentos[diff.documentos_start:])
+        and_count = 0
+        if diff.andamentos_start is not None:
+            and_count = await self.merge_andamentos(processo.id, andamentos[diff.andamentos_start:])
         
         changes_count += doc_count + and_count
         
-        if changes_count > 0:
+        # O digest só é gravado após os merges: uma falha no meio mantém o
+        # snapshot anterior e o próximo refresh refaz a comparação
+        digest_json = digest.model_dump_json()
+        snapshot_changed = processo.digest_secoes != digest_json
+        if snapshot_changed:
+            processo.hash_conteudo = digest.root
+            processo.digest_secoes = digest_json
+        
+        if changes_count > 0 or snapshot_changed:
             self.db.commit()
         
         return ProcessoResult(
             success=True,
             processo_id=processo.id,
             was_updated=True,
-            changes_detected=changes_count
+            changes_detected=changes_count,
+            changes=ChangesSummary(new_documentos=doc_count, new_andamentos=and_count, updated_autuacao=updated)
         )
     
-    def _convert_to_dict(self, obj) -> Dict[str, Any]:
+    def _apply_autuacao(self, processo: Processo, autuacao: Union[AutuacaoRow, AutuacaoData]) -> bool:
         """
-        Converte objeto SQLAlchemy para dict
+        Copia tipo e interessados da autuação para o processo
         
         Args:
-            obj: Objeto a ser convertido
+            processo: Processo existente
+            autuacao: Autuação extraída
             
         Returns:
-            Dicionário com dados do objeto
+            True se algum campo mudou (updated_at é atualizado)
         """
-        if hasattr(obj, '__dict__'):
-            result = {}
-            for key, value in obj.__dict__.items():
-                if not key.startswith('_'):
-                    result[key] = value
-            return result
-        return {} 
\ No newline at end of file
+        updated = False
+        if processo.tipo != autuacao.tipo:
+            processo.tipo = autuacao.tipo
+            updated = True
+        if processo.interessado != autuacao.interessados:  # interessados -> interessado
+            processo.interessado = autuacao.interessados
+            updated = True
+        
+        if updated:
+            processo.updated_at = datetime.now()
+        return updated
+    
+    def _load_digest(self, processo: Processo) -> Optional[ProcessoDigest]:
+        """
+        Lê o digest do último snapshot persistido do processo
+        
+        Args:
+            processo: Processo existente
+            
+        Returns:
+            Digest ou None se ausente/ilegível (força o diff completo)
+        """
+        if not isinstance(processo.digest_secoes, str):
+            return None
+        
+        try:
+            return ProcessoDigest.model_validate_json(processo.digest_secoes)
+        except ValueError:
+            logger.warning(f"Digest inválido para o processo {processo.id}; usando diff completo")
+            return None
@@ -0,0 +1,362 @@
+"""
+Pipeline contínuo: scraping → persistência → download → extração → análise
+
+Uso pela linha de comando:
+    python -m app.services.pipeline URL [URL ...] [--arquivo urls.txt] [--sem-analise]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.database.connection import SessionLocal
+from app.models.processo import Documento
+from app.models.schemas import PipelineConfig, PipelineReport, PipelineStageStats
+from app.observability import configure_logging
+from app.scraper.base import SEIScraper
+from app.scraper.config import ScraperConfig
+from app.services.document_download import DocumentDownloadService
+from app.services.llm_service import LLMService
+from app.services.persistence import ProcessoPersistenceService
+from app.services.text_extraction import PDFTextExtractionService
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineStage:
+    """
+    Estágio do pipeline: fila limitada consumida por N workers
+
+    Cada item processado gera zero ou mais itens para o estágio seguinte. O
+    worker só libera sua vaga depois de entregar as saídas, então uma fila
+    cheia adiante segura os estágios anteriores (back-pressure).
+    """
+
+    def __init__(self, name: str, handler: Callable[[Any], Awaitable[Optional[Iterable[Any]]]],
+                 concurrency: int, queue_size: int, downstream: Optional["PipelineStage"] = None):
+        """
+        Inicializa o estágio
+
+        Args:
+            name: Nome do estágio (relatórios e logs)
+            handler: Corrotina que processa um item e retorna as saídas
+            concurrency: Número de workers
+            queue_size: Capacidade da fila de entrada
+            downstream: Estágio que recebe as saídas
+        """
+        self.name = name
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self.downstream = downstream
+        self.processed = 0
+        self.failed = 0
+        self.in_progress = 0
+        self._workers: List[asyncio.Task] = []
+
+    async def put(self, item: Any):
+        """Enfileira um item, aguardando vaga se a fila estiver cheia"""
+        await self.queue.put(item)
+
+    def start(self):
+        """Inicia os workers"""
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def drain(self):
+        """Aguarda o processamento de todos os itens enfileirados"""
+        await self.queue.join()
+
+    async def stop(self):
+        """Encerra os workers"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def stats(self, elapsed_seconds: float) -> PipelineStageStats:
+        """
+        Retrato do estágio
+
+        Args:
+            elapsed_seconds: Tempo desde o início do pipeline
+
+        Returns:
+            Estatísticas do estágio
+        """
+        return PipelineStageStats(
+            name=self.name,
+            concurrency=self.concurrency,
+            queue_depth=self.queue.qsize(),
+            queue_capacity=self.queue.maxsize,
+            in_progress=self.in_progress,
+            processed=self.processed,
+            failed=self.failed,
+            throughput_per_second=self.processed / elapsed_seconds if elapsed_seconds > 0 else 0.0
+        )
+
+    async def _worker(self):
+        """Laço de um worker"""
+        while True:
+            item = await self.queue.get()
+            self.in_progress += 1
+            try:
+                outputs = await self.handler(item)
+                if self.downstream is not None:
+                    for output in outputs or ():
+                        await self.downstream.put(output)
+                self.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Estágio {self.name}: falha em {item!r}: {e}")
+            finally:
+                self.in_progress -= 1
+                self.queue.task_done()
+
+
+class SEIPipeline:
+    """
+    Orquestra os serviços de scraping, persistência, download, extração e
+    análise ligados por filas assíncronas limitadas
+
+    Os documentos novos encontrados por `merge_documentos` seguem direto
+    para o download, sem consulta periódica ao banco. Cada estágio usa sua
+    própria sessão do banco.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None,
+                 scraper_config: Optional[ScraperConfig] = None,
+                 download_config: Optional[Dict[str, Any]] = None,
+                 extraction_config: Optional[Dict[str, Any]] = None,
+                 llm_config: Optional[Dict[str, Any]] = None,
+                 session_factory: Callable[[], Session] = SessionLocal):
+        """
+        Inicializa o pipeline
+
+        Args:
+            config: Configuração do pipeline (PipelineConfig)
+            scraper_config: Configuração do scraper
+            download_config: Configuração do download (DownloadConfig)
+            extraction_config: Configuração da extração (TextExtractionConfig)
+            llm_config: Configuração do LLM (obrigatória com análise ligada)
+            session_factory: Fábrica de sessões do banco de dados
+        """
+        self.config = PipelineConfig(**(config or {}))
+        if self.config.analyze_documents and llm_config is None:
+            raise ValueError("Configuração do LLM obrigatória com a análise ligada")
+
+        self.scraper_config = scraper_config or ScraperConfig()
+        self.download_config = download_config or {}
+        self.extraction_config = extraction_config or {}
+        self.llm_config = llm_config
+        self.session_factory = session_factory
+
+        self.stages: List[PipelineStage] = []
+        self._started_monotonic: Optional[float] = None
+        self._finished = False
+
+    def report(self) -> PipelineReport:
+        """
+        Vazão e profundidade das filas de cada estágio
+
+        Returns:
+            Retrato do pipeline
+        """
+        elapsed = time.monotonic() - self._started_monotonic if self._started_monotonic else 0.0
+        return PipelineReport(
+            stages=[stage.stats(elapsed) for stage in self.stages],
+            elapsed_seconds=elapsed,
+            finished=self._finished
+        )
+
+    async def run(self, urls: Iterable[str],
+                  progress_callback: Optional[Callable[[PipelineReport], Any]] = None) -> PipelineReport:
+        """
+        Processa as URLs de processos até esvaziar todos os estágios
+
+        Args:
+            urls: URLs de processos no SEI-RJ
+            progress_callback: Chamado com o retrato a cada `report_interval_seconds`
+
+        Returns:
+            Retrato final do pipeline
+        """
+        sessions: List[Session] = []
+
+        def new_session() -> Session:
+            session = self.session_factory()
+            sessions.append(session)
+            return session
+
+        scraper = SEIScraper(self.scraper_config)
+        persist_db = new_session()
+        download_service = DocumentDownloadService(new_session(), self.download_config)
+        extraction_service = PDFTextExtractionService(new_session(), self.extraction_config)
+        llm_service = LLMService(new_session(), self.llm_config) if self.config.analyze_documents else None
+
+        async def scrape(url: str):
+            result = await scraper.scrape_processo(url)
+            if not result.success:
+                raise RuntimeError(result.error_message)
+            return [(url, result.processo_data)]
+
+        async def persist(item):
+            url, processo_data = item
+            new_ids: List[int] = []
+            service = ProcessoPersistenceService(persist_db, on_new_documentos=new_ids.extend)
+            result = await service.save_processo_data(processo_data, url)
+            if not result.success:
+                raise RuntimeError(result.error_message)
+            return new_ids
+
+        async def download(documento_id: int):
+            documento = download_service.db.get(Documento, documento_id)
+            if documento is None or not documento.url_download:
+                logger.info(f"Documento {documento_id} sem link de download")
+                return []
+            result = await download_service.download_document(documento, documento.url_download)
+            if not result.success:
+                raise RuntimeError(result.error_message)
+            return [documento_id]
+
+        async def extract(documento_id: int):
+            documento = extraction_service.db.get(Documento, documento_id)
+            result = await extraction_service.extract_document(documento)
+            if not result.success:
+                raise RuntimeError(result.error_message)
+            return [documento_id] if llm_service is not None else []
+
+        async def analyze(documento_id: int):
+            result = await llm_service.analyze_document(documento_id)
+            if not result.success:
+                raise RuntimeError(result.error_message)
+            return []
+
+        config = self.config
+        stages = [
+            PipelineStage("scrape", scrape, config.scrape_concurrency, config.queue_size),
+            PipelineStage("persist", persist, config.persist_concurrency, config.queue_size),
+            PipelineStage("download", download, config.download_concurrency, config.queue_size),
+            PipelineStage("extract", extract, config.extract_concurrency, config.queue_size),
+        ]
+        if llm_service is not None:
+            stages.append(PipelineStage("analyze", analyze, config.analyze_concurrency, config.queue_size))
+        for stage, next_stage in zip(stages, stages[1:]):
+            stage.downstream = next_stage
+        self.stages = stages
+        self._started_monotonic = time.monotonic()
+        self._finished = False
+
+        reporter = None
+        if progress_callback is not None:
+            reporter = asyncio.create_task(self._report_periodically(progress_callback))
+
+        try:
+            for stage in stages:
+                stage.start()
+            for url in urls:
+                await stages[0].put(url)
+
+            # Um estágio só esvazia de vez depois que todos os anteriores esvaziaram
+            for stage in stages:
+                await stage.drain()
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+            for stage in stages:
+                await stage.stop()
+            extraction_service.close()
+            for session in sessions:
+                session.close()
+
+        self._finished = True
+        report = self.report()
+        if progress_callback is not None:
+            progress_callback(report)
+        return report
+
+    async def _report_periodically(self, progress_callback: Callable[[PipelineReport], Any]):
+        """Publica o retrato do pipeline em intervalos regulares"""
+        while True:
+            await asyncio.sleep(self.config.report_interval_seconds)
+            progress_callback(self.report())
+
+
+def format_report(report: PipelineReport) -> str:
+    """
+    Formata o retrato do pipeline em uma linha por estágio
+
+    Args:
+        report: Retrato do pipeline
+
+    Returns:
+        Texto para log ou terminal
+    """
+    lines = [f"Pipeline {'concluído' if report.finished else 'em execução'} ({report.elapsed_seconds:.1f}s)"]
+    for stage in report.stages:
+        lines.append(
+            f"  {stage.name:<9} fila {stage.queue_depth}/{stage.queue_capacity}  "
+            f"ativos {stage.in_progress}/{stage.concurrency}  ok {stage.processed}  "
+            f"falhas {stage.failed}  {stage.throughput_per_second:.2f}/s"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Ponto de entrada da linha de comando
+
+    Args:
+        argv: Argumentos (padrão: sys.argv)
+
+    Returns:
+        Código de saída (1 se algum item falhou)
+    """
+    parser = argparse.ArgumentParser(description="Pipeline SEI: scraping, download, extração e análise")
+    parser.add_argument("urls", nargs="*", help="URLs de processos no SEI-RJ")
+    parser.add_argument("--arquivo", help="Arquivo com uma URL por linha")
+    parser.add_argument("--sem-analise", action="store_true", help="Encerra o pipeline na extração de texto")
+    parser.add_argument("--downloads", type=int, help="Downloads simultâneos")
+    parser.add_argument("--download-dir", default="./downloads", help="Diretório base dos arquivos baixados")
+    parser.add_argument("--intervalo", type=float, default=10.0, help="Segundos entre relatórios de progresso")
+    args = parser.parse_args(argv)
+
+    urls = list(args.urls)
+    if args.arquivo:
+        with open(args.arquivo, encoding="utf-8") as f:
+            urls.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    if not urls:
+        parser.error("informe ao menos uma URL")
+
+    configure_logging()
+
+    config: Dict[str, Any] = {"analyze_documents": not args.sem_analise, "report_interval_seconds": args.intervalo}
+    if args.downloads:
+        config["download_concurrency"] = args.downloads
+
+    llm_config = None
+    if not args.sem_analise:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            parser.error("OPENAI_API_KEY não definida (use --sem-analise para pular a análise)")
+        llm_config = {"api_key": api_key, "organization_id": os.getenv("OPENAI_ORGANIZATION_ID")}
+
+    pipeline = SEIPipeline(
+        config,
+        scraper_config=ScraperConfig.from_env(),
+        download_config={"download_base_path": args.download_dir},
+        llm_config=llm_config
+    )
+    report = asyncio.run(pipeline.run(urls, progress_callback=lambda r: logger.info(format_report(r))))
+
+    return 1 if any(stage.failed for stage in report.stages) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
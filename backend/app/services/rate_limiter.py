@@ -0,0 +1,305 @@
+"""
+Controle adaptativo de concorrência e cotas para provedores de LLM
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def is_throttling_error(error: Exception) -> bool:
+    """
+    Verifica se a exceção representa throttling do provedor (HTTP 429)
+
+    Args:
+        error: Exceção levantada pela chamada ao provedor
+
+    Returns:
+        True se for sinal de throttling
+    """
+    status = getattr(error, "http_status", None) or getattr(error, "status_code", None)
+    if status == 429:
+        return True
+    return type(error).__name__ == "RateLimitError"
+
+
+def parse_retry_after(headers: Optional[Mapping[str, Any]]) -> Optional[float]:
+    """
+    Extrai tempo de espera sugerido (segundos) dos headers de resposta
+
+    Args:
+        headers: Headers HTTP da resposta
+
+    Returns:
+        Segundos de espera ou None se não informado
+    """
+    if not headers:
+        return None
+
+    headers = {str(k).lower(): v for k, v in headers.items()}
+
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+
+    return None
+
+
+class _Budget:
+    """Balde de cota por minuto com recarga contínua"""
+
+    def __init__(self, per_minute: int, now: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated_at = now
+
+    def refill(self, now: float):
+        rate = self.capacity / 60.0
+        self.level = min(self.capacity, self.level + (now - self.updated_at) * rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Segundos até haver saldo para `amount` (0 se já houver)"""
+        # Requisições maiores que a cota inteira esperam apenas o balde encher
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / (self.capacity / 60.0)
+
+
+class AdaptiveRateLimiter:
+    """
+    Limitador adaptativo para chamadas a um modelo de LLM
+
+    Combina cotas separadas de requisições por minuto (RPM) e tokens por
+    minuto (TPM) com um limite de concorrência ajustado por AIMD: cada sucesso
+    aumenta o limite aditivamente e cada sinal de throttling o reduz
+    multiplicativamente, pausando todas as chamadas pelo retry-after informado.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int,
+                 max_concurrency: int = 8, min_concurrency: int = 1,
+                 initial_concurrency: Optional[int] = None,
+                 increase_step: float = 1.0, decrease_factor: float = 0.5,
+                 base_backoff_seconds: float = 1.0, max_backoff_seconds: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Inicializa o limitador
+
+        Args:
+            requests_per_minute: Cota de requisições por minuto
+            tokens_per_minute: Cota de tokens por minuto
+            max_concurrency: Teto do limite de concorrência
+            min_concurrency: Piso do limite de concorrência
+            initial_concurrency: Limite inicial (padrão: metade do teto)
+            increase_step: Incremento aditivo por janela de sucessos
+            decrease_factor: Fator multiplicativo aplicado em throttling
+            base_backoff_seconds: Base do backoff exponencial
+            max_backoff_seconds: Backoff máximo
+            clock: Relógio monotônico (injetável para testes)
+        """
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        now = clock()
+        self._requests = _Budget(requests_per_minute, now)
+        self._tokens = _Budget(tokens_per_minute, now)
+
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+
+        if initial_concurrency is None:
+            initial_concurrency = max(min_concurrency, max_concurrency // 2)
+        self._limit = float(initial_concurrency)
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._last_decrease_at = float("-inf")
+
+        self.total_requests = 0
+        self.total_throttled = 0
+
+    @property
+    def concurrency_limit(self) -> int:
+        """Limite de concorrência efetivo"""
+        return max(self.min_concurrency, int(self._limit))
+
+    @property
+    def in_flight(self) -> int:
+        """Chamadas em andamento"""
+        return self._in_flight
+
+    async def acquire(self, estimated_tokens: int = 0, poll_interval: float = 0.05):
+        """
+        Aguarda até haver concorrência e cota disponíveis e reserva-as
+
+        Args:
+            estimated_tokens: Tokens estimados da chamada (prompt + max_tokens)
+            poll_interval: Intervalo de espera quando limitado por concorrência
+        """
+        while True:
+            wait = self._try_acquire(estimated_tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(poll_interval if wait == float("inf") else wait)
+
+    def release(self, estimated_tokens: int = 0, actual_tokens: Optional[int] = None,
+                throttled: bool = False, headers: Optional[Mapping[str, Any]] = None) -> float:
+        """
+        Libera a reserva de uma chamada e ajusta o controlador
+
+        Args:
+            estimated_tokens: Tokens reservados em acquire()
+            actual_tokens: Tokens efetivamente consumidos (ajusta a cota)
+            throttled: Se a chamada recebeu throttling do provedor
+            headers: Headers da resposta (retry-after e cotas restantes)
+
+        Returns:
+            Segundos que o chamador deve esperar antes de tentar novamente
+        """
+        with self._lock:
+            now = self._clock()
+            self._in_flight = max(0, self._in_flight - 1)
+
+            if actual_tokens is not None:
+                # Devolve (ou cobra) a diferença entre estimado e real
+                self._tokens.level += estimated_tokens - actual_tokens
+
+            self._apply_headers(headers)
+
+            if not throttled:
+                self._limit = min(self.max_concurrency, self._limit + self.increase_step / self._limit)
+                return 0.0
+
+            self.total_throttled += 1
+            retry_after = parse_retry_after(headers)
+
+            # Uma única redução por "janela": falhas simultâneas das chamadas já
+            # em voo refletem o mesmo evento de throttling
+            if now - self._last_decrease_at >= max(retry_after or 0.0, self.base_backoff_seconds):
+                self._limit = max(float(self.min_concurrency), self._limit * self.decrease_factor)
+                self._last_decrease_at = now
+                logger.info(f"Throttling do provedor: concorrência reduzida para {self.concurrency_limit}")
+
+            pause = retry_after if retry_after is not None else self.base_backoff_seconds
+            self._paused_until = max(self._paused_until, now + pause)
+            return pause
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Calcula espera antes de nova tentativa (backoff exponencial com jitter)
+
+        Args:
+            attempt: Número da tentativa (0 = primeira repetição)
+            retry_after: Espera mínima sugerida pelo provedor
+
+        Returns:
+            Segundos de espera
+        """
+        delay = min(self.max_backoff_seconds, self.base_backoff_seconds * (2 ** attempt))
+        delay = delay * (0.5 + random.random() / 2)
+        return max(delay, retry_after or 0.0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Estado atual do limitador
+
+        Returns:
+            Dicionário com limite, chamadas em voo e saldos de cota
+        """
+        with self._lock:
+            now = self._clock()
+            self._requests.refill(now)
+            self._tokens.refill(now)
+            return {
+                "concurrency_limit": self.concurrency_limit,
+                "in_flight": self._in_flight,
+                "requests_available": int(self._requests.level),
+                "tokens_available": int(self._tokens.level),
+                "paused_for_seconds": max(0.0, self._paused_until - now),
+                "total_requests": self.total_requests,
+                "total_throttled": self.total_throttled
+            }
+
+    def _try_acquire(self, estimated_tokens: int) -> float:
+        """Reserva se possível; senão retorna quanto esperar (inf = aguardar vaga)"""
+        with self._lock:
+            now = self._clock()
+
+            if now < self._paused_until:
+                return self._paused_until - now
+
+            if self._in_flight >= self.concurrency_limit:
+                return float("inf")
+
+            self._requests.refill(now)
+            self._tokens.refill(now)
+            wait = max(self._requests.wait_time(1), self._tokens.wait_time(estimated_tokens))
+            if wait > 0:
+                return wait
+
+            self._requests.level -= 1
+            self._tokens.level -= estimated_tokens
+            self._in_flight += 1
+            self.total_requests += 1
+            return 0.0
+
+    def _apply_headers(self, headers: Optional[Mapping[str, Any]]):
+        """Limita os saldos locais às cotas restantes informadas pelo provedor"""
+        if not headers:
+            return
+
+        headers = {str(k).lower(): v for k, v in headers.items()}
+        for header, budget in (("x-ratelimit-remaining-requests", self._requests),
+                               ("x-ratelimit-remaining-tokens", self._tokens)):
+            try:
+                remaining = float(headers[header])
+            except (KeyError, TypeError, ValueError):
+                continue
+            budget.level = min(budget.level, remaining)
+
+
+# Limitadores compartilhados por todas as instâncias do processo, por provedor/modelo
+_rate_limiters: Dict[Tuple[str, str], AdaptiveRateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str, model: str, **limits) -> AdaptiveRateLimiter:
+    """
+    Obtém o limitador compartilhado do modelo, criando-o se necessário
+
+    Os limites só são aplicados na criação; chamadas seguintes reutilizam o
+    mesmo limitador para que todas as instâncias dividam a mesma cota.
+
+    Args:
+        provider: Provedor do LLM
+        model: Nome do modelo
+        **limits: Argumentos de AdaptiveRateLimiter
+
+    Returns:
+        Limitador compartilhado
+    """
+    key = (provider, model)
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(key)
+        if limiter is None:
+            limiter = AdaptiveRateLimiter(**limits)
+            _rate_limiters[key] = limiter
+        return limiter
+
+
+def reset_rate_limiters():
+    """Descarta os limitadores compartilhados (uso em testes)"""
+    with _rate_limiters_lock:
+        _rate_limiters.clear()
@@ -0,0 +1,281 @@
+"""
+Reverificação periódica de processos priorizada pela frequência de mudanças
+
+Uso pela linha de comando:
+    python -m app.services.refresh_scheduler [--requisicoes-por-hora N]
+"""
+import argparse
+import asyncio
+import logging
+import math
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import flag_modified
+
+from app.database.connection import SessionLocal
+from app.models.processo import Processo
+from app.models.schemas import ChangesSummary, ProcessoResult, RefreshSchedulerConfig, RefreshTickResult
+from app.observability import configure_logging, span
+from app.scraper.base import SEIScraper
+from app.scraper.config import ScraperConfig
+from app.services.persistence import ProcessoPersistenceService
+
+logger = logging.getLogger(__name__)
+
+# Piso da taxa (mudanças/dia) na divisão do orçamento: processos dormentes
+# mantêm uma fração mínima e o intervalo máximo limita o resto
+MIN_RATE_PER_DAY = 0.001
+
+
+class RefreshScheduler:
+    """
+    Agenda o novo scraping dos processos armazenados dentro de um orçamento
+    global de requisições por hora
+
+    Cada processo guarda a taxa de mudanças observada (novos andamentos e
+    documentos por dia, com decaimento exponencial do histórico). O
+    orçamento é dividido em proporção à raiz quadrada da taxa, a divisão que
+    minimiza a defasagem média para mudanças em processo de Poisson:
+    processos ativos são verificados com frequência e os dormentes
+    raramente, respeitando os intervalos mínimo e máximo.
+    """
+
+    def __init__(self, db_session: Session, config: Optional[Dict[str, Any]] = None,
+                 refresh: Optional[Callable[[Processo], Awaitable[ProcessoResult]]] = None):
+        """
+        Inicializa o agendador
+
+        Args:
+            db_session: Sessão do banco de dados
+            config: Configuração do agendador (RefreshSchedulerConfig)
+            refresh: Corrotina que refaz o scraping de um processo e persiste o
+                resultado (padrão: SEIScraper + ProcessoPersistenceService)
+        """
+        self.db = db_session
+        self.config = RefreshSchedulerConfig(**(config or {}))
+        self.refresh = refresh or self._scrape_and_persist
+        self._scraper: Optional[SEIScraper] = None
+        self._tokens = 1.0
+        self._last_refill: Optional[datetime] = None
+
+    @staticmethod
+    def last_check(processo: Processo) -> Optional[datetime]:
+        """Última verificação; antes da primeira, a última gravação do processo"""
+        return processo.ultima_verificacao or processo.updated_at or processo.created_at
+
+    def update_change_rate(self, processo: Processo, changes: ChangesSummary, checked_at: datetime,
+                           since: Optional[datetime] = None):
+        """
+        Atualiza a taxa de mudanças com o resultado de uma verificação
+
+        Acumula mudanças e tempo observado com decaimento exponencial
+        (meia-vida `rate_half_life_days`) e estima a taxa como a razão entre
+        eles, somando a taxa assumida com peso de `prior_weight_days` dias:
+        processos novos começam na taxa assumida e convergem para a observada
+        à medida que acumulam histórico. Na primeira verificação o intervalo
+        conta a partir da última gravação do processo.
+
+        Args:
+            processo: Processo verificado
+            changes: Mudanças encontradas na verificação
+            checked_at: Instante da verificação
+            since: Início do intervalo observado, lido antes da verificação
+                (padrão: last_check(processo))
+        """
+        observed_changes = processo.mudancas_observadas or 0.0
+        observed_days = processo.dias_observados or 0.0
+
+        since = since or self.last_check(processo)
+        if since is not None:
+            elapsed_days = (checked_at - since).total_seconds() / 86400
+            if elapsed_days > 0:
+                decay = 0.5 ** (elapsed_days / self.config.rate_half_life_days)
+                observed_changes = observed_changes * decay + changes.new_andamentos + changes.new_documentos
+                observed_days = observed_days * decay + elapsed_days
+
+        prior_days = self.config.prior_weight_days
+        processo.mudancas_observadas = observed_changes
+        processo.dias_observados = observed_days
+        processo.taxa_mudancas = (
+            (observed_changes + self.config.prior_changes_per_day * prior_days) / (observed_days + prior_days)
+        )
+        processo.ultima_verificacao = checked_at
+
+    def refresh_interval(self, rate: Optional[float], rate_norm: float) -> timedelta:
+        """
+        Intervalo até a próxima verificação
+
+        Args:
+            rate: Taxa de mudanças do processo (None = sem histórico)
+            rate_norm: Soma das raízes das taxas de todos os processos
+
+        Returns:
+            Intervalo limitado a [min_interval_minutes, max_interval_hours]
+        """
+        share = math.sqrt(max(rate if rate is not None else self.config.prior_changes_per_day, MIN_RATE_PER_DAY))
+        hours = rate_norm / (self.config.requests_per_hour * share)
+        hours = min(max(hours, self.config.min_interval_minutes / 60), self.config.max_interval_hours)
+        return timedelta(hours=hours)
+
+    def rate_norm(self) -> float:
+        """
+        Soma das raízes das taxas dos processos agendáveis
+
+        Returns:
+            Normalizador da divisão do orçamento
+        """
+        prior = self.config.prior_changes_per_day
+        return sum(
+            math.sqrt(max(rate if rate is not None else prior, MIN_RATE_PER_DAY))
+            for rate, in self.db.query(Processo.taxa_mudancas).filter(Processo.url_processo.isnot(None)).all()
+        )
+
+    async def run_tick(self, now: Optional[datetime] = None) -> RefreshTickResult:
+        """
+        Executa uma rodada: agenda processos novos e verifica os vencidos
+        que couberem no orçamento
+
+        Args:
+            now: Instante da rodada (padrão: agora)
+
+        Returns:
+            Resumo da rodada
+        """
+        now = now or datetime.now()
+        self._refill(now)
+        norm = self.rate_norm()
+        self._schedule_unscheduled(norm)
+
+        due_filter = (Processo.url_processo.isnot(None), Processo.proxima_verificacao <= now)
+        result = RefreshTickResult(due=self.db.query(func.count(Processo.id)).filter(*due_filter).scalar() or 0)
+
+        # Os mais atrasados primeiro; o que não couber no orçamento espera a próxima rodada
+        due = self.db.query(Processo).filter(*due_filter).order_by(
+            Processo.proxima_verificacao
+        ).limit(int(self._tokens)).all()
+
+        for processo in due:
+            self._tokens -= 1
+            # Antes da verificação, que pode regravar o processo (updated_at)
+            since = self.last_check(processo)
+            try:
+                outcome = await self.refresh(processo)
+            except Exception as e:
+                outcome = ProcessoResult(success=False, error_message=str(e))
+
+            if outcome.success:
+                changes = outcome.changes or ChangesSummary()
+                self.update_change_rate(processo, changes, now, since)
+                result.checked += 1
+                result.changed += 1 if changes.total_changes else 0
+            else:
+                # Falha não altera a taxa; nova tentativa após o intervalo mínimo
+                logger.warning(f"Falha ao reverificar processo {processo.numero}: {outcome.error_message}")
+                result.failed += 1
+            processo.proxima_verificacao = now + (
+                self.refresh_interval(processo.taxa_mudancas, norm) if outcome.success
+                else timedelta(minutes=self.config.min_interval_minutes)
+            )
+            self.db.commit()
+
+        result.deferred = result.due - len(due)
+        return result
+
+    async def run(self, stop_event: Optional[asyncio.Event] = None):
+        """
+        Executa rodadas a cada `tick_seconds` até `stop_event` ser sinalizado
+
+        Args:
+            stop_event: Evento de parada (padrão: executa indefinidamente)
+        """
+        stop_event = stop_event or asyncio.Event()
+        while not stop_event.is_set():
+            result = await self.run_tick()
+            if result.checked or result.failed:
+                logger.info(
+                    f"Reverificação: {result.checked} verificados, {result.changed} com mudanças, "
+                    f"{result.failed} falhas, {result.deferred} adiados"
+                )
+            try:
+                await asyncio.wait_for(stop_event.wait(), self.config.tick_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def _refill(self, now: datetime):
+        """Repõe o balde de tokens proporcionalmente ao tempo decorrido"""
+        if self._last_refill is not None:
+            elapsed_hours = max(0.0, (now - self._last_refill).total_seconds() / 3600)
+            self._tokens = min(float(self.config.max_burst),
+                               self._tokens + elapsed_hours * self.config.requests_per_hour)
+        self._last_refill = now
+
+    def _schedule_unscheduled(self, rate_norm: float):
+        """Agenda processos ainda sem próxima verificação a partir da última atualização"""
+        pending = self.db.query(Processo).filter(
+            Processo.url_processo.isnot(None), Processo.proxima_verificacao.is_(None)
+        ).all()
+        if not pending:
+            return
+
+        for processo in pending:
+            last = self.last_check(processo) or datetime.now()
+            processo.proxima_verificacao = last + self.refresh_interval(processo.taxa_mudancas, rate_norm)
+            # Agendar não é uma atualização do processo: updated_at segue marcando
+            # a última gravação, início do intervalo da primeira verificação
+            flag_modified(processo, "updated_at")
+        self.db.commit()
+
+    async def _scrape_and_persist(self, processo: Processo) -> ProcessoResult:
+        """Refaz o scraping do processo e grava as mudanças"""
+        if self._scraper is None:
+            self._scraper = SEIScraper(ScraperConfig.from_env())
+
+        with span("refresh", processo_id=processo.id):
+            scraped = await self._scraper.scrape_processo(processo.url_processo)
+            if not scraped.success:
+                return ProcessoResult(success=False, processo_id=processo.id, error_message=scraped.error_message)
+
+            return await ProcessoPersistenceService(self.db).save_processo_data(
+                scraped.processo_data, processo.url_processo
+            )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Ponto de entrada da linha de comando: executa o agendador até ser interrompido
+
+    Args:
+        argv: Argumentos (padrão: sys.argv)
+
+    Returns:
+        Código de saída
+    """
+    parser = argparse.ArgumentParser(description="Reverificação periódica dos processos monitorados")
+    parser.add_argument("--requisicoes-por-hora", type=int, default=60, help="Orçamento global de scraping")
+    parser.add_argument("--intervalo-minimo", type=float, default=30.0, help="Minutos entre verificações (ativos)")
+    parser.add_argument("--intervalo-maximo", type=float, default=336.0, help="Horas entre verificações (dormentes)")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+
+    db = SessionLocal()
+    try:
+        scheduler = RefreshScheduler(db, {
+            "requests_per_hour": args.requisicoes_por_hora,
+            "min_interval_minutes": args.intervalo_minimo,
+            "max_interval_hours": args.intervalo_maximo
+        })
+        asyncio.run(scheduler.run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
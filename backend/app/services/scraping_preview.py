@@ -3,37 +3,163 @@ Service para preview de scraping e salvamento completo de processos.
 Implementa a nova lógica onde o usuário visualiza os dados antes de salvar.
 """
 
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime
 import logging
+import secrets
+import threading
+import time
+from urllib.parse import urljoin
 
 from ..models.api_schemas import (
     ScrapingPreviewResponse, 
     SalvarProcessoCompletoRequest,
     SalvarProcessoCompletoResponse,
+    AlteracoesLista,
     ProcessoInfoPreview,
     ProtocoloInfoPreview,
     AndamentoInfoPreview
 )
-from ..scraper.base import ScraperSEI
+from ..scraper.base import SEIScraper
 from ..scraper.config import ScraperConfig
+from ..scraper.dates import parse_dates, parse_datetimes
+from ..database.bulk import bulk_insert_ignore
 from ..database.connection import SessionLocal
 from ..models.processo import Processo, Documento, Andamento
+from .document_download import count_new_documentos
 
 logger = logging.getLogger(__name__)
 
+class PreviewCache:
+    """
+    Cache em memória, de curta duração, dos previews recentes
+    
+    Cada preview recebe um token de repasse (handoff) para o salvamento e
+    também pode ser localizado pela URL, para previews repetidos.
+    """
+    
+    def __init__(self, ttl_seconds: float = 300, max_entries: int = 128,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Inicializa o cache
+        
+        Args:
+            ttl_seconds: Tempo de validade de cada preview
+            max_entries: Número máximo de previews mantidos (LRU)
+            clock: Relógio monotônico (injetável para testes)
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, str, ScrapingPreviewResponse]]" = OrderedDict()
+        self._tokens_by_url: Dict[str, str] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, url: str) -> Optional[ScrapingPreviewResponse]:
+        """
+        Busca preview válido da URL
+        
+        Args:
+            url: URL do processo
+            
+        Returns:
+            Preview ou None se ausente/expirado
+        """
+        with self._lock:
+            token = self._tokens_by_url.get(url)
+            return self._get_entry(token) if token else None
+    
+    def get_by_token(self, token: str) -> Optional[ScrapingPreviewResponse]:
+        """
+        Busca preview válido pelo token de repasse
+        
+        Args:
+            token: Token devolvido no preview
+            
+        Returns:
+            Preview ou None se ausente/expirado
+        """
+        with self._lock:
+            return self._get_entry(token)
+    
+    def set(self, url: str, preview: ScrapingPreviewResponse) -> str:
+        """
+        Armazena preview da URL, substituindo o anterior
+        
+        Args:
+            url: URL do processo
+            preview: Dados extraídos
+            
+        Returns:
+            Token de repasse do preview
+        """
+        token = secrets.token_urlsafe(16)
+        with self._lock:
+            self._remove(self._tokens_by_url.get(url))
+            self._entries[token] = (self._clock() + self.ttl_seconds, url, preview)
+            self._tokens_by_url[url] = token
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+        return token
+    
+    def invalidate(self, url: str):
+        """
+        Remove preview da URL
+        
+        Args:
+            url: URL do processo
+        """
+        with self._lock:
+            self._remove(self._tokens_by_url.get(url))
+    
+    def _get_entry(self, token: Optional[str]) -> Optional[ScrapingPreviewResponse]:
+        """Retorna o preview do token, descartando-o se expirado"""
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        
+        expires_at, _, preview = entry
+        if self._clock() >= expires_at:
+            self._remove(token)
+            return None
+        
+        self._entries.move_to_end(token)
+        return preview
+    
+    def _remove(self, token: Optional[str]):
+        """Remove entrada e índice por URL"""
+        entry = self._entries.pop(token, None) if token else None
+        if entry is not None and self._tokens_by_url.get(entry[1]) == token:
+            del self._tokens_by_url[entry[1]]
+
+
 class ScrapingPreviewService:
     """Service para gerenciar preview de scraping e salvamento completo"""
     
-    def __init__(self):
+    def __init__(self, cache_ttl_seconds: float = 300, session_factory: Callable = SessionLocal):
+        """
+        Inicializa o service
+        
+        Args:
+            cache_ttl_seconds: Validade dos previews em cache
+            session_factory: Fábrica de sessões do banco de dados
+        """
         self.scraper_config = ScraperConfig()
+        self.preview_cache = PreviewCache(ttl_seconds=cache_ttl_seconds)
+        self.session_factory = session_factory
     
-    def preview_scraping(self, url: str) -> ScrapingPreviewResponse:
+    async def preview_scraping(self, url: str, use_cache: bool = True) -> ScrapingPreviewResponse:
         """
         Executa scraping completo para preview sem salvar no banco.
         
+        O scraping é assíncrono (não bloqueia o event loop) e o resultado fica
+        em cache por alguns minutos, para previews repetidos e para o
+        salvamento que normalmente vem em seguida.
+        
         Args:
             url: URL do processo no SEI-RJ
+            use_cache: Se pode reutilizar preview recente da mesma URL
             
         Returns:
             ScrapingPreviewResponse com todos os dados extraídos
@@ -48,12 +174,16 @@ class ScrapingPreviewService:
         if not self._validar_url_sei(url):
             raise ValueError("URL inválida. Deve ser uma URL válida do SEI-RJ.")
         
+        if use_cache:
+            cached = self.preview_cache.get(url)
+            if cached is not None:
+                logger.info(f"Preview obtido do cache para URL: {url}")
+                return cached
+        
         try:
-            # Inicializar scraper
-            scraper = ScraperSEI(self.scraper_config)
-            
             # Executar scraping completo
-            dados_extraidos = scraper.extract_dados_completos(url)
+            scraper = SEIScraper(self.scraper_config)
+            dados_extraidos = await scraper.extract_dados_completos(url)
             
             # Converter para formato de preview
             autuacao = self._converter_autuacao(dados_extraidos.get("autuacao", {}))
@@ -69,6 +199,8 @@ class ScrapingPreviewService:
                 total_andamentos=len(andamentos)
             )
             
+            response.preview_token = self.preview_cache.set(url, response)
+            
             logger.info(f"Preview concluído: {len(protocolos)} protocolos, {len(andamentos)} andamentos")
             return response
             
@@ -76,12 +208,75 @@ class ScrapingPreviewService:
             logger.error(f"Erro no preview de scraping: {str(e)}")
             raise Exception(f"Erro ao extrair dados do SEI: {str(e)}")
     
+    def resolver_dados_salvamento(self, dados: SalvarProcessoCompletoRequest) -> SalvarProcessoCompletoRequest:
+        """
+        Completa a requisição de salvamento com o preview em cache.
+        
+        O cliente pode enviar apenas o token do preview (ou a URL), opcionalmente
+        com suas edições como diff, em vez de reenviar todo o processo. Só os
+        itens editados ou adicionados são validados novamente.
+        
+        Args:
+            dados: Requisição de salvamento
+            
+        Returns:
+            Requisição com url, autuação, protocolos e andamentos preenchidos
+            
+        Raises:
+            ValueError: Se o token expirou, os dados foram omitidos sem preview
+                válido ou o diff é inconsistente com o preview
+        """
+        preview = None
+        url = dados.url
+        
+        if dados.preview_token:
+            preview = self.preview_cache.get_by_token(dados.preview_token)
+            if preview is None:
+                raise ValueError("Token de preview expirado ou inválido. Refaça o preview.")
+            if url and url != preview.url_original:
+                raise ValueError("A URL informada não corresponde ao token de preview.")
+            url = preview.url_original
+        elif None in (dados.autuacao, dados.protocolos, dados.andamentos):
+            if not url:
+                raise ValueError("Informe o token do preview ou a URL do processo.")
+            preview = self.preview_cache.get(url)
+            if preview is None:
+                # Sem preview, as seções omitidas seriam salvas vazias
+                raise ValueError(
+                    "Preview expirado ou inexistente para esta URL. Refaça o preview ou envie "
+                    "autuação, protocolos e andamentos completos."
+                )
+        elif not url:
+            raise ValueError("Informe a URL do processo.")
+        
+        if preview is None:
+            preview = ScrapingPreviewResponse.model_construct(protocolos=[], andamentos=[])
+        
+        # Campos enviados pelo cliente têm precedência sobre o preview
+        autuacao = dados.autuacao or preview.autuacao
+        protocolos = preview.protocolos if dados.protocolos is None else dados.protocolos
+        andamentos = preview.andamentos if dados.andamentos is None else dados.andamentos
+        
+        if dados.alteracoes:
+            alteracoes = dados.alteracoes
+            if alteracoes.autuacao:
+                autuacao = self._aplicar_campos(autuacao, alteracoes.autuacao, ProcessoInfoPreview)
+            protocolos = self._aplicar_alteracoes(protocolos, alteracoes.protocolos, ProtocoloInfoPreview)
+            andamentos = self._aplicar_alteracoes(andamentos, alteracoes.andamentos, AndamentoInfoPreview)
+        
+        return SalvarProcessoCompletoRequest.model_construct(
+            url=url,
+            autuacao=autuacao,
+            protocolos=protocolos,
+            andamentos=andamentos
+        )
+    
     def salvar_processo_completo(self, dados: SalvarProcessoCompletoRequest) -> SalvarProcessoCompletoResponse:
         """
         Salva processo completo com todos os dados relacionados.
         
         Args:
-            dados: Dados completos do processo para salvar
+            dados: Dados completos do processo para salvar (ver resolver_dados_salvamento)
             
         Returns:
             SalvarProcessoCompletoResponse com resultado da operação
@@ -89,65 +284,86 @@ class ScrapingPreviewService:
         logger.info(f"Iniciando salvamento completo do processo: {dados.autuacao.numero}")
         
         try:
-            db = SessionLocal()
+            db = self.session_factory()
             
             try:
-                # Criar processo principal
-                processo = Processo(
-                    numero=dados.autuacao.numero,
-                    tipo=dados.autuacao.tipo,
-                    assunto=dados.autuacao.tipo,  # Usar tipo como assunto por enquanto
-                    data_autuacao=self._parse_data_brasileira(dados.autuacao.data_autuacao),
-                    interessado=dados.autuacao.interessado or "Não informado",
-                    situacao="Importado do SEI",
-                    orgao_autuador="SEI-RJ",
-                    url_processo=dados.url,
-                    hash_conteudo=f"import_{dados.autuacao.numero}_{datetime.now().timestamp()}"
-                )
-                
-                db.add(processo)
-                db.flush()  # Para obter o ID
-                processo_id = processo.id
+                # Reimportação reaproveita o processo existente e insere só o que falta
+                processo_id = db.query(Processo.id).filter(
+                    Processo.numero == dados.autuacao.numero
+                ).scalar()
+                processo_existente = processo_id is not None
                 
-                # 2. Salvar protocolos/documentos
-                protocolos_salvos = 0
-                for protocolo in dados.protocolos:
-                    documento = Documento(
-                        processo_id=processo_id,
-                        numero_documento=protocolo.numero,
-                        tipo=protocolo.tipo,
-                        data_documento=self._parse_data_brasileira(protocolo.data),
-                        data_inclusao=self._parse_data_brasileira(protocolo.data_inclusao),
-                        unidade=protocolo.unidade
+                if not processo_existente:
+                    processo = Processo(
+                        numero=dados.autuacao.numero,
+                        tipo=dados.autuacao.tipo,
+                        assunto=dados.autuacao.tipo,  # Usar tipo como assunto por enquanto
+                        data_autuacao=self._parse_datas_brasileiras([dados.autuacao.data_autuacao])[0].date(),
+                        interessado=dados.autuacao.interessado or "Não informado",
+                        situacao="Importado do SEI",
+                        orgao_autuador="SEI-RJ",
+                        url_processo=dados.url,
+                        hash_conteudo=f"import_{dados.autuacao.numero}_{datetime.now().timestamp()}"
                     )
                     
-                    db.add(documento)
-                    protocolos_salvos += 1
+                    db.add(processo)
+                    db.flush()  # Para obter o ID
+                    processo_id = processo.id
                 
-                # 3. Salvar andamentos
-                andamentos_salvos = 0
-                for andamento in dados.andamentos:
-                    andamento_obj = Andamento(
-                        processo_id=processo_id,
-                        data_hora=self._parse_datetime_brasileira(andamento.data_hora),
-                        unidade=andamento.unidade,
-                        descricao=andamento.descricao
-                    )
-                    
-                    db.add(andamento_obj)
-                    andamentos_salvos += 1
+                # Datas convertidas em lote (uma conversão por valor distinto)
+                protocolos = dados.protocolos
+                datas = self._parse_datas_brasileiras(
+                    [p.data for p in protocolos] + [p.data_inclusao for p in protocolos]
+                )
+                datas_hora = self._parse_datetimes_brasileiras([a.data_hora for a in dados.andamentos])
+                
+                # Um INSERT em lote por tabela; linhas já existentes são ignoradas
+                protocolos_salvos = bulk_insert_ignore(db, Documento, [
+                    {
+                        "processo_id": processo_id,
+                        "numero_documento": protocolo.numero,
+                        "tipo": protocolo.tipo,
+                        "data_documento": datas[i].date(),
+                        "data_inclusao": datas[len(protocolos) + i].date(),
+                        "unidade": protocolo.unidade,
+                        "url_download": urljoin(dados.url, protocolo.url) if protocolo.url else None
+                    }
+                    for i, protocolo in enumerate(protocolos)
+                ])
+                count_new_documentos(db, protocolos_salvos)
+                andamentos_salvos = bulk_insert_ignore(db, Andamento, [
+                    {
+                        "processo_id": processo_id,
+                        "data_hora": data_hora,
+                        "unidade": andamento.unidade,
+                        "descricao": andamento.descricao
+                    }
+                    for andamento, data_hora in zip(dados.andamentos, datas_hora)
+                ])
                 
                 # Confirmar transação
                 db.commit()
                 
-                logger.info(f"Processo salvo com sucesso: ID {processo_id}")
+                # O preview já foi consumido
+                self.preview_cache.invalidate(dados.url)
+                
+                protocolos_ignorados = len(protocolos) - protocolos_salvos
+                andamentos_ignorados = len(dados.andamentos) - andamentos_salvos
+                logger.info(
+                    f"Processo salvo com sucesso: ID {processo_id} "
+                    f"({protocolos_salvos} protocolos e {andamentos_salvos} andamentos inseridos, "
+                    f"{protocolos_ignorados + andamentos_ignorados} já existentes)"
+                )
                 
+                acao = "atualizado" if processo_existente else "importado"
                 return SalvarProcessoCompletoResponse(
                     processo_id=processo_id,
                     protocolos_salvos=protocolos_salvos,
                     andamentos_salvos=andamentos_salvos,
+                    protocolos_ignorados=protocolos_ignorados,
+                    andamentos_ignorados=andamentos_ignorados,
                     sucesso=True,
-                    mensagem=f"Processo {dados.autuacao.numero} importado com sucesso!"
+                    mensagem=f"Processo {dados.autuacao.numero} {acao} com sucesso!"
                 )
                 
             except Exception as e:
@@ -167,6 +383,31 @@ class ScrapingPreviewService:
                 mensagem=f"Erro ao salvar processo: {str(e)}"
             )
     
+    def _aplicar_alteracoes(self, itens: List, alteracoes: AlteracoesLista, modelo) -> List:
+        """Aplica edições, remoções e inclusões sobre uma lista do preview"""
+        removidos = set(alteracoes.removidos)
+        invalidos = sorted(i for i in removidos | set(alteracoes.alterados) if not 0 <= i < len(itens))
+        if invalidos:
+            raise ValueError(f"Índices inexistentes no preview: {invalidos}")
+        
+        resultado = []
+        for indice, item in enumerate(itens):
+            if indice in removidos:
+                continue
+            campos = alteracoes.alterados.get(indice)
+            resultado.append(self._aplicar_campos(item, campos, modelo) if campos else item)
+        
+        resultado.extend(modelo.model_validate(novo) for novo in alteracoes.adicionados)
+        return resultado
+    
+    def _aplicar_campos(self, item, campos: Dict, modelo):
+        """Aplica campos alterados a um item, validando apenas o item resultante"""
+        desconhecidos = set(campos) - set(modelo.model_fields)
+        if desconhecidos:
+            raise ValueError(f"Campos inexistentes em {modelo.__name__}: {sorted(desconhecidos)}")
+        
+        return modelo.model_validate({**item.model_dump(), **campos})
+    
     def _validar_url_sei(self, url: str) -> bool:
         """Valida se a URL é do SEI-RJ"""
         return (
@@ -211,14 +452,29 @@ class ScrapingPreviewService:
     
     def _parse_data_brasileira(self, data_str: str) -> datetime:
         """Converte data brasileira DD/MM/AAAA para datetime"""
-        try:
-            return datetime.strptime(data_str, "%d/%m/%Y")
-        except ValueError:
-            return datetime.now()
+        return self._parse_datas_brasileiras([data_str])[0]
     
     def _parse_datetime_brasileira(self, datetime_str: str) -> datetime:
         """Converte datetime brasileiro DD/MM/AAAA HH:MM para datetime"""
-        try:
-            return datetime.strptime(datetime_str, "%d/%m/%Y %H:%M")
-        except ValueError:
-            return datetime.now() 
\ No newline at end of file
+        return self._parse_datetimes_brasileiras([datetime_str])[0]
+    
+    def _parse_datas_brasileiras(self, valores: List[str]) -> List[datetime]:
+        """
+        Converte em lote datas DD/MM/AAAA (valores inválidos viram o instante atual)
+        
+        Usa a conversão memorizada de app.scraper.dates; cada data distinta
+        vira datetime uma única vez.
+        """
+        agora = datetime.now()
+        datas = parse_dates(valores)
+        meia_noite = {data: datetime(data.year, data.month, data.day) for data in set(datas) if data is not None}
+        return [meia_noite.get(data, agora) for data in datas]
+    
+    def _parse_datetimes_brasileiras(self, valores: List[str]) -> List[datetime]:
+        """
+        Converte em lote datas/horas DD/MM/AAAA HH:MM (valores inválidos viram o instante atual)
+        
+        Usa a conversão memorizada de app.scraper.dates.
+        """
+        agora = datetime.now()
+        return [data_hora or agora for data_hora in parse_datetimes(valores)]
@@ -0,0 +1,369 @@
+"""
+Extração paralela de texto de PDFs baixados para Documento.detalhamento_texto
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from sqlalchemy import insert, or_
+from sqlalchemy.orm import Session
+
+from app.models.processo import Documento, DocumentoPagina
+from app.models.schemas import TextExtractionBatchResult, TextExtractionConfig, TextExtractionResult
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Separador entre páginas no texto persistido
+PAGE_SEPARATOR = "\n\n"
+
+
+class ExtractionTimeout(Exception):
+    """Tempo limite excedido dentro do processo worker"""
+
+
+def _init_worker(memory_limit_mb: Optional[int]):
+    """Inicializador dos processos do pool: aplica o limite de memória"""
+    if memory_limit_mb and resource is not None:
+        limit = memory_limit_mb * 1024 * 1024
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+@contextmanager
+def _time_limit(seconds: Optional[float]):
+    """Interrompe o bloco com ExtractionTimeout após `seconds` (POSIX, thread principal)"""
+    if not seconds or not hasattr(signal, "SIGALRM") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def handler(signum, frame):
+        raise ExtractionTimeout(f"Tempo limite de {seconds:.0f}s excedido")
+
+    previous = signal.signal(signal.SIGALRM, handler)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def count_pdf_pages(file_path: str, timeout_seconds: Optional[float] = None) -> int:
+    """
+    Conta as páginas de um PDF (executado no processo worker)
+
+    Args:
+        file_path: Caminho do PDF
+        timeout_seconds: Tempo limite
+
+    Returns:
+        Número de páginas
+    """
+    from PyPDF2 import PdfReader
+
+    with _time_limit(timeout_seconds):
+        return len(PdfReader(file_path).pages)
+
+
+def page_digest(page) -> str:
+    """
+    Digest do conteúdo de uma página PDF (streams de conteúdo e fontes usadas)
+
+    Independe da posição da página e do restante do arquivo: a mesma página
+    num arquivo regravado ou com páginas acrescentadas mantém o digest.
+
+    Args:
+        page: Página do PyPDF2
+
+    Returns:
+        Digest hexadecimal (128 bits)
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+
+    resources = page.get("/Resources")
+    fonts = resources.get_object().get("/Font") if resources is not None else None
+    if fonts is not None:
+        for name, font in sorted(fonts.get_object().items()):
+            font = font.get_object()
+            digest.update(f"{name}:{font.get('/BaseFont')}:{font.get('/Encoding')}".encode("utf-8", "replace"))
+
+    return digest.hexdigest()
+
+
+def extract_pdf_pages(file_path: str, start: int, end: int, timeout_seconds: Optional[float] = None,
+                      known_digests: FrozenSet[str] = frozenset()) -> List[Tuple[str, Optional[str]]]:
+    """
+    Extrai o texto de uma faixa de páginas (executado no processo worker)
+
+    Args:
+        file_path: Caminho do PDF
+        start: Primeira página (0-based, inclusive)
+        end: Última página (exclusive)
+        timeout_seconds: Tempo limite da faixa
+        known_digests: Digests de páginas com texto já em cache (não reextraídas)
+
+    Returns:
+        (digest, texto) de cada página da faixa; texto None se o digest é conhecido
+    """
+    from PyPDF2 import PdfReader
+
+    with _time_limit(timeout_seconds):
+        reader = PdfReader(file_path)
+        end = min(end, len(reader.pages))
+        pages = []
+        for index in range(start, end):
+            page = reader.pages[index]
+            digest = page_digest(page)
+            text = None if digest in known_digests else (page.extract_text() or "").strip()
+            pages.append((digest, text))
+        return pages
+
+
+class PDFTextExtractionService:
+    """
+    Extração de texto dos documentos baixados em um pool de processos
+
+    O parsing de PDF é CPU-bound, então cada arquivo é dividido em faixas de
+    páginas executadas em paralelo em processos separados. As faixas são
+    persistidas em ordem assim que ficam prontas; durante a extração o
+    documento fica com status 'extraindo' e só volta a 'pendente' (apto à
+    análise do LLM) ao final.
+
+    O texto de cada página fica em DocumentoPagina com o digest do conteúdo
+    da página: ao reextrair um arquivo baixado novamente, as páginas com
+    digest já conhecido reaproveitam o texto em cache.
+    """
+
+    def __init__(self, db_session: Session, config: Optional[Dict[str, Any]] = None,
+                 executor_factory: Optional[Callable[..., Any]] = None):
+        """
+        Inicializa o serviço
+
+        Args:
+            db_session: Sessão do banco de dados
+            config: Configuração de extração (TextExtractionConfig)
+            executor_factory: Fábrica do executor (padrão: ProcessPoolExecutor)
+        """
+        self.db = db_session
+        self.config = TextExtractionConfig(**(config or {}))
+        self.max_workers = self.config.max_workers or os.cpu_count() or 1
+        self._executor_factory = executor_factory or ProcessPoolExecutor
+        self._executor = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def close(self):
+        """Encerra o pool de processos"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def get_pending_documents(self, documento_ids: Optional[List[int]] = None) -> List[Documento]:
+        """
+        Documentos baixados ainda sem texto extraído
+
+        Documentos cuja extração falhou (status 'erro') não são repetidos.
+
+        Args:
+            documento_ids: Restringe a estes documentos
+
+        Returns:
+            Lista de documentos
+        """
+        query = self.db.query(Documento).filter(
+            Documento.downloaded == True,
+            Documento.arquivo_path.isnot(None),
+            Documento.detalhamento_texto.is_(None),
+            or_(Documento.detalhamento_status.is_(None), Documento.detalhamento_status != 'erro')
+        )
+        if documento_ids is not None:
+            query = query.filter(Documento.id.in_(documento_ids))
+        return query.all()
+
+    async def extract_documents(self, documento_ids: Optional[List[int]] = None) -> TextExtractionBatchResult:
+        """
+        Extrai o texto dos documentos pendentes
+
+        Args:
+            documento_ids: Restringe a estes documentos (padrão: todos os pendentes)
+
+        Returns:
+            Resultado da extração em lote
+        """
+        started_at = datetime.now()
+        documentos = self.get_pending_documents(documento_ids)
+
+        results = await asyncio.gather(*(self.extract_document(d) for d in documentos))
+        successful = sum(1 for r in results if r.success)
+
+        return TextExtractionBatchResult(
+            total_documents=len(documentos),
+            successful=successful,
+            failed=len(results) - successful,
+            total_pages=sum(r.extracted_pages for r in results),
+            results=list(results),
+            started_at=started_at,
+            completed_at=datetime.now()
+        )
+
+    async def extract_document(self, documento: Documento) -> TextExtractionResult:
+        """
+        Extrai o texto de um documento e o grava em detalhamento_texto
+
+        Args:
+            documento: Documento baixado
+
+        Returns:
+            Resultado da extração
+        """
+        started = time.monotonic()
+        deadline = started + self.config.file_timeout_seconds
+        file_path = documento.arquivo_path
+
+        if not file_path or not Path(file_path).is_file():
+            return self._finish(documento, started, error=f"Arquivo não encontrado: {file_path}")
+
+        try:
+            total_pages = await asyncio.wait_for(
+                self._run_in_pool(count_pdf_pages, file_path, self.config.task_timeout_seconds),
+                self.config.file_timeout_seconds
+            )
+        except Exception as e:
+            return self._finish(documento, started, error=f"PDF ilegível: {self._describe_error(e)}")
+
+        pages = total_pages if self.config.max_pages is None else min(total_pages, self.config.max_pages)
+        step = max(1, self.config.pages_per_task)
+        ranges = [(start, min(start + step, pages)) for start in range(0, pages, step)]
+
+        documento.detalhamento_status = 'extraindo'
+        self.db.commit()
+
+        # Texto das páginas da versão anterior do arquivo, pelo digest do conteúdo
+        cached = dict(self.db.query(DocumentoPagina.digest, DocumentoPagina.texto).filter(
+            DocumentoPagina.documento_id == documento.id
+        ).all())
+        known_digests = frozenset(cached)
+
+        # Todas as faixas entram na fila do pool; a persistência segue a ordem das páginas
+        tasks = [
+            asyncio.ensure_future(self._run_in_pool(
+                extract_pdf_pages, file_path, start, end, self.config.task_timeout_seconds, known_digests
+            ))
+            for start, end in ranges
+        ]
+
+        parts: List[str] = []
+        page_rows: List[Dict[str, Any]] = []
+        extracted = reused = failed = pages_with_text = 0
+        try:
+            for (start, end), task in zip(ranges, tasks):
+                try:
+                    pages_in_range = await asyncio.wait_for(task, max(0.0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    failed += pages - start
+                    parts.append(f"[Páginas {start + 1}-{pages} não extraídas: tempo limite do arquivo]")
+                    break
+                except Exception as e:
+                    failed += end - start
+                    parts.append(f"[Páginas {start + 1}-{end} não extraídas: {self._describe_error(e)}]")
+                    logger.warning(f"Falha na extração das páginas {start + 1}-{end} de {file_path}: {e}")
+                else:
+                    for offset, (digest, text) in enumerate(pages_in_range):
+                        if text is None:
+                            text = cached[digest]
+                            reused += 1
+                        else:
+                            extracted += 1
+                        page_rows.append({
+                            "documento_id": documento.id,
+                            "numero_pagina": start + offset + 1,
+                            "digest": digest,
+                            "texto": text
+                        })
+                        if text:
+                            parts.append(text)
+                            pages_with_text += 1
+
+                # Persistência incremental: o texto cresce a cada faixa concluída
+                documento.detalhamento_texto = PAGE_SEPARATOR.join(parts)
+                self.db.commit()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        # Substitui o cache de páginas pela versão atual do arquivo
+        self.db.query(DocumentoPagina).filter(DocumentoPagina.documento_id == documento.id).delete(
+            synchronize_session=False
+        )
+        if page_rows:
+            self.db.execute(insert(DocumentoPagina), page_rows)
+
+        if pages_with_text == 0:
+            return self._finish(documento, started, total_pages, extracted, failed, reused,
+                                error="Nenhum texto extraível (documento digitalizado ou ilegível)")
+
+        return self._finish(documento, started, total_pages, extracted, failed, reused)
+
+    def _finish(self, documento: Documento, started: float, total_pages: int = 0, extracted: int = 0,
+                failed: int = 0, reused: int = 0, error: Optional[str] = None) -> TextExtractionResult:
+        """Grava o status final do documento e monta o resultado"""
+        documento.detalhamento_status = 'erro' if error else 'pendente'
+        documento.updated_at = datetime.now()
+        self.db.commit()
+
+        if error:
+            logger.warning(f"Extração de texto do documento {documento.id} falhou: {error}")
+
+        return TextExtractionResult(
+            success=error is None,
+            documento_id=documento.id,
+            total_pages=total_pages,
+            extracted_pages=extracted,
+            reused_pages=reused,
+            failed_pages=failed,
+            characters=len(documento.detalhamento_texto or ""),
+            duration_seconds=time.monotonic() - started,
+            error_message=error
+        )
+
+    async def _run_in_pool(self, fn: Callable, *args):
+        """Executa uma tarefa no pool, limitando as tarefas enfileiradas"""
+        if self._executor is None:
+            self._executor = self._executor_factory(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(self.config.memory_limit_mb,)
+            )
+        if self._slots is None:
+            # Duas tarefas por worker mantêm o pool ocupado sem enfileirar o lote inteiro
+            self._slots = asyncio.Semaphore(self.max_workers * 2)
+
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _describe_error(self, error: Exception) -> str:
+        """Mensagem curta para erros vindos do worker"""
+        if isinstance(error, MemoryError):
+            return f"limite de memória ({self.config.memory_limit_mb} MB) excedido"
+        if isinstance(error, (ExtractionTimeout, asyncio.TimeoutError)):
+            return "tempo limite excedido"
+        return str(error) or type(error).__name__
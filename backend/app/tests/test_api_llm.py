@@ -184,7 +184,7 @@ class TestLLMAPI:
         response = client.get("/api/v1/llm/statistics")
         assert response.status_code == 200
         data = response.json()
-        assert data["total_documents_processed"] == 10
+        assert data["total_documents_processed"] == 8  # documentos com análise concluída
         assert data["successful_analyses"] == 8
         assert data["failed_analyses"] == 2
         assert data["processing_percentage"] == 80.0
@@ -328,4 +328,159 @@ class TestLLMAPI:
         
         response = client.post("/api/v1/llm/batch-analyze", json=invalid_data)
         assert response.status_code == 422
-        assert "detail" in response.json() 
\ No newline at end of file
+        assert "detail" in response.json() 
+
+class TestBatchStreamingAPI:
+    """Testes para análise em lote com streaming e acompanhamento de jobs"""
+    
+    @pytest.fixture
+    def llm_client(self, test_db):
+        """Cliente com LLMService cujas análises são simuladas"""
+        import json as json_module
+        from decimal import Decimal
+        from app.api.routes.llm import get_llm_service
+        from app.models.schemas import DocumentAnalysis
+        
+        service = LLMService(test_db, {"provider": "openai", "model": "gpt-4o-mini", "api_key": "test"})
+        
+        async def fake_analyze(documento_id):
+            return DocumentAnalysis(
+                documento_id=documento_id,
+                success=documento_id != 3,
+                model_used="gpt-4o-mini",
+                tokens_used=100 if documento_id != 3 else 0,
+                processing_time_seconds=0.1,
+                cost_usd=Decimal("0.001") if documento_id != 3 else Decimal("0"),
+                processed_at=datetime.now(),
+                error_message=None if documento_id != 3 else "Falha simulada"
+            )
+        
+        service.analyze_document = fake_analyze
+        
+        previous = dict(app.dependency_overrides)
+        app.dependency_overrides[get_llm_service] = lambda: service
+        try:
+            yield TestClient(app), json_module
+        finally:
+            app.dependency_overrides.clear()
+            app.dependency_overrides.update(previous)
+    
+    def test_batch_analyze_stream_emits_each_result(self, llm_client):
+        """Testa que o stream emite um evento por documento com totais acumulados"""
+        client, json_module = llm_client
+        
+        response = client.post("/api/v1/llm/batch-analyze/stream", json={"documento_ids": [1, 2, 3]})
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        events = [json_module.loads(line) for line in response.text.splitlines() if line]
+        
+        assert events[0]["event"] == "started"
+        results = [e for e in events if e["event"] == "result"]
+        assert sorted(e["result"]["documento_id"] for e in results) == [1, 2, 3]
+        assert [e["progress"]["completed"] for e in results] == [1, 2, 3]
+        
+        final = events[-1]
+        assert final["event"] == "completed"
+        assert final["progress"]["successful"] == 2
+        assert final["progress"]["failed"] == 1
+        assert final["progress"]["total_tokens_used"] == 200
+        
+        # O mesmo lote pode ser consultado pelo endpoint de status
+        job_id = response.headers["x-batch-job-id"]
+        status = client.get(f"/api/v1/llm/batch-jobs/{job_id}")
+        assert status.status_code == 200
+        assert status.json()["status"] == "concluido"
+        assert status.json()["completed"] == 3
+    
+    def test_batch_job_background_status(self, llm_client):
+        """Testa lote em background acompanhado por polling"""
+        client, _ = llm_client
+        
+        response = client.post("/api/v1/llm/batch-jobs", json={"documento_ids": [1, 2]})
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+        
+        status = client.get(f"/api/v1/llm/batch-jobs/{job_id}").json()
+        assert status["status"] == "concluido"
+        assert status["successful"] == 2
+        assert status["total_tokens_used"] == 200
+    
+    def test_batch_job_not_found(self, llm_client):
+        """Testa consulta de lote inexistente"""
+        client, _ = llm_client
+        
+        response = client.get("/api/v1/llm/batch-jobs/inexistente")
+        assert response.status_code == 404
+
+
+@pytest.mark.integration
+class TestLLMTelemetryAPI:
+    """Testes para os endpoints de telemetria de chamadas"""
+    
+    @pytest.fixture
+    def telemetry_client(self, test_db):
+        """Cliente com telemetria de duas chamadas registrada"""
+        from datetime import timedelta
+        from decimal import Decimal
+        from app.api.routes.llm import get_llm_service
+        
+        service = LLMService(test_db, {"provider": "openai", "model": "gpt-4o-mini", "api_key": "test"})
+        now = datetime.now()
+        service.telemetry.record_calls([
+            {"provider": "openai", "modelo": "gpt-4o-mini", "prompt_tokens": 800, "completion_tokens": 200,
+             "latencia_ms": latency, "tentativas": retries, "custo_usd": Decimal("0.001"), "created_at": created_at}
+            for latency, retries, created_at in [(400, 0, now), (1500, 2, now), (300, 0, now - timedelta(hours=2))]
+        ])
+        test_db.commit()
+        
+        previous = dict(app.dependency_overrides)
+        app.dependency_overrides[get_llm_service] = lambda: service
+        try:
+            yield TestClient(app)
+        finally:
+            app.dependency_overrides.clear()
+            app.dependency_overrides.update(previous)
+    
+    def test_call_statistics_buckets(self, telemetry_client):
+        """Testa série horária com percentis de latência"""
+        response = telemetry_client.get("/api/v1/llm/statistics/calls", params={"since_hours": 24})
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["granularity"] == "hour"
+        assert [b["calls"] for b in data["buckets"]] == [1, 2]
+        latest = data["buckets"][-1]
+        assert latest["retries"] == 2
+        assert latest["prompt_tokens"] == 1600
+        assert latest["p50_latency_ms"] <= latest["p95_latency_ms"]
+    
+    def test_statistics_uses_telemetry_totals(self, telemetry_client):
+        """Testa que os totais vêm da telemetria, não de estimativas"""
+        data = telemetry_client.get("/api/v1/llm/statistics").json()
+        
+        assert data["total_tokens_used"] == 3000
+        assert float(data["total_cost_usd"]) == pytest.approx(0.003)
+    
+    def test_statistics_counts_only_analyzed_documents(self, telemetry_client, test_db):
+        """Testa que documentos processados são os analisados, não todos os documentos"""
+        processo = Processo(numero="SEI-260002/002172/2025", tipo="Administrativo", data_autuacao=date(2025, 3, 18))
+        test_db.add(processo)
+        test_db.commit()
+        test_db.add_all([
+            Documento(processo_id=processo.id, numero_documento=str(n), detalhamento_status=status)
+            for n, status in enumerate(["concluido", "concluido", "erro", "pendente"])
+        ])
+        test_db.commit()
+        
+        data = telemetry_client.get("/api/v1/llm/statistics").json()
+        
+        assert data["total_documents_processed"] == 2
+        assert (data["successful_analyses"], data["failed_analyses"]) == (2, 1)
+        assert data["processing_percentage"] == 50.0
+        assert data["most_used_model"] == "gpt-4o-mini"
+    
+    def test_call_statistics_invalid_granularity(self, telemetry_client):
+        """Testa validação da granularidade"""
+        response = telemetry_client.get("/api/v1/llm/statistics/calls", params={"granularity": "week"})
+        assert response.status_code == 422
@@ -212,6 +212,63 @@ class TestDatabaseConstraints:
             test_db.commit()
 
 
+@pytest.mark.db
+class TestSchemaUpgrade:
+    """Testes da atualização de bases criadas por versões anteriores"""
+
+    @pytest.fixture
+    def legacy_engine(self):
+        """Banco com processos/documentos no formato anterior às colunas novas"""
+        from sqlalchemy import create_engine
+        from sqlalchemy.pool import StaticPool
+
+        engine = create_engine("sqlite:///:memory:", poolclass=StaticPool,
+                               connect_args={"check_same_thread": False})
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE processos (id INTEGER PRIMARY KEY, numero VARCHAR(50) NOT NULL UNIQUE, "
+                "hash_conteudo VARCHAR(100))"
+            ))
+            conn.execute(text(
+                "CREATE TABLE documentos (id INTEGER PRIMARY KEY, processo_id INTEGER NOT NULL "
+                "REFERENCES processos(id), numero_documento VARCHAR(50), arquivo_path VARCHAR(500), "
+                "downloaded BOOLEAN)"
+            ))
+            conn.execute(text("INSERT INTO processos (id, numero) VALUES (1, 'SEI-260002/002172/2025')"))
+            conn.execute(text(
+                "INSERT INTO documentos (id, processo_id, numero_documento, downloaded) VALUES (1, 1, '1', 1)"
+            ))
+        yield engine
+        engine.dispose()
+
+    def test_upgrade_adds_missing_columns_and_indexes(self, legacy_engine):
+        """Testa ALTER TABLE das colunas novas, default nas linhas antigas e consultas pelo ORM"""
+        from sqlalchemy import inspect
+        from sqlalchemy.orm import sessionmaker
+        from app.database.connection import Base, upgrade_schema
+        from app.models.processo import Documento, Processo
+
+        Base.metadata.create_all(bind=legacy_engine)
+        created = upgrade_schema(legacy_engine)
+
+        assert {"processos.digest_secoes", "processos.proxima_verificacao", "documentos.url_download",
+                "documentos.arquivo_hash", "documentos.download_falhas"} <= set(created)
+        assert "ix_processos_proxima_verificacao" in created
+        indexes = {i["name"] for i in inspect(legacy_engine).get_indexes("processos")}
+        assert "ix_processos_proxima_verificacao" in indexes
+
+        db = sessionmaker(bind=legacy_engine)()
+        try:
+            documento = db.query(Documento).one()
+            assert documento.downloaded and documento.download_falhas == 0
+            assert db.query(Processo).filter(Processo.proxima_verificacao.is_(None)).count() == 1
+        finally:
+            db.close()
+
+        # Segunda execução não altera nada
+        assert upgrade_schema(legacy_engine) == []
+
+
 @pytest.mark.integration  
 class TestDatabaseIntegration:
     """Testes de integração do banco"""
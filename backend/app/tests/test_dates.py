@@ -0,0 +1,43 @@
+"""
+Testes para a conversão de datas do SEI
+"""
+from datetime import date, datetime
+
+import pytest
+
+from app.scraper.dates import parse_date, parse_dates, parse_datetime, parse_datetimes
+
+
+@pytest.mark.unit
+class TestSEIDates:
+    """Testes da conversão memorizada de DD/MM/AAAA e DD/MM/AAAA HH:MM"""
+    
+    def test_fixed_width_and_short_fields(self):
+        """Testa largura fixa, dia/mês com um dígito e espaços nas pontas"""
+        assert parse_date("16/07/2024") == date(2024, 7, 16)
+        assert parse_date(" 1/2/2025 ") == date(2025, 2, 1)
+        assert parse_datetime("26/06/2025 17:44") == datetime(2025, 6, 26, 17, 44)
+        assert parse_datetime("6/6/2025 7:05") == datetime(2025, 6, 6, 7, 5)
+    
+    @pytest.mark.parametrize("valor", [
+        None, "", "data_inválida", "31/02/2025", "16/07/24", "+1/07/2024", "16/07/2024 17:44", "16-07-2024"
+    ])
+    def test_invalid_dates_are_none(self, valor):
+        """Testa que valores fora do formato ou datas inexistentes viram None"""
+        assert parse_date(valor) is None
+    
+    @pytest.mark.parametrize("valor", ["16/07/2024", "26/06/2025 24:00", "26/06/2025 17:44:10", "26/06/2025T17:44"])
+    def test_invalid_datetimes_are_none(self, valor):
+        """Testa que data sem hora, hora inexistente ou outro separador viram None"""
+        assert parse_datetime(valor) is None
+    
+    def test_batch_reuses_repeated_values(self):
+        """Testa a conversão de colunas inteiras com valores repetidos"""
+        parse_date.cache_clear()
+        
+        datas = parse_dates(["15/01/2025", "invalida", "15/01/2025"] * 100)
+        
+        assert datas[:3] == [date(2025, 1, 15), None, date(2025, 1, 15)]
+        assert datas[0] is datas[299]
+        assert parse_date.cache_info().misses == 2
+        assert parse_datetimes(["16/01/2025 14:05", ""]) == [datetime(2025, 1, 16, 14, 5), None]
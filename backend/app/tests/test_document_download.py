@@ -12,8 +12,9 @@ from unittest.mock import Mock, AsyncMock, patch, MagicMock
 from sqlalchemy.orm import Session
 
 from app.services.document_download import DocumentDownloadService, DownloadResult, BatchDownloadResult
-from app.models.processo import Processo, Documento
-from app.models.schemas import DocumentoInDB
+from app.models.processo import Processo, Documento, DownloadAgregado, DownloadTentativa
+from app.models.schemas import DocumentoData, DocumentoInDB
+from app.services.persistence import ProcessoPersistenceService
 
 
 @pytest.mark.unit
@@ -332,9 +333,11 @@ class TestDocumentDownloadService:
     
     def test_get_download_statistics(self, download_service, db_session):
         """Testa obtenção de estatísticas de download"""
-        # Mock das queries retornando números
-        db_session.query.return_value.count.return_value = 20  # Total docs
-        db_session.query.return_value.filter.return_value.count.return_value = 10  # Downloaded docs
+        # Todos os totais vêm da linha agregada
+        db_session.query.return_value.filter.return_value.first.return_value = DownloadAgregado(
+            id=1, documentos_total=20, documentos_baixados=10, documentos_com_falha=2, arquivos_bytes=5 * 1024 * 1024,
+            tentativas=14, tentativas_falhas=4, bytes_transferidos=5 * 1024 * 1024, duracao_sucesso_ms=10000
+        )
         
         stats = download_service.get_download_statistics()
         
@@ -346,6 +349,11 @@ class TestDocumentDownloadService:
         assert stats.downloaded_documents == 10
         assert stats.pending_downloads == 10
         assert stats.download_percentage == 50.0
+        assert stats.failed_downloads == 2
+        assert stats.total_file_size_mb == 5.0
+        assert stats.failure_rate == 4 / 14
+        assert stats.average_duration_seconds == 1.0
+        assert stats.average_throughput_kbps == 512.0
     
     @pytest.mark.asyncio
     async def test_cleanup_failed_downloads(self, download_service, temp_download_dir):
@@ -363,6 +371,362 @@ class TestDocumentDownloadService:
         assert complete_file.exists()  # Arquivo completo deve permanecer
 
 
+@pytest.mark.unit
+class TestDownloadScheduler:
+    """Testes da fila contínua de downloads"""
+    
+    @pytest.mark.asyncio
+    async def test_small_first_with_host_fairness(self):
+        """Testa ordem de início: rodízio entre hosts e menores primeiro em cada host"""
+        from app.services.download_scheduler import DownloadJob, DownloadScheduler
+        
+        scheduler = DownloadScheduler(concurrency=1)
+        for index, (url, size) in enumerate([
+            ("https://a.gov.br/1", 5000), ("https://a.gov.br/2", None), ("https://a.gov.br/3", 10),
+            ("https://b.gov.br/1", 300), ("https://b.gov.br/2", 20)
+        ]):
+            scheduler.add(DownloadJob(index, url, size=size))
+        
+        started = []
+        
+        async def worker(job):
+            started.append(job.url)
+        
+        await scheduler.run(worker)
+        
+        assert started == [
+            "https://a.gov.br/3", "https://b.gov.br/2", "https://a.gov.br/1",
+            "https://b.gov.br/1", "https://a.gov.br/2"
+        ]
+    
+    @pytest.mark.asyncio
+    async def test_per_host_limit(self):
+        """Testa limite de downloads simultâneos por host"""
+        import asyncio
+        from app.services.download_scheduler import DownloadJob, DownloadScheduler
+        
+        scheduler = DownloadScheduler(concurrency=4, per_host_limit=1)
+        for index in range(6):
+            scheduler.add(DownloadJob(index, f"https://{'ab'[index % 2]}.gov.br/{index}"))
+        
+        active = {"a.gov.br": 0, "b.gov.br": 0}
+        peak = {"a.gov.br": 0, "b.gov.br": 0}
+        
+        async def worker(job):
+            active[job.host] += 1
+            peak[job.host] = max(peak[job.host], active[job.host])
+            await asyncio.sleep(0.01)
+            active[job.host] -= 1
+        
+        await scheduler.run(worker)
+        
+        assert peak == {"a.gov.br": 1, "b.gov.br": 1}
+    
+    @pytest.mark.asyncio
+    async def test_batch_download_slow_file_does_not_stall_slots(self, tmp_path):
+        """Testa que um arquivo lento não trava as demais vagas e que o progresso é contínuo"""
+        import asyncio
+        import time
+        
+        service = DocumentDownloadService(Mock(spec=Session), {
+            'download_base_path': str(tmp_path),
+            'concurrent_downloads': 2,
+            'delay_between_downloads': 0
+        })
+        
+        async def fake_download(documento, url):
+            await asyncio.sleep(0.5 if documento.id == 1 else 0.05)
+            return DownloadResult(success=True, documento_id=documento.id, file_size=documento.id * 100)
+        
+        documentos_data = [
+            {'documento': Documento(id=i, numero_documento=f"doc{i}"), 'url': f"https://sei.rj.gov.br/doc{i}.php"}
+            for i in range(1, 9)
+        ]
+        updates = []
+        
+        with patch.object(service, 'download_document', side_effect=fake_download):
+            inicio = time.perf_counter()
+            result = await service.batch_download(
+                documentos_data, progress_callback=lambda r, p: updates.append((r.documento_id, p))
+            )
+            duracao = time.perf_counter() - inicio
+        
+        # Em lotes de 2 seriam 0.5 + 3 x 0.05 = 0.65s; em fila contínua ~0.5s
+        assert duracao < 0.6
+        assert result.successful_downloads == 8
+        assert [r.documento_id for r in result.results] == list(range(1, 9))
+        assert [p.completed for _, p in updates] == list(range(1, 9))
+        assert updates[-1][1].bytes_downloaded == sum(i * 100 for i in range(1, 9))
+        assert updates[-1][0] == 1
+
+
+class FakeSEIServer:
+    """Servidor HTTP simulado com suporte a Range e queda de conexão"""
+    
+    def __init__(self, data, etag='"v1"', fail_after=None):
+        self.data = data
+        self.etag = etag
+        self.fail_after = fail_after  # bytes enviados antes de derrubar a conexão
+        self.requests = []
+    
+    def session(self, *args, **kwargs):
+        server = self
+        
+        class Response:
+            def __init__(self, headers):
+                self.requests_headers = headers
+                start = 0
+                range_header = headers.get('Range')
+                if range_header and headers.get('If-Range') in (None, server.etag):
+                    start = int(range_header.split('=')[1].rstrip('-'))
+                self.start = start
+                self.status = 206 if start else 200
+                self.headers = {'ETag': server.etag, 'content-type': 'application/pdf',
+                                'Content-Length': str(len(server.data) - start)}
+                if start:
+                    self.headers['Content-Range'] = f"bytes {start}-{len(server.data) - 1}/{len(server.data)}"
+                self.content = self
+            
+            async def iter_chunked(self, size):
+                sent = 0
+                for offset in range(self.start, len(server.data), size):
+                    if server.fail_after is not None and sent >= server.fail_after:
+                        server.fail_after = None
+                        raise ConnectionResetError("Conexão perdida")
+                    chunk = server.data[offset:offset + size]
+                    sent += len(chunk)
+                    yield chunk
+            
+            async def __aenter__(self):
+                return self
+            
+            async def __aexit__(self, *exc):
+                return False
+        
+        class Session:
+            def get(self, url, headers=None):
+                server.requests.append(dict(headers or {}))
+                return Response(headers or {})
+            
+            async def __aenter__(self):
+                return self
+            
+            async def __aexit__(self, *exc):
+                return False
+        
+        return Session()
+
+
+@pytest.mark.unit
+class TestResumableDownload:
+    """Testes de retomada de downloads com Range"""
+    
+    DATA = bytes(range(256)) * 400  # ~100 KB
+    
+    @pytest.fixture
+    def service(self, tmp_path):
+        return DocumentDownloadService(Mock(spec=Session), {
+            'download_base_path': str(tmp_path), 'chunk_size': 4096
+        })
+    
+    @pytest.mark.asyncio
+    async def test_retry_resumes_from_partial(self, service, tmp_path):
+        """Testa que a nova tentativa continua do último byte gravado"""
+        import hashlib
+        
+        server = FakeSEIServer(self.DATA, fail_after=40960)
+        file_path = str(tmp_path / "doc.pdf")
+        
+        with patch('app.services.document_download.aiohttp.ClientSession', server.session), \
+             patch.object(service, '_rehash_partial', wraps=service._rehash_partial) as rehash:
+            with pytest.raises(ConnectionResetError):
+                await service._perform_download("https://sei.rj.gov.br/doc.php", file_path)
+            assert Path(file_path + ".part").stat().st_size == 40960
+            
+            result = await service._perform_download("https://sei.rj.gov.br/doc.php", file_path)
+        
+        assert result['success'] is True
+        assert server.requests[1]['Range'] == "bytes=40960-"
+        assert server.requests[1]['If-Range'] == '"v1"'
+        assert Path(file_path).read_bytes() == self.DATA
+        assert result['file_hash'] == hashlib.sha256(self.DATA).hexdigest()
+        assert not rehash.called  # hash continuado a partir do checkpoint em memória
+        assert not Path(file_path + ".part").exists()
+        assert not Path(file_path + ".part.json").exists()
+    
+    @pytest.mark.asyncio
+    async def test_resume_after_restart_and_changed_file(self, service, tmp_path):
+        """Testa retomada em novo processo e reinício quando o ETag muda"""
+        import hashlib
+        
+        server = FakeSEIServer(self.DATA, fail_after=8192)
+        file_path = str(tmp_path / "doc.pdf")
+        
+        with patch('app.services.document_download.aiohttp.ClientSession', server.session):
+            with pytest.raises(ConnectionResetError):
+                await service._perform_download("https://sei.rj.gov.br/doc.php", file_path)
+            
+            # Novo serviço (reinício): hash reconstruído do disco
+            restarted = DocumentDownloadService(Mock(spec=Session), {'download_base_path': str(tmp_path)})
+            result = await restarted._perform_download("https://sei.rj.gov.br/doc.php", file_path)
+            assert result['file_hash'] == hashlib.sha256(self.DATA).hexdigest()
+            
+            # Arquivo alterado no servidor: If-Range falha e o download recomeça
+            Path(file_path).unlink()
+            server.fail_after = 8192
+            with pytest.raises(ConnectionResetError):
+                await service._perform_download("https://sei.rj.gov.br/doc.php", file_path)
+            server.data, server.etag = self.DATA[::-1], '"v2"'
+            result = await service._perform_download("https://sei.rj.gov.br/doc.php", file_path)
+        
+        assert Path(file_path).read_bytes() == self.DATA[::-1]
+        assert result['file_hash'] == hashlib.sha256(self.DATA[::-1]).hexdigest()
+    
+    @pytest.mark.asyncio
+    async def test_cleanup_keeps_resumable_partials(self, service, tmp_path):
+        """Testa que a limpeza distingue parciais retomáveis de corrompidos"""
+        import json
+        
+        (tmp_path / "retomavel.pdf.part").write_bytes(b"x" * 100)
+        (tmp_path / "retomavel.pdf.part.json").write_text(json.dumps({"etag": '"v1"', "total_size": 500, "offset": 100}))
+        (tmp_path / "sem_meta.pdf.part").write_bytes(b"x" * 100)
+        (tmp_path / "truncado.pdf.part").write_bytes(b"x" * 10)
+        (tmp_path / "truncado.pdf.part.json").write_text(json.dumps({"etag": '"v1"', "total_size": 500, "offset": 100}))
+        (tmp_path / "orfao.pdf.part.json").write_text("{}")
+        
+        removed = await service.cleanup_failed_downloads(str(tmp_path))
+        
+        assert removed == 4
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["retomavel.pdf.part", "retomavel.pdf.part.json"]
+
+
+@pytest.mark.unit
+class TestDownloadStatisticsAggregate:
+    """Testes dos totais de download mantidos incrementalmente"""
+    
+    @pytest.fixture
+    def service(self, test_db, tmp_path):
+        return DocumentDownloadService(test_db, {'download_base_path': str(tmp_path)})
+    
+    @pytest.fixture
+    def documentos(self, test_db):
+        processo = Processo(numero="SEI-260002/002172/2025", tipo="Administrativo", data_autuacao=date(2025, 3, 18))
+        test_db.add(processo)
+        test_db.commit()
+        docs = [Documento(processo_id=processo.id, numero_documento=str(n)) for n in range(3)]
+        test_db.add_all(docs)
+        test_db.commit()
+        return docs
+    
+    @staticmethod
+    def _aggregate_values(test_db):
+        row = test_db.query(DownloadAgregado).one()
+        return (row.documentos_baixados, row.documentos_com_falha, row.arquivos_bytes, row.tentativas,
+                row.tentativas_falhas, row.bytes_transferidos, row.duracao_sucesso_ms)
+    
+    @pytest.mark.asyncio
+    async def test_statistics_follow_downloads_and_failures(self, service, documentos, test_db):
+        """Testa bytes, falhas e taxa de falha sem recontar documentos"""
+        a, b, _ = documentos
+        url = "https://sei.rj.gov.br/doc.php"
+        
+        await service.update_documento_status(a, "/tmp/a.pdf", 1024, "h1", duration_ms=500, download_url=url)
+        service.record_download_failure(b, "HTTP 503", 300, download_url=url, retry_count=2)
+        service.record_download_failure(b, "HTTP 503", 300, download_url=url, retry_count=2)
+        
+        stats = service.get_download_statistics()
+        assert (stats.total_documents, stats.downloaded_documents, stats.pending_downloads) == (3, 1, 2)
+        assert stats.failed_downloads == 1
+        assert stats.failure_rate == 2 / 3
+        assert b.download_falhas == 2
+        
+        # Sucesso após falhas e novo download de um arquivo maior
+        await service.update_documento_status(b, "/tmp/b.pdf", 2048, "h2", duration_ms=1500, download_url=url)
+        await service.update_documento_status(a, "/tmp/a.pdf", 4096, "h3", duration_ms=500, download_url=url)
+        
+        stats = service.get_download_statistics()
+        assert (stats.downloaded_documents, stats.failed_downloads) == (2, 0)
+        assert stats.total_file_size_mb == 6144 / (1024 * 1024)
+        assert (stats.total_attempts, stats.failed_attempts) == (5, 2)
+        assert stats.average_throughput_kbps == 7 / 2.5
+        assert stats.last_download_at == a.downloaded_at
+        assert b.download_erro is None
+        assert test_db.query(DownloadTentativa).count() == 5
+        
+        # Recalcular do zero reproduz os totais incrementais
+        incremental = self._aggregate_values(test_db)
+        service.rebuild_download_statistics()
+        assert self._aggregate_values(test_db) == incremental
+    
+    def test_statistics_without_downloads(self, service, documentos):
+        """Testa estatísticas antes de qualquer download"""
+        stats = service.get_download_statistics()
+        
+        assert (stats.total_documents, stats.downloaded_documents, stats.failed_downloads) == (3, 0, 0)
+        assert stats.average_throughput_kbps is None
+
+    @pytest.mark.asyncio
+    async def test_statistics_count_documents_downloaded_before_aggregate(self, service, documentos, test_db):
+        """Testa que documentos já baixados numa base antiga entram nos totais"""
+        a, b, _ = documentos
+        a.downloaded, a.arquivo_tamanho = True, 1024
+        test_db.commit()
+        assert test_db.query(DownloadAgregado).count() == 0
+
+        await service.update_documento_status(b, "/tmp/b.pdf", 2048, "h2", duration_ms=500)
+
+        stats = service.get_download_statistics()
+        assert (stats.downloaded_documents, stats.pending_downloads) == (2, 1)
+        assert stats.total_file_size_mb == 3072 / (1024 * 1024)
+
+    def test_get_statistics_seeds_missing_aggregate(self, service, documentos, test_db):
+        """Testa que a primeira leitura cria os totais a partir das tabelas"""
+        documentos[0].downloaded = True
+        test_db.commit()
+
+        stats = service.get_download_statistics()
+
+        assert (stats.downloaded_documents, stats.pending_downloads) == (1, 2)
+        assert test_db.query(DownloadAgregado).count() == 1
+
+    @pytest.mark.asyncio
+    async def test_document_total_follows_inserts_without_count(self, service, documentos, test_db):
+        """Testa que documentos inseridos pelo merge entram no total mantido na linha agregada"""
+        service.get_download_statistics()
+        persistence = ProcessoPersistenceService(test_db)
+
+        novos = [DocumentoData(numero_documento=n) for n in ("0", "10", "11")]
+        assert await persistence.merge_documentos(documentos[0].processo_id, novos) == 2
+
+        with patch.object(test_db, "query", wraps=test_db.query) as query:
+            stats = service.get_download_statistics()
+        assert stats.total_documents == 5
+        assert not any(str(arg).startswith("count(") for call in query.call_args_list for arg in call.args)
+        assert test_db.query(DownloadAgregado).one().documentos_total == 5
+
+    def test_missing_document_total_is_counted_once(self, service, documentos, test_db):
+        """Testa a recontagem do total quando a coluna acabou de ser criada (NULL)"""
+        service.get_download_statistics()
+        test_db.query(DownloadAgregado).one().documentos_total = None
+        test_db.commit()
+
+        assert service.get_download_statistics().total_documents == 3
+        assert test_db.query(DownloadAgregado).one().documentos_total == 3
+
+    def test_uploaded_file_counts_as_downloaded(self, service, documentos, test_db):
+        """Testa que o upload manual incrementa os documentos baixados"""
+        service.get_download_statistics()
+        upload = Documento(processo_id=documentos[0].processo_id, numero_documento="DOC-upload")
+
+        service.register_uploaded_file(upload, "/tmp/upload.pdf", 512, "h4")
+
+        stats = service.get_download_statistics()
+        assert (stats.total_documents, stats.downloaded_documents, stats.pending_downloads) == (4, 1, 3)
+        assert stats.total_file_size_mb == 512 / (1024 * 1024)
+        assert upload.downloaded and upload.arquivo_hash == "h4"
+        assert stats.total_attempts == 0
+
+
 @pytest.mark.integration  
 class TestDocumentDownloadIntegration:
     """Testes de integração para download de documentos"""
@@ -626,4 +626,353 @@ class TestLLMServiceIntegration:
             # Verifica se todos foram processados
             for doc in documentos:
                 test_db.refresh(doc)
-                assert doc.detalhamento_status == "concluido" 
\ No newline at end of file
+                assert doc.detalhamento_status == "concluido" 
+
+@pytest.fixture
+def documento_para_analise(test_db):
+    """Documento persistido com texto para análise"""
+    processo = Processo(
+        numero="SEI-260002/002172/2025",
+        tipo="Administrativo",
+        data_autuacao=datetime(2025, 1, 15).date()
+    )
+    test_db.add(processo)
+    test_db.commit()
+    
+    documento = Documento(
+        processo_id=processo.id,
+        numero_documento="12345678",
+        tipo="Despacho",
+        detalhamento_texto="Despacho de encaminhamento para análise."
+    )
+    test_db.add(documento)
+    test_db.commit()
+    test_db.refresh(documento)
+    return documento
+
+
+@pytest.mark.unit
+class TestLLMServiceSaveResults:
+    """Testes da persistência em lote de tags e entidades"""
+    
+    @pytest.mark.asyncio
+    async def test_save_analysis_results_inserts_only_new(self, test_db, llm_config, documento_para_analise):
+        """Testa que apenas tags/entidades novas são inseridas"""
+        doc_id = documento_para_analise.id
+        test_db.add(DocumentoTag(documento_id=doc_id, tag="despacho", origem="manual"))
+        test_db.add(DocumentoEntidade(documento_id=doc_id, tipo_entidade="PESSOA", valor="Maria Silva"))
+        test_db.commit()
+        
+        service = LLMService(test_db, llm_config)
+        await service._save_analysis_results(doc_id, {
+            "tags": ["despacho", "urgente", "urgente"],
+            "entities": [
+                {"type": "PESSOA", "value": "Maria Silva", "confidence": 0.9},
+                {"type": "VALOR", "value": "R$ 1.000,00", "confidence": 0.8},
+                {"type": "VALOR", "value": "R$ 1.000,00", "confidence": 0.8}
+            ]
+        })
+        test_db.commit()
+        
+        tags = sorted(t.tag for t in test_db.query(DocumentoTag).filter_by(documento_id=doc_id))
+        entidades = test_db.query(DocumentoEntidade).filter_by(documento_id=doc_id).all()
+        assert tags == ["despacho", "urgente"]
+        assert len(entidades) == 2
+        assert {e.tipo_entidade for e in entidades} == {"PESSOA", "VALOR"}
+    
+    @pytest.mark.asyncio
+    async def test_save_analysis_results_constant_round_trips(self, test_db, test_engine, llm_config,
+                                                              documento_para_analise):
+        """Testa que o número de comandos SQL não cresce com o número de entidades"""
+        from sqlalchemy import event
+        
+        statements = []
+        
+        def count_statements(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        service = LLMService(test_db, llm_config)
+        analysis = {
+            "tags": [f"tag{i}" for i in range(40)],
+            "entities": [{"type": "PESSOA", "value": f"Pessoa {i}", "confidence": 0.9} for i in range(40)]
+        }
+        
+        event.listen(test_engine, "before_cursor_execute", count_statements)
+        try:
+            await service._save_analysis_results(documento_para_analise.id, analysis)
+        finally:
+            event.remove(test_engine, "before_cursor_execute", count_statements)
+        test_db.commit()
+        
+        assert len(statements) <= 4
+        assert test_db.query(DocumentoEntidade).count() == 40
+    
+    @pytest.mark.asyncio
+    async def test_analyze_document_commits_results_with_status(self, test_db, llm_config, documento_para_analise):
+        """Testa que resultados e status são confirmados juntos"""
+        service = LLMService(test_db, llm_config)
+        
+        with patch.object(service, '_call_llm_api') as mock_api:
+            mock_api.return_value = {
+                "summary": "Despacho",
+                "entities": [{"type": "DOCUMENTO", "value": "Despacho", "confidence": 0.9}],
+                "tags": ["despacho"],
+                "confidence": 0.9,
+                "tokens_used": 300,
+                "prompt_tokens": 250,
+                "completion_tokens": 50
+            }
+            with patch.object(service, '_update_document_status', wraps=service._update_document_status) as mock_status:
+                mock_status.side_effect = [None, Exception("falha no commit"), None]
+                result = await service.analyze_document(documento_para_analise.id)
+        
+        # Falha ao confirmar o status descarta também as tags/entidades
+        assert result.success is False
+        assert test_db.query(DocumentoTag).count() == 0
+        assert test_db.query(DocumentoEntidade).count() == 0
+
+
+@pytest.mark.unit
+class TestBatchProgress:
+    """Testes do acompanhamento incremental de lotes"""
+    
+    def _analysis(self, documento_id, success=True, tokens=100):
+        return DocumentAnalysis(
+            documento_id=documento_id,
+            success=success,
+            model_used="gpt-4o-mini",
+            tokens_used=tokens if success else 0,
+            processing_time_seconds=0.1,
+            cost_usd=Decimal("0.001") if success else Decimal("0"),
+            processed_at=datetime.now()
+        )
+    
+    def test_progress_totals_and_eta(self):
+        """Testa totais acumulados e estimativa de tempo restante"""
+        from app.services.batch_progress import BatchProgress
+        
+        progress = BatchProgress(total_documents=4)
+        progress.record(self._analysis(1))
+        progress.record(self._analysis(2, success=False))
+        
+        snapshot = progress.snapshot()
+        assert snapshot.completed == 2
+        assert snapshot.successful == 1
+        assert snapshot.failed == 1
+        assert snapshot.total_tokens_used == 100
+        assert snapshot.total_cost_usd == Decimal("0.001")
+        assert snapshot.eta_seconds is not None
+        
+        progress.finish()
+        assert progress.snapshot().status == "concluido"
+        assert progress.snapshot().eta_seconds is None
+    
+    def test_store_evicts_finished_jobs_after_ttl(self):
+        """Testa expiração de lotes encerrados"""
+        from app.services.batch_progress import BatchProgressStore
+        
+        store = BatchProgressStore(ttl_seconds=60)
+        progress = store.create(1)
+        assert store.get(progress.job_id) is progress
+        assert store.list_active() == [progress]
+        
+        progress.finish()
+        progress.finished_at = datetime.now() - timedelta(minutes=5)
+        assert store.get(progress.job_id) is None
+    
+    @pytest.mark.asyncio
+    async def test_iter_batch_analysis_yields_as_completed(self, test_db, llm_config):
+        """Testa que resultados são emitidos por ordem de conclusão e falhas viram resultados"""
+        import asyncio
+        from app.services.batch_progress import BatchProgress
+        
+        service = LLMService(test_db, llm_config)
+        delays = {1: 0.05, 2: 0.0, 3: 0.01}
+        
+        async def fake_analyze(documento_id):
+            await asyncio.sleep(delays[documento_id])
+            if documento_id == 3:
+                raise RuntimeError("falha inesperada")
+            return self._analysis(documento_id)
+        
+        progress = BatchProgress(total_documents=3)
+        with patch.object(service, 'analyze_document', side_effect=fake_analyze):
+            results = [r async for r in service.iter_batch_analysis([1, 2, 3], max_concurrent=3, progress=progress)]
+        
+        assert [r.documento_id for r in results] == [2, 3, 1]
+        assert results[1].success is False
+        assert "falha inesperada" in results[1].error_message
+        assert progress.snapshot().completed == 3
+        
+        # A versão não-streaming mantém a ordem solicitada
+        with patch.object(service, 'analyze_document', side_effect=fake_analyze):
+            batch = await service.batch_analyze_documents([1, 2, 3], max_concurrent=3)
+        assert [r.documento_id for r in batch.results] == [1, 2, 3]
+        assert batch.successful_analyses == 2
+        assert batch.total_tokens_used == 200
+
+
+@pytest.mark.unit
+class TestPackedDocumentAnalysis:
+    """Testes do empacotamento de documentos curtos em uma requisição"""
+    
+    @pytest.fixture
+    def documentos_curtos(self, test_db):
+        """Três documentos curtos e um longo do mesmo processo"""
+        processo = Processo(
+            numero="SEI-260002/000001/2025",
+            tipo="Administrativo",
+            data_autuacao=datetime(2025, 1, 15).date()
+        )
+        test_db.add(processo)
+        test_db.commit()
+        
+        documentos = [
+            Documento(processo_id=processo.id, numero_documento=f"1000000{i}",
+                      detalhamento_texto=f"Despacho curto número {i}.")
+            for i in range(3)
+        ]
+        documentos.append(Documento(processo_id=processo.id, numero_documento="20000000",
+                                    detalhamento_texto="Parecer extenso " * 300))
+        test_db.add_all(documentos)
+        test_db.commit()
+        return documentos
+    
+    @staticmethod
+    def _item(doc_id=None):
+        item = {"summary": "Resumo", "entities": [], "tags": ["despacho"], "confidence": 0.9}
+        if doc_id is not None:
+            item["id"] = doc_id
+        return item
+    
+    def test_plan_packed_groups(self, test_db, llm_config, documentos_curtos):
+        """Testa que só documentos curtos são agrupados"""
+        service = LLMService(test_db, {**llm_config, "packing_max_documents": 2})
+        ids = [d.id for d in documentos_curtos]
+        
+        groups, singles = service._plan_packed_groups(ids)
+        
+        assert groups == [ids[:2]]
+        assert sorted(singles) == sorted([ids[2], ids[3]])
+    
+    @pytest.mark.asyncio
+    async def test_batch_packs_short_documents(self, test_db, llm_config, documentos_curtos):
+        """Testa lote com uma requisição agrupada e fallback individual"""
+        service = LLMService(test_db, llm_config)
+        curtos = [d.id for d in documentos_curtos[:3]]
+        prompts = []
+        
+        def fake_api(prompt, max_tokens=None):
+            prompts.append(prompt)
+            if "=== DOCUMENTO" in prompt:
+                # O terceiro documento não vem na resposta: deve ser reprocessado sozinho
+                return {
+                    "documents": [self._item(curtos[0]), self._item(curtos[1]), {"id": curtos[2]}],
+                    "tokens_used": 600, "prompt_tokens": 500, "completion_tokens": 100
+                }
+            return {**self._item(), "tokens_used": 300, "prompt_tokens": 250, "completion_tokens": 50}
+        
+        with patch.object(service, '_call_llm_api', side_effect=fake_api):
+            batch = await service.batch_analyze_documents([d.id for d in documentos_curtos])
+        
+        assert batch.successful_analyses == 4
+        # 1 agrupada + 1 fallback + 1 documento longo (em chunks de 4000 caracteres)
+        packed_prompts = [p for p in prompts if "=== DOCUMENTO" in p]
+        assert len(packed_prompts) == 1
+        assert len(prompts) < 1 + 1 + 3 + 3
+        
+        by_id = {r.documento_id: r for r in batch.results}
+        assert by_id[curtos[0]].tokens_used + by_id[curtos[1]].tokens_used <= 600
+        
+        for documento in documentos_curtos:
+            test_db.refresh(documento)
+            assert documento.detalhamento_status == "concluido"
+        assert test_db.query(DocumentoTag).count() == 4
+
+
+@pytest.mark.unit
+class TestLLMTelemetry:
+    """Testes da telemetria de chamadas ao LLM"""
+    
+    RESPOSTA = {
+        "summary": "Despacho",
+        "entities": [{"type": "DOCUMENTO", "value": "Despacho", "confidence": 0.9}],
+        "tags": ["despacho"],
+        "confidence": 0.9,
+        "tokens_used": 300,
+        "prompt_tokens": 250,
+        "completion_tokens": 50
+    }
+    
+    def test_histogram_percentile(self):
+        """Testa percentis interpolados a partir do histograma"""
+        from app.services.llm_telemetry import (
+            LATENCY_BUCKETS_MS, histogram_percentile, latency_bucket_index
+        )
+        
+        histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        for latency in [50] * 50 + [700] * 45 + [3000] * 5:
+            histogram[latency_bucket_index(latency)] += 1
+        
+        assert histogram_percentile(histogram, 0.5) == 100
+        assert 500 < histogram_percentile(histogram, 0.9) <= 1000
+        assert 2000 < histogram_percentile(histogram, 0.99) <= 4000
+        assert histogram_percentile([0] * len(histogram), 0.5) is None
+    
+    @pytest.mark.asyncio
+    async def test_analyze_document_records_call(self, test_db, llm_config, documento_para_analise):
+        """Testa registro por chamada e estatísticas com tokens e custo reais"""
+        from app.models.processo import LLMChamada, LLMChamadaAgregada
+        
+        service = LLMService(test_db, llm_config)
+        
+        with patch.object(service, '_call_llm_api', return_value=dict(self.RESPOSTA)):
+            result = await service.analyze_document(documento_para_analise.id)
+        
+        assert result.success is True
+        chamada = test_db.query(LLMChamada).one()
+        assert chamada.documento_id == documento_para_analise.id
+        assert chamada.modelo == "gpt-4o-mini"
+        assert (chamada.prompt_tokens, chamada.completion_tokens) == (250, 50)
+        assert chamada.sucesso is True
+        assert chamada.chunk_index is None
+        assert test_db.query(LLMChamadaAgregada).one().chamadas == 1
+        
+        stats = service.get_llm_statistics()
+        assert stats.total_tokens_used == 300
+        assert stats.total_cost_usd == service.calculate_cost(250, 50)
+        
+        buckets = service.get_call_statistics(since=datetime.now() - timedelta(hours=1))
+        assert len(buckets) == 1
+        assert buckets[0].calls == 1
+        assert buckets[0].p50_latency_ms is not None
+    
+    @pytest.mark.asyncio
+    async def test_chunks_and_failures_are_recorded(self, test_db, llm_config, documento_para_analise):
+        """Testa índice de chunk e registro de chamadas que falharam"""
+        from app.models.processo import LLMChamada
+        
+        documento_para_analise.detalhamento_texto = "Parágrafo de teste. " * 500
+        test_db.commit()
+        service = LLMService(test_db, llm_config)
+        
+        calls = []
+        
+        def fake_api(prompt, max_tokens=None):
+            calls.append(prompt)
+            if len(calls) == 2:
+                raise Exception("Erro do provedor")
+            return dict(self.RESPOSTA)
+        
+        with patch.object(service, '_call_llm_api', side_effect=fake_api):
+            result = await service.analyze_document(documento_para_analise.id)
+        
+        assert result.success is True
+        chamadas = test_db.query(LLMChamada).all()
+        assert len(chamadas) == len(calls) > 2
+        assert sorted(c.chunk_index for c in chamadas) == list(range(len(calls)))
+        assert [c.sucesso for c in chamadas].count(False) == 1
+        
+        # Tokens reais somados dos chunks bem-sucedidos (sem rateio 80/20)
+        successful = len(calls) - 1
+        assert result.cost_usd == service.calculate_cost(250 * successful, 50 * successful)
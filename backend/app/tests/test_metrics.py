@@ -0,0 +1,154 @@
+"""
+Testes para as métricas no formato do Prometheus
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+
+from app.metrics import (
+    CONTENT_TYPE, DOWNLOAD_BYTES, DOWNLOAD_THROUGHPUT, LLM_COST_USD, LLM_TOKENS,
+    PERSISTENCE_ROWS_INSERTED, SCRAPER_FETCH_SECONDS, SCRAPER_PARSE_SECONDS, Counter, Histogram, Registry
+)
+from app.models.processo import Processo
+from app.models.rows import AndamentoRow, DocumentoRow
+from app.scraper.base import SEIScraper
+from app.scraper.config import ScraperConfig
+from app.services.document_download import DocumentDownloadService
+from app.services.llm_service import LLMService
+from app.services.persistence import ProcessoPersistenceService
+
+
+def histogram_count(metric: Histogram, **labels) -> int:
+    """Número de observações de uma série"""
+    cumulative, _ = metric.labels(**labels).snapshot()
+    return cumulative[-1]
+
+
+@pytest.mark.unit
+class TestMetricsRegistry:
+    """Testes dos contadores, histogramas e do formato de exposição"""
+
+    def test_render_counter_and_histogram(self):
+        """Testa HELP/TYPE, labels escapados e buckets cumulativos"""
+        registry = Registry()
+        linhas = registry.register(Counter("linhas_total", "Linhas gravadas", ("secao",)))
+        latencia = registry.register(Histogram("latencia_seconds", "Latência", buckets=(0.1, 1.0)))
+
+        linhas.labels(secao='and"amentos').inc(3)
+        latencia.observe(0.05)
+        latencia.observe(0.1)
+        latencia.observe(2.5)
+
+        assert registry.render().splitlines() == [
+            "# HELP linhas_total Linhas gravadas",
+            "# TYPE linhas_total counter",
+            'linhas_total{secao="and\\"amentos"} 3',
+            "# HELP latencia_seconds Latência",
+            "# TYPE latencia_seconds histogram",
+            'latencia_seconds_bucket{le="0.1"} 2',
+            'latencia_seconds_bucket{le="1"} 2',
+            'latencia_seconds_bucket{le="+Inf"} 3',
+            "latencia_seconds_sum 2.65",
+            "latencia_seconds_count 3",
+        ]
+
+    def test_invalid_usage_is_rejected(self):
+        """Testa labels diferentes dos declarados, contador decrescente e nome repetido"""
+        registry = Registry()
+        contador = registry.register(Counter("chamadas_total", "Chamadas", ("model",)))
+
+        with pytest.raises(ValueError):
+            contador.labels(modelo="gpt-4o-mini")
+        with pytest.raises(ValueError):
+            contador.labels(model="gpt-4o-mini").inc(-1)
+        with pytest.raises(ValueError):
+            registry.register(Counter("chamadas_total", "Outra"))
+
+
+@pytest.mark.unit
+class TestMetricsInstrumentation:
+    """Testes das métricas registradas por cada estágio"""
+
+    def test_metrics_endpoint_reports_route_latency(self, client):
+        """Testa /metrics no formato de texto com a latência pelo template da rota"""
+        client.get("/api/v1/processos/999999")
+
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == CONTENT_TYPE
+        assert (
+            'sei_http_request_seconds_count{method="GET",route="/api/v1/processos/{processo_id}",status="404"}'
+            in response.text
+        )
+        assert "# TYPE sei_db_pool_checkout_seconds histogram" in response.text
+
+    @pytest.mark.asyncio
+    @patch('aiohttp.ClientSession.get')
+    async def test_scraper_records_fetch_and_parse(self, mock_get):
+        """Testa a latência por status HTTP (com retry) e o tempo de parse"""
+        erro, ok = Mock(status=503), Mock(status=200)
+        ok.text = AsyncMock(return_value="<html><body><table></table></body></html>")
+        mock_get.return_value.__aenter__.side_effect = [erro, ok]
+        scraper = SEIScraper(ScraperConfig(parse_workers=0, max_retries=2, delay=0))
+        antes = {
+            status: histogram_count(SCRAPER_FETCH_SECONDS, mode="full", status=status) for status in (503, 200)
+        }
+        parses = histogram_count(SCRAPER_PARSE_SECONDS, mode="thread")
+
+        with patch('app.scraper.base.asyncio.sleep', new=AsyncMock()):
+            html = await scraper._fetch_html("https://sei.rj.gov.br/sei/processo")
+        await scraper.parse_html(html)
+
+        assert histogram_count(SCRAPER_FETCH_SECONDS, mode="full", status=503) == antes[503] + 1
+        assert histogram_count(SCRAPER_FETCH_SECONDS, mode="full", status=200) == antes[200] + 1
+        assert histogram_count(SCRAPER_PARSE_SECONDS, mode="thread") == parses + 1
+
+    @pytest.mark.asyncio
+    async def test_merges_count_inserted_rows(self, test_db):
+        """Testa que só linhas novas entram em sei_persistence_rows_inserted_total"""
+        processo = Processo(numero="SEI-123456/789/2025", tipo="Administrativo", data_autuacao=date(2025, 3, 18))
+        test_db.add(processo)
+        test_db.commit()
+        service = ProcessoPersistenceService(test_db)
+        documentos = PERSISTENCE_ROWS_INSERTED.labels(secao="documentos")
+        andamentos = PERSISTENCE_ROWS_INSERTED.labels(secao="andamentos")
+        antes = (documentos.value, andamentos.value)
+
+        novos_docs = [DocumentoRow(numero_documento=f"{n:08d}") for n in range(3)]
+        novos_andamentos = [AndamentoRow(data_hora=datetime(2025, 1, 1, h), descricao=f"A{h}") for h in range(2)]
+        await service.merge_documentos(processo.id, novos_docs)
+        await service.merge_documentos(processo.id, novos_docs)
+        await service.merge_andamentos(processo.id, novos_andamentos)
+
+        assert (documentos.value, andamentos.value) == (antes[0] + 3, antes[1] + 2)
+
+    def test_download_transfer_records_bytes_and_throughput(self):
+        """Testa bytes recebidos e vazão de uma transferência"""
+        antes_bytes = DOWNLOAD_BYTES.labels().value
+        antes_vazao = histogram_count(DOWNLOAD_THROUGHPUT)
+
+        DocumentDownloadService._record_transfer(2_000_000, 0.5)
+        DocumentDownloadService._record_transfer(0, 0.0)
+
+        assert DOWNLOAD_BYTES.labels().value == antes_bytes + 2_000_000
+        assert histogram_count(DOWNLOAD_THROUGHPUT) == antes_vazao + 1
+
+    def test_llm_call_records_tokens_and_cost(self, test_db):
+        """Testa tokens e custo por modelo a cada chamada ao LLM"""
+        service = LLMService(test_db, {
+            "provider": "openai", "model": "gpt-4o-mini", "api_key": "test-key-123",
+            "cost_per_1k_input_tokens": Decimal("0.00015"), "cost_per_1k_output_tokens": Decimal("0.0006")
+        })
+        prompt = LLM_TOKENS.labels(model="gpt-4o-mini", kind="prompt")
+        completion = LLM_TOKENS.labels(model="gpt-4o-mini", kind="completion")
+        custo = LLM_COST_USD.labels(model="gpt-4o-mini")
+        antes = (prompt.value, completion.value, custo.value)
+
+        service._record_llm_call(1.2, 0, result={"prompt_tokens": 1000, "completion_tokens": 500})
+
+        assert prompt.value == antes[0] + 1000
+        assert completion.value == antes[1] + 500
+        assert custo.value == pytest.approx(antes[2] + 0.00045)
@@ -0,0 +1,165 @@
+"""
+Testes para o logging estruturado e os spans de tempo
+"""
+import json
+import logging
+from unittest.mock import patch
+
+import pytest
+from bs4 import BeautifulSoup
+
+from app.observability import (
+    JSONFormatter, configure_tracing, export_spans, get_spans, span
+)
+from app.scraper.base import SEIScraper
+from app.scraper.config import ScraperConfig
+from app.scraper.parsers import SEIParser
+
+HTML_PROCESSO = """
+<html><body>
+<table>
+    <tr><td>Processo:</td><td>SEI-070002/013015/2024</td></tr>
+    <tr><td>Tipo:</td><td>Licitação</td></tr>
+</table>
+<table id="tblHistorico">
+    <tr><th>Data/Hora</th><th>Unidade</th><th>Descrição</th></tr>
+    <tr><td>26/06/2025 17:44</td><td>PGE/PG-15</td><td>Processo recebido na unidade</td></tr>
+</table>
+</body></html>
+"""
+
+URL = "https://sei.rj.gov.br/sei/modulos/pesquisa/md_pesq_processo_exibir.php?id=1"
+
+
+@pytest.fixture
+def tracing():
+    """Tracing com amostragem total, desligado ao final"""
+    yield configure_tracing(sample_rate=1.0)
+    configure_tracing(sample_rate=0.0)
+
+
+@pytest.mark.unit
+class TestParserLogging:
+    """Testes da saída dos parsers"""
+
+    def test_parsers_do_not_write_to_stdout(self, capsys, caplog):
+        """Testa que o diagnóstico vai para o logger em nível DEBUG, não para o stdout"""
+        soup = BeautifulSoup(HTML_PROCESSO, "html.parser")
+
+        with caplog.at_level(logging.DEBUG, logger="app.scraper.parsers"):
+            andamentos = SEIParser.parse_andamentos_table(soup.find("table", id="tblHistorico"))
+            SEIParser.parse_documentos_table(None)
+
+        assert len(andamentos) == 1
+        assert capsys.readouterr().out == ""
+        assert any(r.levelno == logging.DEBUG and "andamentos" in r.getMessage() for r in caplog.records)
+        assert any(r.levelno == logging.ERROR and r.exc_info for r in caplog.records)
+
+    def test_json_formatter_includes_extra_fields(self):
+        """Testa que o formato JSON traz nível, logger, mensagem e campos de `extra`"""
+        record = logging.LogRecord("app.teste", logging.INFO, __file__, 1, "processo %s", ("SEI-1",), None)
+        record.processo_id = 7
+
+        entry = json.loads(JSONFormatter().format(record))
+
+        assert entry["level"] == "INFO"
+        assert entry["logger"] == "app.teste"
+        assert entry["message"] == "processo SEI-1"
+        assert entry["processo_id"] == 7
+
+
+@pytest.mark.unit
+class TestTracing:
+    """Testes dos spans amostrados"""
+
+    def test_disabled_by_default_records_nothing(self):
+        """Testa que, sem amostragem, span() é um contexto nulo compartilhado"""
+        configure_tracing(sample_rate=0.0)
+
+        with span("scrape_processo") as raiz, span("fetch") as filho:
+            filho.set(bytes=10)
+
+        assert raiz is filho
+        assert get_spans() == []
+
+    def test_nested_spans_share_trace(self, tracing):
+        """Testa que os spans filhos herdam o trace e apontam para o pai"""
+        with span("scrape_processo", url=URL) as raiz:
+            with span("fetch"):
+                pass
+            with span("parse"):
+                pass
+
+        fetch, parse, root = get_spans()
+        assert [fetch["name"], parse["name"], root["name"]] == ["fetch", "parse", "scrape_processo"]
+        assert fetch["parent_id"] == parse["parent_id"] == raiz.span_id
+        assert {fetch["trace_id"], parse["trace_id"]} == {root["trace_id"]}
+        assert root["parent_id"] is None
+        assert root["attrs"] == {"url": URL}
+        assert root["duration_ms"] >= fetch["duration_ms"]
+
+    def test_sampling_decision_applies_to_whole_trace(self):
+        """Testa que traces não amostrados não registram nenhum span filho"""
+        configure_tracing(sample_rate=0.5, seed=1)
+        try:
+            for _ in range(200):
+                with span("scrape_processo"):
+                    with span("fetch"):
+                        pass
+            spans = get_spans()
+        finally:
+            configure_tracing(sample_rate=0.0)
+
+        roots = {s["span_id"] for s in spans if s["name"] == "scrape_processo"}
+        fetches = [s for s in spans if s["name"] == "fetch"]
+        assert 50 < len(roots) < 150
+        assert len(fetches) == len(roots)
+        assert {s["parent_id"] for s in fetches} == roots
+
+    def test_buffer_keeps_most_recent_spans(self):
+        """Testa que o buffer circular descarta os spans mais antigos"""
+        configure_tracing(sample_rate=1.0, buffer_size=3)
+        try:
+            for i in range(5):
+                with span("persist", lote=i):
+                    pass
+            assert [s["attrs"]["lote"] for s in get_spans()] == [2, 3, 4]
+        finally:
+            configure_tracing(sample_rate=0.0)
+
+    def test_export_jsonl_and_chrome(self, tracing, tmp_path):
+        """Testa a exportação em JSON Lines e no Trace Event Format"""
+        with span("scrape_processo"):
+            with pytest.raises(ValueError):
+                with span("parse"):
+                    raise ValueError("html inválido")
+
+        jsonl = tmp_path / "spans.jsonl"
+        chrome = tmp_path / "spans.json"
+
+        assert export_spans(str(jsonl)) == 2
+        assert export_spans(str(chrome), fmt="chrome") == 2
+
+        linhas = [json.loads(line) for line in jsonl.read_text().splitlines()]
+        assert linhas[0]["name"] == "parse"
+        assert linhas[0]["error"] == "ValueError"
+
+        eventos = json.loads(chrome.read_text())["traceEvents"]
+        assert {e["ph"] for e in eventos} == {"X"}
+        assert eventos[0]["args"]["parent_id"] == eventos[1]["args"]["span_id"]
+
+    @pytest.mark.asyncio
+    async def test_scrape_processo_records_stage_spans(self, tracing):
+        """Testa que scrape_processo mede download e parse dentro do mesmo trace"""
+        scraper = SEIScraper(ScraperConfig(parse_workers=0))
+
+        with patch.object(scraper, "_fetch_html", return_value=HTML_PROCESSO):
+            result = await scraper.scrape_processo(URL)
+
+        assert result.success
+        by_name = {s["name"]: s for s in get_spans()}
+        assert set(by_name) == {"fetch", "parse", "scrape_processo"}
+        root = by_name["scrape_processo"]
+        assert by_name["fetch"]["parent_id"] == by_name["parse"]["parent_id"] == root["span_id"]
+        assert by_name["fetch"]["attrs"]["bytes"] == len(HTML_PROCESSO)
+        assert root["attrs"]["andamentos"] == 1
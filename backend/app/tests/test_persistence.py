@@ -2,6 +2,7 @@
 Testes para serviços de persistência
 Seguindo metodologia TDD - testes primeiro!
 """
+import numpy as np
 import pytest
 from datetime import datetime, date
 from unittest.mock import Mock, AsyncMock, patch
@@ -9,7 +10,7 @@ from sqlalchemy.orm import Session
 from app.services.persistence import ProcessoPersistenceService, ProcessoResult
 from app.services.change_detection import ChangeDetectionService
 from app.models.processo import Processo, Autuacao, Documento, Andamento
-from app.models.schemas import ProcessoData, AutuacaoData, DocumentoData, AndamentoData
+from app.models.schemas import ProcessoData, AutuacaoData, DocumentoData, AndamentoData, ProcessoDigest
 
 
 @pytest.mark.unit
@@ -19,7 +20,10 @@ class TestProcessoPersistenceService:
     @pytest.fixture
     def db_session(self):
         """Mock da sessão do banco de dados"""
-        return Mock(spec=Session)
+        session = Mock(spec=Session)
+        # Consulta dos andamentos mais recentes (caminho rápido do merge)
+        session.query.return_value.filter.return_value.order_by.return_value.limit.return_value.all.return_value = []
+        return session
     
     @pytest.fixture
     def persistence_service(self, db_session):
@@ -362,4 +366,356 @@ class TestPersistenceIntegration:
     async def test_large_batch_processing(self, test_db):
         """Testa processamento de grandes lotes de dados"""
         # Teste de performance com grandes volumes
-        pass 
\ No newline at end of file
+        pass 
+
+@pytest.mark.integration
+class TestFingerprintChangeDetection:
+    """Testes da detecção de mudanças por fingerprints persistidos"""
+    
+    @pytest.fixture
+    def processo(self, test_db):
+        """Processo persistido sem documentos e andamentos"""
+        processo = Processo(numero="SEI-123456/789/2025", tipo="Administrativo", data_autuacao=date(2025, 3, 18))
+        test_db.add(processo)
+        test_db.commit()
+        return processo
+    
+    def _andamentos(self, inicio, fim):
+        return [
+            AndamentoData(
+                data_hora=datetime(2025, 1, 1 + i % 28, i % 24, i % 60),
+                descricao=f"Andamento {i}",
+                unidade="UENF/DIRCCH"
+            )
+            for i in range(inicio, fim)
+        ]
+    
+    def test_pack_fingerprints_roundtrip(self):
+        """Testa serialização ordenada e sem repetições"""
+        from app.services.change_detection import (
+            andamento_fingerprint, pack_fingerprints, unpack_fingerprints
+        )
+        
+        values = [andamento_fingerprint(datetime(2025, 1, 1, 10, i), f"desc {i}") for i in range(50)]
+        unpacked = unpack_fingerprints(pack_fingerprints(values + values[:5]))
+        
+        assert list(unpacked) == sorted(set(values))
+        assert all(-2 ** 63 <= v < 2 ** 63 for v in unpacked)
+        assert unpacked.dtype == np.int64
+
+    def test_select_new_indices_against_sorted_array(self):
+        """Testa a busca no array ordenado: extremos, repetições e armazenado vazio"""
+        from app.services.change_detection import fingerprint_array
+
+        service = ChangeDetectionService()
+        stored = fingerprint_array([-2 ** 63, 0, 10])
+
+        assert service.select_new_indices([11, 10, -5, 11, 2 ** 63 - 1, -2 ** 63], stored) == [0, 2, 4]
+        assert service.select_new_indices([7, 7, 3], fingerprint_array([])) == [0, 2]
+        assert service.select_new_indices([], stored) == []
+    
+    @pytest.mark.asyncio
+    async def test_merge_uses_persisted_fingerprints(self, test_db, processo):
+        """Testa merge incremental com snapshot persistido por processo"""
+        from app.models.processo import ProcessoFingerprint
+        
+        service = ProcessoPersistenceService(test_db)
+        
+        assert await service.merge_andamentos(processo.id, self._andamentos(0, 10)) == 10
+        snapshot = test_db.query(ProcessoFingerprint).filter_by(processo_id=processo.id, secao="andamentos").one()
+        assert snapshot.total_linhas == 10
+        
+        # Repetições na própria lista e linhas já gravadas são ignoradas
+        atual = self._andamentos(5, 15) + self._andamentos(12, 13)
+        assert await service.merge_andamentos(processo.id, atual) == 5
+        assert test_db.query(Andamento).count() == 15
+        test_db.refresh(snapshot)
+        assert snapshot.total_linhas == 15
+    
+    @pytest.mark.asyncio
+    async def test_stale_snapshot_is_rebuilt(self, test_db, processo):
+        """Testa reconstrução quando linhas foram gravadas por outro caminho"""
+        service = ProcessoPersistenceService(test_db)
+        await service.merge_documentos(processo.id, [DocumentoData(numero_documento="1")])
+        
+        test_db.add(Documento(processo_id=processo.id, numero_documento="2"))
+        test_db.commit()
+        
+        novos = [DocumentoData(numero_documento=n) for n in ("1", "2", "3")]
+        assert await service.merge_documentos(processo.id, novos) == 1
+        assert test_db.query(Documento).count() == 3
+    
+    def test_diff_of_10k_andamentos_is_fast(self):
+        """Testa que o diff de 10 mil andamentos custa poucos microssegundos por linha"""
+        import time
+        from app.services.change_detection import andamento_fingerprint
+        
+        service = ChangeDetectionService()
+        armazenados = self._andamentos(0, 10000)
+        atuais = self._andamentos(100, 10100)
+        stored_fps = {andamento_fingerprint(a.data_hora, a.descricao) for a in armazenados}
+        
+        inicio = time.perf_counter()
+        current_fps = [andamento_fingerprint(a.data_hora, a.descricao) for a in atuais]
+        novos = service.select_new_indices(current_fps, stored_fps)
+        por_linha = (time.perf_counter() - inicio) / len(atuais)
+        
+        assert len(novos) == 100
+        assert por_linha < 20e-6
+
+
+@pytest.mark.unit
+class TestSnapshotDigest:
+    """Testes do digest hierárquico usado no refresh incremental"""
+    
+    def _processo_data(self, total_andamentos, tipo="Administrativo"):
+        from datetime import timedelta
+        
+        return ProcessoData(
+            autuacao=AutuacaoData(
+                numero_sei="SEI-123456/789/2025",
+                tipo=tipo,
+                data_geracao=date(2025, 3, 18),
+                interessados="João da Silva"
+            ),
+            documentos=[DocumentoData(numero_documento=str(n)) for n in (900, 1000)],
+            # Ordem da página do SEI: mais recentes primeiro
+            andamentos=[
+                AndamentoData(
+                    data_hora=datetime(2025, 1, 1) + timedelta(hours=i),
+                    descricao=f"Andamento {i}",
+                    unidade="UENF/DIRCCH"
+                )
+                for i in reversed(range(total_andamentos))
+            ]
+        )
+    
+    def test_appended_rows_change_only_last_chunks(self):
+        """Testa que linhas acrescentadas só alteram o sufixo da seção"""
+        from app.services.change_detection import section_digest, changed_suffix_start
+        
+        fps = list(range(200))
+        stored = section_digest(fps, chunk_size=64)
+        
+        assert changed_suffix_start(section_digest(fps, 64), stored, 64) is None
+        assert changed_suffix_start(section_digest(fps + [500, 501, 502], 64), stored, 64) == 192
+        assert changed_suffix_start(section_digest(list(range(256)), 64), section_digest(list(range(192)), 64), 64) == 192
+        assert changed_suffix_start(section_digest(fps, 64), None, 64) == 0
+    
+    @pytest.mark.asyncio
+    async def test_refresh_merges_only_changed_suffix(self, test_db):
+        """Testa que o refresh envia ao merge apenas os andamentos do sufixo alterado"""
+        service = ProcessoPersistenceService(test_db)
+        await service.save_processo_data(self._processo_data(200))
+        
+        with patch.object(service, "merge_documentos", wraps=service.merge_documentos) as merge_docs, \
+             patch.object(service, "merge_andamentos", wraps=service.merge_andamentos) as merge_ands:
+            result = await service.save_processo_data(self._processo_data(203))
+        
+        assert result.changes_detected == 3
+        assert not merge_docs.called
+        enviados = merge_ands.call_args.args[1]
+        assert len(enviados) == 11
+        assert [a.descricao for a in enviados[-3:]] == ["Andamento 200", "Andamento 201", "Andamento 202"]
+        assert test_db.query(Andamento).count() == 203
+    
+    @pytest.mark.asyncio
+    async def test_unchanged_and_autuacao_only_refresh(self, test_db):
+        """Testa refresh sem mudanças e com mudança apenas na autuação"""
+        service = ProcessoPersistenceService(test_db)
+        await service.save_processo_data(self._processo_data(10))
+        
+        with patch.object(service, "merge_documentos") as merge_docs, \
+             patch.object(service, "merge_andamentos") as merge_ands:
+            inalterado = await service.save_processo_data(self._processo_data(10))
+            autuacao = await service.save_processo_data(self._processo_data(10, tipo="Licitação"))
+        
+        assert inalterado.changes_detected == 0
+        assert autuacao.changes_detected == 1
+        assert not merge_docs.called and not merge_ands.called
+        
+        processo = test_db.query(Processo).one()
+        assert processo.tipo == "Licitação"
+        assert processo.hash_conteudo == ProcessoDigest.model_validate_json(processo.digest_secoes).root
+
+
+@pytest.mark.unit
+class TestAndamentoTailDetection:
+    """Testes do caminho rápido (fim do histórico) na detecção de andamentos"""
+    
+    @pytest.fixture
+    def processo(self, test_db):
+        """Processo persistido sem andamentos"""
+        processo = Processo(numero="SEI-123456/789/2025", tipo="Administrativo", data_autuacao=date(2025, 3, 18))
+        test_db.add(processo)
+        test_db.commit()
+        return processo
+    
+    def _andamentos(self, indices):
+        from datetime import timedelta
+        
+        # Ordem da página do SEI: mais recentes primeiro
+        return [
+            AndamentoData(
+                data_hora=datetime(2025, 1, 1) + timedelta(hours=i),
+                descricao=f"Andamento {i}",
+                unidade="UENF/DIRCCH"
+            )
+            for i in sorted(indices, reverse=True)
+        ]
+    
+    @pytest.mark.asyncio
+    async def test_appended_andamentos_use_tail(self, test_db, processo):
+        """Testa que andamentos acrescentados são detectados sem o diff completo"""
+        from app.models.processo import ProcessoFingerprint
+        
+        service = ProcessoPersistenceService(test_db)
+        await service.merge_andamentos(processo.id, self._andamentos(range(100)))
+        
+        with patch.object(service, "_load_fingerprints", wraps=service._load_fingerprints) as full_diff:
+            assert await service.merge_andamentos(processo.id, self._andamentos(range(103))) == 3
+            assert await service.merge_andamentos(processo.id, self._andamentos(range(103))) == 0
+        
+        assert not full_diff.called
+        assert test_db.query(Andamento).count() == 103
+        snapshot = test_db.query(ProcessoFingerprint).filter_by(processo_id=processo.id, secao="andamentos").one()
+        assert snapshot.total_linhas == 103
+    
+    @pytest.mark.asyncio
+    async def test_gap_falls_back_to_full_diff(self, test_db, processo):
+        """Testa fallback quando surge andamento anterior ao mais recente armazenado"""
+        service = ProcessoPersistenceService(test_db)
+        await service.merge_andamentos(processo.id, self._andamentos(range(10)))
+        
+        retroativo = AndamentoData(
+            data_hora=datetime(2025, 1, 1, 8, 30),
+            descricao="Andamento retroativo",
+            unidade="UENF/DIRCCH"
+        )
+        atual = self._andamentos(range(12))
+        atual.insert(4, retroativo)
+        
+        with patch.object(service, "_load_fingerprints", wraps=service._load_fingerprints) as full_diff:
+            assert await service.merge_andamentos(processo.id, atual) == 3
+            # Sem sobreposição com o histórico também não há como descartar lacunas
+            assert await service.merge_andamentos(processo.id, self._andamentos([20, 21])) == 2
+        
+        assert full_diff.call_count == 2
+        assert test_db.query(Andamento).count() == 15
+
+
+@pytest.mark.unit
+class TestStreamPersistence:
+    """Testes da persistência de processos recebidos em streaming"""
+    
+    def _processo_data(self, n_documentos, n_andamentos):
+        from datetime import timedelta
+        
+        return ProcessoData(
+            autuacao=AutuacaoData(numero_sei="SEI-260002/002172/2025", tipo="Administrativo",
+                                  data_geracao=date(2025, 3, 18)),
+            documentos=[
+                DocumentoData(numero_documento=f"{90000000 + i}", tipo="Despacho", data_documento=date(2025, 3, 19))
+                for i in range(n_documentos)
+            ],
+            # Ordem da página do SEI: mais recentes primeiro
+            andamentos=[
+                AndamentoData(data_hora=datetime(2025, 3, 18) + timedelta(hours=i), descricao=f"Andamento {i}")
+                for i in reversed(range(n_andamentos))
+            ]
+        )
+    
+    async def _rows(self, processo_data, eventos):
+        yield processo_data.autuacao
+        for row in processo_data.documentos + processo_data.andamentos:
+            eventos.append("linha")
+            yield row
+        eventos.append("fim")
+    
+    @pytest.mark.asyncio
+    async def test_rows_are_merged_in_batches_before_stream_ends(self, test_db):
+        """Testa que documentos chegam ao callback durante o stream e o digest final evita novo merge"""
+        eventos = []
+        service = ProcessoPersistenceService(test_db, on_new_documentos=lambda ids: eventos.append(len(ids)))
+        processo_data = self._processo_data(5, 7)
+        
+        resultado = await service.save_processo_stream(self._rows(processo_data, eventos), batch_size=2)
+        
+        assert resultado.success and not resultado.was_updated
+        assert (resultado.changes.new_documentos, resultado.changes.new_andamentos) == (5, 7)
+        assert eventos.index(2) < eventos.index("fim")
+        assert sum(e for e in eventos if isinstance(e, int)) == 5
+        assert test_db.query(Documento).count() == 5 and test_db.query(Andamento).count() == 7
+        
+        # Mesmo conteúdo pelo caminho não-streaming: digest igual, nenhuma mudança
+        with patch.object(service, "merge_andamentos", wraps=service.merge_andamentos) as merge:
+            resultado = await service.save_processo_data(processo_data)
+        assert resultado.success and resultado.changes_detected == 0
+        assert not merge.called
+    
+    @pytest.mark.asyncio
+    async def test_stream_failure_invalidates_digest(self, test_db):
+        """Testa que uma falha no meio do stream mantém o já gravado e força o diff completo"""
+        service = ProcessoPersistenceService(test_db)
+        processo_data = self._processo_data(4, 0)
+        
+        async def interrompido():
+            yield processo_data.autuacao
+            for documento in processo_data.documentos[:3]:
+                yield documento
+            raise ConnectionError("conexão encerrada")
+        
+        resultado = await service.save_processo_stream(interrompido(), batch_size=2)
+        
+        assert not resultado.success and resultado.error_message == "conexão encerrada"
+        processo = test_db.get(Processo, resultado.processo_id)
+        assert processo.digest_secoes is None
+        assert test_db.query(Documento).count() == 2
+        
+        resultado = await service.save_processo_data(processo_data)
+        assert resultado.changes.new_documentos == 2
+
+
+@pytest.mark.unit
+class TestProcessoRows:
+    """Testes das linhas internas (sem Pydantic) do caminho scraping → persistência"""
+    
+    def _rows(self):
+        from app.models.rows import AndamentoRow, AutuacaoRow, DocumentoRow, ProcessoRows
+        
+        return ProcessoRows(
+            autuacao=AutuacaoRow(numero_sei="SEI-260002/002172/2025", tipo="Administrativo",
+                                 data_geracao=date(2025, 3, 18)),
+            documentos=[DocumentoRow(numero_documento="12345678", tipo="Despacho", data_documento=date(2025, 3, 19),
+                                     url_download="https://sei.rj.gov.br/sei/documento.php?id=1")],
+            andamentos=[AndamentoRow(data_hora=datetime(2025, 3, 18, 10, 0), descricao="Processo recebido")]
+        )
+    
+    def test_rows_and_models_have_the_same_digest(self):
+        """Testa que linhas e schemas geram o mesmo digest (snapshots gravados continuam válidos)"""
+        service = ChangeDetectionService()
+        rows = self._rows()
+        model = rows.to_model()
+        
+        assert isinstance(model, ProcessoData) and model.documentos[0].url_download.endswith("id=1")
+        assert not hasattr(rows.andamentos[0], "__dict__")
+        
+        digests = []
+        for dados in (rows, model):
+            _, documento_fps = service.order_documentos(dados.documentos)
+            _, andamento_fps = service.order_andamentos(dados.andamentos)
+            digests.append(service.build_processo_digest(dados.autuacao, documento_fps, andamento_fps))
+        assert digests[0] == digests[1]
+    
+    @pytest.mark.asyncio
+    async def test_rows_saved_then_same_model_is_unchanged(self, test_db):
+        """Testa que o processo salvo a partir das linhas não muda ao reenviar o schema equivalente"""
+        service = ProcessoPersistenceService(test_db)
+        rows = self._rows()
+        
+        criado = await service.save_processo_data(rows, "https://sei.rj.gov.br/processo?id=1")
+        reenviado = await service.save_processo_data(rows.to_model())
+        
+        assert criado.success and criado.changes_detected == 3
+        assert reenviado.success and reenviado.changes_detected == 0
+        assert test_db.query(Documento).one().url_download == "https://sei.rj.gov.br/sei/documento.php?id=1"
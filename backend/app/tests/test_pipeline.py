@@ -0,0 +1,169 @@
+"""
+Testes para o pipeline scraping → persistência → download → extração → análise
+"""
+import asyncio
+import hashlib
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.models.processo import Documento
+from app.models.schemas import (
+    AutuacaoData, DocumentAnalysis, DocumentoData, ProcessoData, ScrapingResult
+)
+from app.scraper.config import ScraperConfig
+from app.services.pipeline import PipelineStage, SEIPipeline
+from app.tests.test_text_extraction import build_pdf
+
+URL_OK = "https://sei.rj.gov.br/sei/modulos/pesquisa/md_pesq_processo_exibir.php?id=1"
+URL_FALHA = "https://sei.rj.gov.br/sei/modulos/pesquisa/md_pesq_processo_exibir.php?id=2"
+
+
+def fake_scrape(url):
+    """Processo com dois documentos; a segunda URL falha no scraping"""
+    if url == URL_FALHA:
+        return ScrapingResult(success=False, error_message="HTTP 503", scraped_at=datetime.now())
+
+    documentos = [
+        DocumentoData(numero_documento=numero, tipo="Despacho", data_documento=date(2025, 3, 19),
+                      url_download=f"https://sei.rj.gov.br/sei/documento.php?id={numero}")
+        for numero in ("12345678", "12345679")
+    ]
+    return ScrapingResult(
+        success=True,
+        processo_data=ProcessoData(
+            autuacao=AutuacaoData(numero_sei="SEI-260002/002172/2025", tipo="Administrativo",
+                                  data_geracao=date(2025, 3, 18)),
+            documentos=documentos,
+            andamentos=[]
+        ),
+        scraped_at=datetime.now()
+    )
+
+
+async def fake_perform_download(self, url, file_path):
+    """Grava um PDF de uma página com o id do documento"""
+    content = build_pdf([f"Documento {url.rsplit('=', 1)[-1]}"])
+    with open(file_path, "wb") as f:
+        f.write(content)
+    return {"success": True, "file_size": len(content), "file_hash": hashlib.sha256(content).hexdigest(),
+            "content_type": "application/pdf"}
+
+
+def fake_analysis(documento_id):
+    return DocumentAnalysis(documento_id=documento_id, success=True, model_used="teste", tokens_used=10,
+                            processing_time_seconds=0.0, cost_usd=Decimal("0"), processed_at=datetime.now())
+
+
+@pytest.mark.unit
+class TestSEIPipeline:
+    """Testes do pipeline ponta a ponta e do back-pressure entre estágios"""
+
+    @pytest.mark.asyncio
+    async def test_new_documentos_flow_through_all_stages(self, test_engine, tmp_path):
+        """Testa que documentos novos seguem do merge até a análise sem polling"""
+        pipeline = SEIPipeline(
+            {"queue_size": 1, "download_concurrency": 2},
+            download_config={"download_base_path": str(tmp_path)},
+            extraction_config={"max_workers": 1, "memory_limit_mb": None},
+            llm_config={"api_key": "teste"},
+            session_factory=sessionmaker(bind=test_engine)
+        )
+        reports = []
+
+        with patch("app.services.pipeline.SEIScraper.scrape_processo",
+                   new=AsyncMock(side_effect=fake_scrape)), \
+             patch("app.services.document_download.DocumentDownloadService._perform_download",
+                   new=fake_perform_download), \
+             patch("app.services.pipeline.LLMService.analyze_document",
+                   new=AsyncMock(side_effect=fake_analysis)) as analyze:
+            report = await pipeline.run([URL_OK, URL_FALHA], progress_callback=reports.append)
+
+        stages = {stage.name: stage for stage in report.stages}
+        assert [stage.name for stage in report.stages] == ["scrape", "persist", "download", "extract", "analyze"]
+        assert (stages["scrape"].processed, stages["scrape"].failed) == (1, 1)
+        assert stages["persist"].processed == 1
+        assert stages["download"].processed == 2
+        assert stages["extract"].processed == 2
+        assert stages["analyze"].processed == 2
+        assert all(stage.queue_depth == 0 and stage.queue_capacity == 1 for stage in report.stages)
+        assert report.finished and reports[-1] is report
+
+        db = sessionmaker(bind=test_engine)()
+        documentos = db.query(Documento).order_by(Documento.numero_documento).all()
+        assert [d.url_download for d in documentos] == [
+            "https://sei.rj.gov.br/sei/documento.php?id=12345678",
+            "https://sei.rj.gov.br/sei/documento.php?id=12345679"
+        ]
+        assert all(d.downloaded for d in documentos)
+        assert [d.detalhamento_texto for d in documentos] == ["Documento 12345678", "Documento 12345679"]
+        assert sorted(call.args[0] for call in analyze.await_args_list) == [d.id for d in documentos]
+        db.close()
+
+    @pytest.mark.asyncio
+    async def test_real_page_documentos_reach_download(self, test_engine, tmp_path):
+        """Testa que os protocolos de uma página real do SEI chegam ao download (parse DOM)"""
+        html = (Path(__file__).resolve().parents[2] / "debug_html" / "sei_page_1.html").read_text(
+            encoding="utf-8", errors="replace"
+        )
+        pipeline = SEIPipeline(
+            {"analyze_documents": False},
+            scraper_config=ScraperConfig(parse_workers=0, stream_parse=False),
+            download_config={"download_base_path": str(tmp_path)},
+            extraction_config={"max_workers": 1, "memory_limit_mb": None},
+            session_factory=sessionmaker(bind=test_engine)
+        )
+
+        with patch("app.services.pipeline.SEIScraper._fetch_html", new=AsyncMock(return_value=html)), \
+             patch("app.services.document_download.DocumentDownloadService._perform_download",
+                   new=fake_perform_download):
+            report = await pipeline.run([URL_OK])
+
+        stages = {stage.name: stage for stage in report.stages}
+        db = sessionmaker(bind=test_engine)()
+        documentos = db.query(Documento).all()
+        assert len(documentos) == 137
+        assert all(
+            d.url_download.startswith("https://sei.rj.gov.br/sei/modulos/pesquisa/md_pesq_documento_consulta_externa.php?")
+            for d in documentos
+        )
+        assert stages["download"].processed == 137
+        assert all(d.downloaded for d in documentos)
+        db.close()
+
+    @pytest.mark.asyncio
+    async def test_full_downstream_queue_holds_upstream(self):
+        """Testa que uma fila cheia adiante segura o estágio anterior"""
+        release = asyncio.Event()
+        consumed = []
+
+        async def slow_consumer(item):
+            await release.wait()
+            consumed.append(item)
+
+        async def fan_out(item):
+            return range(item)
+
+        consumer = PipelineStage("consumer", slow_consumer, concurrency=1, queue_size=2)
+        producer = PipelineStage("producer", fan_out, concurrency=1, queue_size=10, downstream=consumer)
+        producer.start()
+        consumer.start()
+
+        await producer.put(6)
+        await asyncio.sleep(0.05)
+        # 1 item em processamento e 2 na fila; o produtor espera vaga
+        assert consumer.queue.qsize() == 2
+        assert (producer.in_progress, producer.processed) == (1, 0)
+
+        release.set()
+        await producer.drain()
+        await consumer.drain()
+        await producer.stop()
+        await consumer.stop()
+
+        assert consumed == list(range(6))
+        assert consumer.stats(1.0).throughput_per_second == 6.0
@@ -0,0 +1,195 @@
+"""
+Testes para o controle adaptativo de cotas do LLM
+"""
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import patch
+
+from app.services.llm_service import LLMService
+from app.services.rate_limiter import (
+    AdaptiveRateLimiter, get_rate_limiter, reset_rate_limiters,
+    is_throttling_error, parse_retry_after
+)
+
+
+class FakeClock:
+    """Relógio controlado manualmente"""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+class FakeRateLimitError(Exception):
+    """Erro equivalente ao 429 do provedor"""
+    
+    def __init__(self, headers=None):
+        super().__init__("Rate limit reached")
+        self.http_status = 429
+        self.headers = headers or {}
+
+
+class FakeThrottlingProvider:
+    """Provedor local que devolve 429 acima de uma concorrência fixa"""
+    
+    def __init__(self, capacity: int, latency: float = 0.02):
+        self.capacity = capacity
+        self.latency = latency
+        self.active = 0
+        self.calls = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+    
+    def __call__(self, prompt, max_tokens=None):
+        with self._lock:
+            self.calls += 1
+            if self.active >= self.capacity:
+                self.throttled += 1
+                raise FakeRateLimitError({"retry-after-ms": "20"})
+            self.active += 1
+        try:
+            time.sleep(self.latency)
+            return {
+                "summary": "Resumo",
+                "entities": [],
+                "tags": ["despacho"],
+                "confidence": 0.9,
+                "tokens_used": 100,
+                "prompt_tokens": 80,
+                "completion_tokens": 20
+            }
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+@pytest.fixture(autouse=True)
+def limpar_rate_limiters():
+    """Isola os limitadores compartilhados entre testes"""
+    reset_rate_limiters()
+    yield
+    reset_rate_limiters()
+
+
+@pytest.mark.unit
+class TestAdaptiveRateLimiter:
+    """Testes unitários do limitador AIMD"""
+    
+    def test_additive_increase_on_success(self):
+        """Testa aumento aditivo do limite após sucessos"""
+        limiter = AdaptiveRateLimiter(1000, 1_000_000, max_concurrency=8, initial_concurrency=2,
+                                      clock=FakeClock())
+        
+        for _ in range(4):
+            assert limiter._try_acquire(10) == 0
+            limiter.release(10, actual_tokens=10)
+        
+        assert limiter.concurrency_limit == 3
+        assert limiter.in_flight == 0
+    
+    def test_multiplicative_decrease_once_per_window(self):
+        """Testa que throttlings simultâneos reduzem o limite uma única vez"""
+        clock = FakeClock()
+        limiter = AdaptiveRateLimiter(1000, 1_000_000, max_concurrency=8, initial_concurrency=8, clock=clock)
+        
+        for _ in range(4):
+            limiter._try_acquire(10)
+        for _ in range(4):
+            pause = limiter.release(10, throttled=True, headers={"Retry-After": "2"})
+        
+        assert pause == 2.0
+        assert limiter.concurrency_limit == 4
+        assert limiter.total_throttled == 4
+        
+        # Pausa global: ninguém adquire até o retry-after expirar
+        assert limiter._try_acquire(10) == pytest.approx(2.0)
+        clock.now = 2.5
+        assert limiter._try_acquire(10) == 0
+    
+    def test_request_and_token_budgets_are_separate(self):
+        """Testa cotas independentes de RPM e TPM"""
+        clock = FakeClock()
+        
+        # Limitado por requisições: 2/min = 1 requisição a cada 30s
+        limiter = AdaptiveRateLimiter(requests_per_minute=2, tokens_per_minute=1_000_000,
+                                      max_concurrency=10, initial_concurrency=10, clock=clock)
+        assert limiter._try_acquire(100) == 0
+        assert limiter._try_acquire(100) == 0
+        assert limiter._try_acquire(100) == pytest.approx(30.0)
+        
+        # Limitado por tokens: 600/min = 10 tokens/s
+        limiter = AdaptiveRateLimiter(requests_per_minute=1000, tokens_per_minute=600,
+                                      max_concurrency=10, initial_concurrency=10, clock=clock)
+        assert limiter._try_acquire(500) == 0
+        assert limiter._try_acquire(500) == pytest.approx(40.0)
+        
+        # Tokens não usados voltam para a cota
+        limiter.release(500, actual_tokens=100)
+        assert limiter._try_acquire(500) == 0
+    
+    def test_headers_cap_local_budget(self):
+        """Testa que cotas restantes informadas pelo provedor limitam o saldo local"""
+        limiter = AdaptiveRateLimiter(100, 10_000, clock=FakeClock())
+        limiter._try_acquire(10)
+        limiter.release(10, actual_tokens=10, headers={
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-remaining-tokens": "50"
+        })
+        
+        snapshot = limiter.snapshot()
+        assert snapshot["requests_available"] == 0
+        assert snapshot["tokens_available"] == 50
+    
+    def test_throttling_helpers(self):
+        """Testa identificação de throttling e parsing de retry-after"""
+        assert is_throttling_error(FakeRateLimitError())
+        assert not is_throttling_error(ValueError("erro"))
+        assert parse_retry_after({"retry-after-ms": "250"}) == 0.25
+        assert parse_retry_after({"Retry-After": "3"}) == 3.0
+        assert parse_retry_after(None) is None
+    
+    def test_limiter_shared_per_model(self, test_db):
+        """Testa que instâncias do serviço compartilham o limitador do modelo"""
+        config = {"provider": "openai", "model": "gpt-4o-mini", "api_key": "test"}
+        service_a = LLMService(test_db, config)
+        service_b = LLMService(test_db, config)
+        service_c = LLMService(test_db, {**config, "model": "gpt-4o"})
+        
+        assert service_a.rate_limiter is service_b.rate_limiter
+        assert service_a.rate_limiter is not service_c.rate_limiter
+
+
+@pytest.mark.integration
+class TestRateLimiterWithFakeProvider:
+    """Testes do limitador contra um provedor local que aplica throttling"""
+    
+    @pytest.mark.asyncio
+    async def test_converges_below_provider_capacity(self, test_db):
+        """Testa que o limite converge para a capacidade sem tempestade de erros"""
+        limiter = get_rate_limiter(
+            "openai", "fake-model",
+            requests_per_minute=100_000, tokens_per_minute=100_000_000,
+            max_concurrency=16, initial_concurrency=16,
+            base_backoff_seconds=0.02, max_backoff_seconds=0.1
+        )
+        provider = FakeThrottlingProvider(capacity=3)
+        service = LLMService(test_db, {
+            "provider": "openai", "model": "fake-model", "api_key": "test",
+            "rate_limit_max_retries": 20
+        })
+        
+        with patch.object(service, '_call_llm_api', side_effect=provider):
+            results = await asyncio.gather(*(
+                service._process_single_chunk(f"Documento {i}") for i in range(40)
+            ))
+        
+        assert all(r["success"] for r in results)
+        # AIMD oscila em torno da capacidade (dente de serra), bem abaixo do teto inicial
+        assert limiter.concurrency_limit <= 2 * provider.capacity
+        # Os 429 ficam concentrados no início, não proporcionais ao volume
+        assert provider.throttled < 40
+        assert limiter.in_flight == 0
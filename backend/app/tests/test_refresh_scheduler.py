@@ -0,0 +1,145 @@
+"""
+Testes para o agendador de reverificação de processos
+"""
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.models.processo import Processo
+from app.models.schemas import ChangesSummary, ProcessoResult
+from app.services.refresh_scheduler import RefreshScheduler
+
+INICIO = datetime(2025, 3, 1)
+
+
+@pytest.fixture
+def processos(test_db):
+    """Dez processos monitorados: os dois primeiros ativos, os demais dormentes"""
+    processos = [
+        Processo(numero=f"SEI-260002/{n:06d}/2025", tipo="Administrativo", data_autuacao=date(2025, 1, 1),
+                 url_processo=f"https://sei.rj.gov.br/processo?id={n}", created_at=INICIO, updated_at=INICIO)
+        for n in range(10)
+    ]
+    test_db.add_all(processos)
+    test_db.commit()
+    return processos
+
+
+class FakeSEI:
+    """Processos com mudanças a taxa fixa (por dia) desde a última verificação"""
+
+    def __init__(self, rates):
+        self.rates = rates
+        self.now = INICIO
+        self.pending = Counter()
+        self.last_seen = {}
+        self.checks = Counter()
+
+    async def refresh(self, processo):
+        elapsed_days = (self.now - self.last_seen.get(processo.id, INICIO)).total_seconds() / 86400
+        self.last_seen[processo.id] = self.now
+        self.checks[processo.id] += 1
+        self.pending[processo.id] += self.rates.get(processo.id, 0) * elapsed_days
+        novos = int(self.pending[processo.id])
+        self.pending[processo.id] -= novos
+        return ProcessoResult(success=True, processo_id=processo.id, was_updated=True, changes_detected=novos,
+                              changes=ChangesSummary(new_andamentos=novos))
+
+
+@pytest.mark.unit
+class TestRefreshScheduler:
+    """Testes da priorização por frequência de mudanças dentro do orçamento"""
+
+    @pytest.mark.asyncio
+    async def test_active_processos_get_the_budget(self, test_db, processos):
+        """Testa que processos ativos são verificados mais vezes sem exceder o orçamento"""
+        ativos = {processos[0].id, processos[1].id}
+        sei = FakeSEI({pid: 8.0 for pid in ativos})
+        scheduler = RefreshScheduler(test_db, {"requests_per_hour": 1, "prior_changes_per_day": 1.0},
+                                     refresh=sei.refresh)
+
+        horas = 14 * 24
+        for hora in range(horas):
+            sei.now = INICIO + timedelta(hours=hora)
+            await scheduler.run_tick(sei.now)
+
+        total = sum(sei.checks.values())
+        assert total <= horas * 1 + 1
+        # Cron uniforme com a mesma carga: cada processo teria total/10 verificações
+        assert min(sei.checks[pid] for pid in ativos) > 2 * total / len(processos)
+        dormentes = [sei.checks[p.id] for p in processos if p.id not in ativos]
+        assert max(dormentes) < min(sei.checks[pid] for pid in ativos) / 3
+
+        test_db.expire_all()
+        taxas = {p.id: p.taxa_mudancas for p in test_db.query(Processo).all()}
+        assert all(taxas[pid] > 4 for pid in ativos)
+        assert all(taxas[p.id] < 0.5 for p in processos if p.id not in ativos)
+
+    @pytest.mark.asyncio
+    async def test_budget_defers_and_failures_keep_rate(self, test_db, processos):
+        """Testa adiamento por orçamento e que falhas não alteram a taxa"""
+        async def falha(processo):
+            raise ConnectionError("HTTP 503")
+
+        scheduler = RefreshScheduler(test_db, {"requests_per_hour": 2, "max_burst": 3}, refresh=falha)
+
+        # Primeira rodada agenda todos; após 30 dias todos vencem, mas o balde limita a 3
+        await scheduler.run_tick(INICIO)
+        resultado = await scheduler.run_tick(INICIO + timedelta(days=30))
+
+        assert resultado.due == 10
+        assert (resultado.checked, resultado.failed, resultado.deferred) == (0, 3, 7)
+
+        test_db.expire_all()
+        falhos = test_db.query(Processo).filter(Processo.proxima_verificacao > INICIO + timedelta(days=30)).all()
+        assert len(falhos) == 3
+        assert all(p.taxa_mudancas is None and p.ultima_verificacao is None for p in falhos)
+
+    def test_change_rate_decays_without_changes(self, test_db, processos):
+        """Testa a estimativa da taxa com decaimento exponencial e taxa assumida"""
+        scheduler = RefreshScheduler(test_db, {
+            "rate_half_life_days": 7, "prior_changes_per_day": 2.0, "prior_weight_days": 2.0
+        })
+        processo = processos[0]
+
+        scheduler.update_change_rate(processo, ChangesSummary(new_andamentos=5), INICIO)
+        assert processo.taxa_mudancas == 2.0  # primeira verificação: sem intervalo observado
+
+        scheduler.update_change_rate(processo, ChangesSummary(), INICIO + timedelta(days=7))
+        assert processo.taxa_mudancas == pytest.approx(4 / 9)
+
+        # Histórico anterior pela metade: 7 mudanças em 3,5 + 7 dias
+        scheduler.update_change_rate(processo, ChangesSummary(new_documentos=7), INICIO + timedelta(days=14))
+        assert processo.taxa_mudancas == pytest.approx(11 / 12.5)
+
+    def test_first_check_counts_changes_since_last_save(self, test_db, processos):
+        """Testa que as mudanças da primeira verificação contam desde a gravação do processo"""
+        scheduler = RefreshScheduler(test_db, {"prior_changes_per_day": 1.0, "prior_weight_days": 2.0})
+        processo = processos[0]
+
+        scheduler.update_change_rate(processo, ChangesSummary(new_andamentos=4), INICIO + timedelta(days=2))
+
+        assert (processo.mudancas_observadas, processo.dias_observados) == (4, 2)
+        assert processo.taxa_mudancas == pytest.approx(6 / 4)
+
+    @pytest.mark.asyncio
+    async def test_first_refresh_measured_before_processo_is_saved(self, test_db, processos):
+        """Testa que a regravação do processo na verificação não encurta o primeiro intervalo"""
+        async def refresh(processo):
+            processo.updated_at = datetime.now()
+            test_db.commit()
+            return ProcessoResult(success=True, processo_id=processo.id, changes=ChangesSummary(new_andamentos=3))
+
+        scheduler = RefreshScheduler(test_db, {"requests_per_hour": 1, "max_burst": 1}, refresh=refresh)
+        await scheduler.run_tick(INICIO)
+        verificado = test_db.query(Processo).order_by(Processo.proxima_verificacao).first()
+        agora = verificado.proxima_verificacao
+        assert verificado.updated_at == INICIO  # agendar não regrava updated_at
+
+        await scheduler.run_tick(agora)
+
+        test_db.refresh(verificado)
+        assert verificado.ultima_verificacao == agora
+        assert verificado.mudancas_observadas == 3
+        assert verificado.dias_observados == pytest.approx((agora - INICIO).total_seconds() / 86400)
@@ -322,4 +322,119 @@ class TestScraperValidation:
         # Deve validar sem erros mesmo com dados mínimos
         assert processo_data.autuacao.numero_sei.startswith("SEI-")
         assert len(processo_data.documentos) == 0
-        assert len(processo_data.andamentos) == 0 
\ No newline at end of file
+        assert len(processo_data.andamentos) == 0 
+
+@pytest.mark.unit
+class TestParsePool:
+    """Testes do parsing de HTML fora do event loop"""
+    
+    @pytest.fixture
+    def html_processo(self):
+        """Página real de processo salva em debug_html"""
+        from pathlib import Path
+        
+        path = Path(__file__).resolve().parents[2] / "debug_html" / "sei_page_1.html"
+        return path.read_text(encoding="utf-8", errors="replace")
+    
+    @pytest.mark.asyncio
+    async def test_pool_and_thread_parse_match_inline_parse(self, html_processo):
+        """Testa que o resultado do worker (picklable) é igual ao parse no processo atual"""
+        from app.scraper.base import SEIScraper, get_parse_pool, parse_processo_html
+        
+        esperado = parse_processo_html(html_processo)
+        assert esperado["andamentos"]
+        
+        com_pool = SEIScraper(ScraperConfig(parse_workers=2))
+        sem_pool = SEIScraper(ScraperConfig(parse_workers=0))
+        
+        assert com_pool.parse_pool is get_parse_pool(2)
+        assert sem_pool.parse_pool is None
+        assert await com_pool.parse_html(html_processo) == esperado
+        assert await sem_pool.parse_html(html_processo) == esperado
+
+
+@pytest.mark.unit
+class TestParserBenchmark:
+    """Testes das páginas sintéticas e da checagem de regressão do benchmark"""
+    
+    def test_synthetic_page_has_requested_rows(self):
+        """Testa que a página gerada tem N protocolos e N andamentos distintos"""
+        from benchmarks.parsers import build_page, parse_page
+        
+        resultado = parse_page(build_page(30), 'html.parser')
+        
+        assert resultado['autuacao']['numero_sei'] == 'SEI-070002/013015/2024'
+        assert len({d['numero_documento'] for d in resultado['documentos']}) == 30
+        assert len(resultado['andamentos']) == 30
+    
+    def test_regression_beyond_threshold_is_reported(self):
+        """Testa que só aumentos acima do limiar contam como regressão"""
+        from benchmarks.parsers import find_regressions
+        
+        baseline = {"html.parser/100": {"total_ms": 100.0, "peak_mib": 2.0}}
+        
+        assert find_regressions({"html.parser/100": {"total_ms": 140.0, "peak_mib": 2.2}}, baseline, 0.5, 0.2) == []
+        regressoes = find_regressions(
+            {"html.parser/100": {"total_ms": 160.0, "peak_mib": 2.0}, "lxml/100": {"total_ms": 1.0, "peak_mib": 1.0}},
+            baseline, 0.5, 0.2
+        )
+        assert len(regressoes) == 1 and regressoes[0].startswith("html.parser/100 total_ms")
+
+
+@pytest.mark.unit
+class TestStreamParser:
+    """Testes do parse incremental (sem DOM) da página de processo"""
+    
+    @pytest.fixture
+    def html_bytes(self):
+        """Página real de processo salva em debug_html (iso-8859-1)"""
+        from pathlib import Path
+        
+        return (Path(__file__).resolve().parents[2] / "debug_html" / "sei_page_1.html").read_bytes()
+    
+    def test_stream_matches_dom_parse(self, html_bytes):
+        """Testa que o parse em pedaços dá o mesmo resultado do SEIParser e emite antes do fim"""
+        from app.scraper.base import parse_processo_html
+        from app.scraper.parsers import SEIStreamParser
+        
+        html = html_bytes.decode("iso-8859-1")
+        esperado = parse_processo_html(html)
+        
+        autuacao, documentos, andamentos = [], [], []
+        parser = SEIStreamParser(autuacao.append, documentos.append, andamentos.append)
+        metade = len(html) // 2
+        for inicio in range(0, metade, 997):
+            parser.feed(html[inicio:min(inicio + 997, metade)])
+        emitidos_na_metade = len(documentos) + len(andamentos)
+        parser.feed(html[metade:])
+        parser.close()
+        
+        assert 0 < emitidos_na_metade < len(documentos) + len(andamentos)
+        assert autuacao == [esperado['autuacao']]
+        assert documentos == esperado['protocolos'] and len(documentos) == 137
+        assert sorted(andamentos, key=lambda a: a['data_hora']) == esperado['andamentos']
+    
+    @pytest.mark.asyncio
+    async def test_scrape_processo_in_stream_mode(self, html_bytes):
+        """Testa o scraping com stream_parse a partir dos pedaços da resposta"""
+        from unittest.mock import patch
+        
+        from app.scraper.base import SEIScraper
+        
+        async def chunks(url, chunk_size):
+            charset = SEIScraper._response_charset(None, html_bytes)
+            for inicio in range(0, len(html_bytes), chunk_size):
+                yield html_bytes[inicio:inicio + chunk_size].decode(charset)
+        
+        scraper = SEIScraper(ScraperConfig(parse_workers=0, stream_parse=True))
+        url = "https://sei.rj.gov.br/sei/modulos/pesquisa/md_pesq_processo_exibir.php?id=1"
+        with patch.object(scraper, "_fetch_html_chunks", side_effect=chunks):
+            resultado = await scraper.scrape_processo(url)
+        
+        assert resultado.success
+        dados = resultado.processo_data
+        assert dados.autuacao.numero_sei == "SEI-070002/013015/2024"
+        assert dados.autuacao.tipo.startswith("Administrativo: Elabora")
+        assert len(dados.documentos) == 137 and len(dados.andamentos) == 330
+        assert dados.andamentos == sorted(dados.andamentos, key=lambda a: a.data_hora)
+        assert SEIScraper._response_charset("ISO-8859-1", b"") == "iso8859-1"
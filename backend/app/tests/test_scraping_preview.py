@@ -0,0 +1,269 @@
+"""
+Testes para o serviço de preview de scraping e salvamento completo
+"""
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, patch
+
+from app.models.api_schemas import SalvarProcessoCompletoRequest
+from app.models.processo import Processo, Documento, Andamento
+from app.services.scraping_preview import PreviewCache, ScrapingPreviewService
+
+URL = "https://sei.rj.gov.br/sei/modulos/pesquisa/md_pesq_processo_exibir.php?id=123"
+
+DADOS_EXTRAIDOS = {
+    "autuacao": {
+        "numero": "SEI-260002/002172/2025",
+        "tipo": "Administrativo: Solicitação",
+        "data_autuacao": "15/01/2025",
+        "interessado": "Maria Silva"
+    },
+    "protocolos": [
+        {"numero": "12345678", "tipo": "Despacho", "data": "15/01/2025",
+         "data_inclusao": "16/01/2025", "unidade": "SEFAZ/ASSJUR",
+         "url": "md_pesq_documento_consulta_externa.php?id_documento=12345678"}
+    ],
+    "andamentos": [
+        {"data_hora": "15/01/2025 10:30", "unidade": "SEFAZ/ASSJUR", "descricao": "Processo recebido"},
+        {"data_hora": "16/01/2025 14:00", "unidade": "SEFAZ/GAB", "descricao": "Processo remetido"}
+    ]
+}
+
+
+class FakeClock:
+    """Relógio controlado manualmente"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def preview_service(test_db):
+    """Service com sessões do banco de teste"""
+    return ScrapingPreviewService(session_factory=lambda: test_db)
+
+
+@pytest.mark.unit
+class TestPreviewCache:
+    """Testes do cache de previews"""
+
+    def test_entries_expire_after_ttl(self):
+        """Testa expiração pelo TTL"""
+        clock = FakeClock()
+        cache = PreviewCache(ttl_seconds=60, clock=clock)
+        cache.set(URL, "preview")
+
+        clock.now = 59
+        assert cache.get(URL) == "preview"
+        clock.now = 60
+        assert cache.get(URL) is None
+
+    def test_least_recently_used_is_evicted(self):
+        """Testa limite de entradas (LRU)"""
+        cache = PreviewCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+
+@pytest.mark.unit
+class TestScrapingPreviewService:
+    """Testes do preview assíncrono e do salvamento a partir do cache"""
+
+    @pytest.mark.asyncio
+    async def test_preview_is_cached(self, preview_service):
+        """Testa que previews repetidos não refazem o scraping"""
+        with patch("app.services.scraping_preview.SEIScraper.extract_dados_completos",
+                   new=AsyncMock(return_value=DADOS_EXTRAIDOS)) as mock_extract:
+            primeiro = await preview_service.preview_scraping(URL)
+            segundo = await preview_service.preview_scraping(URL)
+            await preview_service.preview_scraping(URL, use_cache=False)
+
+        assert primeiro is segundo
+        assert primeiro.total_andamentos == 2
+        assert mock_extract.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_preview_invalid_url(self, preview_service):
+        """Testa rejeição de URL fora do SEI-RJ"""
+        with pytest.raises(ValueError):
+            await preview_service.preview_scraping("https://example.com/processo")
+
+    @pytest.mark.asyncio
+    async def test_save_reuses_cached_preview(self, preview_service, test_db):
+        """Testa salvamento enviando apenas a URL"""
+        with patch("app.services.scraping_preview.SEIScraper.extract_dados_completos",
+                   new=AsyncMock(return_value=DADOS_EXTRAIDOS)):
+            await preview_service.preview_scraping(URL)
+
+        dados = preview_service.resolver_dados_salvamento(SalvarProcessoCompletoRequest(url=URL))
+        resultado = preview_service.salvar_processo_completo(dados)
+
+        assert resultado.sucesso is True
+        assert (resultado.protocolos_salvos, resultado.andamentos_salvos) == (1, 2)
+        assert test_db.query(Processo).one().numero == "SEI-260002/002172/2025"
+        assert test_db.query(Documento).one().url_download == (
+            "https://sei.rj.gov.br/sei/modulos/pesquisa/md_pesq_documento_consulta_externa.php?id_documento=12345678"
+        )
+        assert test_db.query(Andamento).count() == 2
+
+        # O preview é descartado após o salvamento
+        with pytest.raises(ValueError):
+            preview_service.resolver_dados_salvamento(SalvarProcessoCompletoRequest(url=URL))
+
+    def test_save_without_preview_requires_data(self, preview_service):
+        """Testa que sem preview em cache os dados completos são obrigatórios"""
+        with pytest.raises(ValueError):
+            preview_service.resolver_dados_salvamento(SalvarProcessoCompletoRequest(url=URL))
+
+    def test_save_without_preview_rejects_missing_sections(self, preview_service):
+        """Testa que a autuação sem protocolos/andamentos não salva seções vazias"""
+        autuacao = DADOS_EXTRAIDOS["autuacao"]
+
+        with pytest.raises(ValueError):
+            preview_service.resolver_dados_salvamento(SalvarProcessoCompletoRequest(url=URL, autuacao=autuacao))
+        with pytest.raises(ValueError):
+            preview_service.resolver_dados_salvamento(
+                SalvarProcessoCompletoRequest(url=URL, autuacao=autuacao, protocolos=[])
+            )
+
+        dados = preview_service.resolver_dados_salvamento(
+            SalvarProcessoCompletoRequest(url=URL, autuacao=autuacao, protocolos=[], andamentos=[])
+        )
+        assert (dados.protocolos, dados.andamentos) == ([], [])
+
+
+@pytest.mark.unit
+class TestPreviewHandoffToken:
+    """Testes do repasse preview -> salvamento por token com diff"""
+
+    @pytest_asyncio.fixture
+    async def preview(self, preview_service):
+        """Preview em cache com token de repasse"""
+        with patch("app.services.scraping_preview.SEIScraper.extract_dados_completos",
+                   new=AsyncMock(return_value=DADOS_EXTRAIDOS)):
+            return await preview_service.preview_scraping(URL)
+
+    @pytest.mark.asyncio
+    async def test_save_with_token_and_diff(self, preview_service, preview, test_db):
+        """Testa salvamento pelo token aplicando edições do cliente"""
+        from app.models.api_schemas import AlteracoesPreview
+
+        request = SalvarProcessoCompletoRequest(
+            preview_token=preview.preview_token,
+            alteracoes=AlteracoesPreview(
+                autuacao={"interessado": "Maria da Silva"},
+                andamentos={
+                    "alterados": {1: {"descricao": "Processo remetido ao GAB"}},
+                    "removidos": [0],
+                    "adicionados": [{"data_hora": "17/01/2025 09:00", "unidade": "SEFAZ/GAB",
+                                     "descricao": "Processo arquivado"}]
+                }
+            )
+        )
+        dados = preview_service.resolver_dados_salvamento(request)
+
+        assert dados.url == URL
+        assert dados.autuacao.interessado == "Maria da Silva"
+        assert [a.descricao for a in dados.andamentos] == ["Processo remetido ao GAB", "Processo arquivado"]
+        # O preview em cache não é alterado pelo diff
+        assert preview.andamentos[1].descricao == "Processo remetido"
+
+        resultado = preview_service.salvar_processo_completo(dados)
+        assert resultado.sucesso is True
+        assert test_db.query(Andamento).count() == 2
+
+        # O token é consumido pelo salvamento
+        with pytest.raises(ValueError):
+            preview_service.resolver_dados_salvamento(
+                SalvarProcessoCompletoRequest(preview_token=preview.preview_token)
+            )
+
+    @pytest.mark.asyncio
+    async def test_invalid_diff_is_rejected(self, preview_service, preview):
+        """Testa rejeição de índices e campos inexistentes"""
+        from app.models.api_schemas import AlteracoesPreview
+
+        for alteracoes in (
+            AlteracoesPreview(protocolos={"removidos": [5]}),
+            AlteracoesPreview(andamentos={"alterados": {0: {"campo_inexistente": "x"}}}),
+            AlteracoesPreview(protocolos={"adicionados": [{"numero": "1"}]})
+        ):
+            with pytest.raises(ValueError):
+                preview_service.resolver_dados_salvamento(
+                    SalvarProcessoCompletoRequest(preview_token=preview.preview_token, alteracoes=alteracoes)
+                )
+
+    def test_unknown_token_is_rejected(self, preview_service):
+        """Testa token inexistente"""
+        with pytest.raises(ValueError):
+            preview_service.resolver_dados_salvamento(SalvarProcessoCompletoRequest(preview_token="inexistente"))
+
+
+@pytest.mark.unit
+class TestSalvarProcessoEmLote:
+    """Testes da inserção em lote de protocolos e andamentos"""
+
+    def _request(self, andamentos):
+        from app.models.api_schemas import ProcessoInfoPreview, ProtocoloInfoPreview, AndamentoInfoPreview
+
+        return SalvarProcessoCompletoRequest(
+            url=URL,
+            autuacao=ProcessoInfoPreview(**DADOS_EXTRAIDOS["autuacao"]),
+            protocolos=[ProtocoloInfoPreview(**p) for p in DADOS_EXTRAIDOS["protocolos"]],
+            andamentos=[AndamentoInfoPreview(**a) for a in andamentos]
+        )
+
+    def test_reimport_reports_skipped_rows(self, preview_service, test_db):
+        """Testa que linhas repetidas são ignoradas e contabilizadas"""
+        andamentos = DADOS_EXTRAIDOS["andamentos"]
+        primeiro = preview_service.salvar_processo_completo(self._request(andamentos + andamentos[:1]))
+
+        assert primeiro.sucesso is True
+        assert (primeiro.andamentos_salvos, primeiro.andamentos_ignorados) == (2, 1)
+
+        novo = {"data_hora": "17/01/2025 09:00", "unidade": "SEFAZ/GAB", "descricao": "Processo arquivado"}
+        segundo = preview_service.salvar_processo_completo(self._request([novo] + andamentos))
+
+        assert segundo.processo_id == primeiro.processo_id
+        assert (segundo.protocolos_salvos, segundo.protocolos_ignorados) == (0, 1)
+        assert (segundo.andamentos_salvos, segundo.andamentos_ignorados) == (1, 2)
+        assert test_db.query(Andamento).count() == 3
+
+    def test_batch_date_parsing(self, preview_service):
+        """Testa conversão em lote de datas, com formatos não padronizados e inválidos"""
+        from datetime import datetime
+
+        datas = preview_service._parse_datas_brasileiras(["15/01/2025", "1/2/2025", "15/01/2025"])
+        assert datas == [datetime(2025, 1, 15), datetime(2025, 2, 1), datetime(2025, 1, 15)]
+
+        datas_hora = preview_service._parse_datetimes_brasileiras(["16/01/2025 14:05", "invalida"])
+        assert datas_hora[0] == datetime(2025, 1, 16, 14, 5)
+        assert abs((datas_hora[1] - datetime.now()).total_seconds()) < 5
+
+    def test_large_import_is_fast(self, preview_service, test_db):
+        """Testa importação de 3.000 andamentos em menos de um segundo"""
+        import time
+
+        andamentos = [
+            {"data_hora": f"{1 + i % 28:02d}/{1 + i % 12:02d}/2024 {i % 24:02d}:{i % 60:02d}",
+             "unidade": "SEFAZ/GAB", "descricao": f"Andamento {i}"}
+            for i in range(3000)
+        ]
+        request = self._request(andamentos)
+
+        inicio = time.perf_counter()
+        resultado = preview_service.salvar_processo_completo(request)
+        duracao = time.perf_counter() - inicio
+
+        assert resultado.andamentos_salvos == 3000
+        assert test_db.query(Andamento).count() == 3000
+        assert duracao < 1.0
@@ -0,0 +1,170 @@
+"""
+Testes para a extração paralela de texto de PDFs
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+
+from app.models.processo import Processo, Documento, DocumentoPagina
+from app.services.text_extraction import (
+    ExtractionTimeout, PDFTextExtractionService, _time_limit, extract_pdf_pages
+)
+
+
+def build_pdf(texts):
+    """Monta um PDF mínimo com uma página por texto"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in texts:
+        stream = f"BT /F1 12 Tf 10 100 Td ({text}) Tj ET" if text else ""
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 200 200] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+@pytest.fixture
+def documentos(test_db, tmp_path):
+    """Documentos baixados: PDF com texto, PDF digitalizado (sem texto) e arquivo ausente"""
+    processo = Processo(numero="SEI-123456/789/2025", tipo="Administrativo", data_autuacao=date(2025, 3, 18))
+    test_db.add(processo)
+    test_db.commit()
+
+    arquivos = {
+        "texto": build_pdf([f"Pagina {i}" for i in range(1, 61)]),
+        "digitalizado": build_pdf(["", ""]),
+    }
+    docs = {}
+    for nome in ("texto", "digitalizado", "ausente"):
+        path = tmp_path / f"{nome}.pdf"
+        if nome in arquivos:
+            path.write_bytes(arquivos[nome])
+        docs[nome] = Documento(processo_id=processo.id, numero_documento=nome,
+                               downloaded=True, arquivo_path=str(path))
+    test_db.add_all(docs.values())
+    test_db.commit()
+    return docs
+
+
+@pytest.mark.unit
+class TestPDFTextExtraction:
+    """Testes do estágio de extração de texto"""
+
+    @pytest.mark.asyncio
+    async def test_extracts_pages_in_process_pool(self, test_db, documentos):
+        """Testa extração em faixas de páginas no pool de processos"""
+        service = PDFTextExtractionService(test_db, {"max_workers": 2, "pages_per_task": 25})
+        try:
+            result = await service.extract_documents()
+        finally:
+            service.close()
+
+        por_id = {r.documento_id: r for r in result.results}
+        assert result.total_documents == 3
+        assert result.successful == 1
+
+        texto = documentos["texto"]
+        assert por_id[texto.id].extracted_pages == 60
+        assert texto.detalhamento_status == "pendente"
+        assert texto.detalhamento_texto.split("\n\n") == [f"Pagina {i}" for i in range(1, 61)]
+
+        assert documentos["digitalizado"].detalhamento_status == "erro"
+        assert "Nenhum texto" in por_id[documentos["digitalizado"].id].error_message
+        assert "não encontrado" in por_id[documentos["ausente"].id].error_message
+
+        # Documentos já extraídos ou com falha não voltam à fila
+        assert service.get_pending_documents() == []
+
+    @pytest.mark.asyncio
+    async def test_failed_range_is_marked_and_text_persisted_incrementally(self, test_db, documentos):
+        """Testa que uma faixa com falha não descarta as demais e que o texto é gravado por faixa"""
+        texto = documentos["texto"]
+        persistidos = []
+
+        def flaky_extract(file_path, start, end, *args):
+            if start == 25:
+                raise MemoryError()
+            return extract_pdf_pages(file_path, start, end, *args)
+
+        service = PDFTextExtractionService(
+            test_db, {"max_workers": 2, "pages_per_task": 25, "memory_limit_mb": None},
+            executor_factory=ThreadPoolExecutor
+        )
+        original_commit = test_db.commit
+
+        def commit_spy():
+            persistidos.append(texto.detalhamento_texto)
+            original_commit()
+
+        with patch("app.services.text_extraction.extract_pdf_pages", flaky_extract), \
+             patch.object(test_db, "commit", side_effect=commit_spy):
+            result = await service.extract_document(texto)
+        service.close()
+
+        assert result.success is True
+        assert (result.extracted_pages, result.failed_pages) == (35, 25)
+        assert "[Páginas 26-50 não extraídas: limite de memória" in texto.detalhamento_texto
+        assert "Pagina 51" in texto.detalhamento_texto
+        # Texto cresce a cada faixa: 1-25, +falha, +51-60
+        parciais = [p for p in persistidos if p]
+        assert parciais[0].endswith("Pagina 25")
+        assert len(set(parciais)) >= 3
+
+    @pytest.mark.asyncio
+    async def test_updated_file_reuses_unchanged_pages(self, test_db, documentos):
+        """Testa que a reextração de um arquivo atualizado só processa as páginas alteradas"""
+        texto = documentos["texto"]
+        service = PDFTextExtractionService(
+            test_db, {"max_workers": 2, "pages_per_task": 25, "memory_limit_mb": None},
+            executor_factory=ThreadPoolExecutor
+        )
+        try:
+            primeira = await service.extract_document(texto)
+
+            # Nova versão: páginas 10 e 40 alteradas e uma página acrescentada
+            paginas = [f"Pagina {i}" for i in range(1, 61)]
+            paginas[9], paginas[39] = "Pagina 10 revisada", "Pagina 40 revisada"
+            with open(texto.arquivo_path, "wb") as f:
+                f.write(build_pdf(paginas + ["Pagina 61"]))
+            texto.detalhamento_texto = None
+            test_db.commit()
+
+            segunda = await service.extract_document(texto)
+        finally:
+            service.close()
+
+        assert (primeira.extracted_pages, primeira.reused_pages) == (60, 0)
+        assert (segunda.extracted_pages, segunda.reused_pages) == (3, 58)
+        assert texto.detalhamento_texto.split("\n\n")[39] == "Pagina 40 revisada"
+
+        linhas = test_db.query(DocumentoPagina).filter(
+            DocumentoPagina.documento_id == texto.id
+        ).order_by(DocumentoPagina.numero_pagina).all()
+        assert [linha.numero_pagina for linha in linhas] == list(range(1, 62))
+        assert linhas[9].texto == "Pagina 10 revisada"
+        assert linhas[60].texto == "Pagina 61"
+
+    def test_time_limit_interrupts_worker_code(self):
+        """Testa o tempo limite aplicado dentro do worker"""
+        inicio = time.monotonic()
+        with pytest.raises(ExtractionTimeout):
+            with _time_limit(0.05):
+                time.sleep(1)
+        assert time.monotonic() - inicio < 0.5
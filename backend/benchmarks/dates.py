@@ -0,0 +1,58 @@
+"""
+Benchmark da conversão de datas do SEI: strptime por célula x app.scraper.dates
+
+Uso (a partir de backend/):
+    python benchmarks/dates.py [--linhas 10000]
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.scraper.dates import parse_date, parse_datetime, parse_dates, parse_datetimes  # noqa: E402
+
+
+def column(rows: int, fmt: str, distinct: int):
+    """Coluna com `distinct` valores diferentes, como numa tabela do SEI"""
+    inicio = datetime(2024, 7, 16, 8, 0)
+    valores = [(inicio + timedelta(minutes=37 * i)).strftime(fmt) for i in range(distinct)]
+    rng = random.Random(0)
+    return [rng.choice(valores) for _ in range(rows)]
+
+
+def best_of(fn, repeats: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--linhas", type=int, default=10000)
+    args = parser.parse_args()
+
+    casos = [
+        ("data", column(args.linhas, "%d/%m/%Y", args.linhas // 50), "%d/%m/%Y", parse_dates, parse_date),
+        ("data/hora", column(args.linhas, "%d/%m/%Y %H:%M", args.linhas), "%d/%m/%Y %H:%M",
+         parse_datetimes, parse_datetime),
+    ]
+
+    print(f"{'coluna':<12}{'distintos':>10}{'strptime ms':>13}{'frio ms':>10}{'quente ms':>11}")
+    for nome, valores, fmt, batch, single in casos:
+        strptime = best_of(lambda: [datetime.strptime(v, fmt) for v in valores])
+        frio = best_of(lambda: (single.cache_clear(), batch(valores)))
+        quente = best_of(lambda: batch(valores))
+        print(f"{nome:<12}{len(set(valores)):>10}{strptime * 1000:>13.1f}{frio * 1000:>10.1f}{quente * 1000:>11.1f}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
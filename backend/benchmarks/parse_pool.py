@@ -0,0 +1,85 @@
+"""
+Benchmark do parsing de páginas de processo no pool de processos
+
+Mede páginas/segundo com 1, 2, 4 e 8 workers sobre debug_html/sei_page_1.html,
+com várias páginas em voo (como no scraping concorrente), e a latência do
+event loop durante o parsing.
+
+Uso (a partir de backend/):
+    python benchmarks/parse_pool.py [--paginas 64] [--workers 1 2 4 8]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.scraper.base import SEIScraper, parse_processo_html  # noqa: E402
+from app.scraper.config import ScraperConfig  # noqa: E402
+
+FIXTURE = BACKEND_DIR / "debug_html" / "sei_page_1.html"
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Maior atraso (s) observado num timer periódico do event loop"""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def run(scraper: SEIScraper, html: str, pages: int):
+    """Faz o parse de `pages` cópias da página concorrentemente"""
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(scraper.parse_html(html) for _ in range(pages)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    return elapsed, await lag_task
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--paginas", type=int, default=64)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    html = FIXTURE.read_text(encoding="utf-8", errors="replace")
+    parse_processo_html(html)  # aquece imports e caches no processo principal
+
+    print(f"{FIXTURE.name}: {len(html) / 1024:.0f} KiB, {args.paginas} páginas, {os.cpu_count()} CPUs")
+    print(f"{'modo':<12}{'páginas/s':>12}{'speedup':>10}{'lag máx. loop':>16}")
+
+    configs = [("inline", None)] + [(f"{n} workers", n) for n in args.workers]
+    baseline = None
+    for label, workers in configs:
+        if workers is None:
+            # Referência: parse direto no event loop (comportamento antigo)
+            start = time.perf_counter()
+            for _ in range(args.paginas):
+                parse_processo_html(html)
+            elapsed = time.perf_counter() - start
+            lag = elapsed  # o loop fica bloqueado durante todo o parsing
+        else:
+            scraper = SEIScraper(ScraperConfig(parse_workers=workers))
+            asyncio.run(run(scraper, html, workers))  # garante os workers aquecidos
+            elapsed, lag = asyncio.run(run(scraper, html, args.paginas))
+
+        rate = args.paginas / elapsed
+        baseline = baseline or rate
+        print(f"{label:<12}{rate:>12.1f}{rate / baseline:>9.2f}x{lag * 1000:>13.0f} ms")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
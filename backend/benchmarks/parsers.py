@@ -0,0 +1,247 @@
+"""
+Benchmark dos parsers SEI com páginas sintéticas grandes
+
+Gera páginas a partir de debug_html/sei_page_1.html com 10, 100, 1.000 e
+10.000 protocolos e andamentos, mede o tempo de parse (BeautifulSoup e
+SEIParser separados) e o pico de memória para cada backend do BeautifulSoup
+instalado, e compara com benchmarks/parsers_baseline.json.
+
+Uso (a partir de backend/):
+    python benchmarks/parsers.py                      # compara; sai com 1 se houver regressão
+    python benchmarks/parsers.py --salvar-baseline    # regrava a referência
+    python benchmarks/parsers.py --linhas 10 100 --backends html.parser
+
+Tempos dependem da máquina: gere a referência no mesmo runner que faz a
+comparação. O pico de memória é estável entre máquinas.
+"""
+import argparse
+import gc
+import json
+import re
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+from bs4 import BeautifulSoup  # noqa: E402
+from bs4.builder import builder_registry  # noqa: E402
+
+from app.scraper.parsers import SEIParser  # noqa: E402
+
+TEMPLATE = BACKEND_DIR / "debug_html" / "sei_page_1.html"
+BASELINE = Path(__file__).with_name("parsers_baseline.json")
+
+ROW_COUNTS = [10, 100, 1000, 10000]
+BACKENDS = ["html.parser", "lxml", "html5lib"]
+
+# Linhas de dados das tabelas do template: da primeira <tr> após o cabeçalho até </table>
+_DOCUMENTOS_RE = re.compile(r'(<table id="tblDocumentos".*?</th>\s*</tr>)(.*?)(</table>)', re.S)
+_HISTORICO_RE = re.compile(r'(<table id="tblHistorico".*?</th></tr>)(.*?)(</table>)', re.S)
+_ROW_RE = re.compile(r'<tr\b.*?</tr>', re.S)
+
+_INICIO = datetime(2024, 7, 16, 8, 0)
+
+
+def build_page(rows: int, template: Optional[str] = None) -> str:
+    """
+    Gera uma página de processo com `rows` protocolos e `rows` andamentos
+
+    Replica a primeira linha de cada tabela do template com número de
+    documento, datas e descrição distintos, mantendo o restante da página.
+
+    Args:
+        rows: Quantidade de protocolos e de andamentos
+        template: HTML de referência (padrão: debug_html/sei_page_1.html)
+
+    Returns:
+        HTML da página sintética
+    """
+    html = template if template is not None else TEMPLATE.read_text(encoding="utf-8", errors="replace")
+
+    documentos = _DOCUMENTOS_RE.search(html)
+    historico = _HISTORICO_RE.search(html)
+    if documentos is None or historico is None:
+        raise ValueError("Template sem as tabelas tblDocumentos e tblHistorico")
+
+    doc_row = _ROW_RE.search(documentos.group(2)).group(0)
+    doc_numero = re.search(r'>(\d{8})</a>', doc_row).group(1)
+    and_row = _ROW_RE.search(historico.group(2)).group(0)
+    and_data = re.search(r'\d{2}/\d{2}/\d{4} \d{2}:\d{2}', and_row).group(0)
+    and_descricao = re.search(r'<td>([^<]+)', and_row).group(1)
+
+    doc_rows = []
+    and_rows = []
+    for i in range(rows):
+        momento = _INICIO + timedelta(hours=i)
+        doc_rows.append(
+            doc_row.replace(doc_numero, f"{70000000 + i:08d}")
+            .replace("16/07/2024", momento.strftime("%d/%m/%Y"))
+        )
+        and_rows.append(
+            and_row.replace(and_data, momento.strftime("%d/%m/%Y %H:%M"))
+            .replace(and_descricao, f"{and_descricao} ({i})")
+        )
+
+    html = html[:documentos.start(2)] + "".join(doc_rows) + html[documentos.end(2):]
+    historico = _HISTORICO_RE.search(html)
+    return html[:historico.start(2)] + "\n".join(and_rows) + html[historico.end(2):]
+
+
+def parse_page(html: str, backend: str) -> Dict:
+    """
+    Faz o parse completo da página com os parsers SEI
+
+    Args:
+        html: HTML da página
+        backend: Backend do BeautifulSoup (html.parser, lxml, html5lib)
+
+    Returns:
+        Dict com autuacao, documentos e andamentos
+    """
+    soup = BeautifulSoup(html, backend)
+    return {
+        "autuacao": SEIParser.parse_autuacao_table(soup),
+        "documentos": SEIParser.parse_documentos_table(soup.find("table", id="tblDocumentos")),
+        "andamentos": SEIParser.parse_andamentos_table(soup.find("table", id="tblHistorico")),
+    }
+
+
+def measure(html: str, backend: str, repeats: int) -> Dict[str, float]:
+    """
+    Mede uma página em um backend
+
+    Tempo: melhor de `repeats` execuções, separando a construção da árvore
+    (BeautifulSoup) do SEIParser. Memória: pico do tracemalloc em uma
+    execução à parte, para não distorcer os tempos.
+
+    Args:
+        html: HTML da página
+        backend: Backend do BeautifulSoup
+        repeats: Número de execuções cronometradas
+
+    Returns:
+        soup_ms, parse_ms, total_ms e peak_mib
+    """
+    best_soup = best_parse = float("inf")
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        soup = BeautifulSoup(html, backend)
+        built = time.perf_counter()
+        SEIParser.parse_autuacao_table(soup)
+        SEIParser.parse_documentos_table(soup.find("table", id="tblDocumentos"))
+        SEIParser.parse_andamentos_table(soup.find("table", id="tblHistorico"))
+        done = time.perf_counter()
+        best_soup = min(best_soup, built - start)
+        best_parse = min(best_parse, done - built)
+        del soup
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        parse_page(html, backend)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "soup_ms": round(best_soup * 1000, 1),
+        "parse_ms": round(best_parse * 1000, 1),
+        "total_ms": round((best_soup + best_parse) * 1000, 1),
+        "peak_mib": round(peak / 2 ** 20, 2),
+    }
+
+
+def find_regressions(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                     time_threshold: float, memory_threshold: float) -> List[str]:
+    """
+    Compara os resultados com a referência
+
+    Args:
+        results: Medições por "backend/linhas"
+        baseline: Referência no mesmo formato
+        time_threshold: Aumento relativo tolerado em total_ms (0.5 = +50%)
+        memory_threshold: Aumento relativo tolerado em peak_mib
+
+    Returns:
+        Descrição de cada regressão (vazia se nenhuma)
+    """
+    regressions = []
+    for key, current in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        for metric, threshold in (("total_ms", time_threshold), ("peak_mib", memory_threshold)):
+            if reference[metric] > 0 and current[metric] > reference[metric] * (1 + threshold):
+                regressions.append(
+                    f"{key} {metric}: {current[metric]} > {reference[metric]} "
+                    f"(+{current[metric] / reference[metric] - 1:.0%}, limite +{threshold:.0%})"
+                )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Ponto de entrada da linha de comando
+
+    Args:
+        argv: Argumentos (padrão: sys.argv)
+
+    Returns:
+        Código de saída (1 se houver regressão)
+    """
+    parser = argparse.ArgumentParser(description="Benchmark dos parsers SEI com páginas sintéticas")
+    parser.add_argument("--linhas", type=int, nargs="+", default=ROW_COUNTS, help="Protocolos/andamentos por página")
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, help="Backends do BeautifulSoup")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Execuções cronometradas por medição")
+    parser.add_argument("--limiar-tempo", type=float, default=0.5, help="Aumento de tempo tolerado (0.5 = +50%%)")
+    parser.add_argument("--limiar-memoria", type=float, default=0.2, help="Aumento de memória tolerado")
+    parser.add_argument("--baseline", type=Path, default=BASELINE, help="Arquivo de referência")
+    parser.add_argument("--salvar-baseline", action="store_true", help="Grava os resultados como referência")
+    args = parser.parse_args(argv)
+
+    backends = [name for name in args.backends if builder_registry.lookup(name) is not None]
+    skipped = sorted(set(args.backends) - set(backends))
+    if skipped:
+        print(f"Backends não instalados (ignorados): {', '.join(skipped)}")
+
+    template = TEMPLATE.read_text(encoding="utf-8", errors="replace")
+    results: Dict[str, Dict[str, float]] = {}
+
+    print(f"{'backend/linhas':<22}{'soup ms':>10}{'parser ms':>11}{'total ms':>10}{'pico MiB':>10}")
+    for rows in args.linhas:
+        html = build_page(rows, template)
+        for backend in backends:
+            key = f"{backend}/{rows}"
+            results[key] = measure(html, backend, args.repeticoes)
+            r = results[key]
+            print(f"{key:<22}{r['soup_ms']:>10.1f}{r['parse_ms']:>11.1f}{r['total_ms']:>10.1f}{r['peak_mib']:>10.2f}")
+
+    if args.salvar_baseline:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        baseline.update(results)
+        args.baseline.write_text(json.dumps(dict(sorted(baseline.items())), indent=2) + "\n")
+        print(f"Referência gravada em {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"Sem referência em {args.baseline}; use --salvar-baseline")
+        return 0
+
+    regressions = find_regressions(
+        results, json.loads(args.baseline.read_text()), args.limiar_tempo, args.limiar_memoria
+    )
+    for regression in regressions:
+        print(f"REGRESSÃO {regression}")
+    if not regressions:
+        print("Sem regressões em relação à referência")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
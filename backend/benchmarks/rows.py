@@ -0,0 +1,115 @@
+"""
+Benchmark das linhas internas x schemas Pydantic no caminho scraping → persistência
+
+Parte dos dicts do SEIParser para páginas sintéticas (benchmarks/parsers.py)
+e mede, para cada representação, a conversão dos dicts em linhas e o
+preparo da persistência (ordenação, fingerprints e digest): tempo (melhor
+de N) e memória retida pelas linhas (tracemalloc).
+
+Uso (a partir de backend/):
+    python benchmarks/rows.py [--linhas 1000 10000]
+"""
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from app.models.rows import AndamentoRow, AutuacaoRow, ProcessoRows  # noqa: E402
+from app.models.schemas import AndamentoData, AutuacaoData, DocumentoData, ProcessoData  # noqa: E402
+from app.scraper.base import documento_row  # noqa: E402
+from app.scraper.parsers import SEIParser  # noqa: E402
+from app.services.change_detection import ChangeDetectionService  # noqa: E402
+from benchmarks.parsers import build_page  # noqa: E402
+
+URL = "https://sei.rj.gov.br/sei/modulos/pesquisa/md_pesq_processo_exibir.php?id=1"
+
+
+def parsed_dicts(rows: int) -> Dict:
+    """Saída do SEIParser para uma página sintética com `rows` linhas"""
+    soup = BeautifulSoup(build_page(rows), "html.parser")
+    return {
+        "autuacao": SEIParser.parse_autuacao_table(soup),
+        "protocolos": SEIParser.parse_documentos_table(soup.find("table", id="tblDocumentos")),
+        "andamentos": SEIParser.parse_andamentos_table(soup.find("table", id="tblHistorico")),
+    }
+
+
+def to_models(dados: Dict) -> ProcessoData:
+    """Caminho anterior: um modelo Pydantic validado por linha"""
+    return ProcessoData(
+        autuacao=AutuacaoData(**dados["autuacao"]),
+        documentos=[
+            DocumentoData(**doc, url_download=documento_row(doc, URL).url_download) for doc in dados["protocolos"]
+        ],
+        andamentos=[AndamentoData(**a) for a in dados["andamentos"]]
+    )
+
+
+def to_rows(dados: Dict) -> ProcessoRows:
+    """Caminho atual: dataclasses com __slots__"""
+    return ProcessoRows(
+        autuacao=AutuacaoRow(**dados["autuacao"]),
+        documentos=[documento_row(doc, URL) for doc in dados["protocolos"]],
+        andamentos=[AndamentoRow(**a) for a in dados["andamentos"]]
+    )
+
+
+def prepare(service: ChangeDetectionService, processo) -> None:
+    """Trabalho por linha da persistência antes do banco"""
+    _, documento_fps = service.order_documentos(processo.documentos)
+    _, andamento_fps = service.order_andamentos(processo.andamentos)
+    service.build_processo_digest(processo.autuacao, documento_fps, andamento_fps)
+
+
+def best_of(fn: Callable[[], object], repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def retained_mib(fn: Callable[[], object]) -> float:
+    """Memória ainda alocada pelo resultado de `fn`"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = fn()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return current / 2 ** 20
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Linhas internas x schemas Pydantic")
+    parser.add_argument("--linhas", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    service = ChangeDetectionService()
+    print(f"{'linhas':>7} {'caminho':<9}{'conversão ms':>14}{'preparo ms':>12}{'memória MiB':>13}")
+    for rows in args.linhas:
+        dados = parsed_dicts(rows)
+        for nome, convert in (("pydantic", to_models), ("slots", to_rows)):
+            processo = convert(dados)
+            conversion = best_of(lambda: convert(dados), args.repeticoes)
+            preparation = best_of(lambda: prepare(service, processo), args.repeticoes)
+            memory = retained_mib(lambda: convert(dados))
+            print(f"{rows:>7} {nome:<9}{conversion * 1000:>14.1f}{preparation * 1000:>12.1f}{memory:>13.2f}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())